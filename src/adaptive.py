@@ -0,0 +1,283 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from src.lazy import lazy_import
+from src.logger import get_logger
+from src.constants import DATABASE_PATH, ADAPTIVE_STANDARD_ERROR, ADAPTIVE_MIN_RUNS, ADAPTIVE_ITERATIONS
+from src.analysis import CorrectnessMatrix
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+logger = get_logger(__name__)
+
+ITEM_COLUMNS = ['Question_Code', 'Category', 'Runs', 'Discrimination', 'Difficulty']
+ADAPTIVE_ESTIMATES_TABLE = 'adaptive_estimates'
+
+# Standard deviations of the priors that keep the joint fit finite when few runs are stored
+ABILITY_PRIOR_SD = 1.0
+DIFFICULTY_PRIOR_SD = 2.0
+DISCRIMINATION_PRIOR_SD = 0.5
+DISCRIMINATION_RANGE = (0.1, 4.0)
+# Largest parameter change per Newton step, and the change at which the fit has converged
+MAX_STEP = 1.0
+TOLERANCE = 1e-4
+# Ability grid for the posterior of an adaptive test
+ABILITY_GRID = (-4.0, 4.0, 161)
+
+def _probability(ability: np.ndarray, discrimination: np.ndarray, difficulty: np.ndarray) -> np.ndarray:
+    """Two-parameter logistic probability of a correct answer, broadcast over the inputs."""
+    return 1.0 / (1.0 + np.exp(-np.clip(discrimination * (ability - difficulty), -30, 30)))
+
+def fit_item_parameters(matrix: CorrectnessMatrix, min_runs: int = ADAPTIVE_MIN_RUNS,
+                        iterations: int = ADAPTIVE_ITERATIONS) -> pd.DataFrame:
+    """
+    Fit two-parameter logistic item parameters to stored results.
+
+    Abilities of the runs and the discrimination and difficulty of each question are fitted
+    jointly by alternating Newton steps on the penalized likelihood. Normal priors keep
+    questions every run answered the same way, and runs that answered everything, finite.
+    Abilities are on the scale of a standard normal prior.
+
+    Args:
+    matrix (CorrectnessMatrix): Runs and their per-question scores
+    min_runs (int): Questions answered by fewer runs are left out
+    iterations (int): Maximum number of Newton iterations
+
+    Returns:
+    pd.DataFrame: One row per calibrated question with ITEM_COLUMNS
+    """
+    runs = (~np.isnan(matrix.scores)).sum(axis=0)
+    keep = runs >= min_runs
+    scores = matrix.scores[:, keep]
+    asked = ~np.isnan(scores)
+    answers = np.nan_to_num(scores)
+    # Runs that answered none of the calibrated questions carry no information
+    scores, asked, answers = scores[asked.any(axis=1)], asked[asked.any(axis=1)], answers[asked.any(axis=1)]
+
+    ability = np.zeros(len(scores))
+    difficulty = np.zeros(scores.shape[1])
+    discrimination = np.ones(scores.shape[1])
+    for iteration in range(iterations):
+        change = 0.0
+        for parameter in ('ability', 'difficulty', 'discrimination'):
+            probability = _probability(ability[:, None], discrimination, difficulty)
+            residual = np.where(asked, answers - probability, 0.0)
+            weight = np.where(asked, probability * (1 - probability), 0.0)
+            if parameter == 'ability':
+                gradient = (discrimination * residual).sum(axis=1) - ability / ABILITY_PRIOR_SD ** 2
+                curvature = (discrimination ** 2 * weight).sum(axis=1) + 1 / ABILITY_PRIOR_SD ** 2
+                step = np.clip(gradient / curvature, -MAX_STEP, MAX_STEP)
+                ability += step
+            elif parameter == 'difficulty':
+                gradient = -(discrimination * residual).sum(axis=0) - difficulty / DIFFICULTY_PRIOR_SD ** 2
+                curvature = (discrimination ** 2 * weight).sum(axis=0) + 1 / DIFFICULTY_PRIOR_SD ** 2
+                step = np.clip(gradient / curvature, -MAX_STEP, MAX_STEP)
+                difficulty += step
+            else:
+                spread = ability[:, None] - difficulty
+                gradient = (spread * residual).sum(axis=0) - (discrimination - 1) / DISCRIMINATION_PRIOR_SD ** 2
+                curvature = (spread ** 2 * weight).sum(axis=0) + 1 / DISCRIMINATION_PRIOR_SD ** 2
+                step = np.clip(gradient / curvature, -MAX_STEP, MAX_STEP)
+                discrimination = np.clip(discrimination + step, *DISCRIMINATION_RANGE)
+            change = max(change, float(np.abs(step).max(initial=0.0)))
+        if change < TOLERANCE:
+            break
+
+    logger.info(f"Fitted item parameters for {int(keep.sum())} questions from {len(scores)} runs in {iteration + 1} iterations")
+    return pd.DataFrame({
+        'Question_Code': matrix.question_codes[keep],
+        'Category': matrix.categories[keep],
+        'Runs': runs[keep],
+        'Discrimination': discrimination,
+        'Difficulty': difficulty,
+    })
+
+class AdaptiveTest:
+    """
+    A computerized adaptive test of one model over a pool of calibrated questions.
+
+    Each next question is the unasked one with the most Fisher information at the current
+    ability estimate. The estimate is the posterior mean on a grid under a standard normal
+    prior, and the test finishes once its posterior standard deviation is below the
+    threshold, the question limit is reached or the pool is exhausted.
+    """
+
+    def __init__(self, items: pd.DataFrame, standard_error: float = ADAPTIVE_STANDARD_ERROR, max_questions: Optional[int] = None):
+        """
+        Args:
+        items (pd.DataFrame): The pool, with Question_Code, Category, Discrimination, Difficulty and optionally Discipline
+        standard_error (float): Standard error at which the test stops
+        max_questions (Optional[int]): Most questions to ask (no limit if None)
+        """
+        self.items = items.reset_index(drop=True)
+        self.standard_error_threshold = standard_error
+        self.max_questions = max_questions
+        self._discrimination = self.items['Discrimination'].to_numpy(dtype=float)
+        self._difficulty = self.items['Difficulty'].to_numpy(dtype=float)
+        self._positions = {code: position for position, code in enumerate(self.items['Question_Code'])}
+        self._available = np.ones(len(self.items), dtype=bool)
+        self._grid = np.linspace(*ABILITY_GRID)
+        # Probability of a correct answer to every question at every grid point
+        self._grid_probability = _probability(self._grid[:, None], self._discrimination, self._difficulty)
+        self._log_posterior = -0.5 * (self._grid / ABILITY_PRIOR_SD) ** 2
+        self.asked = 0
+        self.answered = 0
+        self._update_estimate()
+
+    def _update_estimate(self) -> None:
+        posterior = np.exp(self._log_posterior - self._log_posterior.max())
+        self._posterior = posterior / posterior.sum()
+        self.ability = float(self._posterior @ self._grid)
+        self.standard_error = float(np.sqrt(self._posterior @ (self._grid - self.ability) ** 2))
+
+    @property
+    def finished(self) -> bool:
+        """Whether the test should stop asking questions."""
+        return (self.standard_error < self.standard_error_threshold
+                or (self.max_questions is not None and self.asked >= self.max_questions)
+                or not self._available.any())
+
+    def next_question(self) -> Optional[str]:
+        """
+        Pick the most informative question left, or None once the test has finished.
+
+        Returns:
+        Optional[str]: Code of the question to ask next
+        """
+        if self.finished:
+            return None
+        probability = _probability(self.ability, self._discrimination, self._difficulty)
+        information = np.where(self._available, self._discrimination ** 2 * probability * (1 - probability), -1.0)
+        position = int(np.argmax(information))
+        self._available[position] = False
+        self.asked += 1
+        return str(self.items.at[position, 'Question_Code'])
+
+    def record(self, question_code: str, correct: Optional[float]) -> None:
+        """
+        Update the ability estimate with an answer.
+
+        Args:
+        question_code (str): The question that was asked
+        correct (Optional[float]): 1 if answered correctly, 0 if not, None if no valid answer was received
+        """
+        if correct is None:
+            return
+        probability = self._grid_probability[:, self._positions[question_code]]
+        self._log_posterior += np.log(probability) if correct else np.log1p(-probability)
+        self.answered += 1
+        self._update_estimate()
+
+    def questions(self, questions_df: pd.DataFrame) -> Iterator[Tuple[Any, pd.Series]]:
+        """
+        Yield the questions to ask as (index, row) pairs, like DataFrame.iterrows.
+
+        Each question is chosen when it is requested, so record the answer to one before
+        asking for the next.
+
+        Args:
+        questions_df (pd.DataFrame): Question rows covering the pool
+
+        Yields:
+        Tuple[Any, pd.Series]: Index and row of the next question
+        """
+        by_code = questions_df.set_index('Question_Code', drop=False)
+        while (question_code := self.next_question()) is not None:
+            yield question_code, by_code.loc[question_code]
+
+    def expected_percentages(self) -> Dict[str, Any]:
+        """
+        Map the ability estimate back onto the percentage scale.
+
+        The expected share of the whole pool the model answers correctly, averaged over the
+        ability posterior, overall and per category and discipline.
+
+        Returns:
+        Dict[str, Any]: {'TOTAL': float, 'Category': {name: float}, 'Discipline': {name: float}}
+        """
+        expected = pd.Series(self._posterior @ self._grid_probability * 100, index=self.items.index)
+        percentages: Dict[str, Any] = {'TOTAL': round(float(expected.mean()), 2)}
+        for column in ('Category', 'Discipline'):
+            if column in self.items.columns:
+                percentages[column] = expected.groupby(self.items[column]).mean().round(2).to_dict()
+        return percentages
+
+    def estimate(self) -> Dict[str, Any]:
+        """
+        The final estimate of the round, as stored by save_ability_estimate.
+
+        Returns:
+        Dict[str, Any]: {'Ability': float, 'Standard_Error': float, 'Questions': int, 'Pool': int, 'Percentages': dict}
+        """
+        return {'Ability': float(self.ability), 'Standard_Error': float(self.standard_error), 'Questions': int(self.answered),
+                'Pool': len(self.items), 'Percentages': self.expected_percentages()}
+
+def calibrated_pool(questions_df: pd.DataFrame, item_parameters: pd.DataFrame) -> pd.DataFrame:
+    """
+    Join the candidate questions with their fitted parameters, dropping uncalibrated ones.
+
+    Args:
+    questions_df (pd.DataFrame): Candidate questions
+    item_parameters (pd.DataFrame): Output of fit_item_parameters
+
+    Returns:
+    pd.DataFrame: The candidate questions that have parameters, with Discrimination and Difficulty
+    """
+    return questions_df.merge(item_parameters[['Question_Code', 'Discrimination', 'Difficulty']], on='Question_Code')
+
+def save_ability_estimate(estimate: Dict[str, Any], model: str, today_date: str, round_number: int, db_path: str = DATABASE_PATH) -> None:
+    """
+    Record the final ability estimate of an adaptive round, replacing one saved before.
+
+    Args:
+    estimate (Dict[str, Any]): The estimate, from AdaptiveTest.estimate
+    model (str): Model variant
+    today_date (str): Run date
+    round_number (int): The round
+    db_path (str): Path to the results database
+    """
+    percentages = estimate['Percentages']
+    conn = sqlite3.connect(db_path)
+    try:
+        with conn:
+            ensure_ability_estimates(conn)
+            # A replayed round saves its estimate again
+            conn.execute(f"DELETE FROM {ADAPTIVE_ESTIMATES_TABLE} WHERE Model = ? AND Date = ? AND Round = ?", (model, today_date, round_number))
+            conn.execute(f"INSERT INTO {ADAPTIVE_ESTIMATES_TABLE} (Model, Round, Date, Ability, Standard_Error, Questions, Pool, "
+                         f"Percentage_Correct, Percentages) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                         (model, round_number, today_date, estimate['Ability'], estimate['Standard_Error'], estimate['Questions'],
+                          estimate['Pool'], percentages['TOTAL'], json.dumps(percentages)))
+    finally:
+        conn.close()
+
+def ensure_ability_estimates(conn: sqlite3.Connection) -> None:
+    """Create the adaptive estimates table if it does not exist."""
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {ADAPTIVE_ESTIMATES_TABLE} (Model TEXT, Round INTEGER, Date TEXT, Ability REAL, "
+                 f"Standard_Error REAL, Questions INTEGER, Pool INTEGER, Percentage_Correct REAL, Percentages TEXT)")
+
+def stored_percentages(conn: sqlite3.Connection, model: str, today_date: str, round_number: int) -> Optional[Dict[str, Any]]:
+    """
+    The summary percentages recorded for an adaptive round.
+
+    Rebuilding the summaries of an adaptive round from its answers would report the share
+    of the (deliberately hard) questions it was asked, so rebuilds use these instead.
+
+    Args:
+    conn (sqlite3.Connection): Connection to the results database
+    model (str): Model variant
+    today_date (str): Run date
+    round_number (int): The round
+
+    Returns:
+    Optional[Dict[str, Any]]: Percentages in the format of AdaptiveTest.expected_percentages, or None if the round is not adaptive
+    """
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (ADAPTIVE_ESTIMATES_TABLE,)).fetchone()
+    if exists is None:
+        return None
+    row = conn.execute(f"SELECT Percentages FROM {ADAPTIVE_ESTIMATES_TABLE} WHERE Model = ? AND Date = ? AND Round = ? "
+                       f"ORDER BY rowid DESC LIMIT 1", (model, today_date, round_number)).fetchone()
+    return None if row is None else json.loads(row[0])
@@ -0,0 +1,283 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from src.lazy import lazy_import
+from src.logger import get_logger
+from src.constants import DATABASE_PATH, BOOTSTRAP_RESAMPLES, BOOTSTRAP_CONFIDENCE, BOOTSTRAP_SEED, ANALYSIS_CACHE_FILE
+from src.data_processing import load_table_catalog
+from src.model_names import resolve_display_name
+from src.json_cache import JsonCache
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+logger = get_logger(__name__)
+
+# Resamples drawn per matrix product, bounding memory to RESAMPLE_BLOCK x questions weights
+RESAMPLE_BLOCK = 500
+# Pairs of runs compared per matrix product
+PAIR_BLOCK = 256
+# Bump when the statistics change so cached results are not reused
+ANALYSIS_VERSION = 1
+
+INTERVAL_COLUMNS = ['Run', 'Category', 'Questions', 'Accuracy', 'Lower', 'Upper']
+TEST_COLUMNS = ['Run_A', 'Run_B', 'Questions', 'Difference', 'Lower', 'Upper', 'P_Value', 'P_Adjusted']
+
+class CorrectnessMatrix(NamedTuple):
+    runs: pd.DataFrame  # Table_Name, Model, Date and Label of each run, one row per results table
+    question_codes: np.ndarray
+    categories: np.ndarray  # category of each question
+    scores: np.ndarray  # runs x questions: share of rounds answered correctly, NaN where never asked
+
+def _correct_column(conn: sqlite3.Connection, table_name: str) -> Optional[str]:
+    columns = {info[1] for info in conn.execute(f'PRAGMA table_info("{table_name}")')}
+    if 'Question_Code' not in columns:
+        return None
+    return 'Is_Correct' if 'Is_Correct' in columns else 'Correct' if 'Correct' in columns else None
+
+def load_correctness_matrix(db_path: str = DATABASE_PATH, models: Sequence[str] = (), date: Optional[str] = None,
+                            latest: bool = False) -> CorrectnessMatrix:
+    """
+    Load per-question correctness of the catalogued runs into a NumPy array.
+
+    A run is one results table (a model on a date). Questions asked in several rounds
+    score the share of rounds they were answered correctly.
+
+    Args:
+    db_path (str): Path to the results database
+    models (Sequence[str]): Only load runs of these model variants (all if empty)
+    date (Optional[str]): Only load runs of this date ('YYYY-MM-DD')
+    latest (bool): Only load the most recent run of each model
+
+    Returns:
+    CorrectnessMatrix: The runs, questions and their scores
+    """
+    catalog = load_table_catalog(db_path, date=date)
+    if models:
+        catalog = catalog[catalog['Model'].isin(models)]
+    if latest:
+        catalog = catalog.sort_values('Date', kind='stable').groupby('Model', sort=False).tail(1).sort_values(['Date', 'Model'])
+    per_run: List[pd.DataFrame] = []
+    runs: List[Tuple[str, str, str]] = []
+    conn = sqlite3.connect(db_path)
+    try:
+        for table_name, run_model, run_date in catalog[['Table_Name', 'Model', 'Date']].itertuples(index=False):
+            column = _correct_column(conn, table_name)
+            if column is None:
+                logger.warning(f"Skipping {table_name}: no Question_Code or correctness column")
+                continue
+            per_run.append(pd.read_sql_query(
+                f'SELECT "Question_Code", MAX("Category") AS Category, '
+                f'AVG(CASE WHEN "{column}" IN (1, \'1\', \'True\', \'true\') THEN 1.0 ELSE 0.0 END) AS Score '
+                f'FROM "{table_name}" GROUP BY "Question_Code"', conn
+            ).assign(Run=len(runs)))
+            runs.append((table_name, run_model, run_date))
+    finally:
+        conn.close()
+
+    runs_df = pd.DataFrame(runs, columns=['Table_Name', 'Model', 'Date'])
+    if not runs:
+        return CorrectnessMatrix(runs_df.assign(Label=[]), np.array([], dtype=object), np.array([], dtype=object), np.zeros((0, 0)))
+
+    answers = pd.concat(per_run, ignore_index=True)
+    matrix = answers.pivot(index='Question_Code', columns='Run', values='Score').reindex(columns=range(len(runs)))
+    categories = answers.groupby('Question_Code')['Category'].first().reindex(matrix.index).fillna('').astype(str)
+
+    names = [resolve_display_name(str(run_model))[0] for run_model in runs_df['Model']]
+    runs_df['Label'] = [f"{name} ({run_date})" if names.count(name) > 1 else name for name, run_date in zip(names, runs_df['Date'])]
+    return CorrectnessMatrix(runs_df, matrix.index.to_numpy(dtype=object), categories.to_numpy(dtype=object), matrix.to_numpy(dtype=float).T)
+
+def bootstrap_weights(categories: np.ndarray, resamples: int, seed: int) -> Iterator[np.ndarray]:
+    """
+    Yield bootstrap resamples of the questions as count weights, in blocks of rows.
+
+    Questions are resampled within their category, so every resample keeps the category
+    mix. Each block comes from its own seeded generator, so any analysis over the same
+    questions and seed sees identical resamples.
+
+    Args:
+    categories (np.ndarray): Category of each question
+    resamples (int): Total number of resamples
+    seed (int): Seed of the resamples
+
+    Yields:
+    np.ndarray: A (block size x questions) array of how often each question was drawn
+    """
+    groups = [np.flatnonzero(categories == category) for category in np.unique(categories)]
+    for block, start in enumerate(range(0, resamples, RESAMPLE_BLOCK)):
+        size = min(RESAMPLE_BLOCK, resamples - start)
+        rng = np.random.default_rng([seed, block])
+        weights = np.zeros((size, len(categories)), dtype=np.float32)
+        for group in groups:
+            # Draw len(group) questions with replacement per resample and count them in one bincount
+            draws = rng.integers(0, len(group), size=(size, len(group))) + np.arange(size)[:, None] * len(group)
+            weights[:, group] = np.bincount(draws.ravel(), minlength=size * len(group)).reshape(size, len(group))
+        yield weights
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(denominator > 0, numerator / np.where(denominator > 0, denominator, 1), np.nan)
+
+def _interval(samples: np.ndarray, confidence: float) -> Tuple[np.ndarray, np.ndarray]:
+    # Percentile interval per column, ignoring resamples that drew none of a run's questions
+    lower, upper = (1 - confidence) / 2, 1 - (1 - confidence) / 2
+    with np.errstate(invalid='ignore'):
+        valid = ~np.isnan(samples).all(axis=0)
+        bounds = np.full((2, samples.shape[1]), np.nan)
+        if valid.any():
+            bounds[:, valid] = np.nanquantile(samples[:, valid], [lower, upper], axis=0)
+    return bounds[0], bounds[1]
+
+def bootstrap_intervals(matrix: CorrectnessMatrix, resamples: int = BOOTSTRAP_RESAMPLES, confidence: float = BOOTSTRAP_CONFIDENCE,
+                        seed: int = BOOTSTRAP_SEED) -> pd.DataFrame:
+    """
+    Bootstrap confidence intervals of each run's accuracy, overall ('TOTAL') and per category.
+
+    Every run and category is evaluated on the same resamples with one matrix product per
+    block: accuracy is the weighted mean score over the resampled questions a run answered.
+
+    Args:
+    matrix (CorrectnessMatrix): Runs and their per-question scores
+    resamples (int): Number of bootstrap resamples
+    confidence (float): Coverage of the intervals, e.g. 0.95
+    seed (int): Seed of the resamples
+
+    Returns:
+    pd.DataFrame: One row per run and category with accuracy and interval bounds, in percent
+    """
+    asked = ~np.isnan(matrix.scores)
+    values = np.where(asked, matrix.scores, 0.0).astype(np.float32)
+    asked_weights = asked.astype(np.float32)
+    groups: Dict[str, np.ndarray] = {category: np.flatnonzero(matrix.categories == category) for category in np.unique(matrix.categories)}
+    numerators: Dict[str, List[np.ndarray]] = {category: [] for category in ['TOTAL', *groups]}
+    denominators: Dict[str, List[np.ndarray]] = {category: [] for category in ['TOTAL', *groups]}
+
+    for weights in bootstrap_weights(matrix.categories, resamples, seed):
+        total_numerator, total_denominator = 0.0, 0.0
+        for category, columns in groups.items():
+            numerator = weights[:, columns] @ values[:, columns].T
+            denominator = weights[:, columns] @ asked_weights[:, columns].T
+            numerators[category].append(numerator)
+            denominators[category].append(denominator)
+            total_numerator, total_denominator = total_numerator + numerator, total_denominator + denominator
+        numerators['TOTAL'].append(total_numerator)
+        denominators['TOTAL'].append(total_denominator)
+
+    rows = []
+    for category in numerators:
+        columns = np.arange(len(matrix.question_codes)) if category == 'TOTAL' else groups[category]
+        counts = asked[:, columns].sum(axis=1)
+        accuracy = _ratio(values[:, columns].sum(axis=1, dtype=np.float64), counts)
+        lower, upper = _interval(_ratio(np.concatenate(numerators[category]), np.concatenate(denominators[category])), confidence)
+        for run in np.flatnonzero(counts):
+            rows.append((matrix.runs['Label'].iloc[run], category, int(counts[run]), accuracy[run] * 100, lower[run] * 100, upper[run] * 100))
+    return pd.DataFrame(rows, columns=INTERVAL_COLUMNS)
+
+def holm_adjust(p_values: np.ndarray) -> np.ndarray:
+    """Holm-Bonferroni adjusted p-values, controlling the family-wise error rate across all comparisons."""
+    order = np.argsort(p_values)
+    adjusted = np.maximum.accumulate(p_values[order] * (len(p_values) - np.arange(len(p_values))))
+    result = np.empty_like(adjusted)
+    result[order] = np.minimum(adjusted, 1.0)
+    return result
+
+def paired_tests(matrix: CorrectnessMatrix, resamples: int = BOOTSTRAP_RESAMPLES, confidence: float = BOOTSTRAP_CONFIDENCE,
+                 seed: int = BOOTSTRAP_SEED) -> pd.DataFrame:
+    """
+    Paired bootstrap tests of the accuracy difference between every pair of runs.
+
+    Each pair is compared on the questions both runs answered, resampling questions so the
+    pairing is kept. The p-value is two-sided, from the share of resamples on either side
+    of zero, and P_Adjusted applies the Holm correction across all pairs.
+
+    Args:
+    matrix (CorrectnessMatrix): Runs and their per-question scores
+    resamples (int): Number of bootstrap resamples
+    confidence (float): Coverage of the difference intervals
+    seed (int): Seed of the resamples
+
+    Returns:
+    pd.DataFrame: One row per pair with the difference (A - B) and its interval in percentage points
+    """
+    run_count = len(matrix.runs)
+    first, second = np.triu_indices(run_count, k=1)
+    if not len(first):
+        return pd.DataFrame(columns=TEST_COLUMNS)
+
+    asked = ~np.isnan(matrix.scores)
+    values = np.where(asked, matrix.scores, 0.0).astype(np.float32)
+    pair_blocks = []
+    for start in range(0, len(first), PAIR_BLOCK):
+        a, b = first[start:start + PAIR_BLOCK], second[start:start + PAIR_BLOCK]
+        common = (asked[a] & asked[b]).astype(np.float32)
+        pair_blocks.append((a, b, common, (values[a] - values[b]) * common))
+
+    # Each block of resamples is drawn once and applied to every pair
+    samples: List[List[np.ndarray]] = [[] for _ in pair_blocks]
+    for weights in bootstrap_weights(matrix.categories, resamples, seed):
+        for block, (_, _, common, differences) in enumerate(pair_blocks):
+            samples[block].append(_ratio(weights @ differences.T, weights @ common.T))
+
+    rows = []
+    for (a, b, common, differences), block_samples in zip(pair_blocks, samples):
+        block_samples = np.concatenate(block_samples)
+        counts = common.sum(axis=1)
+        estimate = _ratio(differences.sum(axis=1, dtype=np.float64), counts)
+        lower, upper = _interval(block_samples, confidence)
+        valid = np.maximum((~np.isnan(block_samples)).sum(axis=0), 1)
+        below = (block_samples <= 0).sum(axis=0) / valid
+        above = (block_samples >= 0).sum(axis=0) / valid
+        p_values = np.minimum(1.0, 2 * np.minimum(below, above))
+        for pair in range(len(a)):
+            rows.append((matrix.runs['Label'].iloc[a[pair]], matrix.runs['Label'].iloc[b[pair]], int(counts[pair]),
+                         estimate[pair] * 100, lower[pair] * 100, upper[pair] * 100, p_values[pair] if counts[pair] else np.nan))
+
+    tests = pd.DataFrame(rows, columns=TEST_COLUMNS[:-1])
+    tested = tests['P_Value'].notna().to_numpy()
+    tests['P_Adjusted'] = np.nan
+    if tested.any():
+        tests.loc[tested, 'P_Adjusted'] = holm_adjust(tests.loc[tested, 'P_Value'].to_numpy())
+    return tests
+
+def analysis_cache_key(matrix: CorrectnessMatrix, resamples: int, confidence: float, seed: int) -> str:
+    """Key a cached analysis by the analysis version, the bootstrap parameters and the scores."""
+    digest = hashlib.sha256(json.dumps([ANALYSIS_VERSION, resamples, confidence, seed, list(matrix.runs['Label']),
+                                        [str(code) for code in matrix.question_codes], list(matrix.categories)]).encode('utf-8'))
+    digest.update(np.ascontiguousarray(matrix.scores, dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+def analyze_runs(matrix: CorrectnessMatrix, resamples: int = BOOTSTRAP_RESAMPLES, confidence: float = BOOTSTRAP_CONFIDENCE,
+                 seed: int = BOOTSTRAP_SEED, cache_file: Optional[str] = ANALYSIS_CACHE_FILE) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Compute bootstrap intervals and paired tests, reusing cached results for identical inputs.
+
+    Args:
+    matrix (CorrectnessMatrix): Runs and their per-question scores
+    resamples (int): Number of bootstrap resamples
+    confidence (float): Coverage of the intervals
+    seed (int): Seed of the resamples
+    cache_file (Optional[str]): JSON file caching recent results; None disables caching
+
+    Returns:
+    Tuple[pd.DataFrame, pd.DataFrame]: (intervals, paired tests)
+    """
+    key = analysis_cache_key(matrix, resamples, confidence, seed)
+    cache = JsonCache(cache_file) if cache_file else None
+    cached = cache.get(key) if cache is not None else None
+    if cached is not None:
+        logger.info(f"Using cached analysis of {len(matrix.runs)} runs")
+        intervals = pd.DataFrame(cached['intervals'], columns=INTERVAL_COLUMNS)
+        tests = pd.DataFrame(cached['tests'], columns=TEST_COLUMNS)
+    else:
+        intervals = bootstrap_intervals(matrix, resamples, confidence, seed)
+        tests = paired_tests(matrix, resamples, confidence, seed)
+        logger.info(f"Bootstrapped {len(matrix.runs)} runs over {len(matrix.question_codes)} questions with {resamples} resamples")
+        cached = {'intervals': intervals.values.tolist(), 'tests': tests.values.tolist()}
+    if cache is not None:
+        cache.put(key, cached)
+        cache.save()
+    return intervals, tests
@@ -1,31 +1,49 @@
+from __future__ import annotations
+
+import asyncio
 import os
+import threading
 import time
 import random
-from typing import Tuple, Optional, Any, cast
-from openai import OpenAI
-from openai.types.chat import ChatCompletion
-from openai.types.completion_usage import CompletionUsage
-import anthropic # type: ignore
-from google.oauth2 import service_account
-import vertexai  # type: ignore
-from vertexai.generative_models import GenerativeModel  # type: ignore
-from together import Together  # type: ignore
-from mistralai.client import MistralClient # type: ignore
-from mistralai.models.chat_completion import ChatMessage # type: ignore
+from typing import TYPE_CHECKING, Tuple, Optional, Any, Dict, Iterator, List, Union
 
+from src.lazy import lazy_import
 from src.logger import get_logger
-from src.constants import PROJECT_ID, LOCATION, SERVICE_ACCOUNT_FILE, MAX_RETRIES, INITIAL_DELAY, MAX_DELAY, BACKOFF_MULTIPLIER
+from src.metrics import REQUESTS_IN_FLIGHT, REQUEST_LATENCY, RATE_LIMITED_RESPONSES, is_rate_limit_error
+from src.constants import (
+    PROJECT_ID, LOCATION, SERVICE_ACCOUNT_FILE, MAX_RETRIES, INITIAL_DELAY, MAX_DELAY, BACKOFF_MULTIPLIER, GEMINI_GENERATION_CONFIG
+)
+from src.data_processing import PromptParts
+from src.local_inference import query_local_model
+
+if TYPE_CHECKING:
+    from openai.types.chat import ChatCompletion
 
-logger = get_logger()
+# Provider SDKs are imported on first use; vertexai alone takes seconds to import
+openai = lazy_import('openai')
+anthropic = lazy_import('anthropic')
+together = lazy_import('together')
+mistralai_client = lazy_import('mistralai.client')
+mistralai_models = lazy_import('mistralai.models.chat_completion')
+vertexai = lazy_import('vertexai')
+generative_models = lazy_import('vertexai.generative_models')
+service_account = lazy_import('google.oauth2.service_account')
+
+logger = get_logger(__name__)
 
 # Initialize API clients
 GPT_client = None
 claude_client = None
 together_client = None
 mistral_client = None
+vertex_initialized = False
+
+# Gemini model instances by (model, system instruction), built once and reused for every question
+_gemini_models: Dict[Tuple[str, str], Any] = {}
+_gemini_models_lock = threading.Lock()
 
 def initialize_clients() -> None:
-    global GPT_client, claude_client, together_client, mistral_client
+    global GPT_client, claude_client, together_client, mistral_client, vertex_initialized
     openai_key = os.getenv('OPENAI_API_KEY')
     claude_key = os.getenv('CLAUDE_API_KEY')
     together_key = os.getenv('TOGETHER_API_KEY')
@@ -35,97 +53,277 @@ def initialize_clients() -> None:
         raise Exception("One or more API keys are missing. Please check your environment variables.")
 
     if GPT_client is None:
-        GPT_client = OpenAI(api_key=openai_key)
+        GPT_client = openai.OpenAI(api_key=openai_key)
     if claude_client is None:
         claude_client = anthropic.Anthropic(api_key=claude_key)
     if together_client is None:
-        together_client = Together(api_key=together_key)
+        together_client = together.Together(api_key=together_key)
     if mistral_client is None:
-        mistral_client = MistralClient(api_key=mistral_key)
+        mistral_client = mistralai_client.MistralClient(api_key=mistral_key)
+
+    if not vertex_initialized:
+        # Authenticate using the service account
+        CREDENTIALS = service_account.Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE)
+
+        vertexai.init(project=PROJECT_ID, location=LOCATION, credentials=CREDENTIALS)
+        vertex_initialized = True
+
+def _token_count(value: Any) -> int:
+    # Usage fields are missing or None when a provider or SDK version does not report them
+    return value if isinstance(value, int) else 0
+
+def _anthropic_request(parts: PromptParts) -> Dict[str, Any]:
+    """
+    Lay out a prompt for the Anthropic Messages API with the shared prefix marked cacheable.
+
+    The cache breakpoint goes on the last static block, so the system prompt and few-shot
+    examples are cached together and only the question is processed at full price.
+    """
+    cache_control = {"type": "ephemeral"}
+    request: Dict[str, Any] = {}
+    if parts.system:
+        system_block: Dict[str, Any] = {"type": "text", "text": parts.system}
+        if not parts.prefix:
+            system_block["cache_control"] = cache_control
+        request["system"] = [system_block]
+    content: Union[str, List[Dict[str, Any]]] = parts.question
+    if parts.prefix:
+        content = [{"type": "text", "text": parts.prefix, "cache_control": cache_control}, {"type": "text", "text": parts.question}]
+    request["messages"] = [{"role": "user", "content": content}]
+    return request
+
+def get_gemini_model(model: str, system: str = '') -> Any:
+    """
+    Get a cached Gemini model instance configured with the generation settings from config.yaml.
+
+    Args:
+    model (str): The Gemini model name
+    system (str): System instruction, empty for none
+
+    Returns:
+    Any: The vertexai GenerativeModel
+    """
+    key = (model, system)
+    with _gemini_models_lock:
+        if key not in _gemini_models:
+            _gemini_models[key] = generative_models.GenerativeModel(
+                model,
+                system_instruction=system or None,
+                generation_config=generative_models.GenerationConfig(**GEMINI_GENERATION_CONFIG)
+            )
+        return _gemini_models[key]
+
+def _gemini_result(model_instance: Any, prompt_text: str, response: Any) -> Tuple[Optional[str], int, int, int, int]:
+    """Read the answer and token counts from a Gemini response."""
+    content = str(response.text) if hasattr(response, 'text') and response.text is not None else None
+    usage = getattr(response, 'usage_metadata', None)
+    if usage is None:
+        # Responses without usage metadata need count_tokens, which costs two extra round-trips
+        return (
+            content,
+            int(model_instance.count_tokens(prompt_text).total_tokens),
+            int(model_instance.count_tokens(content or "").total_tokens),
+            0,
+            0
+        )
+    return (
+        content,
+        _token_count(getattr(usage, 'prompt_token_count', 0)),
+        _token_count(getattr(usage, 'candidates_token_count', 0)),
+        _token_count(getattr(usage, 'cached_content_token_count', 0)),
+        0
+    )
+
+def _call_provider(provider: str, model: str, prompt: PromptParts) -> Optional[Tuple[Optional[str], int, int, int, int]]:
+    """
+    Send a single request to the provider's API.
+
+    Returns:
+    Optional[Tuple[Optional[str], int, int, int, int]]: The response content, and the prompt, completion, cached prompt
+    and cache write token counts, or None if the provider is not supported
+    """
+    if provider == 'OpenAI' and GPT_client is not None:
+        # The static prefix comes first and never changes, which is what OpenAI's automatic prompt caching matches on
+        messages = [{"role": "system", "content": prompt.system}] if prompt.system else []
+        messages.append({"role": "user", "content": prompt.prefix + prompt.question})
+        params = {
+            "model": model,
+            "messages": messages,
+        }
+        response: ChatCompletion = GPT_client.chat.completions.create(**params)
+        content = response.choices[0].message.content if hasattr(response, 'choices') and response.choices else None
+        usage = response.usage if hasattr(response, 'usage') else None
+        details = getattr(usage, 'prompt_tokens_details', None) if usage else None
+        return (
+            content,
+            getattr(usage, 'prompt_tokens', 0) if usage else 0,
+            getattr(usage, 'completion_tokens', 0) if usage else 0,
+            _token_count(getattr(details, 'cached_tokens', 0)),
+            0
+        )
+    elif provider == 'Anthropic' and claude_client is not None:
+        response_anthropic: Any = claude_client.messages.create(model=model, max_tokens=300, **_anthropic_request(prompt))
+        content = response_anthropic.content[0].text if response_anthropic.content else None
+        usage = response_anthropic.usage if hasattr(response_anthropic, 'usage') else None
+        # input_tokens excludes tokens written to or read from the cache; report the whole prompt
+        cache_read = _token_count(getattr(usage, 'cache_read_input_tokens', 0)) if usage else 0
+        cache_write = _token_count(getattr(usage, 'cache_creation_input_tokens', 0)) if usage else 0
+        return (
+            content,
+            (getattr(usage, 'input_tokens', 0) if usage else 0) + cache_read + cache_write,
+            getattr(usage, 'output_tokens', 0) if usage else 0,
+            cache_read,
+            cache_write
+        )
+    elif provider == 'Local':
+        answer, prompt_tokens, completion_tokens, cached_tokens = query_local_model(model, prompt)
+        return answer, prompt_tokens, completion_tokens, cached_tokens, 0
+    elif provider == 'Google':
+        model_instance = get_gemini_model(model, prompt.system)
+        text = prompt.prefix + prompt.question
+        response_google: Any = model_instance.generate_content(text)
+        return _gemini_result(model_instance, text, response_google)
+    elif provider in ['Meta', 'Mistral'] and together_client is not None:
+        response_together: Any = together_client.chat.completions.create(model=model, messages=[{"role": "user", "content": prompt.text}])
+        content = response_together.choices[0].message.content if hasattr(response_together, 'choices') and response_together.choices else None
+        usage = response_together.usage if hasattr(response_together, 'usage') else None
+        return (
+            content,
+            getattr(usage, 'prompt_tokens', 0) if usage else 0,
+            getattr(usage, 'completion_tokens', 0) if usage else 0,
+            0,
+            0
+        )
+    elif provider == 'MistralM' and mistral_client is not None:
+        response_mistral: Any = mistral_client.chat(model=model, messages=[mistralai_models.ChatMessage(role="user", content=prompt.text)])
+        content = response_mistral.choices[0].message.content if response_mistral.choices else None
+        usage = response_mistral.usage if hasattr(response_mistral, 'usage') else None
+        return (
+            content,
+            getattr(usage, 'input_tokens', 0) if usage else 0,
+            getattr(usage, 'output_tokens', 0) if usage else 0,
+            0,
+            0
+        )
+    return None
+
+class _Attempt:
+    """
+    One request to a provider.
+
+    The request is tracked in the live metrics, and an error it raises is logged and
+    recorded instead of propagating, with the backoff to wait before the next attempt.
+    """
+
+    def __init__(self, labels: Dict[str, str], retries_left: int):
+        self.labels = labels
+        self.retries_left = retries_left
+        self.delay = 0.0
+        self._start = 0.0
 
-    # Authenticate using the service account
-    CREDENTIALS = service_account.Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE)
+    def __enter__(self) -> '_Attempt':
+        REQUESTS_IN_FLIGHT.inc(**self.labels)
+        self._start = time.monotonic()
+        return self
 
-    vertexai.init(project=PROJECT_ID, location=LOCATION, credentials=CREDENTIALS)
+    def __exit__(self, exc_type: Any, exc: Optional[BaseException], traceback: Any) -> bool:
+        REQUESTS_IN_FLIGHT.dec(**self.labels)
+        REQUEST_LATENCY.observe(time.monotonic() - self._start, **self.labels)
+        if not isinstance(exc, Exception):
+            return False
+        if is_rate_limit_error(exc):
+            RATE_LIMITED_RESPONSES.inc(**self.labels)
+        logger.error(f"Error during API call: {exc}")
+        if self.retries_left > 0:
+            self.delay = min(MAX_DELAY, INITIAL_DELAY * (BACKOFF_MULTIPLIER ** (MAX_RETRIES - self.retries_left))) + random.uniform(0, 1)
+            logger.info(f"Retrying in {self.delay:.2f} seconds...")
+        else:
+            logger.error("Maximum retries reached. Returning no result.")
+        return True
 
-def query_language_model(provider: str, model: str, prompt: str, retry_count: int = MAX_RETRIES) -> Tuple[Optional[str], int, int]:
+def _attempts(provider: str, model: str, retry_count: int) -> Iterator[_Attempt]:
+    """Yield up to retry_count attempts; the caller sleeps for each failed attempt's delay, blocking or not."""
+    labels = {'provider': provider, 'model': model}
+    for retries_left in range(retry_count - 1, -1, -1):
+        yield _Attempt(labels, retries_left)
+
+def query_language_model(provider: str, model: str, prompt: Union[str, PromptParts],
+                         retry_count: int = MAX_RETRIES) -> Tuple[Optional[str], int, int, int, int]:
     """
     Query a language model with the given prompt.
     
     Args:
     provider (str): The provider of the language model (e.g., 'OpenAI', 'Anthropic')
     model (str): The specific model to use
-    prompt (str): The prompt to send to the model
+    prompt (Union[str, PromptParts]): The prompt to send to the model, optionally split into a cacheable prefix and the question
     retry_count (int): Number of retries allowed in case of failure
 
     Returns:
-    Tuple[Optional[str], int, int]: The response content, number of tokens in the prompt, and number of tokens in the response
+    Tuple[Optional[str], int, int, int, int]: The response content, number of tokens in the prompt, number of tokens in the
+    response, and numbers of prompt tokens read from and written to the provider's prompt cache
     """
-    initial_delay = INITIAL_DELAY
-    max_delay = MAX_DELAY
-    multiplier = BACKOFF_MULTIPLIER
+    if isinstance(prompt, str):
+        prompt = PromptParts('', '', prompt)
 
-    initialize_clients()
-    
-    while retry_count > 0:
-        try:
-            if provider == 'OpenAI' and GPT_client is not None:
-                params = {
-                    "model": model,
-                    "messages": [{"role": "user", "content": prompt}],
-                }
-                response: ChatCompletion = GPT_client.chat.completions.create(**params)
-                content = response.choices[0].message.content if hasattr(response, 'choices') and response.choices else None
-                usage = response.usage if hasattr(response, 'usage') else None
-                return (
-                    content,
-                    getattr(usage, 'prompt_tokens', 0) if usage else 0,
-                    getattr(usage, 'completion_tokens', 0) if usage else 0
-                )
-            elif provider == 'Anthropic' and claude_client is not None:
-                response_anthropic: Any = claude_client.messages.create(model=model, messages=[{"role": "user", "content": prompt}], max_tokens=300)
-                content = response_anthropic.content[0].text if response_anthropic.content else None
-                usage = response_anthropic.usage if hasattr(response_anthropic, 'usage') else None
-                return (
-                    content,
-                    getattr(usage, 'input_tokens', 0) if usage else 0,
-                    getattr(usage, 'output_tokens', 0) if usage else 0
-                )
-            elif provider == 'Google':
-                model_instance = GenerativeModel(model)
-                response_google: Any = model_instance.generate_content(prompt)
-                return (
-                    str(response_google.text) if hasattr(response_google, 'text') and response_google.text is not None else None,
-                    int(model_instance.count_tokens(prompt).total_tokens) if hasattr(model_instance, 'count_tokens') else 0,
-                    int(model_instance.count_tokens(str(response_google.text) if hasattr(response_google, 'text') and response_google.text is not None else "").total_tokens) if hasattr(model_instance, 'count_tokens') else 0
-                )
-            elif provider in ['Meta', 'Mistral'] and together_client is not None:
-                response_together: Any = together_client.chat.completions.create(model=model, messages=[{"role": "user", "content": prompt}])
-                content = response_together.choices[0].message.content if hasattr(response_together, 'choices') and response_together.choices else None
-                usage = response_together.usage if hasattr(response_together, 'usage') else None
-                return (
-                    content,
-                    getattr(usage, 'prompt_tokens', 0) if usage else 0,
-                    getattr(usage, 'completion_tokens', 0) if usage else 0
-                )
-            elif provider == 'MistralM':
-                response_mistral: Any = mistral_client.chat(model=model, messages=[ChatMessage(role="user", content=prompt)])
-                content = response_mistral.choices[0].message.content if response_mistral.choices else None
-                usage = response_mistral.usage if hasattr(response_mistral, 'usage') else None
-                return (
-                    content,
-                    getattr(usage, 'input_tokens', 0) if usage else 0,
-                    getattr(usage, 'output_tokens', 0) if usage else 0
-                )
-        except Exception as e:
-            logger.error(f"Error during API call: {e}")
-            retry_count -= 1
-            if retry_count > 0:
-                delay = min(max_delay, initial_delay * (multiplier ** (MAX_RETRIES - retry_count))) + random.uniform(0, 1)
-                logger.info(f"Retrying in {delay:.2f} seconds...")
-                time.sleep(delay)
-            else:
-                logger.error("Maximum retries reached. Returning no result.")
+    # Local models run offline and need no API clients
+    if provider != 'Local':
+        initialize_clients()
+
+    for attempt in _attempts(provider, model, retry_count):
+        with attempt:
+            result = _call_provider(provider, model, prompt)
+            if result is None:
+                logger.error(f"Unsupported provider: {provider}")
+                break
+            return result
+        if attempt.retries_left > 0:
+            time.sleep(attempt.delay)
+
+    return None, 0, 0, 0, 0
+
+async def _call_provider_async(provider: str, model: str, prompt: PromptParts) -> Optional[Tuple[Optional[str], int, int, int, int]]:
+    """
+    Send a single request without blocking the event loop.
+
+    Gemini uses its native async client; other providers run the blocking call in a worker thread.
+    """
+    if provider == 'Google':
+        model_instance = get_gemini_model(model, prompt.system)
+        text = prompt.prefix + prompt.question
+        response_google: Any = await model_instance.generate_content_async(text)
+        return _gemini_result(model_instance, text, response_google)
+    return await asyncio.to_thread(_call_provider, provider, model, prompt)
+
+async def query_language_model_async(provider: str, model: str, prompt: Union[str, PromptParts],
+                                     retry_count: int = MAX_RETRIES) -> Tuple[Optional[str], int, int, int, int]:
+    """
+    Query a language model from asyncio code, so many questions can be in flight at once.
+
+    Retries, backoff and metrics are shared with query_language_model.
+
+    Args:
+    provider (str): The provider of the language model (e.g., 'OpenAI', 'Google')
+    model (str): The specific model to use
+    prompt (Union[str, PromptParts]): The prompt to send to the model
+    retry_count (int): Number of retries allowed in case of failure
+
+    Returns:
+    Tuple[Optional[str], int, int, int, int]: The response content, prompt, completion, cached prompt and cache write token counts
+    """
+    if isinstance(prompt, str):
+        prompt = PromptParts('', '', prompt)
+
+    if provider != 'Local':
+        initialize_clients()
+
+    for attempt in _attempts(provider, model, retry_count):
+        with attempt:
+            result = await _call_provider_async(provider, model, prompt)
+            if result is None:
+                logger.error(f"Unsupported provider: {provider}")
                 break
+            return result
+        if attempt.retries_left > 0:
+            await asyncio.sleep(attempt.delay)
 
-    return None, 0, 0
\ No newline at end of file
+    return None, 0, 0, 0, 0
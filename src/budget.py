@@ -0,0 +1,102 @@
+import threading
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from src.logger import get_logger
+from src.constants import BUDGET_SLOWDOWN_THRESHOLD, BUDGET_MAX_SLOWDOWN_DELAY
+
+logger = get_logger(__name__)
+
+class BudgetStatus(NamedTuple):
+    action: str  # 'continue', 'slow' or 'stop'
+    delay: float
+    scope: Optional[str]  # 'total' or 'model' when a budget is close or exhausted
+    spent: float
+    budget: Optional[float]
+
+class CostAccumulator:
+    """
+    Thread-safe running total of actual API spend, overall and per model.
+
+    Spend is added for every API call, including invalid-answer retries. Before each
+    question, and before each retry of an invalid answer, the scheduler asks `check`
+    whether to continue, slow down or stop.
+    """
+
+    def __init__(self, max_cost: Optional[float] = None, model_budgets: Optional[Dict[str, float]] = None,
+                 slowdown_threshold: float = BUDGET_SLOWDOWN_THRESHOLD, max_delay: float = BUDGET_MAX_SLOWDOWN_DELAY):
+        self.max_cost = max_cost
+        self.model_budgets = dict(model_budgets or {})
+        self.slowdown_threshold = slowdown_threshold
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._total = 0.0
+        self._by_model: Dict[str, float] = {}
+        self._calls: Dict[str, int] = {}
+
+    def add(self, model_name: str, cost: float) -> None:
+        """Record the cost of one API call."""
+        with self._lock:
+            self._total += cost
+            self._by_model[model_name] = self._by_model.get(model_name, 0.0) + cost
+            self._calls[model_name] = self._calls.get(model_name, 0) + 1
+
+    def spent(self, model_name: Optional[str] = None) -> float:
+        with self._lock:
+            return self._total if model_name is None else self._by_model.get(model_name, 0.0)
+
+    def _expected_call_cost(self, model_name: str) -> float:
+        calls = self._calls.get(model_name, 0)
+        return self._by_model.get(model_name, 0.0) / calls if calls else 0.0
+
+    def check(self, model_name: str) -> BudgetStatus:
+        """
+        Decide whether the next question for a model fits in the remaining budget.
+
+        Args:
+        model_name (str): The model about to be queried
+
+        Returns:
+        BudgetStatus: 'stop' if the next question would likely exceed a budget, 'slow' with a
+        delay once spend passes the slowdown threshold, otherwise 'continue'
+        """
+        with self._lock:
+            expected = self._expected_call_cost(model_name)
+            limits: Tuple[Tuple[str, Optional[float], float], ...] = (
+                ('total', self.max_cost, self._total),
+                ('model', self.model_budgets.get(model_name), self._by_model.get(model_name, 0.0)),
+            )
+            status = BudgetStatus('continue', 0.0, None, self._total, self.max_cost)
+
+        for scope, budget, spent in limits:
+            if budget is None:
+                continue
+            if spent + expected > budget:
+                return BudgetStatus('stop', 0.0, scope, spent, budget)
+            utilisation = spent / budget if budget > 0 else 1.0
+            if utilisation >= self.slowdown_threshold:
+                progress = (utilisation - self.slowdown_threshold) / max(1e-9, 1.0 - self.slowdown_threshold)
+                delay = self.max_delay * min(1.0, progress)
+                if delay >= status.delay:
+                    status = BudgetStatus('slow', delay, scope, spent, budget)
+        return status
+
+def parse_model_budgets(values: Tuple[str, ...]) -> Dict[str, float]:
+    """
+    Parse per-model budgets given as NAME=AMOUNT.
+
+    Args:
+    values (Tuple[str, ...]): Budget strings, e.g. ('GPT-4o=5', 'Claude-3 Opus=2.5')
+
+    Returns:
+    Dict[str, float]: Budget in dollars keyed by model name
+    """
+    budgets: Dict[str, float] = {}
+    for value in values:
+        name, separator, amount = value.rpartition('=')
+        if not separator or not name.strip():
+            raise ValueError(f"Invalid model budget '{value}', expected NAME=AMOUNT")
+        try:
+            budgets[name.strip()] = float(amount)
+        except ValueError:
+            raise ValueError(f"Invalid amount in model budget '{value}'")
+    return budgets
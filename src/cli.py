@@ -1,22 +1,327 @@
+from __future__ import annotations
+
 import click
-from typing import List, Union, Dict, Any
+from functools import partial
+from typing import List, Union, Dict, Any, Mapping, Optional, Set, Tuple
 from datetime import datetime
-import pandas as pd
 import os
 import sys
-from dotenv import load_dotenv
-
-# Load environment variables at the very beginning
-load_dotenv()
+import time
 
-from src.constants import MODELS, BASE_FOLDER, DATE_FORMAT, PROMPT_TEMPLATE, MAX_RETRIES
+from src.constants import (MODELS, BASE_FOLDER, DATE_FORMAT, MAX_RETRIES, DATABASE_PATH, QUEUE_POLL_INTERVAL, ADAPTIVE_STANDARD_ERROR,
+                           SPOOL_FOLDER, SPOOL_STALE_SECONDS)
+from src.model_registry import ModelRegistry
 from src.user_interface import select_models, select_categories, get_user_inputs, confirm_run
 from src.data_processing import (
-    load_questions, save_results_to_sqlite, calculate_token_cost, 
-    estimate_cost, answer_check, check_table_exists_and_get_highest_round
+    load_questions, save_results_to_sqlite, calculate_token_cost, build_prompt_parts, build_prompt_prefix, PromptParts,
+    answer_check, check_table_exists_and_get_highest_round, record_budget_stop, load_completed_questions, get_results_table_name,
+    question_version, question_versions, stored_few_shot_counts
 )
+from src.question_versions import refresh_round_summaries
+from src.question_sets import load_question_set
+from src.analysis import load_correctness_matrix
+from src.adaptive import AdaptiveTest, fit_item_parameters, calibrated_pool, save_ability_estimate
+from src.sharding import parse_shard, sample_round_questions, filter_shard
+from src.budget import CostAccumulator, BudgetStatus, parse_model_budgets
+from src.cost_estimation import estimate_run_cost
 from src.api_calls import query_language_model
-from src.logger import setup_logger, get_logger
+from src.local_inference import load_local_model, prefetch_answers
+from src.lazy import lazy_import
+from src.logger import setup_logger, get_logger, flush_logs
+from src.metrics import MetricsExporter, ACCUMULATED_COST, INVALID_ANSWERS, QUESTIONS_ANSWERED, QUESTIONS_PER_SECOND
+from src.work_queue import WorkQueue, WorkItem, WorkRound, LeaseHeartbeat, default_worker_id
+from src.result_spool import ResultSpool, SpooledRound, replay_spool, stale_spool_files
+
+pd = lazy_import('pandas')
+
+def query_and_check(model_info: Dict[str, Any], prompt: PromptParts,
+                    cost_tracker: Optional[CostAccumulator] = None) -> Tuple[str, bool, int, int, int, int]:
+    """
+    Query a model once, validate the answer and record live metrics for the attempt.
+
+    Args:
+    model_info (Dict[str, Any]): The model being tested
+    prompt (PromptParts): The rendered prompt
+    cost_tracker (Optional[CostAccumulator]): Accumulator that receives the actual cost of the call
+
+    Returns:
+    Tuple[str, bool, int, int, int, int]: (cleaned_answer, is_valid, prompt_tokens, completion_tokens, cached_tokens, cache_write_tokens)
+    """
+    logger = get_logger(__name__)
+    labels = {'provider': model_info['provider'], 'model': model_info['variant']}
+
+    answer, prompt_tokens, completion_tokens, cached_tokens, cache_write_tokens = query_language_model(
+        model_info['provider'],
+        model_info['variant'],
+        prompt
+    )
+    call_cost = calculate_token_cost(prompt_tokens, completion_tokens, model_info, cached_tokens, cache_write_tokens)
+    ACCUMULATED_COST.inc(call_cost, **labels)
+    if cost_tracker is not None:
+        cost_tracker.add(model_info['name'], call_cost)
+
+    logger.debug(f"Raw answer from model: {answer}", extra={'model': model_info['name'], 'raw_answer': answer})
+    cleaned_answer, is_valid = answer_check(answer if answer is not None else "")
+    logger.debug(f"Cleaned answer: {cleaned_answer}, Is valid: {is_valid}")
+    if not is_valid:
+        INVALID_ANSWERS.inc(**labels)
+
+    return cleaned_answer, is_valid, prompt_tokens, completion_tokens, cached_tokens, cache_write_tokens
+
+def ask_question(model_info: Dict[str, Any], question: pd.Series, iteration: int, question_number: int,
+                 cost_tracker: Optional[CostAccumulator] = None, few_shot: int = 0) -> Optional[Dict[str, Any]]:
+    """
+    Ask a model a single question, retrying invalid answers.
+
+    Args:
+    model_info (Dict[str, Any]): The model being tested
+    question (pd.Series): The question row
+    iteration (int): The round number
+    question_number (int): Position of the question within the round
+    cost_tracker (Optional[CostAccumulator]): Accumulator for actual spend, including retries
+    few_shot (int): Number of few-shot examples placed before the question
+
+    Returns:
+    Optional[Dict[str, Any]]: The result row, or None if no valid answer was received
+    """
+    logger = get_logger(__name__)
+    logger.debug(f"Processing question {question_number}", extra={'question_code': question['Question_Code']})
+    prompt = build_prompt_parts(question, few_shot)
+
+    # Query the model
+    logger.debug(f"Querying model {model_info['name']}...")
+    cleaned_answer, is_valid, prompt_tokens, completion_tokens, cached_tokens, cache_write_tokens = query_and_check(model_info, prompt, cost_tracker)
+
+    # If the answer is not valid, retry (you might want to limit the number of retries)
+    retry_count: int = MAX_RETRIES
+    while not is_valid and retry_count > 0:
+        # Retries are paid calls too, so they must fit in the budget
+        if cost_tracker is not None and cost_tracker.check(model_info['name']).action == 'stop':
+            logger.warning(f"Budget reached, not retrying the invalid answer to question {question_number}")
+            return None
+        logger.warning(f"Invalid answer, retrying. Attempts left: {retry_count}")
+        cleaned_answer, is_valid, prompt_tokens, completion_tokens, cached_tokens, cache_write_tokens = query_and_check(model_info, prompt, cost_tracker)
+        retry_count -= 1
+
+    if not is_valid:
+        logger.error(f"Failed to get a valid answer after retries. Skipping this question.")
+        return None
+
+    # Process the result
+    is_correct: bool = cleaned_answer == question['Correct_Option']
+    cost: float = calculate_token_cost(prompt_tokens, completion_tokens, model_info, cached_tokens, cache_write_tokens)
+    QUESTIONS_ANSWERED.inc(provider=model_info['provider'], model=model_info['variant'])
+    QUESTIONS_PER_SECOND.mark(provider=model_info['provider'], model=model_info['variant'])
+
+    logger.debug(f"Question {question_number} result: {cleaned_answer}, Correct: {is_correct}",
+                 extra={'model': model_info['name'], 'question_code': question['Question_Code'], 'answer': cleaned_answer, 'is_correct': is_correct})
+
+    return {
+        'Round': iteration,
+        'Discipline': question['Discipline'],
+        'Category': question['Category'],
+        'Sub_Category': question.get('Sub_Category'),
+        'Question_Code': question['Question_Code'],
+        'Question': question['Question'],
+        'Question_Version': question_version(question),
+        'Correct_Option': question['Correct_Option'],
+        'Provider': model_info['provider'],
+        'Model': model_info['name'],
+        'Model_Answer': cleaned_answer,
+        'Is_Correct': is_correct,
+        'Cost': cost,
+        'Prompt_Tokens': prompt_tokens,
+        'Completion_Tokens': completion_tokens,
+        'Cached_Prompt_Tokens': cached_tokens,
+        'Few_Shot': few_shot,
+        'Timestamp': datetime.now()
+    }
+
+def select_round_questions(questions_df: pd.DataFrame, num_questions: Union[str, int], iteration: int, seed: Optional[int] = None) -> pd.DataFrame:
+    """
+    Pick the questions for a round, reproducibly when a seed is given.
+
+    Args:
+    questions_df (pd.DataFrame): Candidate questions
+    num_questions (Union[str, int]): Number of questions per round, or 'all'
+    iteration (int): The round number
+    seed (Optional[int]): Seed for reproducible sampling; random sampling if None
+
+    Returns:
+    pd.DataFrame: The questions to ask in this round
+    """
+    if num_questions == 'all':
+        return questions_df
+    if seed is not None:
+        return sample_round_questions(questions_df, int(num_questions), seed, iteration)
+    return questions_df.sample(n=min(int(num_questions), len(questions_df)))
+
+def pending_round_questions(questions_df: pd.DataFrame, num_questions: Union[str, int], num_rounds: int, seed: int, model_variant: str,
+                            completed: Set[Tuple[int, str]], shard: Optional[Tuple[int, int]] = None) -> Dict[int, pd.DataFrame]:
+    """
+    Get the questions of rounds 1..num_rounds that have no stored result yet for a model.
+
+    The requested cells are fixed by the seed, so this is the set difference between the
+    requested (round, question) matrix and the cells already stored.
+
+    Args:
+    questions_df (pd.DataFrame): Candidate questions
+    num_questions (Union[str, int]): Number of questions per round, or 'all'
+    num_rounds (int): Number of rounds the model should have
+    seed (int): Seed for the question sample of each round
+    model_variant (str): The model's variant, used to assign cells to shards
+    completed (Set[Tuple[int, str]]): Stored (round, question code) cells
+    shard (Optional[Tuple[int, int]]): Only keep cells of this (shard_index, shard_count)
+
+    Returns:
+    Dict[int, pd.DataFrame]: Questions still to ask, by round; rounds with nothing missing are left out
+    """
+    pending: Dict[int, pd.DataFrame] = {}
+    for iteration in range(1, num_rounds + 1):
+        questions = select_round_questions(questions_df, num_questions, iteration, seed)
+        if shard is not None:
+            questions = filter_shard(questions, seed, model_variant, iteration, *shard)
+        questions = questions[[(iteration, code) not in completed for code in questions['Question_Code']]]
+        if not questions.empty:
+            pending[iteration] = questions
+    return pending
+
+def save_finished_round(work_queue: WorkQueue, item: Union[WorkItem, WorkRound], model_info: Dict[str, Any], db_path: str = DATABASE_PATH) -> bool:
+    """
+    Save a queued round to the results database once its last item has finished.
+
+    Only one worker wins the claim for a round, so each round is saved exactly once.
+
+    Args:
+    work_queue (WorkQueue): The shared work queue
+    item (Union[WorkItem, WorkRound]): The item that was just completed, or a finished round nobody has saved
+    model_info (Dict[str, Any]): The model the item belongs to
+    db_path (str): Path to the results database
+
+    Returns:
+    bool: True if this call saved the round
+    """
+    logger = get_logger(__name__)
+    results = work_queue.claim_finished_round(item.run_id, item.model_name, item.round)
+    if results is None:
+        return False
+    logger.info(f"Saving queued round {item.round} for {item.model_name} ({len(results)} answers)")
+    try:
+        results_df = pd.DataFrame(results)
+        if not results_df.empty:
+            results_df['Timestamp'] = pd.to_datetime(results_df['Timestamp'])
+        save_results_to_sqlite(results_df, model_info['variant'], item.run_date, db_path)
+    except Exception:
+        work_queue.unclaim_round(item.run_id, item.model_name, item.round)
+        raise
+    return True
+
+def save_round(spooled: SpooledRound, versions: Optional[Mapping[str, str]] = None) -> None:
+    """
+    Save a round handed over by the result spool, with its summaries.
+
+    Args:
+    spooled (SpooledRound): The round and its answers
+    versions (Optional[Mapping[str, str]]): Current question versions, used when the round's summaries are rebuilt
+    """
+    results_df = pd.DataFrame(spooled.results)
+    if not results_df.empty:
+        results_df['Timestamp'] = pd.to_datetime(results_df['Timestamp'])
+    save_results_to_sqlite(results_df, spooled.model, spooled.date, spooled.db_path, percentages=spooled.percentages)
+    if spooled.estimate is not None:
+        save_ability_estimate(spooled.estimate, spooled.model, spooled.date, spooled.round_number, spooled.db_path)
+    if spooled.refresh:
+        # The round may already have had answers, so rebuild its summaries from every current answer
+        table_name = get_results_table_name(spooled.model, spooled.date)
+        refresh_round_summaries([(table_name, spooled.model, spooled.date, spooled.round_number)], versions or {}, spooled.db_path)
+
+def replay_interrupted_rounds(folder: str = SPOOL_FOLDER, stale_seconds: float = SPOOL_STALE_SECONDS) -> int:
+    """
+    Save the answers interrupted runs left in the result spool.
+
+    Rounds whose summaries are rebuilt leave out answers to questions edited since, as
+    they would in a live run.
+
+    Args:
+    folder (str): Folder holding the spool files
+    stale_seconds (float): Only files untouched for this long are replayed
+
+    Returns:
+    int: Number of answers saved
+    """
+    if not stale_spool_files(folder, stale_seconds):
+        return 0
+    versions = question_versions(load_questions())
+    return replay_spool(partial(save_round, versions=versions), folder, stale_seconds)
+
+def run_worker(work_queue: WorkQueue, worker_id: str, run_id: Optional[str] = None, model_names: Tuple[str, ...] = (),
+               cost_tracker: Optional[CostAccumulator] = None, poll_interval: float = QUEUE_POLL_INTERVAL,
+               db_path: str = DATABASE_PATH) -> int:
+    """
+    Process work items from a shared queue until no work is left for this worker.
+
+    Each item is asked while a heartbeat keeps its lease alive, and its result is
+    committed back to the queue. Rounds are saved to the results database as soon
+    as their last item finishes, whichever worker answered it.
+
+    Args:
+    work_queue (WorkQueue): The shared work queue
+    worker_id (str): Identifier of this worker
+    run_id (Optional[str]): Only process items from this run
+    model_names (Tuple[str, ...]): Only process items for these models (all if empty)
+    cost_tracker (Optional[CostAccumulator]): Budget accumulator for this worker's spend
+    poll_interval (float): Seconds to wait while other workers hold the remaining leases
+    db_path (str): Path to the results database
+
+    Returns:
+    int: Number of items this worker completed
+    """
+    logger = get_logger(__name__)
+    questions_df = load_questions().set_index('Question_Code', drop=False)
+    models_by_name = ModelRegistry(MODELS).by_name
+    completed = 0
+
+    while True:
+        item = work_queue.claim(worker_id, run_id, model_names)
+        if item is None:
+            # Rounds whose last item failed or whose save failed have no completion left to trigger their save
+            for work_round in work_queue.finished_unsaved_rounds(run_id, model_names):
+                if work_round.model_name in models_by_name:
+                    save_finished_round(work_queue, work_round, models_by_name[work_round.model_name], db_path)
+            counts = work_queue.counts(run_id, model_names)
+            if not counts.get('pending') and not counts.get('leased'):
+                break
+            # Other workers hold the remaining leases; wait in case one of them expires
+            time.sleep(poll_interval)
+            continue
+
+        model_info = models_by_name.get(item.model_name)
+        if model_info is None or item.question_code not in questions_df.index:
+            logger.error(f"Work item {item.id} refers to unknown model or question ({item.model_name}, {item.question_code})")
+            work_queue.complete(item.id, worker_id, None)
+        else:
+            if cost_tracker is not None:
+                budget_status = cost_tracker.check(model_info['name'])
+                if budget_status.action == 'stop':
+                    logger.warning(f"{budget_status.scope} budget ${budget_status.budget:.3f} reached, worker {worker_id} stopping")
+                    work_queue.release(item.id, worker_id)
+                    break
+                if budget_status.action == 'slow':
+                    time.sleep(budget_status.delay)
+
+            try:
+                with LeaseHeartbeat(work_queue, item.id, worker_id):
+                    result = ask_question(model_info, questions_df.loc[item.question_code], item.round, item.id, cost_tracker, item.few_shot)
+            except Exception:
+                work_queue.release(item.id, worker_id)
+                raise
+            if work_queue.complete(item.id, worker_id, result):
+                completed += 1
+        if model_info is not None:
+            save_finished_round(work_queue, item, model_info, db_path)
+
+    logger.info(f"Worker {worker_id} finished after completing {completed} items")
+    return completed
 
 @click.command()
 @click.option('--num-questions', default='all', type=str, help='Number of questions to test (or "all" for all questions)')
@@ -24,30 +329,130 @@ from src.logger import setup_logger, get_logger
 @click.option('--models', '-m', multiple=True, help='Models to use for testing (can be specified multiple times)')
 @click.option('--categories', '-c', multiple=True, help='Categories to test (can be specified multiple times)')
 @click.option('--interactive/--non-interactive', default=True, help='Run in interactive mode (default) or non-interactive mode')
+@click.option('--metrics-port', default=None, type=int, help='Serve live OpenMetrics on this local HTTP port (0 picks a free port)')
+@click.option('--metrics-textfile', default=None, type=click.Path(dir_okay=False), help='Periodically write OpenMetrics to this file')
+@click.option('--max-cost', default=None, type=float, help='Stop the run cleanly before actual spend exceeds this many dollars')
+@click.option('--model-budget', multiple=True, help='Per-model budget as NAME=DOLLARS (can be specified multiple times)')
+@click.option('--enqueue', is_flag=True, default=False, help='Add the selected run to the work queue instead of running it')
+@click.option('--worker', is_flag=True, default=False, help='Process items from the work queue (limited to --models if given)')
+@click.option('--queue-db', default=DATABASE_PATH, type=click.Path(dir_okay=False), help='SQLite file holding the shared work queue')
+@click.option('--run-id', default=None, help='Work queue run identifier (generated by --enqueue if omitted)')
+@click.option('--shard', default=None, help='Run only shard i of N (as i/N) of the model x round x question cells')
+@click.option('--seed', default=None, type=int, help='Seed for reproducible question sampling (defaults to 0 with --shard)')
+@click.option('--results-db', default=DATABASE_PATH, type=click.Path(dir_okay=False), help='SQLite file the results are written to')
+@click.option('--run-date', default=None, help='Date (YYYY-MM-DD) to record results under instead of today')
+@click.option('--incremental', is_flag=True, default=False, help='Only ask the questions of rounds 1..--num-rounds that have no stored result yet')
+@click.option('--question-set', default=None, help='Only use the questions of this named set (see utils/question_sets.py)')
+@click.option('--few-shot', default=0, type=click.IntRange(min=0), help='Number of answered examples from config.yaml placed before each question')
+@click.option('--adaptive', is_flag=True, default=False, help='Pick each question adaptively and stop once the ability estimate is precise; --num-questions caps each round')
+@click.option('--adaptive-se', default=ADAPTIVE_STANDARD_ERROR, type=click.FloatRange(min=0, min_open=True), help='Standard error at which an adaptive round stops')
 
-def run_benchmark(num_questions: Union[str, int], num_rounds: int, models: List[str], categories: List[str], interactive: bool):
+def run_benchmark(num_questions: Union[str, int], num_rounds: int, models: List[str], categories: List[str], interactive: bool,
+                  metrics_port: Optional[int] = None, metrics_textfile: Optional[str] = None,
+                  max_cost: Optional[float] = None, model_budget: Tuple[str, ...] = (),
+                  enqueue: bool = False, worker: bool = False, queue_db: str = DATABASE_PATH, run_id: Optional[str] = None,
+                  shard: Optional[str] = None, seed: Optional[int] = None, results_db: str = DATABASE_PATH, run_date: Optional[str] = None,
+                  incremental: bool = False, question_set: Optional[str] = None, few_shot: int = 0, adaptive: bool = False,
+                  adaptive_se: float = ADAPTIVE_STANDARD_ERROR):
     """Run the GenAI Marketing Benchmarks."""
+    # Load environment variables before anything reads API keys
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    metrics_exporter: Optional[MetricsExporter] = None
+    spool: Optional[ResultSpool] = None
     try:
         setup_logger(BASE_FOLDER)
-        logger = get_logger()
+        logger = get_logger(__name__)
 
         logger.info("Starting the GenAI Marketing Benchmarks script")
 
-        # Check if API keys are set
-        required_keys = ['OPENAI_API_KEY', 'CLAUDE_API_KEY', 'TOGETHER_API_KEY']
+        if metrics_port is not None or metrics_textfile is not None:
+            metrics_exporter = MetricsExporter(port=metrics_port, textfile=metrics_textfile).start()
+
+        # Check if API keys are set; runs of local models only can go offline
+        requested_models = [] if interactive else ModelRegistry(MODELS).select(models)
+        offline = bool(requested_models) and all(model['provider'] == 'Local' for model in requested_models)
+        required_keys = [] if offline else ['OPENAI_API_KEY', 'CLAUDE_API_KEY', 'TOGETHER_API_KEY']
         missing_keys = [key for key in required_keys if not os.getenv(key)]
         if missing_keys:
             for key in missing_keys:
                 logger.error(f"{key} is not set in the environment variables.")
             sys.exit(1)
 
+        cost_tracker = CostAccumulator(max_cost, parse_model_budgets(model_budget))
+        if max_cost is not None or model_budget:
+            logger.info(f"Budget limits: total={max_cost}, per model={cost_tracker.model_budgets}")
+
+        if enqueue and worker:
+            logger.error("--enqueue and --worker cannot be used together. Exiting.")
+            sys.exit(1)
+        if worker and few_shot:
+            logger.error("Workers ask queued items with the --few-shot given to --enqueue. Exiting.")
+            sys.exit(1)
+        try:
+            build_prompt_prefix(few_shot)
+        except ValueError as e:
+            logger.error(f"{e}. Exiting.")
+            sys.exit(1)
+
+        shard_index, shard_count = None, None
+        if shard is not None:
+            if enqueue or worker:
+                logger.error("--shard cannot be combined with the work queue. Exiting.")
+                sys.exit(1)
+            try:
+                shard_index, shard_count = parse_shard(shard)
+            except ValueError as e:
+                logger.error(f"{e}. Exiting.")
+                sys.exit(1)
+            logger.info(f"Running shard {shard_index} of {shard_count}, writing to {results_db}")
+        if incremental and (enqueue or worker):
+            logger.error("--incremental cannot be combined with the work queue. Exiting.")
+            sys.exit(1)
+        if adaptive and (enqueue or worker or incremental or shard is not None):
+            logger.error("--adaptive cannot be combined with the work queue, --incremental or --shard. Exiting.")
+            sys.exit(1)
+
+        # Shards and incremental runs fill fixed rounds from a fixed question sample, skipping cells already stored
+        fixed_rounds = incremental or shard_index is not None
+        if fixed_rounds:
+            seed = 0 if seed is None else seed
+            logger.info(f"Filling rounds 1 to {num_rounds} with seed {seed}")
+
+        # Save answers an interrupted run left in the spool before anything reads stored results
+        recovered = replay_interrupted_rounds()
+        if recovered:
+            logger.info(f"Recovered {recovered} answers from interrupted runs")
+
+        if worker:
+            worker_id = default_worker_id()
+            logger.info(f"Starting queue worker {worker_id} on {queue_db}")
+            run_worker(WorkQueue(queue_db), worker_id, run_id, tuple(models), cost_tracker, db_path=results_db)
+            logger.info(f"Actual spend: ${cost_tracker.spent():.3f}")
+            return
+
         # Get current date
         today_date: str = datetime.today().strftime(DATE_FORMAT)
+        if run_date is not None:
+            try:
+                today_date = datetime.strptime(run_date, DATE_FORMAT).strftime(DATE_FORMAT)
+            except ValueError:
+                logger.error(f"Invalid run date '{run_date}', expected YYYY-MM-DD. Exiting.")
+                sys.exit(1)
 
         # Load questions
         logger.info("Loading questions from database")
         questions_df: pd.DataFrame = load_questions()
         logger.info(f"Loaded {len(questions_df)} questions from database")
+        if question_set is not None:
+            try:
+                set_codes = load_question_set(question_set)
+            except ValueError as e:
+                logger.error(f"{e}. Exiting.")
+                sys.exit(1)
+            questions_df = questions_df[questions_df['Question_Code'].isin(set_codes)]
+            logger.info(f"Using {len(questions_df)} questions from question set '{question_set}'")
 
         if interactive:
             selected_models = select_models(MODELS)
@@ -55,7 +460,11 @@ def run_benchmark(num_questions: Union[str, int], num_rounds: int, models: List[
             selected_categories = select_categories(all_categories)
             num_questions, num_rounds = get_user_inputs()
         else:
-            selected_models = [model for model in MODELS if model['name'] in models]
+            model_registry = ModelRegistry(MODELS)
+            selected_models = model_registry.select(models)
+            unknown_models = [name for name in models if name not in model_registry]
+            if unknown_models:
+                logger.warning(f"Ignoring unknown models: {unknown_models}")
             selected_categories = list(categories)
             num_questions = len(questions_df) if num_questions == 'all' else int(num_questions)
 
@@ -82,9 +491,46 @@ def run_benchmark(num_questions: Union[str, int], num_rounds: int, models: List[
             logger.error("No questions available for the selected categories. Exiting.")
             sys.exit(1)
 
+        # Answers with and without few-shot examples share tables and summaries, so a model keeps one prompt variant per date
+        for model_info in selected_models:
+            stored = stored_few_shot_counts(model_info['variant'], today_date, results_db) - {few_shot}
+            if stored:
+                logger.error(f"{model_info['name']} already has answers with {sorted(stored)} few-shot examples on {today_date}, "
+                             f"not {few_shot}; use another --run-date or --results-db. Exiting.")
+                sys.exit(1)
+
+        # Adaptive rounds draw from the questions calibrated on stored results
+        adaptive_pool: Optional[pd.DataFrame] = None
+        if adaptive:
+            item_parameters = fit_item_parameters(load_correctness_matrix(results_db))
+            adaptive_pool = calibrated_pool(filtered_df, item_parameters)
+            if adaptive_pool.empty:
+                logger.error("No questions in the selected categories have been calibrated on stored results. Exiting.")
+                sys.exit(1)
+            logger.info(f"Adaptive testing over {len(adaptive_pool)} calibrated questions, stopping at standard error {adaptive_se}")
+            total_questions = len(adaptive_pool)
+
+        # Work out which cells are still missing; answers to questions edited since are asked again
+        current_versions = question_versions(filtered_df) if fixed_rounds else None
+        pending: Dict[str, Dict[int, pd.DataFrame]] = {}
+        if fixed_rounds:
+            shard_spec = (shard_index, shard_count) if shard_index is not None else None
+            for model_info in selected_models:
+                completed_questions = load_completed_questions(model_info['variant'], today_date, results_db, current_versions,
+                                                               question_codes=filtered_df['Question_Code'], few_shot=few_shot)
+                pending[model_info['variant']] = pending_round_questions(filtered_df, num_questions, num_rounds, seed, model_info['variant'],
+                                                                         completed_questions, shard_spec)
+            missing = {variant: sum(len(questions) for questions in rounds.values()) for variant, rounds in pending.items()}
+            logger.info(f"Questions missing per model: {missing}")
+            if not any(missing.values()):
+                logger.info("Every requested result is already stored, nothing to run")
+                print("Nothing to run: every requested result is already stored.")
+                return
+
         # Calculate estimated cost
         questions_per_round = total_questions if isinstance(num_questions, str) and num_questions == 'all' else min(int(num_questions), total_questions)
-        estimated_cost, model_costs = estimate_cost(questions_per_round, num_rounds, selected_models)
+        estimated_cost, model_costs = estimate_run_cost(filtered_df if adaptive_pool is None else adaptive_pool, questions_per_round, num_rounds, selected_models, db_path=results_db,
+                                                        model_questions=missing if fixed_rounds else None, few_shot=few_shot)
         logger.info(f"Estimated total cost: ${estimated_cost:.3f}")
 
         # Confirm run
@@ -94,95 +540,108 @@ def run_benchmark(num_questions: Union[str, int], num_rounds: int, models: List[
                 logger.info("User aborted the run")
                 print("Testing run aborted by the user.")
                 return
-            
+
+        if enqueue:
+            run_id = run_id or datetime.now().strftime('%Y%m%d-%H%M%S')
+            items: List[Tuple[str, int, str]] = []
+            for model_info in selected_models:
+                start_round = check_table_exists_and_get_highest_round(model_info['variant'], today_date, results_db) + 1
+                for iteration in range(start_round, start_round + num_rounds):
+                    questions_to_test = select_round_questions(filtered_df, num_questions, iteration, seed)
+                    items.extend((model_info['name'], iteration, code) for code in questions_to_test['Question_Code'])
+            try:
+                added = WorkQueue(queue_db).enqueue(run_id, today_date, items, few_shot)
+            except ValueError as e:
+                logger.error(f"{e}. Exiting.")
+                sys.exit(1)
+            logger.info(f"Enqueued {added} items as run {run_id}; start workers with --worker --run-id {run_id}")
+            print(f"Run {run_id} queued with {added} items.")
+            return
+
+        # Load local models before asking anything, so a missing backend stops the run once
+        for model_info in selected_models:
+            if model_info['provider'] == 'Local':
+                try:
+                    load_local_model(model_info['variant'])
+                except ImportError as e:
+                    logger.error(f"{e}. Exiting.")
+                    sys.exit(1)
+
+        # Answers go to the spool as they arrive; its flusher saves finished rounds in the background
+        spool = ResultSpool(partial(save_round, versions=current_versions), results_db).start()
+
         # Main testing loop
         for model_info in selected_models:
             logger.info(f"Starting tests for model: {model_info['name']}")
-            # Check for existing rounds and get the highest round number
-            highest_round: int = check_table_exists_and_get_highest_round(model_info['variant'], today_date)
-            start_round: int = highest_round + 1
-            for iteration in range(start_round, start_round + num_rounds):
-                logger.info(f"Starting round {iteration} for {model_info['name']}")
+            if fixed_rounds:
+                round_questions = pending[model_info['variant']]
+                if not round_questions:
+                    logger.info(f"{model_info['name']} has nothing left to run")
+            else:
+                # Check for existing rounds and get the highest round number
+                highest_round: int = check_table_exists_and_get_highest_round(model_info['variant'], today_date, results_db)
+                round_questions = {iteration: select_round_questions(filtered_df, num_questions, iteration, seed) if adaptive_pool is None else adaptive_pool
+                                   for iteration in range(highest_round + 1, highest_round + num_rounds + 1)}
+            budget_status: Optional[BudgetStatus] = None
+            for iteration, questions_to_test in round_questions.items():
                 results: List[Dict[str, Any]] = []
-                questions_to_test = filtered_df if num_questions == 'all' else filtered_df.sample(n=min(int(num_questions), total_questions))
-                for question_number, (index, question) in enumerate(questions_to_test.iterrows(), start=1):
-                    logger.info(f"Processing question {question_number}")
-                    # Prepare the prompt
-                    prompt = PROMPT_TEMPLATE.format(
-                        question=question['Question'],
-                        option_a=question['Option_A'],
-                        option_b=question['Option_B'],
-                        option_c=question['Option_C'],
-                        option_d=question['Option_D']
-                    )
-                    
-                    # Query the model
-                    logger.info(f"Querying model {model_info['name']}...")
-                    answer, prompt_tokens, completion_tokens = query_language_model(
-                        model_info['provider'],
-                        model_info['variant'],
-                        prompt
-                    )
-
-                    # Check the answer
-                    logger.info(f"Raw answer from model: {answer}")
-                    cleaned_answer, is_valid = answer_check(answer if answer is not None else "")
-                    logger.info(f"Cleaned answer: {cleaned_answer}, Is valid: {is_valid}")
-
-                    # If the answer is not valid, retry (you might want to limit the number of retries)
-                    retry_count: int = MAX_RETRIES
-                    while not is_valid and retry_count > 0:
-                        logger.warning(f"Invalid answer, retrying. Attempts left: {retry_count}")
-                        answer, prompt_tokens, completion_tokens = query_language_model(
-                            model_info['provider'],
-                            model_info['variant'],
-                            prompt
-                        )
-                        logger.info(f"Raw answer from model (retry): {answer}")
-                        cleaned_answer, is_valid = answer_check(answer if answer is not None else "")
-                        logger.info(f"Cleaned answer (retry): {cleaned_answer}, Is valid: {is_valid}")
-                        retry_count -= 1
-
-                    if not is_valid:
-                        logger.error(f"Failed to get a valid answer after retries. Skipping this question.")
-                        continue
-
-                    # Process the result
-                    is_correct: bool = cleaned_answer == question['Correct_Option']
-                    cost: float = calculate_token_cost(prompt_tokens, completion_tokens, model_info)
-
-                    logger.info(f"Final answer: {cleaned_answer}")
-                    logger.info(f"Question {question_number} result: Correct: {is_correct}")
-
-                    # Store the result
-                    results.append({
-                        'Round': iteration,
-                        'Discipline': question['Discipline'],
-                        'Category': question['Category'],
-                        'Sub_Category': question.get('Sub_Category'),
-                        'Question_Code': question['Question_Code'],
-                        'Question': question['Question'],
-                        'Correct_Option': question['Correct_Option'],
-                        'Provider': model_info['provider'],
-                        'Model': model_info['name'],
-                        'Model_Answer': cleaned_answer,
-                        'Is_Correct': is_correct,
-                        'Cost': cost,
-                        'Timestamp': datetime.now()
-                    })
+                logger.info(f"Starting round {iteration} for {model_info['name']}")
+                adaptive_test: Optional[AdaptiveTest] = None
+                if adaptive_pool is not None:
+                    adaptive_test = AdaptiveTest(adaptive_pool, adaptive_se, questions_per_round)
+                question_rows = questions_to_test.iterrows() if adaptive_test is None else adaptive_test.questions(filtered_df)
+                if model_info['provider'] == 'Local' and adaptive_test is None:
+                    # Score the whole round in batches up front; each question below then reads its answer
+                    prefetch_answers(model_info['variant'], [build_prompt_parts(question, few_shot) for _, question in questions_to_test.iterrows()])
+                for question_number, (index, question) in enumerate(question_rows, start=1):
+                    budget_status = cost_tracker.check(model_info['name'])
+                    if budget_status.action == 'stop':
+                        logger.warning(f"Stopping {model_info['name']} at round {iteration}, question {question_number}: "
+                                       f"{budget_status.scope} budget ${budget_status.budget:.3f} reached (spent ${budget_status.spent:.3f})")
+                        record_budget_stop(model_info['variant'], today_date, iteration, len(results), question['Question_Code'], budget_status, results_db)
+                        break
+                    if budget_status.action == 'slow':
+                        logger.info(f"Approaching {budget_status.scope} budget, pausing {budget_status.delay:.1f}s")
+                        time.sleep(budget_status.delay)
+                    result = ask_question(model_info, question, iteration, question_number, cost_tracker, few_shot)
+                    if result is not None:
+                        results.append(result)
+                        spool.add(model_info['variant'], today_date, result)
+                    if adaptive_test is not None:
+                        adaptive_test.record(question['Question_Code'], None if result is None else result['Is_Correct'])
 
                 # Save results
                 logger.info(f"Saving results for round {iteration }")
-                results_df = pd.DataFrame(results)
-                save_results_to_sqlite(results_df, model_info['variant'], today_date)
+                percentages = estimate = None
+                if adaptive_test is not None and results:
+                    # Adaptive questions are chosen near the model's ability, so report the expected share of the whole pool
+                    estimate = adaptive_test.estimate()
+                    percentages = estimate['Percentages']
+                    logger.info(f"Adaptive round {iteration}: ability {adaptive_test.ability:.2f} (SE {adaptive_test.standard_error:.2f}) "
+                                f"after {adaptive_test.answered} answers, expected {percentages['TOTAL']}% correct")
+                spool.finish_round(model_info['variant'], today_date, iteration, percentages, refresh=fixed_rounds and bool(results), estimate=estimate)
+
+                if budget_status is not None and budget_status.action == 'stop':
+                    break
 
             logger.info(f"Completed all rounds for model: {model_info['name']}")
+            if budget_status is not None and budget_status.action == 'stop' and budget_status.scope == 'total':
+                logger.warning("Total budget reached, skipping remaining models")
+                break
+
+        logger.info(f"Actual spend: ${cost_tracker.spent():.3f}")
 
         logger.info("Testing completed successfully")
         
     except Exception as e:
         logger.exception(f"An error occurred: {str(e)}")
         sys.exit(1)
+    finally:
+        if spool is not None:
+            spool.close()
+        if metrics_exporter is not None:
+            metrics_exporter.stop()
+        flush_logs()
 
 if __name__ == '__main__':
     run_benchmark()
\ No newline at end of file
@@ -1,27 +1,65 @@
+import json
 import os
-import yaml
 from typing import Dict, Any
 
+from src.model_registry import ModelRegistry
+
 # File paths
 SCRIPTS_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 BASE_FOLDER = os.path.dirname(SCRIPTS_FOLDER)
 LOGS_FOLDER = os.path.join(BASE_FOLDER, 'Logs')
+RESULTS_FOLDER = os.path.join(SCRIPTS_FOLDER, 'Results')
 CONFIG_PATH = os.path.join(SCRIPTS_FOLDER, 'config.yaml')
+CONFIG_CACHE_PATH = os.path.join(SCRIPTS_FOLDER, '.config_cache.json')
+
+# Bump when the snapshot layout changes so stale caches are ignored
+CONFIG_CACHE_VERSION = 1
 
 # Load configuration
 def load_config(config_path: str = CONFIG_PATH) -> Dict[str, Any]:
+    import yaml
     with open(config_path, 'r') as config_file:
         return yaml.safe_load(config_file)
 
-CONFIG: Dict[str, Any] = load_config()
+def load_config_snapshot(config_path: str = CONFIG_PATH, cache_path: str = CONFIG_CACHE_PATH) -> Dict[str, Any]:
+    """
+    Load the configuration and parsed model prices, reusing a JSON snapshot while config.yaml is unchanged.
+
+    The snapshot is keyed on the config file's modification time and size, so editing
+    config.yaml invalidates it. Start-ups with a valid snapshot skip YAML parsing and
+    price evaluation entirely.
 
-# Function to evaluate cost expressions
-def evaluate_cost(expression: str) -> float:
+    Args:
+    config_path (str): Path to config.yaml
+    cache_path (str): Path to the JSON snapshot
+
+    Returns:
+    Dict[str, Any]: {'config': the raw configuration, 'models': model definitions with numeric prices}
+    """
+    stat = os.stat(config_path)
+    key = {'version': CONFIG_CACHE_VERSION, 'path': os.path.abspath(config_path), 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
     try:
-        return eval(expression)
-    except Exception as e:
-        print(f"Error evaluating cost expression {expression}: {e}")
-        return 0.0
+        with open(cache_path, 'r') as cache_file:
+            snapshot = json.load(cache_file)
+        if snapshot.get('key') == key:
+            return snapshot
+    except (OSError, ValueError):
+        pass
+
+    config = load_config(config_path)
+    snapshot = {'key': key, 'config': config, 'models': ModelRegistry(config.get('models') or []).models}
+    try:
+        temp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as cache_file:
+            json.dump(snapshot, cache_file)
+        os.replace(temp_path, cache_path)
+    except (OSError, TypeError, ValueError):
+        # Caching is an optimisation only, e.g. read-only checkouts or non-JSON YAML values
+        pass
+    return snapshot
+
+_CONFIG_SNAPSHOT: Dict[str, Any] = load_config_snapshot()
+CONFIG: Dict[str, Any] = _CONFIG_SNAPSHOT['config']
 
 # Database settings
 DATABASE_NAME = CONFIG['database']['name']
@@ -32,16 +70,17 @@ DATABASE_PATH = os.path.join(BASE_FOLDER, DATABASE_FOLDER, DATABASE_NAME)
 PROJECT_ID = CONFIG['api']['project_id']
 LOCATION = CONFIG['api']['location']
 SERVICE_ACCOUNT_FILE = os.path.join(SCRIPTS_FOLDER, 'key.json')
+GEMINI_GENERATION_CONFIG = CONFIG['gemini']['generation_config'] or {}
 
-# Model definitions with calculated costs
-MODELS = []
-for model in CONFIG['models']:
-    model['prompt'] = evaluate_cost(model['prompt'])
-    model['completion'] = evaluate_cost(model['completion'])
-    MODELS.append(model)
+# Model definitions with calculated costs, indexed by name, variant and provider
+MODEL_REGISTRY = ModelRegistry(_CONFIG_SNAPSHOT['models'])
+MODELS = MODEL_REGISTRY.models
 
 # Prompt template
 PROMPT_TEMPLATE = CONFIG['prompt_template']
+SYSTEM_PROMPT = CONFIG['system_prompt']
+FEW_SHOT_EXAMPLES = CONFIG['few_shot_examples']
+PROMPT_CACHE_MIN_TOKENS = CONFIG['prompt_cache_min_tokens']
 
 # Date and time formats
 DATE_FORMAT = '%Y-%m-%d'
@@ -52,4 +91,56 @@ MAX_RETRIES = CONFIG['max_retries']
 INITIAL_DELAY = CONFIG['initial_delay']
 MAX_DELAY = CONFIG['max_delay']
 BACKOFF_MULTIPLIER = CONFIG['backoff_multiplier']
-VALID_ANSWERS = CONFIG['valid_answers']
\ No newline at end of file
+VALID_ANSWERS = CONFIG['valid_answers']
+
+# Logging settings
+LOG_LEVEL = CONFIG['logging']['level']
+CONSOLE_LOG_LEVEL = CONFIG['logging']['console_level']
+MODULE_LOG_LEVELS = CONFIG['logging'].get('module_levels') or {}
+
+# Cost estimation settings
+DEFAULT_COMPLETION_TOKENS = CONFIG['cost_estimation']['default_completion_tokens']
+FALLBACK_TOKEN_UNCERTAINTY = CONFIG['cost_estimation']['fallback_uncertainty']
+MESSAGE_OVERHEAD_TOKENS = CONFIG['cost_estimation']['message_overhead_tokens']
+MAX_PROMPT_SAMPLE = CONFIG['cost_estimation']['max_prompt_sample']
+CONFIDENCE_Z = CONFIG['cost_estimation']['confidence_z']
+
+# Budget settings
+BUDGET_SLOWDOWN_THRESHOLD = CONFIG['budget']['slowdown_threshold']
+BUDGET_MAX_SLOWDOWN_DELAY = CONFIG['budget']['max_slowdown_delay']
+
+# Metrics settings
+METRICS_HOST = CONFIG['metrics']['host']
+METRICS_TEXTFILE_INTERVAL = CONFIG['metrics']['textfile_interval']
+METRICS_LATENCY_BUCKETS = CONFIG['metrics']['latency_buckets']
+
+# Work queue settings
+QUEUE_LEASE_SECONDS = CONFIG['work_queue']['lease_seconds']
+QUEUE_MAX_ATTEMPTS = CONFIG['work_queue']['max_attempts']
+QUEUE_POLL_INTERVAL = CONFIG['work_queue']['poll_interval']
+
+# Export settings
+EXPORT_FOLDER = os.path.join(RESULTS_FOLDER, CONFIG['export']['folder'])
+EXPORT_BATCH_SIZE = CONFIG['export']['batch_size']
+
+# Analysis settings
+BOOTSTRAP_RESAMPLES = CONFIG['analysis']['resamples']
+BOOTSTRAP_CONFIDENCE = CONFIG['analysis']['confidence']
+BOOTSTRAP_SEED = CONFIG['analysis']['seed']
+ANALYSIS_CACHE_FILE = os.path.join(RESULTS_FOLDER, CONFIG['analysis']['cache_file'])
+
+# Adaptive testing settings
+ADAPTIVE_STANDARD_ERROR = CONFIG['adaptive']['standard_error']
+ADAPTIVE_MIN_RUNS = CONFIG['adaptive']['min_runs']
+ADAPTIVE_ITERATIONS = CONFIG['adaptive']['iterations']
+
+# Local inference settings
+LOCAL_BATCH_SIZE = CONFIG['local']['batch_size']
+LOCAL_THREADS = CONFIG['local']['threads']
+LOCAL_CONTEXT_LENGTH = CONFIG['local']['context_length']
+
+# Result spool settings
+SPOOL_FOLDER = os.path.join(BASE_FOLDER, CONFIG['spool']['folder'])
+SPOOL_FLUSH_INTERVAL = CONFIG['spool']['flush_interval']
+SPOOL_STALE_SECONDS = CONFIG['spool']['stale_seconds']
+SPOOL_FSYNC = CONFIG['spool']['fsync']
\ No newline at end of file
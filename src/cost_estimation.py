@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import math
+import os
+import sqlite3
+from functools import lru_cache
+from typing import Callable, Dict, Any, List, Mapping, NamedTuple, Optional, Tuple
+
+from src.lazy import lazy_import
+from src.logger import get_logger
+from src.data_processing import build_prompt, shared_prompt_prefix
+from src.constants import (
+    DATABASE_PATH, DEFAULT_COMPLETION_TOKENS, FALLBACK_TOKEN_UNCERTAINTY,
+    MESSAGE_OVERHEAD_TOKENS, MAX_PROMPT_SAMPLE, CONFIDENCE_Z, PROMPT_CACHE_MIN_TOKENS
+)
+
+pd = lazy_import('pandas')
+
+logger = get_logger(__name__)
+
+# Rough characters-per-token ratio used when no local tokenizer is available
+CHARS_PER_TOKEN = 4
+
+class CostEstimate(NamedTuple):
+    model_name: str
+    cost: float
+    low: float
+    high: float
+    tokenizer: str
+
+class TokenStats(NamedTuple):
+    count: int
+    mean: float
+    std: float
+
+def _heuristic_token_count(text: str) -> int:
+    return max(1, math.ceil(len(text) / CHARS_PER_TOKEN))
+
+@lru_cache(maxsize=None)
+def get_tokenizer(provider: str, variant: str) -> Tuple[str, Callable[[str], int]]:
+    """
+    Load a token counter for a model, preferring tokenizers already cached on this machine.
+
+    Open-weight models use their Hugging Face tokenizer if it is in the local cache,
+    OpenAI models use tiktoken, other providers use a tiktoken approximation, and
+    everything falls back to a characters-per-token heuristic.
+
+    Args:
+    provider (str): The model provider
+    variant (str): The model variant as sent to the API
+
+    Returns:
+    Tuple[str, Callable[[str], int]]: (tokenizer description, function returning the token count of a string)
+    """
+    if '/' in variant:
+        try:
+            from transformers import AutoTokenizer  # type: ignore
+            hf_tokenizer = AutoTokenizer.from_pretrained(variant, local_files_only=True)
+            return f"transformers:{variant}", lambda text: len(hf_tokenizer.encode(text))
+        except Exception as e:
+            logger.debug(f"No cached transformers tokenizer for {variant}: {e}")
+
+    try:
+        import tiktoken  # type: ignore
+        if provider == 'OpenAI':
+            try:
+                encoding = tiktoken.encoding_for_model(variant)
+            except KeyError:
+                encoding = tiktoken.get_encoding('o200k_base')
+            return f"tiktoken:{encoding.name}", lambda text: len(encoding.encode(text))
+        encoding = tiktoken.get_encoding('cl100k_base')
+        return f"tiktoken:{encoding.name} (approx.)", lambda text: len(encoding.encode(text))
+    except Exception as e:
+        logger.debug(f"tiktoken unavailable for {variant}: {e}")
+
+    return "heuristic", _heuristic_token_count
+
+def _stats(values: List[int]) -> TokenStats:
+    count = len(values)
+    if count == 0:
+        return TokenStats(0, 0.0, 0.0)
+    mean = sum(values) / count
+    variance = sum((value - mean) ** 2 for value in values) / count
+    return TokenStats(count, mean, math.sqrt(variance))
+
+def prompt_token_stats(prompts: List[str], model_info: Dict[str, Any]) -> Tuple[str, TokenStats]:
+    """
+    Count prompt tokens for the rendered prompts of a run.
+
+    Args:
+    prompts (List[str]): Rendered prompts for the candidate questions
+    model_info (Dict[str, Any]): The model being estimated
+
+    Returns:
+    Tuple[str, TokenStats]: (tokenizer description, per-prompt token statistics including chat overhead)
+    """
+    tokenizer_name, count_tokens = get_tokenizer(model_info['provider'], model_info['variant'])
+    counts = [count_tokens(prompt) + MESSAGE_OVERHEAD_TOKENS for prompt in prompts]
+    return tokenizer_name, _stats(counts)
+
+def load_completion_token_history(model_variant: str, db_path: str = DATABASE_PATH) -> Optional[TokenStats]:
+    """
+    Load the historical completion-token distribution for a model from the results database.
+
+    Args:
+    model_variant (str): The variant of the model
+    db_path (str): Path to the database
+
+    Returns:
+    Optional[TokenStats]: Completion-token statistics per question, or None if there is no history
+    """
+    if not os.path.exists(db_path):
+        return None
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='token_usage'")
+        if cursor.fetchone() is None:
+            return None
+        cursor.execute(
+            "SELECT SUM(Questions), SUM(Completion_Tokens), SUM(Completion_Tokens_Squared) FROM token_usage WHERE Model = ?",
+            (model_variant,)
+        )
+        count, total, total_squared = cursor.fetchone()
+    finally:
+        conn.close()
+
+    if not count:
+        return None
+    mean = total / count
+    variance = max(0.0, total_squared / count - mean ** 2)
+    return TokenStats(int(count), mean, math.sqrt(variance))
+
+def _fallback_completion_stats(model_info: Dict[str, Any]) -> TokenStats:
+    mean = float(model_info.get('expected_completion_tokens', DEFAULT_COMPLETION_TOKENS))
+    return TokenStats(0, mean, mean * FALLBACK_TOKEN_UNCERTAINTY)
+
+def estimate_run_cost(questions_df: pd.DataFrame, questions_per_round: int, num_rounds: int, selected_models: List[Dict[str, Any]],
+                      db_path: str = DATABASE_PATH, z: float = CONFIDENCE_Z,
+                      model_questions: Optional[Mapping[str, int]] = None, few_shot: int = 0) -> Tuple[float, List[CostEstimate]]:
+    """
+    Estimate the cost of a run from tokenized prompts and historical completion lengths.
+
+    The bounds combine per-question variation in prompt and completion length with the
+    uncertainty in the historical mean, using a normal approximation.
+
+    Args:
+    questions_df (pd.DataFrame): Candidate questions for the run
+    questions_per_round (int): Number of questions asked per round
+    num_rounds (int): Number of rounds to run
+    selected_models (List[Dict[str, Any]]): List of selected model dictionaries
+    db_path (str): Path to the results database
+    z (float): Standard score for the confidence bounds
+    model_questions (Optional[Mapping[str, int]]): Questions to ask per model variant, for runs
+    that only fill in missing results; defaults to questions_per_round * num_rounds for every model
+    few_shot (int): Number of few-shot examples in the shared prefix, which is priced as cached after the first question
+    once it is long enough for providers to cache
+
+    Returns:
+    Tuple[float, List[CostEstimate]]: (total_estimated_cost, per-model estimates with bounds)
+    """
+    logger.info("Calculating estimated cost")
+    if len(questions_df) > MAX_PROMPT_SAMPLE:
+        questions_df = questions_df.sample(n=MAX_PROMPT_SAMPLE, random_state=0)
+    prompts = [build_prompt(question) for _, question in questions_df.iterrows()]
+    prefix = shared_prompt_prefix(few_shot)
+
+    estimates: List[CostEstimate] = []
+    for model_info in selected_models:
+        total_questions = questions_per_round * num_rounds if model_questions is None else model_questions.get(model_info['variant'], 0)
+        tokenizer_name, prompt_stats = prompt_token_stats(prompts, model_info)
+        completion_stats = load_completion_token_history(model_info['variant'], db_path) or _fallback_completion_stats(model_info)
+
+        mean_cost = prompt_stats.mean * model_info['prompt'] + completion_stats.mean * model_info['completion']
+        cost = total_questions * mean_cost
+        if prefix and total_questions:
+            prefix_tokens = get_tokenizer(model_info['provider'], model_info['variant'])[1](prefix)
+            if prefix_tokens >= PROMPT_CACHE_MIN_TOKENS:
+                # The first question writes the prefix to the provider's cache, later ones read it
+                cost += prefix_tokens * (model_info.get('cache_write_prompt', model_info['prompt'])
+                                         + (total_questions - 1) * model_info.get('cached_prompt', model_info['prompt']))
+            else:
+                # Providers don't cache prefixes this short, so every question pays for it in full
+                cost += prefix_tokens * total_questions * model_info['prompt']
+
+        # Spread from question-to-question variation plus uncertainty in the estimated means
+        per_question_variance = (prompt_stats.std * model_info['prompt']) ** 2 + (completion_stats.std * model_info['completion']) ** 2
+        spread = math.sqrt(total_questions * per_question_variance)
+        if completion_stats.count:
+            spread += total_questions * completion_stats.std * model_info['completion'] / math.sqrt(completion_stats.count)
+        else:
+            spread += total_questions * completion_stats.std * model_info['completion']
+        low, high = max(0.0, cost - z * spread), cost + z * spread
+
+        source = f"{completion_stats.count} historical answers" if completion_stats.count else "default completion length"
+        logger.info(f"Estimated cost for {model_info['name']}: ${cost:.3f} (${low:.3f} - ${high:.3f}; {tokenizer_name}, {source})")
+        estimates.append(CostEstimate(model_info['name'], cost, low, high, tokenizer_name))
+
+    total_cost = sum(estimate.cost for estimate in estimates)
+    return total_cost, estimates
@@ -1,58 +1,65 @@
-import pandas as pd
+from __future__ import annotations
+
+import hashlib
+import json
 import sqlite3
 import os
 import re
-from typing import Tuple, List, Dict, Any, Optional
+from datetime import datetime
+from functools import lru_cache
+from typing import Tuple, Dict, Any, Iterable, Mapping, NamedTuple, Optional, Set
 
+from src.lazy import lazy_import
 from src.logger import get_logger
-from src.constants import DATABASE_PATH, VALID_ANSWERS
+from src.constants import DATABASE_PATH, VALID_ANSWERS, PROMPT_TEMPLATE, SYSTEM_PROMPT, FEW_SHOT_EXAMPLES, MODEL_REGISTRY
+from src.model_names import resolve_display_name
 
-logger = get_logger()
+pd = lazy_import('pandas')
 
-def estimate_cost(num_questions: int, num_rounds: int, selected_models: List[Dict[str, Any]], avg_prompt_tokens: int = 70, avg_completion_tokens: int = 1) -> Tuple[float, List[Tuple[str, float]]]:
-    """
-    Estimate the cost of running the tests.
-    
-    Args:
-    num_questions (int): Number of questions per round
-    num_rounds (int): Number of rounds to run
-    selected_models (List[Dict[str, Any]]): List of selected model dictionaries
-    avg_prompt_tokens (int): Average number of tokens in a prompt
-    avg_completion_tokens (int): Average number of tokens in a completion
-    
-    Returns:
-    Tuple[float, List[Tuple[str, float]]]: (total_estimated_cost, list of (model_name, model_cost) tuples)
-    """
-    logger.info("Calculating estimated cost")
+logger = get_logger(__name__)
 
-    total_questions = num_questions * num_rounds
-    
-    model_costs = [
-        (model['name'], 
-         total_questions * ((model['prompt'] * avg_prompt_tokens) + (model['completion'] * avg_completion_tokens)))
-        for model in selected_models
-    ]
+# Per-day results tables are named <YYYY>_<MM>_<DD>_<model>
+RESULTS_TABLE_PATTERN = re.compile(r'^(\d{4})_(\d{2})_(\d{2})_.+')
 
-    total_cost = sum(cost for _, cost in model_costs)
+# The fields a model sees or is marked against; editing any of them makes earlier answers stale
+VERSION_COLUMNS = ('Question', 'Option_A', 'Option_B', 'Option_C', 'Option_D', 'Correct_Option')
 
-    for model_name, model_cost in model_costs:
-        logger.info(f"Estimated cost for {model_name}: ${model_cost:.3f}")
+# Resolved once when a summary row is written so reports can show them as stored
+DISPLAY_COLUMNS = ('Display_Name', 'Provider')
 
-    return total_cost, model_costs
+class PromptParts(NamedTuple):
+    """A prompt split into the prefix shared by every question and the question itself."""
+    system: str  # system prompt, empty if unused
+    prefix: str  # few-shot examples, identical for every question of a run
+    question: str
 
-def calculate_token_cost(prompt_tokens: int, completion_tokens: int, model_info: Dict[str, Any]) -> float:
+    @property
+    def text(self) -> str:
+        """The whole prompt as one string, for providers without system prompts or caching."""
+        return ''.join(part for part in (f"{self.system}\n\n" if self.system else '', self.prefix, self.question))
+
+TABLE_CATALOG_COLUMNS = ('Table_Name', 'Model', 'Date', 'First_Round', 'Last_Round', 'Row_Count', 'First_Timestamp', 'Last_Timestamp')
+
+def calculate_token_cost(prompt_tokens: int, completion_tokens: int, model_info: Dict[str, Any], cached_tokens: int = 0,
+                         cache_write_tokens: int = 0) -> float:
     """
     Calculate the cost of tokens used.
     
     Args:
-    prompt_tokens (int): Number of tokens in the prompt
+    prompt_tokens (int): Number of tokens in the prompt, including cached ones
     completion_tokens (int): Number of tokens in the completion
     model_info (Dict[str, Any]): Dictionary containing model information including pricing
+    cached_tokens (int): Prompt tokens read from the provider's prompt cache, billed at the cached_prompt price
+    cache_write_tokens (int): Prompt tokens written to the provider's prompt cache, billed at the cache_write_prompt price
     
     Returns:
     float: Total cost
     """
-    prompt_cost = prompt_tokens * model_info["prompt"]
+    cached_tokens = min(cached_tokens, prompt_tokens)
+    cache_write_tokens = min(cache_write_tokens, prompt_tokens - cached_tokens)
+    prompt_cost = ((prompt_tokens - cached_tokens - cache_write_tokens) * model_info["prompt"]
+                   + cached_tokens * model_info.get("cached_prompt", model_info["prompt"])
+                   + cache_write_tokens * model_info.get("cache_write_prompt", model_info["prompt"]))
     completion_cost = completion_tokens * model_info["completion"]
     return prompt_cost + completion_cost
 
@@ -76,6 +83,86 @@ def load_questions(db_path: str = DATABASE_PATH, table_name: str = 'questions')
     conn.close()
     return df
 
+def build_prompt(question: pd.Series) -> str:
+    """
+    Render the prompt for a multiple-choice question.
+
+    Args:
+    question (pd.Series): Question row with Question and Option_A to Option_D fields
+
+    Returns:
+    str: The formatted prompt
+    """
+    return PROMPT_TEMPLATE.format(
+        question=question['Question'],
+        option_a=question['Option_A'],
+        option_b=question['Option_B'],
+        option_c=question['Option_C'],
+        option_d=question['Option_D']
+    )
+
+@lru_cache(maxsize=None)
+def build_prompt_prefix(few_shot: int = 0) -> str:
+    """
+    Render the first few_shot examples from config.yaml as answered questions.
+
+    Args:
+    few_shot (int): Number of examples to include
+
+    Returns:
+    str: The examples, each followed by its answer and a blank line
+    """
+    if few_shot > len(FEW_SHOT_EXAMPLES):
+        raise ValueError(f"Only {len(FEW_SHOT_EXAMPLES)} few-shot examples are configured, {few_shot} requested")
+    examples = []
+    for example in FEW_SHOT_EXAMPLES[:few_shot]:
+        rendered = PROMPT_TEMPLATE.format(
+            question=example['question'],
+            option_a=example['option_a'],
+            option_b=example['option_b'],
+            option_c=example['option_c'],
+            option_d=example['option_d']
+        )
+        examples.append(f"{rendered.rstrip()} {example['answer']}\n\n")
+    return ''.join(examples)
+
+def shared_prompt_prefix(few_shot: int = 0) -> str:
+    """The system prompt and few-shot examples sent identically before every question."""
+    return PromptParts(SYSTEM_PROMPT or '', build_prompt_prefix(few_shot), '').text
+
+def build_prompt_parts(question: pd.Series, few_shot: int = 0) -> PromptParts:
+    """
+    Render a question behind the shared system prompt and few-shot prefix.
+
+    The prefix comes first and is the same for every question, so providers can serve it
+    from their prompt cache.
+
+    Args:
+    question (pd.Series): Question row with Question and Option_A to Option_D fields
+    few_shot (int): Number of few-shot examples in the prefix
+
+    Returns:
+    PromptParts: The system prompt, shared prefix and question
+    """
+    return PromptParts(SYSTEM_PROMPT or '', build_prompt_prefix(few_shot), build_prompt(question))
+
+def question_version(question: Mapping[str, Any]) -> str:
+    """
+    Get the content version of a question.
+
+    Args:
+    question (Mapping[str, Any]): Question row
+
+    Returns:
+    str: A short hash of the question's wording, options and correct option
+    """
+    values = [None if pd.isna(value) else str(value) for value in (question.get(column) for column in VERSION_COLUMNS)]
+    return hashlib.sha256(json.dumps(values, ensure_ascii=False).encode('utf-8')).hexdigest()[:12]
+
+def question_versions(questions_df: pd.DataFrame) -> Dict[str, str]:
+    """Map each question code to its current version."""
+    return {question['Question_Code']: question_version(question) for _, question in questions_df.iterrows()}
+
 def answer_check(answer: str) -> Tuple[str, bool]:
     """
     Check if the answer is valid.
@@ -86,7 +173,7 @@ def answer_check(answer: str) -> Tuple[str, bool]:
     Returns:
     Tuple[str, bool]: Cleaned answer and whether it's valid
     """
-    logger.info(f"Checking answer: {answer}")
+    logger.debug(f"Checking answer: {answer}")
     answer = answer.upper().strip()
     if answer.startswith(('##', '**')):
         answer = answer[2:].strip()
@@ -98,10 +185,54 @@ def answer_check(answer: str) -> Tuple[str, bool]:
     if not is_valid:
         logger.warning(f"Invalid answer received: {answer}")
     else:
-        logger.info(f"Valid answer: {answer}")
+        logger.debug(f"Valid answer: {answer}")
     
     return answer, is_valid
 
+def get_results_table_name(model_variant: str, today_date: str) -> str:
+    """
+    Get the name of the per-day results table for a model.
+    
+    Args:
+    model_variant (str): The variant of the model
+    today_date (str): The run date in 'YYYY-MM-DD' format
+    
+    Returns:
+    str: Table name such as '2024_07_01_gpt_4o_2024_05_13'
+    """
+    model_cleaned = model_variant.split('/')[-1]
+    return f"{today_date}_{model_cleaned}".replace('-', '_').replace(':', '_').replace(' ', '_').replace('.', '_')
+
+def results_table_date(table_name: str) -> str:
+    """Get the run date ('YYYY-MM-DD') of a per-day results table."""
+    year, month, day = RESULTS_TABLE_PATTERN.match(table_name).groups()  # type: ignore[union-attr]
+    return f"{year}-{month}-{day}"
+
+def resolve_results_table_model(conn: sqlite3.Connection, table_name: str, schemas: Tuple[str, ...] = ('main',)) -> str:
+    """
+    Find the model variant whose results are stored in a per-day results table.
+
+    Table names are lossy, so the variant is matched against the configured models and
+    the models in model_summary for that date.
+
+    Args:
+    conn (sqlite3.Connection): Connection to the database
+    table_name (str): The per-day results table
+    schemas (Tuple[str, ...]): Schemas whose model_summary tables are searched
+
+    Returns:
+    str: The model variant, or the model part of the table name if it is unknown
+    """
+    date = results_table_date(table_name)
+    candidates: Set[str] = set(MODEL_REGISTRY.by_variant)
+    for schema in schemas:
+        if conn.execute(f"SELECT 1 FROM {schema}.sqlite_master WHERE type = 'table' AND name = 'model_summary'").fetchone():
+            candidates.update(row[0] for row in conn.execute(f"SELECT DISTINCT Model FROM {schema}.model_summary WHERE Date = ?", (date,)))
+    for candidate in sorted(candidates):
+        if get_results_table_name(candidate, date) == table_name:
+            return candidate
+    return table_name[len('YYYY_MM_DD_'):]
+
 def check_table_exists_and_get_highest_round(model_variant: str, today_date: str, db_path: str = DATABASE_PATH) -> int:
     """
     Check if a table exists for the given model and date, and get the highest round number.
@@ -117,33 +248,121 @@ def check_table_exists_and_get_highest_round(model_variant: str, today_date: str
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
     
-    model_cleaned = model_variant.split('/')[-1]
-    table_name = f"{today_date}_{model_cleaned}".replace('-', '_').replace(':', '_').replace(' ', '_').replace('.', '_')
+    table_name = get_results_table_name(model_variant, today_date)
     
-    logger.info(f"Checking for existing table: {table_name}")
+    logger.debug(f"Checking for existing table: {table_name}")
     
     cursor.execute(f'SELECT name FROM sqlite_master WHERE type="table" AND name="{table_name}";')
     table_exists = cursor.fetchone()
     
     highest_round = 0
     if table_exists:
-        logger.info(f"Table {table_name} exists, retrieving highest round number")
+        logger.debug(f"Table {table_name} exists, retrieving highest round number")
         # Table exists, retrieve the highest round number
         cursor.execute(f'SELECT MAX("Round") FROM "{table_name}";')
         result = cursor.fetchone()
         highest_round = result[0] if result[0] is not None else 0
     else:
-        logger.info(f"Table {table_name} does not exist")
+        logger.debug(f"Table {table_name} does not exist")
     
     conn.close()
     
     logger.info(f"Highest round number for {model_variant} on {today_date}: {highest_round}")
     return highest_round
 
+def ensure_question_code_index(conn: sqlite3.Connection, table_name: str) -> None:
+    """Index a results table on (Question_Code, Round) so stored cells can be looked up without a scan."""
+    conn.execute(f'CREATE INDEX IF NOT EXISTS "idx_{table_name}_question_code" ON "{table_name}" ("Question_Code", "Round")')
+
+def stored_few_shot_counts(model_variant: str, today_date: str, db_path: str = DATABASE_PATH) -> Set[int]:
+    """
+    Get the numbers of few-shot examples of the answers stored for a model and date.
+
+    Answers stored before prompts had few-shot examples count as zero-shot.
+
+    Args:
+    model_variant (str): The variant of the model being tested
+    today_date (str): The run date in 'YYYY-MM-DD' format
+    db_path (str): Path to the database
+
+    Returns:
+    Set[int]: The distinct few-shot counts, empty if nothing is stored
+    """
+    if not os.path.exists(db_path):
+        return set()
+    table_name = get_results_table_name(model_variant, today_date)
+    conn = sqlite3.connect(db_path)
+    try:
+        columns = {info[1] for info in conn.execute(f'PRAGMA table_info("{table_name}")')}
+        if not columns:
+            return set()
+        few_shot = 'COALESCE("Few_Shot", 0)' if 'Few_Shot' in columns else '0'
+        return {int(row[0]) for row in conn.execute(f'SELECT DISTINCT {few_shot} FROM "{table_name}"')}
+    finally:
+        conn.close()
+
+def load_completed_questions(model_variant: str, today_date: str, db_path: str = DATABASE_PATH,
+                             versions: Optional[Mapping[str, str]] = None,
+                             question_codes: Optional[Iterable[str]] = None,
+                             few_shot: Optional[int] = None) -> Set[Tuple[int, str]]:
+    """
+    Get the (round, question code) pairs already stored for a model and date.
+    
+    Args:
+    model_variant (str): The variant of the model being tested
+    today_date (str): The run date in 'YYYY-MM-DD' format
+    db_path (str): Path to the database
+    versions (Optional[Mapping[str, str]]): Current question versions; answers to an older
+    version don't count as completed. Answers stored without a version always count.
+    question_codes (Optional[Iterable[str]]): Only look up these questions, through the
+    Question_Code index, instead of reading every stored answer
+    few_shot (Optional[int]): Only count answers asked with this many few-shot examples
+    (answers stored without the count are zero-shot)
+    
+    Returns:
+    Set[Tuple[int, str]]: Stored (Round, Question_Code) pairs, empty if the table doesn't exist
+    """
+    table_name = get_results_table_name(model_variant, today_date)
+
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table_name,))
+        if cursor.fetchone() is None:
+            return set()
+        # Tables written before the index existed get it on first lookup
+        ensure_question_code_index(conn, table_name)
+        columns = {info[1] for info in cursor.execute(f'PRAGMA table_info("{table_name}")')}
+        conditions = []
+        if question_codes is not None:
+            cursor.execute("CREATE TEMP TABLE IF NOT EXISTS requested_codes (Question_Code TEXT PRIMARY KEY)")
+            cursor.executemany("INSERT OR IGNORE INTO temp.requested_codes (Question_Code) VALUES (?)", [(code,) for code in question_codes])
+            conditions.append('"Question_Code" IN (SELECT Question_Code FROM temp.requested_codes)')
+        if few_shot is not None:
+            stored_few_shot = 'COALESCE("Few_Shot", 0)' if 'Few_Shot' in columns else '0'
+            conditions.append(f'{stored_few_shot} = {int(few_shot)}')
+        where = ' WHERE ' + ' AND '.join(conditions) if conditions else ''
+        if versions is not None and 'Question_Version' in columns:
+            cursor.execute(f'SELECT DISTINCT "Round", "Question_Code", "Question_Version" FROM "{table_name}"{where}')
+            completed = {
+                (int(round_number), question_code) for round_number, question_code, version in cursor.fetchall()
+                if version is None or versions.get(question_code, version) == version
+            }
+        else:
+            cursor.execute(f'SELECT DISTINCT "Round", "Question_Code" FROM "{table_name}"{where}')
+            completed = {(int(round_number), question_code) for round_number, question_code in cursor.fetchall()}
+        conn.commit()
+    finally:
+        conn.close()
+
+    logger.debug(f"Found {len(completed)} stored results for {model_variant} on {today_date}")
+    return completed
+
 def sanitize_column_name(col_name: str) -> str:
     return re.sub(r'[^a-zA-Z0-9_]', '_', col_name)
 
-def save_results_to_sqlite(iteration_results_df: pd.DataFrame, model: str, today_date: str, db_path: str = DATABASE_PATH) -> None:
+def save_results_to_sqlite(iteration_results_df: pd.DataFrame, model: str, today_date: str, db_path: str = DATABASE_PATH,
+                           percentages: Optional[Dict[str, Any]] = None) -> None:
     """
     Save results to SQLite database.
     
@@ -153,13 +372,18 @@ def save_results_to_sqlite(iteration_results_df: pd.DataFrame, model: str, today
     base_folder (str): Base folder path
     today_date (str): Current date
     db_path (str): Path to the database
+    percentages (Optional[Dict[str, Any]]): Summary percentages to store instead of the share answered correctly,
+        as {'TOTAL': float, 'Category': {name: float}, 'Discipline': {name: float}} (used by adaptive rounds)
     """
+    if iteration_results_df.empty:
+        logger.warning(f"No results to save for model {model}")
+        return
+
     logger.info(f"Saving results for model {model} to SQLite database")
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
     
-    model_cleaned = model.split('/')[-1]
-    table_name = f"{today_date}_{model_cleaned}".replace('-', '_').replace(':', '_').replace(' ', '_').replace('.', '_')
+    table_name = get_results_table_name(model, today_date)
     quoted_table_name = f'"{table_name}"'
     
     # Check if table exists
@@ -171,6 +395,8 @@ def save_results_to_sqlite(iteration_results_df: pd.DataFrame, model: str, today
         columns = [f"{sanitize_column_name(col)} {get_sqlite_type(iteration_results_df[col].dtype)}" for col in iteration_results_df.columns]
         create_table_sql = f"CREATE TABLE {quoted_table_name} ({', '.join(columns)})"
         cursor.execute(create_table_sql)
+        if 'Question_Code' in iteration_results_df.columns:
+            ensure_question_code_index(conn, table_name)
     else:
         # Check existing columns and add any missing ones
         cursor.execute(f"PRAGMA table_info({quoted_table_name})")
@@ -182,37 +408,69 @@ def save_results_to_sqlite(iteration_results_df: pd.DataFrame, model: str, today
                 column_type = get_sqlite_type(iteration_results_df[column].dtype)
                 cursor.execute(f"ALTER TABLE {quoted_table_name} ADD COLUMN {safe_column_name} {column_type}")
     
-    # Save the results
+    # Save the results; the catalog is created first so its backfill doesn't claim the new rows
+    ensure_table_catalog(conn)
     iteration_results_df.to_sql(table_name, conn, if_exists='append', index=False)
     
+    # Record the new rows in the catalog; the write lock keeps concurrent workers from counting rows twice
+    cursor.execute("BEGIN IMMEDIATE")
+    update_table_catalog(conn, table_name, model, today_date)
+    conn.commit()
+    
     # Calculate and save summary data
     round_number = int(iteration_results_df['Round'].iloc[0])
     total_questions = len(iteration_results_df)
     correct_answers = iteration_results_df['Is_Correct'].sum()
     percentage_correct = round((correct_answers / total_questions) * 100, 2)
+    if percentages is not None:
+        percentage_correct = percentages['TOTAL']
+    
+    display_name, provider = resolve_display_name(model)
     
     # Model summary
     model_summary_data = {
         'Model': [model],
         'Round': [round_number],
         'Date': [today_date],
-        'Percentage_Correct': [percentage_correct]
+        'Percentage_Correct': [percentage_correct],
+        'Display_Name': [display_name],
+        'Provider': [provider]
     }
+    ensure_display_columns(conn, 'model_summary')
     model_summary_df = pd.DataFrame(model_summary_data)
     model_summary_df.to_sql('model_summary', conn, if_exists='append', index=False)
     
+    # Token usage summary, used to estimate the cost of future runs
+    if {'Prompt_Tokens', 'Completion_Tokens'}.issubset(iteration_results_df.columns):
+        completion_tokens = iteration_results_df['Completion_Tokens'].astype(int)
+        token_usage_df = pd.DataFrame({
+            'Model': [model],
+            'Round': [round_number],
+            'Date': [today_date],
+            'Questions': [total_questions],
+            'Prompt_Tokens': [int(iteration_results_df['Prompt_Tokens'].astype(int).sum())],
+            'Completion_Tokens': [int(completion_tokens.sum())],
+            'Completion_Tokens_Squared': [int((completion_tokens ** 2).sum())]
+        })
+        token_usage_df.to_sql('token_usage', conn, if_exists='append', index=False)
+    
     # Discipline summary
     if 'Discipline' in iteration_results_df.columns:
         discipline_summary = iteration_results_df.groupby('Discipline')['Is_Correct'].mean() * 100
         discipline_summary = discipline_summary.round(2)
+        if percentages is not None and 'Discipline' in percentages:
+            discipline_summary = pd.Series(percentages['Discipline'], dtype=float)
         discipline_summary_data = {
             'Model': model,
             'Round': round_number,
             'Date': today_date,
+            'Display_Name': display_name,
+            'Provider': provider,
         }
         discipline_summary_data.update(discipline_summary.to_dict())
         
         ensure_summary_table(conn, 'discipline_summary', discipline_summary.index)
+        ensure_display_columns(conn, 'discipline_summary')
         
         discipline_summary_df = pd.DataFrame([discipline_summary_data])
         discipline_summary_df.to_sql('discipline_summary', conn, if_exists='append', index=False)
@@ -221,15 +479,20 @@ def save_results_to_sqlite(iteration_results_df: pd.DataFrame, model: str, today
     if 'Category' in iteration_results_df.columns:
         category_summary = iteration_results_df.groupby('Category')['Is_Correct'].mean() * 100
         category_summary = category_summary.round(2)
+        if percentages is not None and 'Category' in percentages:
+            category_summary = pd.Series(percentages['Category'], dtype=float)
         category_summary_data = {
             'Model': model,
             'Round': round_number,
             'Date': today_date,
             'TOTAL': percentage_correct,
+            'Display_Name': display_name,
+            'Provider': provider,
         }
         category_summary_data.update({sanitize_column_name(cat): val for cat, val in category_summary.to_dict().items()})
         
-        ensure_summary_table(conn, 'category_summary', category_summary.index)
+        ensure_summary_table(conn, 'category_summary', category_summary.index.insert(0, 'TOTAL'))
+        ensure_display_columns(conn, 'category_summary')
         
         category_summary_df = pd.DataFrame([category_summary_data])
         category_summary_df.to_sql('category_summary', conn, if_exists='append', index=False)
@@ -238,6 +501,38 @@ def save_results_to_sqlite(iteration_results_df: pd.DataFrame, model: str, today
 
     logger.info(f"Results saved to database successfully in table {table_name}. Overall percentage correct: {percentage_correct}%")
 
+def record_budget_stop(model: str, today_date: str, round_number: int, questions_completed: int, next_question_code: Optional[str],
+                       budget_status: Any, db_path: str = DATABASE_PATH) -> None:
+    """
+    Record where a run stopped because a budget was reached.
+    
+    Args:
+    model (str): Variant of the model that was stopped
+    today_date (str): Current date
+    round_number (int): Round in progress when the run stopped
+    questions_completed (int): Number of results saved for that round
+    next_question_code (Optional[str]): The first question that was not asked
+    budget_status (BudgetStatus): The budget check that triggered the stop
+    db_path (str): Path to the database
+    """
+    budget_stop_df = pd.DataFrame([{
+        'Model': model,
+        'Round': round_number,
+        'Date': today_date,
+        'Questions_Completed': questions_completed,
+        'Next_Question_Code': next_question_code,
+        'Scope': budget_status.scope,
+        'Spent': round(budget_status.spent, 6),
+        'Budget': budget_status.budget,
+        'Timestamp': datetime.now()
+    }])
+    conn = sqlite3.connect(db_path)
+    try:
+        budget_stop_df.to_sql('budget_stops', conn, if_exists='append', index=False)
+    finally:
+        conn.close()
+    logger.info(f"Recorded budget stop for {model} in round {round_number} after {questions_completed} questions")
+
 def get_sqlite_type(dtype: Any) -> str:
     if dtype == 'int64':
         return 'INTEGER'
@@ -253,4 +548,106 @@ def ensure_summary_table(conn: sqlite3.Connection, table_name: str, columns: pd.
     existing_columns = [info[1] if isinstance(info, tuple) else info['name'] for info in cursor.fetchall()]
     new_columns = [sanitize_column_name(col) for col in columns if sanitize_column_name(col) not in existing_columns]
     for safe_col in new_columns:
-        cursor.execute(f"ALTER TABLE {table_name} ADD COLUMN {safe_col} REAL")
\ No newline at end of file
+        cursor.execute(f"ALTER TABLE {table_name} ADD COLUMN {safe_col} REAL")
+
+def ensure_display_columns(conn: sqlite3.Connection, table_name: str) -> None:
+    """
+    Add the Display_Name and Provider columns to an existing summary table and fill them for older rows.
+
+    The caller commits, so this can run inside a merge or recompute transaction.
+
+    Args:
+    conn (sqlite3.Connection): Connection to the database
+    table_name (str): The summary table; nothing is done if it doesn't exist yet
+    """
+    existing = [info[1] for info in conn.execute(f"PRAGMA table_info({table_name})")]
+    if not existing:
+        return
+    for column in DISPLAY_COLUMNS:
+        if column not in existing:
+            conn.execute(f"ALTER TABLE {table_name} ADD COLUMN {column} TEXT")
+    models = [row[0] for row in conn.execute(f"SELECT DISTINCT Model FROM {table_name} WHERE Display_Name IS NULL OR Provider IS NULL")]
+    if models:
+        conn.executemany(f"UPDATE {table_name} SET Display_Name = ?, Provider = ? WHERE Model = ? AND (Display_Name IS NULL OR Provider IS NULL)",
+                         [resolve_display_name(str(model)) + (model,) for model in models])
+        logger.info(f"Filled display names for {len(models)} models in {table_name}")
+
+def ensure_table_catalog(conn: sqlite3.Connection) -> None:
+    """Create the table_catalog table if needed, filling it from any existing results tables."""
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'table_catalog'").fetchone():
+        return
+    conn.execute("CREATE TABLE IF NOT EXISTS table_catalog (Table_Name TEXT PRIMARY KEY, Model TEXT, Date TEXT, First_Round INTEGER, "
+                 "Last_Round INTEGER, Row_Count INTEGER, First_Timestamp TEXT, Last_Timestamp TEXT, Last_Rowid INTEGER)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_table_catalog_date_model ON table_catalog (Date, Model)")
+    tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name")]
+    catalogued = 0
+    for table_name in tables:
+        columns = {info[1] for info in conn.execute(f'PRAGMA table_info("{table_name}")')}
+        if RESULTS_TABLE_PATTERN.match(table_name) and 'Round' in columns:
+            update_table_catalog(conn, table_name, resolve_results_table_model(conn, table_name), results_table_date(table_name))
+            catalogued += 1
+    conn.commit()
+    logger.info(f"Created table_catalog with {catalogued} existing results tables")
+
+def update_table_catalog(conn: sqlite3.Connection, table_name: str, model: str, today_date: str) -> None:
+    """
+    Fold the rows added to a results table since it was last catalogued into its table_catalog entry.
+
+    Each entry keeps the last rowid it has counted, so appending a round only scans the
+    new rows. Call inside a write transaction; the caller commits.
+
+    Args:
+    conn (sqlite3.Connection): Connection to the database
+    table_name (str): The per-day results table
+    model (str): Model variant stored in the table
+    today_date (str): Run date in 'YYYY-MM-DD' format
+    """
+    entry = conn.execute("SELECT Last_Rowid FROM table_catalog WHERE Table_Name = ?", (table_name,)).fetchone()
+    columns = {info[1] for info in conn.execute(f'PRAGMA table_info("{table_name}")')}
+    timestamp = '"Timestamp"' if 'Timestamp' in columns else 'NULL'
+    stats = conn.execute(
+        f'SELECT MIN("Round"), MAX("Round"), COUNT(*), MIN({timestamp}), MAX({timestamp}), MAX(rowid) FROM "{table_name}" WHERE rowid > ?',
+        (entry[0] if entry else 0,)
+    ).fetchone()
+    if not stats[2]:
+        return
+    conn.execute(
+        "INSERT INTO table_catalog (Table_Name, Model, Date, First_Round, Last_Round, Row_Count, First_Timestamp, Last_Timestamp, Last_Rowid) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (Table_Name) DO UPDATE SET "
+        "Model = excluded.Model, Date = excluded.Date, "
+        "First_Round = MIN(First_Round, excluded.First_Round), Last_Round = MAX(Last_Round, excluded.Last_Round), "
+        "Row_Count = Row_Count + excluded.Row_Count, "
+        "First_Timestamp = COALESCE(MIN(First_Timestamp, excluded.First_Timestamp), First_Timestamp, excluded.First_Timestamp), "
+        "Last_Timestamp = COALESCE(MAX(Last_Timestamp, excluded.Last_Timestamp), Last_Timestamp, excluded.Last_Timestamp), "
+        "Last_Rowid = excluded.Last_Rowid",
+        (table_name, model, today_date) + tuple(stats)
+    )
+
+def load_table_catalog(db_path: str = DATABASE_PATH, model: Optional[str] = None, date: Optional[str] = None) -> pd.DataFrame:
+    """
+    List the results tables in a database from table_catalog.
+
+    Args:
+    db_path (str): Path to the database
+    model (Optional[str]): Only list tables of this model variant
+    date (Optional[str]): Only list tables of this run date ('YYYY-MM-DD')
+
+    Returns:
+    pd.DataFrame: One row per results table, ordered by date and model
+    """
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(f"Database file not found at path: {db_path}")
+
+    conn = sqlite3.connect(db_path)
+    try:
+        ensure_table_catalog(conn)
+        conditions, parameters = [], []
+        for column, value in (('Date', date), ('Model', model)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                parameters.append(value)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+        rows = conn.execute(f"SELECT {', '.join(TABLE_CATALOG_COLUMNS)} FROM table_catalog{where} ORDER BY Date, Model", parameters).fetchall()
+    finally:
+        conn.close()
+    return pd.DataFrame(rows, columns=list(TABLE_CATALOG_COLUMNS))
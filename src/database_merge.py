@@ -0,0 +1,309 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+from typing import Dict, List, NamedTuple, Sequence, Set, Tuple
+
+from src.lazy import lazy_import
+from src.logger import get_logger
+from src.data_processing import (RESULTS_TABLE_PATTERN, DISPLAY_COLUMNS, get_results_table_name, results_table_date, resolve_results_table_model, sanitize_column_name,
+                                  ensure_summary_table, ensure_display_columns, ensure_table_catalog, update_table_catalog)
+from src.model_names import resolve_display_name
+from src.adaptive import ADAPTIVE_ESTIMATES_TABLE, ensure_ability_estimates, stored_percentages
+
+pd = lazy_import('pandas')
+
+logger = get_logger(__name__)
+
+SUMMARY_TABLES = ('model_summary', 'category_summary', 'discipline_summary', 'token_usage')
+# SQLite allows 10 attached databases by default; keep one slot spare
+MAX_ATTACHED = 9
+
+# Is_Correct is stored with TEXT affinity by older versions, so accept every spelling of true
+IS_CORRECT_SQL = "CASE WHEN \"Is_Correct\" IN (1, '1', 'True', 'true') THEN 1.0 ELSE 0.0 END"
+
+class MergeReport(NamedTuple):
+    tables_merged: int
+    rows_inserted: int
+    duplicates_skipped: int
+    renumbered_rounds: List[Tuple[str, int, int]]  # (table, source round, new round)
+    summaries_recomputed: int
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+def _tables(conn: sqlite3.Connection, schema: str) -> Dict[str, str]:
+    rows = conn.execute(f"SELECT name, sql FROM {schema}.sqlite_master WHERE type = 'table'").fetchall()
+    return {name: sql for name, sql in rows}
+
+def _columns(conn: sqlite3.Connection, schema: str, table: str) -> List[Tuple[str, str]]:
+    return [(info[1], info[2]) for info in conn.execute(f"PRAGMA {schema}.table_info({_quote(table)})").fetchall()]
+
+def _copy_results_table(conn: sqlite3.Connection, schema: str, table: str, create_sql: str) -> Tuple[int, int, Dict[int, int]]:
+    """
+    Copy one per-day results table from an attached database into main.
+
+    Returns:
+    Tuple[int, int, Dict[int, int]]: (rows inserted, duplicates skipped, source round -> target round)
+    """
+    quoted = _quote(table)
+    if table not in _tables(conn, 'main'):
+        conn.execute(create_sql)
+
+    # Add any columns the target is missing
+    target_columns = {name for name, _ in _columns(conn, 'main', table)}
+    source_columns = _columns(conn, schema, table)
+    for name, column_type in source_columns:
+        if name not in target_columns:
+            conn.execute(f"ALTER TABLE {quoted} ADD COLUMN {_quote(name)} {column_type or 'TEXT'}")
+    column_names = [name for name, _ in source_columns]
+
+    has_question_code = 'Question_Code' in column_names
+    if has_question_code:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {_quote('idx_' + table + '_question_round')} ON {quoted} (\"Question_Code\", \"Round\")")
+
+    # Round is left out so rows an earlier merge renumbered still count as duplicates
+    duplicate = (f"EXISTS (SELECT 1 FROM main.{quoted} AS m WHERE "
+                 + ' AND '.join(f"m.{_quote(name)} IS s.{_quote(name)}" for name in column_names if name != 'Round') + ")")
+    source_rounds = [row[0] for row in conn.execute(f'SELECT DISTINCT "Round" FROM {schema}.{quoted} ORDER BY "Round"')]
+    # Start past the source rounds too, so a renumbered round never lands on a source round kept as it is
+    next_round = max([conn.execute(f'SELECT MAX("Round") FROM main.{quoted}').fetchone()[0] or 0] + source_rounds) + 1
+
+    # A source round collides when new rows share a round (and question) with different target rows;
+    # disjoint question sets in the same round (e.g. shards) are merged into that round
+    round_map: Dict[int, int] = {}
+    for source_round in source_rounds:
+        overlap = "m.\"Question_Code\" = s.\"Question_Code\"" if has_question_code else "1 = 1"
+        collides = conn.execute(
+            f"SELECT EXISTS (SELECT 1 FROM {schema}.{quoted} AS s JOIN main.{quoted} AS m ON m.\"Round\" = s.\"Round\" AND {overlap} "
+            f"WHERE s.\"Round\" = ? AND NOT {duplicate})",
+            (source_round,)
+        ).fetchone()[0]
+        if collides:
+            round_map[source_round] = next_round
+            next_round += 1
+        else:
+            round_map[source_round] = source_round
+
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS merge_round_map (old_round INTEGER PRIMARY KEY, new_round INTEGER)")
+    conn.execute("DELETE FROM temp.merge_round_map")
+    conn.executemany("INSERT INTO temp.merge_round_map VALUES (?, ?)", list(round_map.items()))
+
+    select_columns = ', '.join('r.new_round' if name == 'Round' else f"s.{_quote(name)}" for name in column_names)
+    before = conn.total_changes
+    conn.execute(
+        f"INSERT INTO main.{quoted} ({', '.join(_quote(name) for name in column_names)}) "
+        f"SELECT {select_columns} FROM {schema}.{quoted} AS s JOIN temp.merge_round_map AS r ON r.old_round = s.\"Round\" "
+        f"WHERE NOT {duplicate}"
+    )
+    inserted = conn.total_changes - before
+    total = conn.execute(f"SELECT COUNT(*) FROM {schema}.{quoted}").fetchone()[0]
+    return inserted, total - inserted, round_map
+
+def _copy_summary_rows(conn: sqlite3.Connection, schema: str, table: str, create_sql: str, recomputed: Set[Tuple[str, str, int]]) -> None:
+    """Copy summary rows for rounds that have no results table to rebuild them from."""
+    quoted = _quote(table)
+    if table not in _tables(conn, 'main'):
+        conn.execute(create_sql)
+    if table in ('category_summary', 'discipline_summary'):
+        ensure_display_columns(conn, table)
+        ensure_summary_table(conn, table, pd.Index([name for name, _ in _columns(conn, schema, table) if name not in DISPLAY_COLUMNS]))
+    else:
+        target_columns = {name for name, _ in _columns(conn, 'main', table)}
+        for name, column_type in _columns(conn, schema, table):
+            if name not in target_columns:
+                conn.execute(f"ALTER TABLE {quoted} ADD COLUMN {_quote(name)} {column_type or 'TEXT'}")
+
+    column_names = [name for name, _ in _columns(conn, schema, table)]
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS merge_recomputed (Model TEXT, Date TEXT, Round INTEGER)")
+    conn.execute("DELETE FROM temp.merge_recomputed")
+    conn.executemany("INSERT INTO temp.merge_recomputed VALUES (?, ?, ?)", sorted(recomputed))
+    conn.execute(
+        f"INSERT INTO main.{quoted} ({', '.join(_quote(name) for name in column_names)}) "
+        f"SELECT {', '.join('s.' + _quote(name) for name in column_names)} FROM {schema}.{quoted} AS s "
+        f"WHERE NOT EXISTS (SELECT 1 FROM main.{quoted} AS m WHERE m.Model IS s.Model AND m.Date IS s.Date AND m.Round IS s.Round) "
+        f"AND NOT EXISTS (SELECT 1 FROM temp.merge_recomputed AS k WHERE k.Model IS s.Model AND k.Date IS s.Date AND k.Round IS s.Round)"
+    )
+    if table != 'token_usage':
+        # Rows from databases written before display names were stored get them here
+        ensure_display_columns(conn, table)
+
+def _copy_ability_estimates(conn: sqlite3.Connection, schema: str, round_maps: Dict[str, Dict[int, int]]) -> None:
+    """Copy adaptive estimates, following their rounds when they were renumbered, so rebuilt summaries keep them."""
+    ensure_ability_estimates(conn)
+    columns = [name for name, _ in _columns(conn, schema, ADAPTIVE_ESTIMATES_TABLE)]
+    target_columns = {name for name, _ in _columns(conn, 'main', ADAPTIVE_ESTIMATES_TABLE)}
+    columns = [name for name in columns if name in target_columns]
+    rows = conn.execute(f"SELECT {', '.join(_quote(name) for name in columns)} FROM {schema}.{ADAPTIVE_ESTIMATES_TABLE}").fetchall()
+    for row in rows:
+        values = dict(zip(columns, row))
+        values['Round'] = round_maps.get(get_results_table_name(values['Model'], values['Date']), {}).get(values['Round'], values['Round'])
+        if conn.execute(f"SELECT 1 FROM main.{ADAPTIVE_ESTIMATES_TABLE} WHERE Model IS ? AND Date IS ? AND Round IS ?",
+                        (values['Model'], values['Date'], values['Round'])).fetchone():
+            continue
+        conn.execute(f"INSERT INTO main.{ADAPTIVE_ESTIMATES_TABLE} ({', '.join(_quote(name) for name in values)}) "
+                     f"VALUES ({', '.join('?' for _ in values)})", list(values.values()))
+
+def recompute_round_summaries(conn: sqlite3.Connection, table: str, model: str, date: str, round_number: int,
+                              current_versions_only: bool = False) -> None:
+    """
+    Rebuild the summary rows of one round from its per-day results table.
+
+    Adaptive rounds keep the percentages recorded with their ability estimate; only their
+    token usage is rebuilt from the answers.
+
+    Args:
+    conn (sqlite3.Connection): Connection to the target database
+    table (str): The per-day results table
+    model (str): Model variant stored in the summaries
+    date (str): Run date in 'YYYY-MM-DD' format
+    round_number (int): The round to rebuild
+    current_versions_only (bool): Leave out answers to older versions of a question, as
+    listed in temp.current_versions (see question_versions.stage_question_versions)
+    """
+    quoted = _quote(table)
+    column_names = {name for name, _ in _columns(conn, 'main', table)}
+    where = '"Round" = ?'
+    if current_versions_only and 'Question_Version' in column_names:
+        where += (f' AND NOT EXISTS (SELECT 1 FROM temp.current_versions AS v WHERE v.Question_Code = {quoted}."Question_Code" '
+                  f'AND {quoted}."Question_Version" IS NOT NULL AND v.Question_Version <> {quoted}."Question_Version")')
+    key = (model, date, round_number)
+    for summary_table in SUMMARY_TABLES:
+        if summary_table in _tables(conn, 'main'):
+            conn.execute(f"DELETE FROM {summary_table} WHERE Model = ? AND Date = ? AND Round = ?", key)
+
+    total_questions, correct_answers = conn.execute(f'SELECT COUNT(*), SUM({IS_CORRECT_SQL}) FROM {quoted} WHERE {where}', (round_number,)).fetchone()
+    if not total_questions:
+        return
+    percentage_correct = round(correct_answers / total_questions * 100, 2)
+    percentages = stored_percentages(conn, model, date, round_number) or {}
+    percentage_correct = percentages.get('TOTAL', percentage_correct)
+    display_name, provider = resolve_display_name(model)
+
+    conn.execute("CREATE TABLE IF NOT EXISTS model_summary (Model TEXT, Round INTEGER, Date TEXT, Percentage_Correct REAL, Display_Name TEXT, Provider TEXT)")
+    ensure_display_columns(conn, 'model_summary')
+    conn.execute("INSERT INTO model_summary (Model, Round, Date, Percentage_Correct, Display_Name, Provider) VALUES (?, ?, ?, ?, ?, ?)",
+                 (model, round_number, date, percentage_correct, display_name, provider))
+
+    if {'Prompt_Tokens', 'Completion_Tokens'}.issubset(column_names):
+        conn.execute("CREATE TABLE IF NOT EXISTS token_usage (Model TEXT, Round INTEGER, Date TEXT, Questions INTEGER, "
+                     "Prompt_Tokens INTEGER, Completion_Tokens INTEGER, Completion_Tokens_Squared INTEGER)")
+        conn.execute(
+            f'INSERT INTO token_usage (Model, Round, Date, Questions, Prompt_Tokens, Completion_Tokens, Completion_Tokens_Squared) '
+            f'SELECT ?, ?, ?, COUNT(*), SUM(CAST("Prompt_Tokens" AS INTEGER)), SUM(CAST("Completion_Tokens" AS INTEGER)), '
+            f'SUM(CAST("Completion_Tokens" AS INTEGER) * CAST("Completion_Tokens" AS INTEGER)) FROM {quoted} WHERE {where}',
+            (model, round_number, date, round_number)
+        )
+
+    for group_column, summary_table, extra in (('Discipline', 'discipline_summary', {}), ('Category', 'category_summary', {'TOTAL': percentage_correct})):
+        if group_column not in column_names:
+            continue
+        if group_column in percentages:
+            groups = list(percentages[group_column].items())
+        else:
+            groups = conn.execute(
+                f'SELECT {_quote(group_column)}, ROUND(AVG({IS_CORRECT_SQL}) * 100, 2) FROM {quoted} WHERE {where} GROUP BY {_quote(group_column)}',
+                (round_number,)
+            ).fetchall()
+        values = dict(extra)
+        values.update({sanitize_column_name(str(name)): value for name, value in groups})
+        ensure_summary_table(conn, summary_table, pd.Index(list(values)))
+        ensure_display_columns(conn, summary_table)
+        names = ['Model', 'Round', 'Date', 'Display_Name', 'Provider'] + list(values)
+        conn.execute(
+            f"INSERT INTO {summary_table} ({', '.join(_quote(name) for name in names)}) VALUES ({', '.join('?' for _ in names)})",
+            [model, round_number, date, display_name, provider] + list(values.values())
+        )
+
+def _merge_batch(conn: sqlite3.Connection, source_paths: Sequence[str]) -> MergeReport:
+    schemas = [f"source_{index}" for index in range(len(source_paths))]
+    for schema, source_path in zip(schemas, source_paths):
+        conn.execute(f"ATTACH DATABASE ? AS {schema}", (source_path,))
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            tables_merged = rows_inserted = duplicates_skipped = 0
+            renumbered: List[Tuple[str, int, int]] = []
+            affected: Dict[Tuple[str, str, int], str] = {}
+            round_maps: Dict[str, Dict[int, int]] = {}
+
+            for schema, source_path in zip(schemas, source_paths):
+                source_tables = _tables(conn, schema)
+                for table, create_sql in sorted(source_tables.items()):
+                    if not RESULTS_TABLE_PATTERN.match(table) or not {'Round', 'Is_Correct'}.issubset(name for name, _ in _columns(conn, schema, table)):
+                        continue
+                    inserted, skipped, round_map = _copy_results_table(conn, schema, table, create_sql)
+                    tables_merged += 1
+                    rows_inserted += inserted
+                    duplicates_skipped += skipped
+                    renumbered.extend((table, old, new) for old, new in round_map.items() if old != new)
+                    round_maps[table] = round_map
+                    if inserted:
+                        model = resolve_results_table_model(conn, table, ('main', schema))
+                        update_table_catalog(conn, table, model, results_table_date(table))
+                        # Renumbered rounds also rebuild the original round so its source summary isn't copied over it
+                        for round_number in set(round_map) | set(round_map.values()):
+                            affected[(model, results_table_date(table), round_number)] = table
+                    logger.info(f"Merged {table} from {source_path}: {inserted} rows added, {skipped} duplicates skipped")
+
+                if ADAPTIVE_ESTIMATES_TABLE in source_tables:
+                    _copy_ability_estimates(conn, schema, round_maps)
+                for summary_table in SUMMARY_TABLES:
+                    if summary_table in source_tables:
+                        _copy_summary_rows(conn, schema, summary_table, source_tables[summary_table], set(affected))
+
+            for (model, date, round_number), table in sorted(affected.items()):
+                recompute_round_summaries(conn, table, model, date, round_number)
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+    finally:
+        for schema in schemas:
+            conn.execute(f"DETACH DATABASE {schema}")
+
+    return MergeReport(tables_merged, rows_inserted, duplicates_skipped, renumbered, len(affected))
+
+def merge_databases(target_path: str, source_paths: Sequence[str]) -> MergeReport:
+    """
+    Merge result databases into a target database.
+
+    Per-day results tables are copied with bulk INSERT ... SELECT from attached
+    databases. Rows identical to existing rows are skipped; a source round that
+    overlaps different results in the same target round is renumbered to the next
+    free round, while disjoint question sets (e.g. shards) join the existing round.
+    The summaries of every round that received rows are recomputed from the merged
+    results, all in a single transaction per batch of up to nine sources.
+
+    Args:
+    target_path (str): Database to merge into (created if missing)
+    source_paths (Sequence[str]): Databases to merge from
+
+    Returns:
+    MergeReport: What was merged
+    """
+    for source_path in source_paths:
+        if not os.path.exists(source_path):
+            raise FileNotFoundError(f"Database file not found at path: {source_path}")
+        if os.path.abspath(source_path) == os.path.abspath(target_path):
+            raise ValueError(f"Cannot merge {source_path} into itself")
+
+    reports: List[MergeReport] = []
+    conn = sqlite3.connect(target_path, isolation_level=None)
+    try:
+        ensure_table_catalog(conn)
+        for start in range(0, len(source_paths), MAX_ATTACHED):
+            reports.append(_merge_batch(conn, source_paths[start:start + MAX_ATTACHED]))
+    finally:
+        conn.close()
+
+    report = MergeReport(
+        sum(r.tables_merged for r in reports),
+        sum(r.rows_inserted for r in reports),
+        sum(r.duplicates_skipped for r in reports),
+        [entry for r in reports for entry in r.renumbered_rounds],
+        sum(r.summaries_recomputed for r in reports),
+    )
+    logger.info(f"Merged {len(source_paths)} databases into {target_path}: {report.rows_inserted} rows added, "
+                f"{report.duplicates_skipped} duplicates skipped, {len(report.renumbered_rounds)} rounds renumbered")
+    return report
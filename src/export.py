@@ -0,0 +1,240 @@
+import hashlib
+import json
+import os
+import sqlite3
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from src.logger import get_logger
+from src.constants import DATABASE_PATH, EXPORT_FOLDER, EXPORT_BATCH_SIZE
+from src.data_processing import RESULTS_TABLE_PATTERN, results_table_date
+from src.database_merge import IS_CORRECT_SQL
+
+logger = get_logger(__name__)
+
+FORMATS = {'parquet': '.parquet', 'arrow': '.arrow'}
+SUMMARY_TABLES = ('model_summary', 'category_summary', 'discipline_summary', 'token_usage', 'budget_stops')
+# Files starting with '_' or '.' are ignored by pyarrow.dataset, so the state file and
+# partially written parts never show up in a dataset scan
+STATE_FILE = '_export_state.json'
+STATE_VERSION = 1
+
+class ExportReport(NamedTuple):
+    tables_exported: int
+    rows_exported: int
+    files_written: int
+    summaries_rewritten: List[str]
+
+def _import_pyarrow() -> Tuple[Any, Any, Any]:
+    try:
+        import pyarrow  # type: ignore
+        import pyarrow.ipc  # type: ignore
+        import pyarrow.parquet  # type: ignore
+    except ImportError as e:
+        raise ImportError("Exporting results requires pyarrow; install it with 'pip install pyarrow'") from e
+    return pyarrow, pyarrow.ipc, pyarrow.parquet
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+def _arrow_columns(pa: Any, conn: sqlite3.Connection, table: str) -> List[Tuple[str, str, Any]]:
+    """Map the columns of a table to (name, select expression, Arrow type); strings are dictionary-encoded."""
+    columns = []
+    for info in conn.execute(f"PRAGMA table_info({_quote(table)})").fetchall():
+        name, declared = info[1], (info[2] or '').upper()
+        quoted = _quote(name)
+        if name == 'Is_Correct':
+            # Stored with TEXT affinity by older versions
+            columns.append((name, f"{IS_CORRECT_SQL} = 1.0", pa.bool_()))
+        elif 'INT' in declared:
+            columns.append((name, f"CAST({quoted} AS INTEGER)", pa.int64()))
+        elif any(affinity in declared for affinity in ('REAL', 'FLOA', 'DOUB')):
+            columns.append((name, f"CAST({quoted} AS REAL)", pa.float64()))
+        else:
+            columns.append((name, f"CAST({quoted} AS TEXT)", pa.dictionary(pa.int32(), pa.string())))
+    return columns
+
+def _read_batches(pa: Any, conn: sqlite3.Connection, table: str, after_rowid: int, batch_size: int) -> Iterator[Tuple[int, int, Any]]:
+    """
+    Stream the rows of a table added after a rowid as Arrow record batches.
+
+    Yields:
+    Tuple[int, int, pyarrow.RecordBatch]: (first rowid, last rowid, batch)
+    """
+    columns = _arrow_columns(pa, conn, table)
+    schema = pa.schema([(name, arrow_type) for name, _, arrow_type in columns])
+    # Keep NULLs as NULL; the Is_Correct expression would otherwise turn them into False
+    select = ', '.join(f"CASE WHEN {_quote(name)} IS NULL THEN NULL ELSE {expression} END" for name, expression, _ in columns)
+    cursor = conn.execute(f"SELECT rowid, {select} FROM {_quote(table)} WHERE rowid > ? ORDER BY rowid", (after_rowid,))
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        arrays = []
+        for index, (_, _, arrow_type) in enumerate(columns, start=1):
+            values = [row[index] for row in rows]
+            if pa.types.is_dictionary(arrow_type):
+                arrays.append(pa.array(values, type=pa.string()).dictionary_encode())
+            elif pa.types.is_boolean(arrow_type):
+                arrays.append(pa.array([None if value is None else bool(value) for value in values], type=arrow_type))
+            else:
+                arrays.append(pa.array(values, type=arrow_type))
+        yield rows[0][0], rows[-1][0], pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+def _write_file(modules: Tuple[Any, Any, Any], path: str, export_format: str, batch: Any) -> None:
+    pa, ipc, pq = modules
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = os.path.join(os.path.dirname(path), '.' + os.path.basename(path) + '.tmp')
+    if export_format == 'parquet':
+        pq.write_table(pa.Table.from_batches([batch]), temp_path)
+    else:
+        # Uncompressed IPC files can be memory-mapped without copying
+        with pa.OSFile(temp_path, 'wb') as sink, ipc.new_file(sink, batch.schema) as writer:
+            writer.write_batch(batch)
+    os.replace(temp_path, path)
+
+def _new_state(export_format: str) -> Dict[str, Any]:
+    return {'version': STATE_VERSION, 'format': export_format, 'results': {}, 'summaries': {}}
+
+def _load_state(output_dir: str, export_format: str) -> Dict[str, Any]:
+    state_path = os.path.join(output_dir, STATE_FILE)
+    if not os.path.exists(state_path):
+        return _new_state(export_format)
+    with open(state_path, 'r', encoding='utf-8') as f:
+        state = json.load(f)
+    if state.get('version') != STATE_VERSION:
+        raise ValueError(f"Unsupported export state version in {state_path}; export to a new folder or use a full export")
+    if state.get('format') != export_format:
+        raise ValueError(f"{output_dir} holds a {state.get('format')} export; use the same format or another folder")
+    return state
+
+def _save_state(output_dir: str, state: Dict[str, Any]) -> None:
+    state_path = os.path.join(output_dir, STATE_FILE)
+    temp_path = state_path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(temp_path, state_path)
+
+def _summary_fingerprint(conn: sqlite3.Connection, table: str) -> Dict[str, Any]:
+    """Fingerprint a summary table by its columns and a hash of its rows; rebuilt rows can reuse their rowids."""
+    columns = [info[1] for info in conn.execute(f"PRAGMA table_info({_quote(table)})").fetchall()]
+    digest = hashlib.sha256()
+    count = 0
+    for row in conn.execute(f"SELECT * FROM {_quote(table)} ORDER BY rowid"):
+        digest.update(repr(row).encode('utf-8'))
+        count += 1
+    return {'rows': count, 'sha256': digest.hexdigest(), 'columns': columns}
+
+def _remove_files(folder: str, extension: str) -> None:
+    if not os.path.isdir(folder):
+        return
+    for name in os.listdir(folder):
+        if name.endswith(extension):
+            os.remove(os.path.join(folder, name))
+
+def results_partition(output_dir: str, table: str) -> str:
+    """
+    Get the folder a per-day results table is exported to.
+
+    Args:
+    output_dir (str): Export root folder
+    table (str): Per-day results table, e.g. '2024_07_01_gpt_4o'
+
+    Returns:
+    str: Hive-style partition folder, e.g. '<output_dir>/results/date=2024-07-01/model=gpt_4o'
+    """
+    model = table[len('YYYY_MM_DD_'):]
+    return os.path.join(output_dir, 'results', f"date={results_table_date(table)}", f"model={model}")
+
+def export_results(db_path: str = DATABASE_PATH, output_dir: str = EXPORT_FOLDER, export_format: str = 'parquet',
+                   batch_size: int = EXPORT_BATCH_SIZE, full: bool = False) -> ExportReport:
+    """
+    Export results and summary tables to Parquet or Arrow IPC files.
+
+    Per-day results tables are written under results/date=<date>/model=<model>/ with
+    one part file per batch of new rows. The last exported rowid of every table is
+    kept in _export_state.json, so later exports only write rounds added since.
+    Summary tables are small and can be rewritten by merges, so each is re-exported
+    as a single file whenever its contents change. String columns are dictionary-encoded.
+
+    Args:
+    db_path (str): Path to the results database
+    output_dir (str): Export root folder
+    export_format (str): 'parquet' or 'arrow'
+    batch_size (int): Maximum rows read and written per part file
+    full (bool): Discard the previous export state and export everything
+
+    Returns:
+    ExportReport: What was exported
+    """
+    if export_format not in FORMATS:
+        raise ValueError(f"Unsupported export format '{export_format}', expected one of {', '.join(FORMATS)}")
+    if batch_size < 1:
+        raise ValueError("batch_size must be positive")
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(f"Database file not found at path: {db_path}")
+    modules = _import_pyarrow()
+    pa = modules[0]
+    extension = FORMATS[export_format]
+
+    os.makedirs(output_dir, exist_ok=True)
+    state = _new_state(export_format) if full else _load_state(output_dir, export_format)
+
+    tables_exported = rows_exported = files_written = 0
+    summaries_rewritten: List[str] = []
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        # Read every table from one snapshot while runs keep writing
+        conn.execute("BEGIN")
+        tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name")]
+
+        for table in tables:
+            if not RESULTS_TABLE_PATTERN.match(table):
+                continue
+            folder = results_partition(output_dir, table)
+            max_rowid = conn.execute(f"SELECT MAX(rowid) FROM {_quote(table)}").fetchone()[0] or 0
+            watermark: Optional[int] = state['results'].get(table)
+            if watermark is None or max_rowid < watermark:
+                # New table, full export, or the table was rebuilt since the last export
+                _remove_files(folder, extension)
+                watermark = 0
+            if max_rowid == watermark:
+                continue
+
+            table_rows = 0
+            for first_rowid, last_rowid, batch in _read_batches(pa, conn, table, watermark, batch_size):
+                _write_file(modules, os.path.join(folder, f"part-{first_rowid:012d}{extension}"), export_format, batch)
+                table_rows += batch.num_rows
+                files_written += 1
+                state['results'][table] = last_rowid
+            _save_state(output_dir, state)
+            tables_exported += 1
+            rows_exported += table_rows
+            logger.info(f"Exported {table_rows} rows of {table} to {folder}")
+
+        for table in SUMMARY_TABLES:
+            if table not in tables:
+                continue
+            fingerprint = _summary_fingerprint(conn, table)
+            count = fingerprint['rows']
+            if state['summaries'].get(table) == fingerprint:
+                continue
+            path = os.path.join(output_dir, 'summaries', table + extension)
+            batches = [batch for _, _, batch in _read_batches(pa, conn, table, 0, max(count, 1))]
+            if batches:
+                _write_file(modules, path, export_format, batches[0])
+                files_written += 1
+            elif os.path.exists(path):
+                os.remove(path)
+            state['summaries'][table] = fingerprint
+            _save_state(output_dir, state)
+            summaries_rewritten.append(table)
+            logger.info(f"Exported {count} rows of {table} to {path}")
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+
+    _save_state(output_dir, state)
+    report = ExportReport(tables_exported, rows_exported, files_written, summaries_rewritten)
+    logger.info(f"Exported {report.rows_exported} result rows from {report.tables_exported} tables and "
+                f"{len(report.summaries_rewritten)} summary tables to {output_dir} ({export_format})")
+    return report
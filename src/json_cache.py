@@ -0,0 +1,44 @@
+import json
+from typing import Any, Dict, Optional
+
+CACHE_SIZE = 20
+
+class JsonCache:
+    """
+    Small least-recently-used cache of JSON values kept in one file.
+
+    The file is read once when the cache is created and written by `save`, keeping only the
+    `size` most recently used entries. A missing or unreadable file starts an empty cache.
+    """
+
+    def __init__(self, path: str, size: int = CACHE_SIZE):
+        """
+        Args:
+        path (str): JSON file holding the entries
+        size (int): Number of entries kept when saving
+        """
+        self.path = path
+        self.size = size
+        try:
+            with open(path, 'r') as file:
+                self._entries: Dict[str, Any] = json.load(file)
+        except (OSError, ValueError):
+            self._entries = {}
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the value stored under a key, marking it as most recently used, or None."""
+        value = self._entries.pop(key, None)
+        if value is not None:
+            self._entries[key] = value
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        """Store a value as the most recently used entry."""
+        self._entries.pop(key, None)
+        self._entries[key] = value
+
+    def save(self) -> None:
+        """Write the most recently used entries back to the file."""
+        entries = list(self._entries.items())[-self.size:]
+        with open(self.path, 'w') as file:
+            json.dump(dict(entries), file)
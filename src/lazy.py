@@ -0,0 +1,57 @@
+import importlib
+import threading
+import types
+from typing import Any
+
+class LazyModule(types.ModuleType):
+    """
+    Placeholder for a module that is imported on first attribute access.
+
+    Heavy dependencies (pandas, provider SDKs) are bound with `lazy_import` at the top
+    of a module, so `python main.py --help` and other short code paths never pay for
+    importing them. Attribute assignment and deletion are forwarded to the real module,
+    which keeps `unittest.mock.patch('src.module.sdk.Name')` working.
+    """
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        object.__setattr__(self, '_lazy_module', None)
+        object.__setattr__(self, '_lazy_lock', threading.Lock())
+
+    def _load(self) -> types.ModuleType:
+        module = object.__getattribute__(self, '_lazy_module')
+        if module is None:
+            with object.__getattribute__(self, '_lazy_lock'):
+                module = object.__getattribute__(self, '_lazy_module')
+                if module is None:
+                    module = importlib.import_module(self.__name__)
+                    object.__setattr__(self, '_lazy_module', module)
+        return module
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._load(), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(self._load(), name, value)
+
+    def __delattr__(self, name: str) -> None:
+        delattr(self._load(), name)
+
+    def __dir__(self) -> list:
+        return dir(self._load())
+
+    def __repr__(self) -> str:
+        state = 'loaded' if object.__getattribute__(self, '_lazy_module') is not None else 'not loaded'
+        return f"<lazy module '{self.__name__}' ({state})>"
+
+def lazy_import(name: str) -> LazyModule:
+    """
+    Return a proxy that imports `name` the first time one of its attributes is used.
+
+    Args:
+    name (str): Fully qualified module name, e.g. 'pandas' or 'vertexai.generative_models'
+
+    Returns:
+    LazyModule: The module proxy
+    """
+    return LazyModule(name)
@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import copy
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Sequence, Tuple
+
+from src.lazy import lazy_import
+from src.logger import get_logger
+from src.constants import VALID_ANSWERS, LOCAL_BATCH_SIZE, LOCAL_THREADS, LOCAL_CONTEXT_LENGTH
+from src.data_processing import PromptParts
+
+np = lazy_import('numpy')
+
+logger = get_logger(__name__)
+
+# (answer, prompt_tokens, completion_tokens, cached_tokens); query_language_model adds no cache writes for local models
+LocalAnswer = Tuple[str, int, int, int]
+
+def _letter_variants(letter: str) -> Tuple[str, str]:
+    # "Answer:" is usually followed by " A", but some tokenizers attach the space to the colon
+    return letter, f" {letter}"
+
+def choose_letter(logits: Any, letter_ids: Sequence[Sequence[int]]) -> str:
+    """
+    Pick the answer letter with the highest next-token logit.
+
+    Args:
+    logits (Any): Next-token logits over the vocabulary
+    letter_ids (Sequence[Sequence[int]]): Token ids spelling each letter in VALID_ANSWERS
+
+    Returns:
+    str: The most likely letter
+    """
+    logits = np.asarray(logits, dtype=float)
+    scores = [max(logits[token_id] for token_id in ids) for ids in letter_ids]
+    return VALID_ANSWERS[int(np.argmax(scores))]
+
+class LocalModel(ABC):
+    """
+    A model run on this machine, answering by the next-token likelihood of each letter.
+
+    Subclasses implement `score`; the shared prompt prefix is evaluated once and its KV
+    cache reused for every question behind it.
+    """
+
+    def __init__(self, variant: str):
+        self.variant = variant
+        self.lock = threading.Lock()
+
+    @abstractmethod
+    def score(self, prompts: Sequence[PromptParts]) -> List[LocalAnswer]:
+        """Answer a batch of prompts that share one prefix, in order."""
+
+class TransformersModel(LocalModel):
+    """A Hugging Face causal language model scored in batches on CPU."""
+
+    def __init__(self, variant: str):
+        super().__init__(variant)
+        try:
+            import torch  # type: ignore
+            from transformers import AutoModelForCausalLM, AutoTokenizer  # type: ignore
+        except ImportError as e:
+            raise ImportError("Local transformers models require torch and transformers; "
+                              "install them with 'pip install torch transformers'") from e
+        self.torch = torch
+        if LOCAL_THREADS:
+            torch.set_num_threads(LOCAL_THREADS)
+        self.tokenizer = AutoTokenizer.from_pretrained(variant)
+        # Right padding keeps every question's tokens directly after the cached prefix
+        self.tokenizer.padding_side = 'right'
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        self.model = AutoModelForCausalLM.from_pretrained(variant, torch_dtype=torch.float32)
+        self.model.eval()
+        self.letter_ids = [sorted({self.tokenizer.encode(text, add_special_tokens=False)[-1] for text in _letter_variants(letter)})
+                           for letter in VALID_ANSWERS]
+        self._prefix_text = None
+        self._prefix_cache: Any = None
+        self._prefix_length = 0
+
+    def _prefix(self, text: str) -> bool:
+        """Evaluate the shared prefix once; returns True if it was already cached."""
+        if text == self._prefix_text:
+            return True
+        ids = self.tokenizer(text, return_tensors='pt').input_ids
+        with self.torch.no_grad():
+            self._prefix_cache = self.model(input_ids=ids, use_cache=True).past_key_values
+        self._prefix_text, self._prefix_length = text, ids.shape[1]
+        return False
+
+    def _repeat_prefix(self, count: int) -> Any:
+        # The forward pass appends to the cache, so every batch gets its own copy
+        if hasattr(self._prefix_cache, 'batch_repeat_interleave'):
+            cache = copy.deepcopy(self._prefix_cache)
+            cache.batch_repeat_interleave(count)
+            return cache
+        return tuple(tuple(tensor.expand(count, *tensor.shape[1:]).contiguous() for tensor in layer) for layer in self._prefix_cache)
+
+    def score(self, prompts: Sequence[PromptParts]) -> List[LocalAnswer]:
+        answers: List[LocalAnswer] = []
+        torch = self.torch
+        for start in range(0, len(prompts), LOCAL_BATCH_SIZE):
+            batch = prompts[start:start + LOCAL_BATCH_SIZE]
+            prefix = PromptParts(batch[0].system, batch[0].prefix, '').text
+            if any(PromptParts(prompt.system, prompt.prefix, '').text != prefix for prompt in batch):
+                # Prompts behind different prefixes cannot share a cache; score them separately
+                for prompt in batch:
+                    answers.extend(self.score([prompt]))
+                continue
+
+            cached = self._prefix(prefix) if prefix else False
+            encoded = self.tokenizer([prompt.question for prompt in batch], add_special_tokens=not prefix,
+                                     padding=True, return_tensors='pt')
+            attention_mask = encoded.attention_mask
+            inputs: Dict[str, Any] = {'input_ids': encoded.input_ids}
+            if prefix:
+                inputs['past_key_values'] = self._repeat_prefix(len(batch))
+                attention_mask = torch.cat([torch.ones(len(batch), self._prefix_length, dtype=attention_mask.dtype), attention_mask], dim=1)
+            with torch.no_grad():
+                logits = self.model(**inputs, attention_mask=attention_mask, use_cache=bool(prefix)).logits
+
+            lengths = encoded.attention_mask.sum(dim=1)
+            last_logits = logits[torch.arange(len(batch)), lengths - 1].float().numpy()
+            prefix_length = self._prefix_length if prefix else 0
+            for position, length in enumerate(lengths.tolist()):
+                # Only the first question behind a new prefix pays for evaluating it
+                reused = prefix_length if cached or position > 0 else 0
+                answers.append((choose_letter(last_logits[position], self.letter_ids), prefix_length + length, 1, reused))
+        return answers
+
+class GGUFModel(LocalModel):
+    """
+    A GGUF model run with llama.cpp.
+
+    llama-cpp-python evaluates one sequence at a time, so questions are scored in turn;
+    each reuses the KV cache of the longest prefix it shares with the previous prompt.
+    """
+
+    def __init__(self, variant: str):
+        super().__init__(variant)
+        try:
+            from llama_cpp import Llama  # type: ignore
+        except ImportError as e:
+            raise ImportError("Local GGUF models require llama-cpp-python; install it with 'pip install llama-cpp-python'") from e
+        self.llm = Llama(model_path=variant, n_ctx=LOCAL_CONTEXT_LENGTH, n_threads=LOCAL_THREADS or None, verbose=False)
+        self.letter_ids = [sorted({self.llm.tokenize(text.encode('utf-8'), add_bos=False)[-1] for text in _letter_variants(letter)})
+                           for letter in VALID_ANSWERS]
+
+    def score(self, prompts: Sequence[PromptParts]) -> List[LocalAnswer]:
+        answers: List[LocalAnswer] = []
+        for prompt in prompts:
+            tokens = self.llm.tokenize(prompt.text.encode('utf-8'))
+            previous = list(self.llm.input_ids[:self.llm.n_tokens])
+            reused = 0
+            while reused < min(len(tokens) - 1, len(previous)) and tokens[reused] == previous[reused]:
+                reused += 1
+            # generate() evaluates only the tokens after the shared prefix; its first step leaves the
+            # last prompt position's logits in scores
+            generator = self.llm.generate(tokens, temp=0.0, reset=True)
+            next(generator)
+            logits = self.llm.scores[self.llm.n_tokens - 1]
+            generator.close()
+            answers.append((choose_letter(logits, self.letter_ids), len(tokens), 1, reused))
+        return answers
+
+_models: Dict[str, LocalModel] = {}
+_models_lock = threading.Lock()
+# Answers scored ahead of the questions being asked, by (variant, prompt)
+_prefetched: Dict[Tuple[str, PromptParts], LocalAnswer] = {}
+
+def load_local_model(variant: str) -> LocalModel:
+    """
+    Load a local model once per process.
+
+    Args:
+    variant (str): Path to a .gguf file, or a Hugging Face model id or folder
+
+    Returns:
+    LocalModel: The loaded model
+    """
+    with _models_lock:
+        if variant not in _models:
+            logger.info(f"Loading local model {variant}")
+            _models[variant] = GGUFModel(variant) if variant.lower().endswith('.gguf') else TransformersModel(variant)
+        return _models[variant]
+
+def prefetch_answers(variant: str, prompts: Sequence[PromptParts]) -> int:
+    """
+    Score many prompts in batches ahead of the questions being asked one by one.
+
+    query_local_model returns the stored answer for a prefetched prompt without running
+    the model again, so the benchmark loop is unchanged while the model sees whole batches.
+
+    Args:
+    variant (str): The local model
+    prompts (Sequence[PromptParts]): The prompts about to be asked
+
+    Returns:
+    int: Number of prompts scored
+    """
+    pending = list(dict.fromkeys(prompt for prompt in prompts if (variant, prompt) not in _prefetched))
+    if not pending:
+        return 0
+    model = load_local_model(variant)
+    with model.lock:
+        answers = model.score(pending)
+    for prompt, answer in zip(pending, answers):
+        _prefetched[(variant, prompt)] = answer
+    logger.debug(f"Prefetched {len(pending)} answers from {variant}")
+    return len(pending)
+
+def query_local_model(variant: str, prompt: PromptParts) -> LocalAnswer:
+    """
+    Answer one prompt with a local model, using a prefetched answer if there is one.
+
+    Args:
+    variant (str): The local model
+    prompt (PromptParts): The prompt
+
+    Returns:
+    LocalAnswer: (answer, prompt_tokens, completion_tokens, cached_tokens)
+    """
+    answer = _prefetched.pop((variant, prompt), None)
+    if answer is not None:
+        return answer
+    model = load_local_model(variant)
+    with model.lock:
+        return model.score([prompt])[0]
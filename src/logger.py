@@ -1,40 +1,147 @@
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import sys
 from datetime import datetime
+from typing import Any, Dict, Optional
 
-def setup_logger(base_folder):
-    # Get current date and time
-    today_date = datetime.today().strftime('%Y-%m-%d')
-    current_time = datetime.now().strftime('%H-%M')
+from src.constants import LOG_LEVEL, CONSOLE_LOG_LEVEL, MODULE_LOG_LEVELS
+
+# Attributes present on every LogRecord; anything else was passed via `extra`
+_STANDARD_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+# Shared state so repeated calls to setup_logger don't stack handlers
+_log_queue: Optional[queue.Queue] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Format log records as single-line JSON objects."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            'timestamp': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in _STANDARD_RECORD_ATTRS})
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class _NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that keeps structured fields and exception text for the writer thread."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        return record
+
+
+class _ConsoleHandler(logging.StreamHandler):
+    """Stream handler that always writes to the current sys.stderr."""
+
+    @property  # type: ignore[override]
+    def stream(self):
+        return sys.stderr
+
+    @stream.setter
+    def stream(self, value):
+        pass
 
-    # Set up folder
-    logs_folder = os.path.join(base_folder, 'Logs')
-    today_logs_folder = os.path.join(logs_folder, today_date)
-    if not os.path.exists(today_logs_folder):
-        os.makedirs(today_logs_folder)
 
-    # Create log file
-    log_file = os.path.join(today_logs_folder, f"run_{current_time}.log")
+def _parse_level(level: Any) -> int:
+    if isinstance(level, int):
+        return level
+    return logging.getLevelName(str(level).upper())
+
+
+def setup_logger(base_folder: str, level: Any = LOG_LEVEL, console_level: Any = CONSOLE_LOG_LEVEL,
+                 module_levels: Optional[Dict[str, Any]] = None) -> logging.Logger:
+    """
+    Configure the root logger with a queue-backed, non-blocking pipeline.
+
+    Records are put on an in-memory queue by the calling thread and written by a
+    background listener to a JSON-lines file and the console. Calling this again
+    only updates the levels; handlers are never added twice.
+
+    Args:
+    base_folder (str): Base folder path; logs are written to Logs/<date>/run_<time>.jsonl
+    level (Any): Level for the root logger
+    console_level (Any): Minimum level echoed to the console
+    module_levels (Optional[Dict[str, Any]]): Per-module logger levels, e.g. {'src.api_calls': 'WARNING'}
+
+    Returns:
+    logging.Logger: The configured root logger
+    """
+    global _log_queue, _listener
 
-    # Create and configure logger
     logger = logging.getLogger()
-    logger.setLevel(logging.INFO)
+    logger.setLevel(_parse_level(level))
+    for module_name, module_level in (MODULE_LOG_LEVELS if module_levels is None else module_levels).items():
+        logging.getLogger(module_name).setLevel(_parse_level(module_level))
+
+    if _listener is not None:
+        return logger
 
-    # Create handlers
+    # Set up folder
+    today_date = datetime.today().strftime('%Y-%m-%d')
+    current_time = datetime.now().strftime('%H-%M')
+    today_logs_folder = os.path.join(base_folder, 'Logs', today_date)
+    os.makedirs(today_logs_folder, exist_ok=True)
+    log_file = os.path.join(today_logs_folder, f"run_{current_time}.jsonl")
+
+    # Create handlers used by the background writer
     file_handler = logging.FileHandler(log_file)
-    console_handler = logging.StreamHandler()
+    file_handler.setFormatter(JsonLinesFormatter())
+    console_handler = _ConsoleHandler()
+    console_handler.setLevel(_parse_level(console_level))
+    console_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
 
-    # Create formatters and add it to handlers
-    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-    file_handler.setFormatter(formatter)
-    console_handler.setFormatter(formatter)
+    _log_queue = queue.Queue(-1)
+    _listener = logging.handlers.QueueListener(_log_queue, file_handler, console_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logger)
 
-    # Add handlers to the logger
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
+    logger.addHandler(_NonBlockingQueueHandler(_log_queue))
 
     return logger
 
+
+def flush_logs() -> None:
+    """Block until every queued log record has been written."""
+    if _log_queue is not None and _listener is not None:
+        _log_queue.join()
+
+
+def shutdown_logger() -> None:
+    """Stop the background writer, flushing any pending records."""
+    global _log_queue, _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, _NonBlockingQueueHandler):
+            root.removeHandler(handler)
+    for handler in _listener.handlers:
+        handler.close()
+    _log_queue = None
+    _listener = None
+
+
 # This function can be called to get a logger for any module
-def get_logger():
-    return logging.getLogger()
\ No newline at end of file
+def get_logger(name: Optional[str] = None) -> logging.Logger:
+    return logging.getLogger(name)
@@ -0,0 +1,277 @@
+import bisect
+from abc import ABC, abstractmethod
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Deque, Dict, List, Optional, Sequence, Tuple
+
+from src.logger import get_logger
+from src.constants import METRICS_HOST, METRICS_TEXTFILE_INTERVAL, METRICS_LATENCY_BUCKETS
+
+logger = get_logger(__name__)
+
+CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+LabelValues = Tuple[str, ...]
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class _Metric(ABC):
+    """Base class for labelled metrics; all updates are guarded by a lock."""
+
+    metric_type = 'unknown'
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, '')) for name in self.label_names)
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        """Exposition lines for every labelled value of this metric."""
+
+    def render(self) -> str:
+        lines = [f"# TYPE {self.name} {self.metric_type}", f"# HELP {self.name} {self.documentation}"]
+        lines.extend(self.samples())
+        return '\n'.join(lines)
+
+class Counter(_Metric):
+    """Monotonically increasing value, exposed with a `_total` suffix."""
+
+    metric_type = 'counter'
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        if amount < 0:
+            raise ValueError("Counters can only be incremented by non-negative amounts")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}_total{_format_labels(self.label_names, key)} {_format_value(value)}" for key, value in items]
+
+class Gauge(_Metric):
+    """Value that can go up and down, such as requests in flight."""
+
+    metric_type = 'gauge'
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}" for key, value in items]
+
+class Histogram(_Metric):
+    """Cumulative bucketed observations, e.g. request latency in seconds."""
+
+    metric_type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (), buckets: Sequence[float] = METRICS_LATENCY_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = sorted(float(bucket) for bucket in buckets)
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * (len(self.buckets) + 1))
+            counts[index] += 1
+            self._sums[key] = self._sums.get(key, 0.0) + value
+
+    def count(self, **labels: str) -> int:
+        with self._lock:
+            return sum(self._counts.get(self._key(labels), []))
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, list(counts), self._sums[key]) for key, counts in self._counts.items())
+        lines = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + [float('inf')], counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, ('le', _format_value(bound)))} {cumulative}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_value(total)}")
+        return lines
+
+class ThroughputGauge(Gauge):
+    """Gauge reporting events per second over a sliding window."""
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (), window: float = 60.0):
+        super().__init__(name, documentation, label_names)
+        self.window = window
+        self._events: Dict[LabelValues, Deque[float]] = {}
+
+    def mark(self, **labels: str) -> None:
+        key = self._key(labels)
+        now = time.monotonic()
+        with self._lock:
+            self._events.setdefault(key, deque()).append(now)
+
+    def samples(self) -> List[str]:
+        now = time.monotonic()
+        with self._lock:
+            for key, events in self._events.items():
+                while events and now - events[0] > self.window:
+                    events.popleft()
+                self._values[key] = len(events) / self.window
+        return super().samples()
+
+class MetricsRegistry:
+    """Collection of metrics rendered together in OpenMetrics text format."""
+
+    def __init__(self) -> None:
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return '\n'.join(metric.render() for metric in self._metrics) + '\n# EOF\n'
+
+REGISTRY = MetricsRegistry()
+
+REQUESTS_IN_FLIGHT = REGISTRY.register(Gauge(
+    'benchmark_requests_in_flight', "API requests currently awaiting a response.", ['provider', 'model']))
+REQUEST_LATENCY = REGISTRY.register(Histogram(
+    'benchmark_request_latency_seconds', "Latency of individual API requests.", ['provider', 'model']))
+RATE_LIMITED_RESPONSES = REGISTRY.register(Counter(
+    'benchmark_rate_limited_responses', "API responses rejected with HTTP 429.", ['provider', 'model']))
+QUESTIONS_ANSWERED = REGISTRY.register(Counter(
+    'benchmark_questions_answered', "Questions answered with a valid choice.", ['provider', 'model']))
+QUESTIONS_PER_SECOND = REGISTRY.register(ThroughputGauge(
+    'benchmark_questions_per_second', "Questions answered per second over the last minute.", ['provider', 'model']))
+INVALID_ANSWERS = REGISTRY.register(Counter(
+    'benchmark_invalid_answers', "Responses that did not contain a valid choice.", ['provider', 'model']))
+ACCUMULATED_COST = REGISTRY.register(Counter(
+    'benchmark_cost_dollars', "Accumulated API spend in US dollars.", ['provider', 'model']))
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Return True if an SDK exception represents an HTTP 429 response."""
+    status = getattr(error, 'status_code', None) or getattr(error, 'code', None) or getattr(error, 'status', None)
+    if status == 429 or str(status) == '429':
+        return True
+    return 'RateLimit' in type(error).__name__ or 'ResourceExhausted' in type(error).__name__
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    registry: MetricsRegistry = REGISTRY
+
+    def do_GET(self) -> None:
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        logger.debug(f"Metrics request: {format % args}")
+
+def write_textfile(path: str, registry: MetricsRegistry = REGISTRY) -> None:
+    """Atomically write the current metrics to a textfile for collector scraping."""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w') as metrics_file:
+        metrics_file.write(registry.render())
+    os.replace(temp_path, path)
+
+class MetricsExporter:
+    """Serve metrics over HTTP and/or periodically write them to a textfile."""
+
+    def __init__(self, port: Optional[int] = None, textfile: Optional[str] = None, host: str = METRICS_HOST,
+                 interval: float = METRICS_TEXTFILE_INTERVAL, registry: MetricsRegistry = REGISTRY):
+        self.port = port
+        self.textfile = textfile
+        self.host = host
+        self.interval = interval
+        self.registry = registry
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._stop_event = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> 'MetricsExporter':
+        if self.port is not None:
+            handler = type('MetricsRequestHandler', (_MetricsRequestHandler,), {'registry': self.registry})
+            self._server = ThreadingHTTPServer((self.host, self.port), handler)
+            self.port = self._server.server_address[1]
+            self._threads.append(threading.Thread(target=self._server.serve_forever, name='metrics-http', daemon=True))
+            logger.info(f"Serving metrics on http://{self.host}:{self.port}/metrics")
+        if self.textfile is not None:
+            self._threads.append(threading.Thread(target=self._write_periodically, name='metrics-textfile', daemon=True))
+            logger.info(f"Writing metrics to {self.textfile} every {self.interval}s")
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def _write_periodically(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            self._write_textfile()
+
+    def _write_textfile(self) -> None:
+        try:
+            write_textfile(self.textfile, self.registry)  # type: ignore[arg-type]
+        except OSError as e:
+            logger.warning(f"Failed to write metrics textfile {self.textfile}: {e}")
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        if self.textfile is not None:
+            self._write_textfile()
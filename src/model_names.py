@@ -0,0 +1,137 @@
+import re
+from functools import lru_cache
+from typing import Tuple
+
+from src.constants import MODEL_REGISTRY
+
+# Substrings that identify a model's provider in legacy names, checked in order
+PROVIDER_KEYWORDS = (
+    ('claude', 'Anthropic'),
+    ('gpt', 'OpenAI'),
+    ('gemini', 'Google'),
+    ('llama', 'Meta'),
+    ('mistral', 'Mistral'),
+)
+
+EIGHT_DIGIT_DATE = re.compile(r'\d{8}')
+DATE = re.compile(r'\d{4}[-/]?\d{2}[-/]?\d{2}')
+SPACED_VERSION = re.compile(r'(\d) (\d)')
+TRAILING_NUMBER = re.compile(r'-\d+$')
+OMNI_SUFFIX = re.compile(r'(\d)O')
+REPEATED_HYPHENS = re.compile(r'-+')
+WORD_START = re.compile(r'(\b[a-z])')
+GEMINI_TYPE = re.compile(r'-(Pro|Flash)$')
+LLAMA_VERSION_SIZE = re.compile(r'Llama[-\s]*(\d+(?:\.\d+)?)[-\s]*(\d+)[bB]', re.IGNORECASE)
+META_PREFIX = re.compile(r'Meta-?')
+INSTRUCT_SUFFIX = re.compile(r'Instruct.*')
+CHAT_SUFFIX = re.compile(r'chat.*', re.IGNORECASE)
+SEPARATORS = re.compile(r'[-\s]+')
+HF_SUFFIX = re.compile(r'-hf$', re.IGNORECASE)
+MISTRAL_SUFFIX = re.compile(r'(Instruct|latest).*', re.IGNORECASE)
+MIXTURE_SIZE = re.compile(r'X(\d)')
+
+@lru_cache(maxsize=None)
+def determine_provider(model_name: str) -> str:
+    """Guess the provider of a model from its name; used only for models the registry doesn't know."""
+    model_name_lower = model_name.lower()
+    for keyword, provider in PROVIDER_KEYWORDS:
+        if keyword in model_name_lower:
+            return provider
+    return 'Unknown'
+
+@lru_cache(maxsize=None)
+def clean_model_name(model_name: str, provider: str) -> str:
+    """Turn a legacy model identifier into a display name; used only for models the registry doesn't know."""
+    if provider == 'Anthropic':
+        # Remove date-like strings
+        model_name = EIGHT_DIGIT_DATE.sub('', model_name)
+        # Replace hyphens with spaces
+        model_name = model_name.replace('-', ' ')
+        # Format numbers correctly
+        model_name = SPACED_VERSION.sub(r'\1.\2', model_name)
+        # Capitalize and format with a space after the model number
+        model_name_parts = model_name.split()
+        model_name = f"{model_name_parts[0].title()}-{model_name_parts[1]} {model_name_parts[2].title()}"
+    elif provider == 'OpenAI':
+        # Remove date-like strings and trailing segments
+        model_name = DATE.sub('', model_name)
+        model_name = TRAILING_NUMBER.sub('', model_name)
+        # Add hyphen after GPT, lowercase the "o", and remove trailing hyphens
+        model_name = model_name.upper().replace(' ', '').replace('GPT', 'GPT-')
+        model_name = OMNI_SUFFIX.sub(r'\1o', model_name)
+        model_name = REPEATED_HYPHENS.sub('-', model_name).rstrip('-')
+        # Capitalize Turbo correctly and replace hyphen with space
+        model_name = model_name.replace('TURBO', 'Turbo')
+        model_name = model_name.replace('-Turbo', ' Turbo')
+        # Capitalize Mini correctly and replace hyphen with space
+        model_name = model_name.replace('MINI', 'Mini')
+        model_name = model_name.replace('-Mini', ' Mini')
+    elif provider == 'Google':
+        # Remove date-like strings if any
+        model_name = DATE.sub('', model_name)
+        # Add hyphen after Gemini
+        model_name = model_name.replace('Gemini', 'Gemini-')
+        # Capitalize first letter of each word and format correctly
+        model_name = WORD_START.sub(lambda x: x.group().upper(), model_name)
+        # Remove last hyphen before type
+        model_name = GEMINI_TYPE.sub(r' \1', model_name)
+    elif provider == 'Meta':
+        # Remove everything before the forward slash
+        model_name = model_name.split('/')[-1]
+        # Remove date-like strings and trailing segments
+        model_name = DATE.sub('', model_name)
+        # Try to match both Llama-3.1 and Llama-2 style names
+        match = LLAMA_VERSION_SIZE.search(model_name)
+        if match:
+            version, size = match.groups()
+            # Remove trailing .0 if present
+            version = version.rstrip('.0')
+            model_name = f"Llama-{version} {size}B"
+        else:
+            # If pattern not found, just clean up the name
+            model_name = META_PREFIX.sub('', model_name)
+            model_name = INSTRUCT_SUFFIX.sub('', model_name)
+            model_name = CHAT_SUFFIX.sub('', model_name)
+            model_name = SEPARATORS.sub('-', model_name).strip('-')
+        # Remove -hf suffix if present
+        model_name = HF_SUFFIX.sub('', model_name)
+    elif provider == 'Mistral':
+        # Remove everything before the forward slash
+        model_name = model_name.split('/')[-1]
+        # Remove "Instruct", "latest", and anything after
+        model_name = MISTRAL_SUFFIX.sub('', model_name)
+        # Convert "X" to lowercase
+        model_name = MIXTURE_SIZE.sub(r'x\1', model_name)
+        # Remove hyphens and extra spaces
+        model_name = SEPARATORS.sub(' ', model_name).strip()
+        # Capitalize properly
+        model_name = ' '.join(word.capitalize() for word in model_name.split())
+    else:
+        # Generic cleanup
+        model_name = model_name.replace('-', ' ')
+
+    return model_name
+
+@lru_cache(maxsize=None)
+def resolve_display_name(model: str) -> Tuple[str, str]:
+    """
+    Get the display name and provider of a model.
+
+    Models in the registry use their configured name and provider; anything else (models
+    removed from config.yaml, legacy table names) falls back to the name heuristics.
+
+    Args:
+    model (str): Model variant or name
+
+    Returns:
+    Tuple[str, str]: (display name, provider)
+    """
+    model_info = MODEL_REGISTRY.by_variant.get(model) or MODEL_REGISTRY.get(model)
+    if model_info is not None:
+        return model_info['name'], model_info.get('display_provider', model_info['provider'])
+    provider = determine_provider(model)
+    try:
+        return clean_model_name(model, provider), provider
+    except IndexError:
+        # Names too short for the provider's pattern are shown as stored
+        return model, provider
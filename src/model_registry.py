@@ -0,0 +1,146 @@
+import ast
+import operator
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, TypedDict, Union
+
+# Operators allowed in price expressions such as "2.5 / 1000000"
+_BINARY_OPERATORS: Dict[type, Callable[[Any, Any], Any]] = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+}
+_UNARY_OPERATORS: Dict[type, Callable[[Any], Any]] = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+class _ModelInfoRequired(TypedDict):
+    name: str
+    variant: str
+    provider: str
+    prompt: float
+    completion: float
+
+class ModelInfo(_ModelInfoRequired, total=False):
+    expected_completion_tokens: int
+    cached_prompt: float  # price of prompt tokens read from the provider's prompt cache
+    cache_write_prompt: float  # price of prompt tokens written to the provider's prompt cache
+    display_provider: str  # provider shown in reports when `provider` is an API route, e.g. MistralM
+
+def parse_price(expression: Union[str, int, float]) -> float:
+    """
+    Evaluate an arithmetic price expression without eval.
+
+    Only numbers, parentheses and + - * / are accepted.
+
+    Args:
+    expression (Union[str, int, float]): Price expression, e.g. "2.5 / 1000000"
+
+    Returns:
+    float: The evaluated price
+    """
+    if isinstance(expression, (int, float)) and not isinstance(expression, bool):
+        return expression
+
+    def _evaluate(node: ast.AST) -> Any:
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+            return node.value
+        if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+            return _BINARY_OPERATORS[type(node.op)](_evaluate(node.left), _evaluate(node.right))
+        if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPERATORS:
+            return _UNARY_OPERATORS[type(node.op)](_evaluate(node.operand))
+        raise ValueError(f"Unsupported element in price expression: {ast.dump(node)}")
+
+    try:
+        tree = ast.parse(str(expression).strip(), mode='eval')
+        return _evaluate(tree.body)
+    except (SyntaxError, ZeroDivisionError) as e:
+        raise ValueError(f"Invalid price expression {expression!r}: {e}")
+
+def validate_model(entry: Mapping[str, Any]) -> ModelInfo:
+    """
+    Validate a model definition from config.yaml and parse its prices.
+
+    Args:
+    entry (Mapping[str, Any]): Raw model definition
+
+    Returns:
+    ModelInfo: A new model dictionary with numeric prices; the entry is not modified
+    """
+    label = entry.get('name', entry) if isinstance(entry, Mapping) else entry
+    if not isinstance(entry, Mapping):
+        raise ValueError(f"Invalid model definition {label!r}: expected a mapping")
+    for key in ('name', 'variant', 'provider'):
+        if not isinstance(entry.get(key), str) or not entry[key].strip():
+            raise ValueError(f"Invalid model definition {label!r}: '{key}' must be a non-empty string")
+
+    model: Dict[str, Any] = dict(entry)
+    for key in ('prompt', 'completion'):
+        if key not in entry:
+            raise ValueError(f"Invalid model definition {label!r}: missing '{key}' price")
+        try:
+            model[key] = parse_price(entry[key])
+        except ValueError as e:
+            raise ValueError(f"Invalid model definition {label!r}: {e}")
+        if model[key] < 0:
+            raise ValueError(f"Invalid model definition {label!r}: '{key}' price is negative")
+    for key in ('cached_prompt', 'cache_write_prompt'):
+        if key not in entry:
+            continue
+        try:
+            model[key] = parse_price(entry[key])
+        except ValueError as e:
+            raise ValueError(f"Invalid model definition {label!r}: {e}")
+        if model[key] < 0:
+            raise ValueError(f"Invalid model definition {label!r}: '{key}' price is negative")
+
+    display_provider = entry.get('display_provider')
+    if display_provider is not None and (not isinstance(display_provider, str) or not display_provider.strip()):
+        raise ValueError(f"Invalid model definition {label!r}: 'display_provider' must be a non-empty string")
+
+    expected = entry.get('expected_completion_tokens')
+    if expected is not None and (not isinstance(expected, int) or isinstance(expected, bool) or expected <= 0):
+        raise ValueError(f"Invalid model definition {label!r}: 'expected_completion_tokens' must be a positive integer")
+    return model  # type: ignore[return-value]
+
+class ModelRegistry:
+    """
+    Validated models indexed by name, variant and provider.
+
+    `models` keeps the configuration order, which is the order models are run and shown in.
+    """
+
+    def __init__(self, entries: Iterable[Mapping[str, Any]]):
+        self.models: List[ModelInfo] = []
+        self.by_name: Dict[str, ModelInfo] = {}
+        self.by_variant: Dict[str, ModelInfo] = {}
+        self.by_provider: Dict[str, List[ModelInfo]] = {}
+        self._positions: Dict[str, int] = {}
+        for entry in entries:
+            model = validate_model(entry)
+            if model['name'] in self.by_name:
+                raise ValueError(f"Duplicate model name {model['name']!r}")
+            if model['variant'] in self.by_variant:
+                raise ValueError(f"Duplicate model variant {model['variant']!r}")
+            self._positions[model['name']] = len(self.models)
+            self.models.append(model)
+            self.by_name[model['name']] = model
+            self.by_variant[model['variant']] = model
+            self.by_provider.setdefault(model['provider'], []).append(model)
+
+    def __len__(self) -> int:
+        return len(self.models)
+
+    def __iter__(self) -> Iterator[ModelInfo]:
+        return iter(self.models)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self.by_name
+
+    def get(self, name: str) -> Optional[ModelInfo]:
+        return self.by_name.get(name)
+
+    def select(self, names: Iterable[str]) -> List[ModelInfo]:
+        """Return the known models among `names`, in configuration order."""
+        known = {name for name in names if name in self.by_name}
+        return [self.by_name[name] for name in sorted(known, key=self._positions.__getitem__)]
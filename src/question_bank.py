@@ -0,0 +1,201 @@
+import hashlib
+import json
+import os
+import sqlite3
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence, Set
+
+from src.lazy import lazy_import
+from src.logger import get_logger
+from src.constants import DATABASE_PATH
+from src.data_processing import question_version
+
+pd = lazy_import('pandas')
+
+logger = get_logger(__name__)
+
+QUESTIONS_TABLE = 'questions'
+INDEXED_COLUMNS = ('Category', 'Discipline')
+CHUNK_SIZE = 1000
+
+class IngestReport(NamedTuple):
+    inserted: int
+    updated: int
+    unchanged: int
+    removed: int
+    missing: int  # questions in the database but not in the source, kept unless pruning
+
+def sanitize_question_column(column: str) -> str:
+    return str(column).strip().replace(' ', '_').replace('-', '_')
+
+def _normalize(value: Any) -> Optional[str]:
+    # Empty cells become NULL rather than the string 'nan'; everything else is stored as text,
+    # so the same sheet hashes identically whether it was read from CSV or Excel
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    text = str(value).strip()
+    return text or None
+
+def _read_csv(path: str, chunk_size: int) -> Iterator[List[Dict[str, Optional[str]]]]:
+    for chunk in pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=chunk_size):
+        chunk.columns = [sanitize_question_column(column) for column in chunk.columns]
+        yield [{column: _normalize(value) for column, value in row.items()} for row in chunk.to_dict('records')]
+
+def _read_excel(path: str, chunk_size: int) -> Iterator[List[Dict[str, Optional[str]]]]:
+    try:
+        import openpyxl  # type: ignore
+    except ImportError as e:
+        raise ImportError("Reading Excel question banks requires openpyxl; install it with 'pip install openpyxl' or export the sheet to CSV") from e
+
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        # Keep each name's position, so a blank header cell does not shift the columns after it
+        columns = [(i, sanitize_question_column(column)) for i, column in enumerate(header) if column is not None]
+        chunk: List[Dict[str, Optional[str]]] = []
+        for values in rows:
+            if all(value is None for value in values):
+                continue
+            chunk.append({column: _normalize(values[i]) if i < len(values) else None for i, column in columns})
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    finally:
+        workbook.close()
+
+def read_question_chunks(path: str, chunk_size: int = CHUNK_SIZE) -> Iterator[List[Dict[str, Optional[str]]]]:
+    """
+    Stream questions from a CSV or Excel file in chunks of rows.
+
+    Args:
+    path (str): Path to a .csv, .xlsx or .xlsm file
+    chunk_size (int): Rows per chunk
+
+    Yields:
+    List[Dict[str, Optional[str]]]: Rows keyed by sanitized column name
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Question file not found at path: {path}")
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return _read_csv(path, chunk_size)
+    if extension in ('.xlsx', '.xlsm'):
+        return _read_excel(path, chunk_size)
+    raise ValueError(f"Unsupported question file '{path}', expected .csv or .xlsx")
+
+def content_hash(row: Dict[str, Optional[str]], columns: Sequence[str]) -> str:
+    """Hash the given columns of a question row."""
+    payload = json.dumps([[column, row.get(column)] for column in sorted(columns)], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+def _table_columns(conn: sqlite3.Connection) -> List[str]:
+    return [info[1] for info in conn.execute(f"PRAGMA table_info({QUESTIONS_TABLE})")]
+
+def ensure_questions_table(conn: sqlite3.Connection, columns: Sequence[str]) -> None:
+    """Create or extend the questions table, with a unique Question_Code and indexes on the filter columns."""
+    existing = _table_columns(conn)
+    if not existing:
+        conn.execute(f"CREATE TABLE {QUESTIONS_TABLE} (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                     f"{', '.join(f'{_quote(column)} TEXT' for column in columns)}, Content_Hash TEXT, Question_Version TEXT)")
+    else:
+        for column in list(columns) + ['Content_Hash', 'Question_Version']:
+            if column not in existing:
+                conn.execute(f"ALTER TABLE {QUESTIONS_TABLE} ADD COLUMN {_quote(column)} TEXT")
+
+    duplicates = conn.execute(f"SELECT Question_Code FROM {QUESTIONS_TABLE} GROUP BY Question_Code HAVING COUNT(*) > 1 LIMIT 5").fetchall()
+    if duplicates:
+        raise ValueError(f"The questions table has duplicate question codes ({', '.join(str(row[0]) for row in duplicates)}); remove them before ingesting")
+    conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_questions_code ON {QUESTIONS_TABLE} (Question_Code)")
+    for column in INDEXED_COLUMNS:
+        if column in columns or column in existing:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_questions_{column.lower()} ON {QUESTIONS_TABLE} ({_quote(column)})")
+
+def ingest_questions(source_path: str, db_path: str = DATABASE_PATH, chunk_size: int = CHUNK_SIZE, prune: bool = False) -> IngestReport:
+    """
+    Load a question bank into the questions table, rewriting only questions that changed.
+
+    Rows are streamed from the file and upserted by Question_Code with executemany in a
+    single transaction. Each row stores a hash of its content; rows whose hash matches
+    the stored one are skipped. Question_Version records the version results are
+    checked against (see data_processing.question_version).
+
+    Args:
+    source_path (str): CSV or Excel file with a Question_Code column
+    db_path (str): Path to the database
+    chunk_size (int): Rows read and written per batch
+    prune (bool): Delete questions that are no longer in the file
+
+    Returns:
+    IngestReport: What changed
+    """
+    chunks = read_question_chunks(source_path, chunk_size)
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            inserted = updated = unchanged = removed = 0
+            stored: Optional[Dict[str, Optional[str]]] = None
+            seen: Set[str] = set()
+            for chunk in chunks:
+                if not chunk:
+                    continue
+                columns = list(chunk[0])
+                if 'Question_Code' not in columns:
+                    raise ValueError(f"{source_path} has no Question_Code column")
+                if stored is None:
+                    ensure_questions_table(conn, columns)
+                    # Rows without a version predate versioning and are rewritten once to add it
+                    stored = dict(conn.execute(f"SELECT Question_Code, CASE WHEN Question_Version IS NULL THEN NULL ELSE Content_Hash END "
+                                               f"FROM {QUESTIONS_TABLE}").fetchall())
+
+                changed = []
+                for row in chunk:
+                    code = row['Question_Code']
+                    if code is None:
+                        raise ValueError(f"{source_path} has a row without a Question_Code")
+                    if code in seen:
+                        raise ValueError(f"{source_path} has duplicate Question_Code {code}")
+                    seen.add(code)
+                    row_hash = content_hash(row, columns)
+                    if code not in stored:
+                        inserted += 1
+                    elif stored[code] != row_hash:
+                        updated += 1
+                    else:
+                        unchanged += 1
+                        continue
+                    changed.append([row.get(column) for column in columns] + [row_hash, question_version(row)])
+
+                if changed:
+                    names = columns + ['Content_Hash', 'Question_Version']
+                    updates = ', '.join(f"{_quote(name)} = excluded.{_quote(name)}" for name in names if name != 'Question_Code')
+                    conn.executemany(
+                        f"INSERT INTO {QUESTIONS_TABLE} ({', '.join(_quote(name) for name in names)}) VALUES ({', '.join('?' for _ in names)}) "
+                        f"ON CONFLICT (Question_Code) DO UPDATE SET {updates}",
+                        changed
+                    )
+
+            if stored is None:
+                raise ValueError(f"{source_path} contains no questions")
+            missing = [code for code in stored if code not in seen]
+            if prune and missing:
+                conn.executemany(f"DELETE FROM {QUESTIONS_TABLE} WHERE Question_Code = ?", [(code,) for code in missing])
+                removed = len(missing)
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+
+    report = IngestReport(inserted, updated, unchanged, removed, len(missing) - removed)
+    logger.info(f"Ingested {source_path}: {report.inserted} new, {report.updated} updated, {report.unchanged} unchanged, "
+                f"{report.removed} removed, {report.missing} not in the file")
+    return report
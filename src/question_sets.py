@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+import warnings
+from datetime import datetime
+from typing import List, NamedTuple
+
+from src.lazy import lazy_import
+from src.logger import get_logger
+from src.constants import DATABASE_PATH
+from src.analysis import CorrectnessMatrix
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+logger = get_logger(__name__)
+
+QUESTION_SETS_TABLE = 'question_sets'
+STATISTICS_COLUMNS = ['Question_Code', 'Category', 'Runs', 'Difficulty', 'Discrimination']
+# Subsets grow by this share of each category until the ranking is preserved
+FRACTION_STEP = 0.05
+
+class CoreSubset(NamedTuple):
+    question_codes: List[str]
+    fraction: float  # share of each category's questions kept
+    kendall_tau: float  # agreement of the subset ranking of runs with the full ranking
+    statistics: pd.DataFrame  # statistics of the selected questions
+
+def question_statistics(matrix: CorrectnessMatrix) -> pd.DataFrame:
+    """
+    Per-question difficulty and discrimination across stored runs.
+
+    Difficulty is the share of runs answering incorrectly. Discrimination is the item-rest
+    correlation: how well a question's score predicts a run's accuracy on the other
+    questions it answered. Questions every run answers the same way discriminate nothing
+    and get 0.
+
+    Args:
+    matrix (CorrectnessMatrix): Runs and their per-question scores
+
+    Returns:
+    pd.DataFrame: One row per question with STATISTICS_COLUMNS
+    """
+    scores = matrix.scores
+    asked = ~np.isnan(scores)
+    runs = asked.sum(axis=0)
+    totals = np.nansum(scores, axis=1, keepdims=True)
+    counts = asked.sum(axis=1, keepdims=True)
+    # Questions no run answered have empty means; their NaN statistics are expected
+    with np.errstate(invalid='ignore', divide='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        rest = np.where(asked & (counts > 1), (totals - np.nan_to_num(scores)) / (counts - 1), np.nan)
+        scores = np.where(np.isnan(rest), np.nan, scores)
+        score_mean = np.nanmean(scores, axis=0)
+        rest_mean = np.nanmean(rest, axis=0)
+        covariance = np.nanmean((scores - score_mean) * (rest - rest_mean), axis=0)
+        spread = np.nanstd(scores, axis=0) * np.nanstd(rest, axis=0)
+        discrimination = np.where(spread > 0, covariance / np.where(spread > 0, spread, 1), 0.0)
+        difficulty = 1 - np.nanmean(matrix.scores, axis=0)
+
+    return pd.DataFrame({
+        'Question_Code': matrix.question_codes,
+        'Category': matrix.categories,
+        'Runs': runs,
+        'Difficulty': difficulty,
+        'Discrimination': discrimination,
+    })
+
+def run_accuracies(scores: np.ndarray) -> np.ndarray:
+    """Mean score of each run over the questions it answered, NaN for runs that answered none."""
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return np.nanmean(scores, axis=1) if scores.shape[1] else np.full(scores.shape[0], np.nan)
+
+def kendall_tau(first: np.ndarray, second: np.ndarray) -> float:
+    """Kendall's tau-b between two rankings, ignoring entries missing from either."""
+    valid = ~(np.isnan(first) | np.isnan(second))
+    first, second = first[valid], second[valid]
+    if len(first) < 2:
+        return 1.0
+    upper = np.triu_indices(len(first), k=1)
+    first_order = np.sign(first[:, None] - first[None, :])[upper]
+    second_order = np.sign(second[:, None] - second[None, :])[upper]
+    denominator = np.sqrt(np.count_nonzero(first_order) * np.count_nonzero(second_order))
+    if denominator == 0:
+        return 1.0 if not first_order.any() and not second_order.any() else 0.0
+    return float((first_order * second_order).sum() / denominator)
+
+def select_core_subset(matrix: CorrectnessMatrix, fraction: float = 0.3, min_tau: float = 0.9, min_runs: int = 2) -> CoreSubset:
+    """
+    Propose a smaller, category-balanced question subset that preserves the ranking of runs.
+
+    Each category keeps the same share of its questions, choosing the most discriminating
+    ones. The share grows by FRACTION_STEP until Kendall's tau between run accuracies on
+    the subset and on all questions reaches min_tau.
+
+    Args:
+    matrix (CorrectnessMatrix): Runs and their per-question scores
+    fraction (float): Share of each category to start from
+    min_tau (float): Ranking agreement the subset must reach, between -1 and 1
+    min_runs (int): Questions answered by fewer runs are ranked last
+
+    Returns:
+    CoreSubset: The selected questions, the share kept and the ranking agreement reached
+    """
+    if len(matrix.runs) < 2:
+        raise ValueError("At least two runs are needed to compare rankings")
+    statistics = question_statistics(matrix)
+    full_accuracy = run_accuracies(matrix.scores)
+
+    # Within each category, order questions by discrimination; rarely asked questions go last
+    order = statistics.assign(Reliable=statistics['Runs'] >= min_runs).sort_values(
+        ['Category', 'Reliable', 'Discrimination', 'Question_Code'], ascending=[True, False, False, True], kind='stable')
+    order['Rank'] = order.groupby('Category').cumcount()
+    category_sizes = order.groupby('Category')['Question_Code'].transform('size')
+
+    fraction = min(max(fraction, FRACTION_STEP), 1.0)
+    while True:
+        # Every category keeps at least one question
+        selected = order[order['Rank'] < np.maximum(1, np.ceil(category_sizes * fraction - 1e-9))]
+        columns = selected.index.to_numpy()
+        tau = kendall_tau(full_accuracy, run_accuracies(matrix.scores[:, columns]))
+        if tau >= min_tau or fraction >= 1.0:
+            break
+        fraction = min(1.0, fraction + FRACTION_STEP)
+
+    logger.info(f"Core subset keeps {len(selected)} of {len(statistics)} questions ({fraction:.0%} per category), Kendall tau {tau:.3f}")
+    return CoreSubset(list(selected['Question_Code']), fraction, tau, selected[STATISTICS_COLUMNS].reset_index(drop=True))
+
+def save_question_set(name: str, statistics: pd.DataFrame, db_path: str = DATABASE_PATH) -> None:
+    """
+    Store a named question set, replacing any set with the same name.
+
+    Args:
+    name (str): Name of the set, used with run_benchmark --question-set
+    statistics (pd.DataFrame): The set's questions, with STATISTICS_COLUMNS
+    db_path (str): Path to the database holding the questions table
+    """
+    rows = [(name, row.Question_Code, row.Category, row.Difficulty, row.Discrimination, datetime.now().isoformat(timespec='seconds'))
+            for row in statistics.itertuples(index=False)]
+    conn = sqlite3.connect(db_path)
+    try:
+        with conn:
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {QUESTION_SETS_TABLE} (Name TEXT, Question_Code TEXT, Category TEXT, "
+                         f"Difficulty REAL, Discrimination REAL, Created TEXT, PRIMARY KEY (Name, Question_Code))")
+            conn.execute(f"DELETE FROM {QUESTION_SETS_TABLE} WHERE Name = ?", (name,))
+            conn.executemany(f"INSERT INTO {QUESTION_SETS_TABLE} VALUES (?, ?, ?, ?, ?, ?)", rows)
+    finally:
+        conn.close()
+    logger.info(f"Saved question set '{name}' with {len(rows)} questions")
+
+def load_question_set(name: str, db_path: str = DATABASE_PATH) -> List[str]:
+    """
+    Get the question codes of a named question set.
+
+    Args:
+    name (str): Name of the set
+    db_path (str): Path to the database holding the questions table
+
+    Returns:
+    List[str]: The set's question codes
+    """
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(f"Database file not found at path: {db_path}")
+    conn = sqlite3.connect(db_path)
+    try:
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (QUESTION_SETS_TABLE,)).fetchone() is None:
+            codes = []
+        else:
+            codes = [row[0] for row in conn.execute(f"SELECT Question_Code FROM {QUESTION_SETS_TABLE} WHERE Name = ? ORDER BY Question_Code", (name,))]
+    finally:
+        conn.close()
+    if not codes:
+        raise ValueError(f"Unknown question set '{name}'")
+    return codes
+
+def list_question_sets(db_path: str = DATABASE_PATH) -> pd.DataFrame:
+    """List the stored question sets with their size and creation time."""
+    conn = sqlite3.connect(db_path)
+    try:
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (QUESTION_SETS_TABLE,)).fetchone() is None:
+            return pd.DataFrame(columns=['Name', 'Questions', 'Created'])
+        return pd.read_sql_query(f"SELECT Name, COUNT(*) AS Questions, MAX(Created) AS Created FROM {QUESTION_SETS_TABLE} GROUP BY Name ORDER BY Name", conn)
+    finally:
+        conn.close()
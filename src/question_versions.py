@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import sqlite3
+from typing import Iterable, List, Mapping, Tuple
+
+from src.lazy import lazy_import
+from src.logger import get_logger
+from src.constants import DATABASE_PATH
+from src.data_processing import load_table_catalog
+from src.database_merge import recompute_round_summaries
+
+pd = lazy_import('pandas')
+
+logger = get_logger(__name__)
+
+STALE_COLUMNS = ['Table_Name', 'Model', 'Date', 'Round', 'Question_Code', 'Question_Version', 'Current_Version']
+
+def stage_question_versions(conn: sqlite3.Connection, versions: Mapping[str, str]) -> None:
+    """Load the current question versions into temp.current_versions for SQL filtering."""
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS current_versions (Question_Code TEXT PRIMARY KEY, Question_Version TEXT)")
+    conn.execute("DELETE FROM temp.current_versions")
+    conn.executemany("INSERT INTO temp.current_versions (Question_Code, Question_Version) VALUES (?, ?)", list(versions.items()))
+
+def find_stale_results(versions: Mapping[str, str], db_path: str = DATABASE_PATH) -> pd.DataFrame:
+    """
+    Find results answered against an older version of a question.
+
+    Results stored without a version (before versioning) are assumed current.
+
+    Args:
+    versions (Mapping[str, str]): Current version of each question code
+    db_path (str): Path to the results database
+
+    Returns:
+    pd.DataFrame: One row per stale answer, with the stored and current versions
+    """
+    catalog = load_table_catalog(db_path)
+    rows: List[tuple] = []
+    conn = sqlite3.connect(db_path)
+    try:
+        stage_question_versions(conn, versions)
+        for table_name, model, date in catalog[['Table_Name', 'Model', 'Date']].itertuples(index=False):
+            if 'Question_Version' not in {info[1] for info in conn.execute(f'PRAGMA table_info("{table_name}")')}:
+                continue
+            stale = conn.execute(
+                f'SELECT r."Round", r."Question_Code", r."Question_Version", v.Question_Version FROM "{table_name}" AS r '
+                f'JOIN temp.current_versions AS v ON v.Question_Code = r."Question_Code" '
+                f'WHERE r."Question_Version" IS NOT NULL AND r."Question_Version" <> v.Question_Version'
+            ).fetchall()
+            rows.extend((table_name, model, date) + tuple(row) for row in stale)
+    finally:
+        conn.close()
+    return pd.DataFrame(rows, columns=STALE_COLUMNS)
+
+def refresh_round_summaries(rounds: Iterable[Tuple[str, str, str, int]], versions: Mapping[str, str], db_path: str = DATABASE_PATH) -> None:
+    """
+    Rebuild the summaries of the given rounds from their current-version answers, in one transaction.
+
+    Args:
+    rounds (Iterable[Tuple[str, str, str, int]]): (results table, model variant, date, round) of each round
+    versions (Mapping[str, str]): Current version of each question code
+    db_path (str): Path to the results database
+    """
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        stage_question_versions(conn, versions)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for table_name, model, date, round_number in rounds:
+                recompute_round_summaries(conn, table_name, model, date, int(round_number), current_versions_only=True)
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+
+def recompute_current_summaries(versions: Mapping[str, str], db_path: str = DATABASE_PATH) -> int:
+    """
+    Rebuild the summaries of every round with stale answers from current-version answers only.
+
+    Args:
+    versions (Mapping[str, str]): Current version of each question code
+    db_path (str): Path to the results database
+
+    Returns:
+    int: Number of rounds recomputed
+    """
+    stale = find_stale_results(versions, db_path)
+    rounds = stale[['Table_Name', 'Model', 'Date', 'Round']].drop_duplicates()
+    if rounds.empty:
+        return 0
+
+    refresh_round_summaries(rounds.itertuples(index=False), versions, db_path)
+    logger.info(f"Recomputed summaries for {len(rounds)} rounds without answers to outdated question versions")
+    return len(rounds)
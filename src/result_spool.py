@@ -0,0 +1,308 @@
+import glob
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict, IO, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from src.lazy import lazy_import
+from src.logger import get_logger
+from src.constants import SPOOL_FOLDER, SPOOL_FLUSH_INTERVAL, SPOOL_STALE_SECONDS, SPOOL_FSYNC
+from src.data_processing import get_results_table_name
+
+pd = lazy_import('pandas')
+
+logger = get_logger(__name__)
+
+SPOOL_SUFFIX = '.jsonl'
+REPLAY_SUFFIX = '.replay'
+
+class SpooledRound(NamedTuple):
+    db_path: str
+    model: str
+    date: str
+    round_number: int
+    results: List[Dict[str, Any]]
+    percentages: Optional[Dict[str, Any]]
+    refresh: bool  # the round may already have answers, so its summaries are rebuilt from all of them
+    estimate: Optional[Dict[str, Any]] = None  # ability estimate of an adaptive round
+
+RoundWriter = Callable[[SpooledRound], None]
+RoundKey = Tuple[str, str, str, int]
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if hasattr(value, 'item'):
+        # NumPy scalars
+        return value.item()
+    raise TypeError(f"Cannot write {type(value).__name__} to the result spool")
+
+class ResultSpool:
+    """
+    Write-behind spool between the benchmark loop and the results database.
+
+    Every answer is appended to a JSON lines file as soon as it arrives, which costs one
+    buffered write, and handed to a background flusher. The flusher saves each round with
+    its summaries once the round is finished, so database writes never hold up the
+    questions still to be asked. Saved rounds are marked in the file, and the file is
+    removed when the spool closes with everything saved; a file left behind by a crash
+    is picked up by replay_spool on the next start.
+    """
+
+    def __init__(self, write_round: RoundWriter, db_path: str, folder: str = SPOOL_FOLDER,
+                 flush_interval: float = SPOOL_FLUSH_INTERVAL, fsync: bool = SPOOL_FSYNC):
+        """
+        Args:
+        write_round (RoundWriter): Saves a finished round to the results database
+        db_path (str): Results database the answers belong to
+        folder (str): Folder holding the spool files
+        flush_interval (float): Seconds between heartbeats while no answers arrive
+        fsync (bool): Sync the file to disk after every record
+        """
+        self.write_round = write_round
+        self.db_path = db_path
+        self.folder = folder
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.path = os.path.join(folder, f"{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}-{uuid.uuid4().hex[:6]}{SPOOL_SUFFIX}")
+        self.failed = False
+        self._file: Optional[IO[str]] = None
+        self._file_lock = threading.Lock()
+        self._records: 'queue.Queue[Optional[Dict[str, Any]]]' = queue.Queue()
+        self._pending: Dict[RoundKey, List[Dict[str, Any]]] = {}
+        self._thread = threading.Thread(target=self._run, name='result-spool', daemon=True)
+
+    def start(self) -> 'ResultSpool':
+        self._thread.start()
+        return self
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, default=_json_default) + '\n'
+        with self._file_lock:
+            if self._file is None:
+                # The file is only created once there is something to keep
+                os.makedirs(self.folder, exist_ok=True)
+                self._file = open(self.path, 'a', encoding='utf-8')
+            self._file.write(line)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+
+    def add(self, model: str, today_date: str, result: Dict[str, Any]) -> None:
+        """
+        Record an answer; returns once it is in the spool file, without touching the database.
+
+        Args:
+        model (str): Model variant
+        today_date (str): Run date
+        result (Dict[str, Any]): The result row, including its Round
+        """
+        record = {'kind': 'answer', 'db': self.db_path, 'model': model, 'date': today_date, 'round': int(result['Round']), 'result': result}
+        self._write(record)
+        self._records.put(record)
+
+    def finish_round(self, model: str, today_date: str, round_number: int,
+                     percentages: Optional[Dict[str, Any]] = None, refresh: bool = False,
+                     estimate: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Mark a round as finished so the flusher saves it.
+
+        Args:
+        model (str): Model variant
+        today_date (str): Run date
+        round_number (int): The round
+        percentages (Optional[Dict[str, Any]]): Summary percentages to store instead of the share answered correctly
+        refresh (bool): Rebuild the round's summaries from all of its stored answers after saving
+        estimate (Optional[Dict[str, Any]]): Ability estimate of an adaptive round, saved with its answers
+        """
+        record = {'kind': 'round', 'db': self.db_path, 'model': model, 'date': today_date, 'round': int(round_number),
+                  'percentages': percentages, 'refresh': refresh, 'estimate': estimate}
+        self._write(record)
+        self._records.put(record)
+
+    def _save(self, spooled: SpooledRound) -> None:
+        try:
+            self.write_round(spooled)
+        except Exception:
+            # The answers stay in the spool file and are replayed on the next start
+            self.failed = True
+            logger.exception(f"Could not save round {spooled.round_number} of {spooled.model}; its answers are kept in {self.path}")
+            return
+        self._write({'kind': 'saved', 'db': spooled.db_path, 'model': spooled.model, 'date': spooled.date, 'round': spooled.round_number})
+
+    def _run(self) -> None:
+        while True:
+            try:
+                record = self._records.get(timeout=self.flush_interval)
+            except queue.Empty:
+                self._heartbeat()
+                continue
+            if record is None:
+                break
+            key = (record['db'], record['model'], record['date'], record['round'])
+            if record['kind'] == 'answer':
+                self._pending.setdefault(key, []).append(record['result'])
+            else:
+                self._save(SpooledRound(*key, self._pending.pop(key, []), record['percentages'], record['refresh'], record['estimate']))
+
+        # Rounds cut short by an error are saved with the answers they have
+        for key, results in self._pending.items():
+            logger.warning(f"Saving {len(results)} answers of unfinished round {key[3]} of {key[1]}")
+            self._save(SpooledRound(*key, results, None, True))
+        self._pending.clear()
+
+    def _heartbeat(self) -> None:
+        # A spool file that stops changing belongs to a run that is no longer alive
+        with self._file_lock:
+            if self._file is not None:
+                os.utime(self.path)
+
+    def close(self) -> None:
+        """Save everything still pending and remove the spool file if it all reached the database."""
+        if self._thread.is_alive():
+            self._records.put(None)
+            self._thread.join()
+        with self._file_lock:
+            if self._file is None:
+                return
+            self._file.close()
+            self._file = None
+        if self.failed:
+            logger.warning(f"Unsaved answers are kept in {self.path} and will be replayed on the next start")
+        else:
+            os.remove(self.path)
+
+def read_spool_file(path: str) -> List[SpooledRound]:
+    """
+    Read the rounds of a spool file that were not saved yet.
+
+    Args:
+    path (str): The spool file
+
+    Returns:
+    List[SpooledRound]: Unsaved rounds in the order they were started
+    """
+    answers: Dict[RoundKey, List[Dict[str, Any]]] = {}
+    finished: Dict[RoundKey, Dict[str, Any]] = {}
+    saved: Set[RoundKey] = set()
+    with open(path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, start=1):
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # Only the last line can be cut short by a crash
+                logger.warning(f"Skipping incomplete line {line_number} of {path}")
+                continue
+            key = (record['db'], record['model'], record['date'], int(record['round']))
+            if record['kind'] == 'answer':
+                answers.setdefault(key, []).append(record['result'])
+            elif record['kind'] == 'round':
+                finished[key] = record
+            elif record['kind'] == 'saved':
+                saved.add(key)
+
+    rounds = []
+    for key, results in answers.items():
+        if key not in saved:
+            record = finished.get(key, {})
+            rounds.append(SpooledRound(*key, results, record.get('percentages'), record.get('refresh', False), record.get('estimate')))
+    return rounds
+
+def _stored_answers(spooled: SpooledRound) -> Set[Tuple[str, Any]]:
+    """(Question_Code, Timestamp) of the round's answers that are already in the database."""
+    if not os.path.exists(spooled.db_path):
+        return set()
+    table_name = get_results_table_name(spooled.model, spooled.date)
+    conn = sqlite3.connect(spooled.db_path)
+    try:
+        columns = {info[1] for info in conn.execute(f'PRAGMA table_info("{table_name}")')}
+        if not {'Round', 'Question_Code'}.issubset(columns):
+            return set()
+        timestamp = '"Timestamp"' if 'Timestamp' in columns else 'NULL'
+        rows = conn.execute(f'SELECT "Question_Code", {timestamp} FROM "{table_name}" WHERE "Round" = ?', (spooled.round_number,)).fetchall()
+    finally:
+        conn.close()
+    return {(code, None if stamp is None else pd.Timestamp(stamp)) for code, stamp in rows}
+
+def _without_stored(spooled: SpooledRound) -> SpooledRound:
+    """Drop the answers a crash left half-saved, so replaying a round never duplicates rows."""
+    stored = _stored_answers(spooled)
+    if not stored:
+        return spooled
+    results = [result for result in spooled.results
+               if (result['Question_Code'], pd.Timestamp(result['Timestamp'])) not in stored
+               and (result['Question_Code'], None) not in stored]
+    logger.info(f"{len(spooled.results) - len(results)} spooled answers of round {spooled.round_number} of {spooled.model} were already saved")
+    # Summaries may have been written for part of the round, so rebuild them from every stored answer
+    # (adaptive rounds keep the percentages recorded with their ability estimate)
+    return spooled._replace(results=results, refresh=True)
+
+def _claim(path: str) -> Optional[str]:
+    """Rename a spool file so no other process replays it at the same time."""
+    base = path[:path.index(SPOOL_SUFFIX) + len(SPOOL_SUFFIX)]
+    claimed = f"{base}.{uuid.uuid4().hex[:6]}{REPLAY_SUFFIX}"
+    try:
+        os.rename(path, claimed)
+    except OSError:
+        return None
+    os.utime(claimed)
+    return claimed
+
+def stale_spool_files(folder: str = SPOOL_FOLDER, stale_seconds: float = SPOOL_STALE_SECONDS) -> List[str]:
+    """
+    List spool files no live run is writing to.
+
+    Args:
+    folder (str): Folder holding the spool files
+    stale_seconds (float): Files modified more recently may belong to a running benchmark
+
+    Returns:
+    List[str]: Paths of the stale files, oldest first
+    """
+    paths: Iterable[str] = glob.glob(os.path.join(folder, f'*{SPOOL_SUFFIX}')) + glob.glob(os.path.join(folder, f'*{REPLAY_SUFFIX}'))
+    cutoff = time.time() - stale_seconds
+    stale = []
+    for path in paths:
+        try:
+            if os.path.getmtime(path) <= cutoff:
+                stale.append(path)
+        except OSError:
+            continue
+    return sorted(stale, key=os.path.getmtime)
+
+def replay_spool(write_round: RoundWriter, folder: str = SPOOL_FOLDER, stale_seconds: float = SPOOL_STALE_SECONDS) -> int:
+    """
+    Save the answers left in spool files by interrupted runs.
+
+    Answers already in the database are skipped, so a file can be replayed after a crash
+    at any point. Files whose rounds could not all be saved are kept for the next start.
+
+    Args:
+    write_round (RoundWriter): Saves a round to the results database
+    folder (str): Folder holding the spool files
+    stale_seconds (float): Only files untouched for this long are replayed
+
+    Returns:
+    int: Number of answers saved
+    """
+    replayed = 0
+    for path in stale_spool_files(folder, stale_seconds):
+        claimed = _claim(path)
+        if claimed is None:
+            continue
+        try:
+            rounds = [_without_stored(spooled) for spooled in read_spool_file(claimed)]
+            for spooled in rounds:
+                write_round(spooled)
+                replayed += len(spooled.results)
+        except Exception:
+            logger.exception(f"Could not replay {claimed}; it is kept for the next start")
+            continue
+        logger.info(f"Replayed {sum(len(spooled.results) for spooled in rounds)} answers from {len(rounds)} rounds in {path}")
+        os.remove(claimed)
+    return replayed
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import hashlib
+from typing import Tuple
+
+from src.lazy import lazy_import
+from src.logger import get_logger
+
+pd = lazy_import('pandas')
+
+logger = get_logger(__name__)
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    """
+    Parse a shard specification of the form i/N.
+
+    Args:
+    value (str): Shard specification, e.g. '2/4' for the second of four shards
+
+    Returns:
+    Tuple[int, int]: (shard_index, shard_count) with 1 <= shard_index <= shard_count
+    """
+    index, separator, count = value.partition('/')
+    try:
+        shard_index, shard_count = int(index), int(count)
+    except ValueError:
+        raise ValueError(f"Invalid shard '{value}', expected i/N")
+    if not separator or shard_count < 1 or not 1 <= shard_index <= shard_count:
+        raise ValueError(f"Invalid shard '{value}', expected i/N with 1 <= i <= N")
+    return shard_index, shard_count
+
+def _stable_hash(*parts: object) -> int:
+    # Python's hash() is salted per process, so hash the key explicitly to agree across hosts
+    key = '|'.join(str(part) for part in parts).encode('utf-8')
+    return int.from_bytes(hashlib.sha256(key).digest()[:8], 'big')
+
+def in_shard(seed: int, model_variant: str, round_number: int, question_code: str, shard_index: int, shard_count: int) -> bool:
+    """Return True if the (model, round, question) cell belongs to the given shard."""
+    return _stable_hash(seed, model_variant, round_number, question_code) % shard_count == shard_index - 1
+
+def sample_round_questions(questions_df: pd.DataFrame, num_questions: int, seed: int, round_number: int) -> pd.DataFrame:
+    """
+    Sample the questions for a round reproducibly.
+
+    Each question gets a key hashed from the seed, the round and its code, and the round
+    takes the questions with the smallest keys. The sample is the same on every host (and
+    for every model), and growing the question set only swaps in new questions whose keys
+    are smaller, so answers stored for the old sample stay in it.
+
+    Args:
+    questions_df (pd.DataFrame): Candidate questions
+    num_questions (int): Number of questions to sample
+    seed (int): Run seed
+    round_number (int): The round being sampled
+
+    Returns:
+    pd.DataFrame: The sampled questions
+    """
+    keys = pd.Series([_stable_hash(seed, round_number, code) for code in questions_df['Question_Code']], index=questions_df.index)
+    return questions_df.loc[keys.sort_values(kind='stable').index[:num_questions]]
+
+def filter_shard(questions_df: pd.DataFrame, seed: int, model_variant: str, round_number: int, shard_index: int, shard_count: int) -> pd.DataFrame:
+    """Keep only the questions of a round that belong to the given shard."""
+    mask = [in_shard(seed, model_variant, round_number, code, shard_index, shard_count) for code in questions_df['Question_Code']]
+    return questions_df[mask]
@@ -1,6 +1,6 @@
 import curses
 import os
-from typing import List, Tuple, Dict, Any, Union
+from typing import List, Tuple, Dict, Any, Iterable, Sequence, Set, Union
 
 def clear_console() -> None:
     """Clear the console screen."""
@@ -11,6 +11,147 @@ def clear_console() -> None:
     else:
         _ = os.system('clear')
 
+class SelectionMenu:
+    """
+    Multi-select list drawn with curses that stays responsive with thousands of entries.
+
+    Only the rows that fit the terminal are drawn, scrolling with the cursor, and a row is
+    rewritten only when its text or highlight changed since the last keypress. Typing
+    filters entries by case-insensitive substring; each extra character searches only the
+    previous matches, and the matches for every shorter filter are kept for Backspace.
+    """
+    HEADER_ROWS = 3  # prompt, key help and filter line; the last row shows messages
+    HELP = "Arrows/PgUp/PgDn move, Space toggles, Ctrl+A toggles all shown, type to filter, Esc clears filter, Enter confirms"
+
+    def __init__(self, stdscr: 'curses.window', items: Sequence[str], prompt: str, selected: Iterable[int] = (),
+                 require_selection: bool = False):
+        self.stdscr = stdscr
+        self.items = list(items)
+        self.prompt = prompt
+        self.selected: Set[int] = set(selected)
+        self.require_selection = require_selection
+        self.index = [item.lower() for item in self.items]
+        self.matches: List[List[int]] = [list(range(len(self.items)))]  # one list per character of the filter
+        self.query = ''
+        self.cursor = 0  # position in the current matches
+        self.top = 0  # first match shown
+        self.page = 1
+        self.message = ''
+        self.drawn: Dict[int, Tuple[str, int]] = {}
+
+    @property
+    def shown(self) -> List[int]:
+        return self.matches[-1]
+
+    def set_query(self, query: str) -> None:
+        """Change the filter, narrowing the previous matches when the filter grows."""
+        if not query.startswith(self.query):
+            del self.matches[1:]
+            self.query = ''
+        while len(self.query) > len(query):
+            self.matches.pop()
+            self.query = self.query[:-1]
+        for char in query[len(self.query):]:
+            self.query += char
+            needle = self.query.lower()
+            self.matches.append([idx for idx in self.shown if needle in self.index[idx]])
+        self.cursor = self.top = 0
+
+    def handle_key(self, key: int) -> bool:
+        """Apply a keypress; returns True when the selection is confirmed."""
+        if key in (curses.KEY_ENTER, 10, 13):
+            if self.require_selection and not self.selected:
+                self.message = "Please select at least one entry before confirming."
+                return False
+            return True
+        if key == curses.KEY_UP:
+            self.cursor -= 1
+        elif key == curses.KEY_DOWN:
+            self.cursor += 1
+        elif key == curses.KEY_PPAGE:
+            self.cursor -= self.page
+        elif key == curses.KEY_NPAGE:
+            self.cursor += self.page
+        elif key == curses.KEY_HOME:
+            self.cursor = 0
+        elif key == curses.KEY_END:
+            self.cursor = len(self.shown) - 1
+        elif key == ord(' ') and self.shown:
+            self.selected ^= {self.shown[self.cursor]}
+        elif key == 1:  # Ctrl+A
+            shown = set(self.shown)
+            if shown <= self.selected:
+                self.selected -= shown
+            else:
+                self.selected |= shown
+        elif key in (curses.KEY_BACKSPACE, 127, 8):
+            self.set_query(self.query[:-1])
+        elif key == 27:  # Esc
+            self.set_query('')
+        elif 32 < key < 127:
+            self.set_query(self.query + chr(key))
+        self.cursor = max(0, min(self.cursor, len(self.shown) - 1))
+        return False
+
+    def rows(self, height: int) -> List[Tuple[str, int]]:
+        """The text and attribute of every screen row."""
+        self.page = max(1, height - self.HEADER_ROWS - 1)
+        if self.cursor < self.top:
+            self.top = self.cursor
+        elif self.cursor >= self.top + self.page:
+            self.top = self.cursor - self.page + 1
+
+        rows = [
+            (self.prompt, curses.A_NORMAL),
+            (self.HELP, curses.A_NORMAL),
+            (f"Filter: {self.query}  ({len(self.shown)} of {len(self.items)} shown, {len(self.selected)} selected)", curses.A_NORMAL),
+        ]
+        for position in range(self.top, self.top + self.page):
+            if position < len(self.shown):
+                idx = self.shown[position]
+                style = curses.A_REVERSE if position == self.cursor else curses.A_NORMAL
+                rows.append((f"{'[X]' if idx in self.selected else '[ ]'} {self.items[idx]}", style))
+            else:
+                rows.append(('', curses.A_NORMAL))
+        rows.append((self.message, curses.A_BOLD))
+        return rows[:height]
+
+    def draw(self, full: bool = False) -> None:
+        """Redraw the rows that changed, or the whole screen after a resize."""
+        height, width = self.stdscr.getmaxyx()
+        if full:
+            self.stdscr.clear()
+            self.drawn = {}
+        for y, (text, style) in enumerate(self.rows(height)):
+            # Writing the last column of a row moves the cursor past the edge, which curses rejects
+            text = text[:max(0, width - 1)]
+            if self.drawn.get(y) != (text, style):
+                self.stdscr.move(y, 0)
+                self.stdscr.clrtoeol()
+                if text:
+                    self.stdscr.addstr(y, 0, text, style)
+                self.drawn[y] = (text, style)
+        self.stdscr.refresh()
+
+    def run(self) -> List[int]:
+        """
+        Show the menu until the selection is confirmed.
+
+        Returns:
+        List[int]: Indexes of the selected items, in item order
+        """
+        curses.curs_set(0)
+        self.draw(full=True)
+        while True:
+            key = self.stdscr.getch()
+            self.message = ''
+            if key == curses.KEY_RESIZE:
+                self.draw(full=True)
+                continue
+            if self.handle_key(key):
+                return sorted(self.selected)
+            self.draw()
+
 def curses_menu(stdscr: 'curses.window', items: List[str], prompt: str, all_selected: bool = True) -> List[str]:
     """
     Display a curses-based menu for selection.
@@ -24,43 +165,8 @@ def curses_menu(stdscr: 'curses.window', items: List[str], prompt: str, all_sele
     Returns:
     List[str]: Selected items
     """
-    def draw_menu(current_row, selected_rows):
-        stdscr.clear()
-        stdscr.addstr(0, 0, prompt)
-        stdscr.addstr(1, 0, "Use arrow keys to navigate, Space to toggle selection, Enter to confirm")
-        for idx, item in enumerate(items):
-            x = 0
-            y = idx + 2  # Offset by 2 to account for the prompt and instruction lines
-            if idx == current_row:
-                stdscr.addstr(y, x, f"{'[X]' if idx in selected_rows else '[ ]'} {item}", curses.A_REVERSE)
-            else:
-                stdscr.addstr(y, x, f"{'[X]' if idx in selected_rows else '[ ]'} {item}")
-        stdscr.refresh()
-
-    curses.curs_set(0)
-    selected_rows = set(range(len(items))) if all_selected else set()
-    current_row = 0
-
-    draw_menu(current_row, selected_rows)
-
-    while True:
-        key = stdscr.getch()
-
-        if key == curses.KEY_UP and current_row > 0:
-            current_row -= 1
-        elif key == curses.KEY_DOWN and current_row < len(items) - 1:
-            current_row += 1
-        elif key == ord(' '):
-            if current_row in selected_rows:
-                selected_rows.remove(current_row)
-            else:
-                selected_rows.add(current_row)
-        elif key in [10, 13]:  # Enter key
-            break
-
-        draw_menu(current_row, selected_rows)
-
-    return [items[idx] for idx in selected_rows]
+    selected = range(len(items)) if all_selected else ()
+    return [items[idx] for idx in SelectionMenu(stdscr, items, prompt, selected).run()]
 
 def select_models(models: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """
@@ -101,13 +207,13 @@ def get_user_inputs() -> Tuple[str | int, int]:
     num_rounds = int(input("Enter the number of rounds to run: "))
     return num_questions, num_rounds
 
-def confirm_run(estimated_cost: float, model_costs: List[Tuple[str, float]], num_rounds: int, num_questions: int, total_questions: int) -> bool:
+def confirm_run(estimated_cost: float, model_costs: List[Tuple], num_rounds: int, num_questions: int, total_questions: int) -> bool:
     """
     Display estimated costs and ask for user confirmation.
     
     Args:
     estimated_cost (float): Total estimated cost
-    model_costs (List[Tuple[str, float]]): List of tuples containing model names and their costs
+    model_costs (List[Tuple]): Tuples of (model_name, cost), optionally followed by (low, high) confidence bounds
     num_rounds (int): Number of rounds to run
     num_questions (int or str): Number of questions per round ('all' or int)
     total_questions (int): Total number of questions available
@@ -120,9 +226,15 @@ def confirm_run(estimated_cost: float, model_costs: List[Tuple[str, float]], num
     total_questions_run = questions_per_round * num_rounds
     
     print(f"\nEstimated cost for running {num_rounds} rounds with {questions_per_round} questions each across selected models:")
-    for model_name, cost in model_costs:
-        print(f"  {model_name}: ${cost:.3f}")
+    for model_cost in model_costs:
+        model_name, cost = model_cost[0], model_cost[1]
+        if len(model_cost) >= 4:
+            print(f"  {model_name}: ${cost:.3f} (likely range ${model_cost[2]:.3f} - ${model_cost[3]:.3f})")
+        else:
+            print(f"  {model_name}: ${cost:.3f}")
     print(f"Total estimated cost: ${estimated_cost:.3f}")
+    if model_costs and all(len(model_cost) >= 4 for model_cost in model_costs):
+        print(f"Total likely range: ${sum(model_cost[2] for model_cost in model_costs):.3f} - ${sum(model_cost[3] for model_cost in model_costs):.3f}")
     
     confirm = input("\nDo you want to proceed with the testing run? (y/n): ").strip().lower()
     return confirm == 'y'
\ No newline at end of file
@@ -0,0 +1,316 @@
+import json
+import socket
+import sqlite3
+import threading
+import time
+import os
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from src.logger import get_logger
+from src.constants import DATABASE_PATH, QUEUE_LEASE_SECONDS, QUEUE_MAX_ATTEMPTS
+
+logger = get_logger(__name__)
+
+class WorkItem(NamedTuple):
+    id: int
+    run_id: str
+    model_name: str
+    round: int
+    question_code: str
+    run_date: str
+    attempts: int
+    few_shot: int = 0
+
+class WorkRound(NamedTuple):
+    run_id: str
+    model_name: str
+    round: int
+    run_date: str
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+class WorkQueue:
+    """
+    SQLite-backed queue of (model, round, question) work items shared by many workers.
+
+    Workers claim items under a time-limited lease and keep it alive with heartbeats.
+    Items whose lease expires are returned to the queue automatically on the next claim,
+    so a crashed worker never loses work. The database file can live on a shared drive
+    so workers on different hosts (with different API keys) can share one run.
+    """
+
+    def __init__(self, db_path: str = DATABASE_PATH, lease_seconds: float = QUEUE_LEASE_SECONDS, max_attempts: int = QUEUE_MAX_ATTEMPTS):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        with self._transaction() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS work_items (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    run_id TEXT NOT NULL,
+                    model_name TEXT NOT NULL,
+                    round INTEGER NOT NULL,
+                    question_code TEXT NOT NULL,
+                    run_date TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    worker_id TEXT,
+                    lease_expires REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    result TEXT,
+                    updated_at REAL,
+                    few_shot INTEGER NOT NULL DEFAULT 0,
+                    UNIQUE (run_id, model_name, round, question_code)
+                )
+            """)
+            # Queues created before prompts had few-shot examples only hold zero-shot items
+            if 'few_shot' not in {info[1] for info in conn.execute("PRAGMA table_info(work_items)")}:
+                conn.execute("ALTER TABLE work_items ADD COLUMN few_shot INTEGER NOT NULL DEFAULT 0")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_work_items_status ON work_items (status, lease_expires)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_work_items_round ON work_items (run_id, model_name, round, status)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS work_rounds (
+                    run_id TEXT NOT NULL,
+                    model_name TEXT NOT NULL,
+                    round INTEGER NOT NULL,
+                    saved INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (run_id, model_name, round)
+                )
+            """)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=60, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def enqueue(self, run_id: str, run_date: str, items: Sequence[Tuple[str, int, str]], few_shot: int = 0) -> int:
+        """
+        Add work items for a run. A run keeps one prompt variant, so items with a different
+        number of few-shot examples than those already queued are rejected with ValueError.
+
+        Args:
+        run_id (str): Identifier shared by all items of the run
+        run_date (str): Date used for the results tables
+        items (Sequence[Tuple[str, int, str]]): (model_name, round, question_code) triples
+        few_shot (int): Number of few-shot examples workers place before each question
+
+        Returns:
+        int: Number of new items added; items already queued are ignored
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            queued = conn.execute("SELECT DISTINCT few_shot FROM work_items WHERE run_id = ? AND few_shot <> ?", (run_id, few_shot)).fetchone()
+            if queued is not None:
+                raise ValueError(f"Run {run_id} is queued with {queued[0]} few-shot examples, not {few_shot}")
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO work_items (run_id, model_name, round, question_code, run_date, updated_at, few_shot) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(run_id, model_name, round_number, question_code, run_date, now, few_shot) for model_name, round_number, question_code in items]
+            )
+            added = conn.total_changes - before
+            conn.executemany(
+                "INSERT OR IGNORE INTO work_rounds (run_id, model_name, round) VALUES (?, ?, ?)",
+                sorted({(run_id, model_name, round_number) for model_name, round_number, _ in items})
+            )
+        logger.info(f"Queued {len(items)} work items for run {run_id}")
+        return added
+
+    @staticmethod
+    def _filters(run_id: Optional[str], model_names: Sequence[str]) -> Tuple[str, List[Any]]:
+        clause = ""
+        params: List[Any] = []
+        if run_id is not None:
+            clause += " AND run_id = ?"
+            params.append(run_id)
+        if model_names:
+            clause += f" AND model_name IN ({', '.join('?' for _ in model_names)})"
+            params.extend(model_names)
+        return clause, params
+
+    def _requeue_expired(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute(
+            "UPDATE work_items SET status = 'failed', worker_id = NULL, lease_expires = NULL, updated_at = ? "
+            "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+            (now, now, self.max_attempts)
+        )
+        cursor = conn.execute(
+            "UPDATE work_items SET status = 'pending', worker_id = NULL, lease_expires = NULL, updated_at = ? "
+            "WHERE status = 'leased' AND lease_expires < ?",
+            (now, now)
+        )
+        if cursor.rowcount:
+            logger.warning(f"Re-queued {cursor.rowcount} work items with expired leases")
+
+    def claim(self, worker_id: str, run_id: Optional[str] = None, model_names: Sequence[str] = ()) -> Optional[WorkItem]:
+        """
+        Lease the next pending work item.
+
+        Args:
+        worker_id (str): Identifier of the claiming worker
+        run_id (Optional[str]): Only claim items from this run
+        model_names (Sequence[str]): Only claim items for these models (all models if empty)
+
+        Returns:
+        Optional[WorkItem]: The leased item, or None if nothing is pending
+        """
+        now = time.time()
+        filters, params = self._filters(run_id, model_names)
+        query = f"SELECT id, run_id, model_name, round, question_code, run_date, attempts, few_shot FROM work_items WHERE status = 'pending'{filters} ORDER BY id LIMIT 1"
+
+        with self._transaction() as conn:
+            self._requeue_expired(conn, now)
+            row = conn.execute(query, params).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE work_items SET status = 'leased', worker_id = ?, lease_expires = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                (worker_id, now + self.lease_seconds, now, row[0])
+            )
+        item = WorkItem(*row[:6], attempts=row[6] + 1, few_shot=row[7])
+        logger.debug(f"Worker {worker_id} claimed item {item.id}", extra={'model': item.model_name, 'question_code': item.question_code})
+        return item
+
+    def heartbeat(self, item_id: int, worker_id: str) -> bool:
+        """Extend the lease on an item; returns False if the lease was lost."""
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE work_items SET lease_expires = ?, updated_at = ? WHERE id = ? AND worker_id = ? AND status = 'leased'",
+                (now + self.lease_seconds, now, item_id, worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, item_id: int, worker_id: str, result: Optional[Dict[str, Any]]) -> bool:
+        """
+        Commit the result of an item. A result of None marks the item failed (no valid answer).
+
+        Returns:
+        bool: False if the lease had been lost and the result was discarded
+        """
+        now = time.time()
+        status = 'done' if result is not None else 'failed'
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE work_items SET status = ?, result = ?, lease_expires = NULL, updated_at = ? WHERE id = ? AND worker_id = ? AND status = 'leased'",
+                (status, json.dumps(result, default=str) if result is not None else None, now, item_id, worker_id)
+            )
+            if cursor.rowcount != 1:
+                logger.warning(f"Lease on work item {item_id} was lost; discarding result from {worker_id}")
+                return False
+        return True
+
+    def release(self, item_id: int, worker_id: str) -> None:
+        """Return a leased item to the queue without counting the attempt."""
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE work_items SET status = 'pending', worker_id = NULL, lease_expires = NULL, attempts = MAX(0, attempts - 1), updated_at = ? "
+                "WHERE id = ? AND worker_id = ? AND status = 'leased'",
+                (time.time(), item_id, worker_id)
+            )
+
+    def claim_finished_round(self, run_id: str, model_name: str, round_number: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        If every item of a round is finished and nobody has saved it yet, claim it for saving.
+
+        Returns:
+        Optional[List[Dict[str, Any]]]: The round's results, or None if the round is unfinished or already claimed
+        """
+        with self._transaction() as conn:
+            unfinished = conn.execute(
+                "SELECT COUNT(*) FROM work_items WHERE run_id = ? AND model_name = ? AND round = ? AND status IN ('pending', 'leased')",
+                (run_id, model_name, round_number)
+            ).fetchone()[0]
+            if unfinished:
+                return None
+            cursor = conn.execute(
+                "UPDATE work_rounds SET saved = 1 WHERE run_id = ? AND model_name = ? AND round = ? AND saved = 0",
+                (run_id, model_name, round_number)
+            )
+            if cursor.rowcount != 1:
+                return None
+            rows = conn.execute(
+                "SELECT result FROM work_items WHERE run_id = ? AND model_name = ? AND round = ? AND status = 'done' ORDER BY id",
+                (run_id, model_name, round_number)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def finished_unsaved_rounds(self, run_id: Optional[str] = None, model_names: Sequence[str] = ()) -> List[WorkRound]:
+        """
+        List rounds with no pending or leased items that nobody has saved.
+
+        A round is normally saved by the worker completing its last item. If that item instead
+        fails when its lease expires at max_attempts, or the save itself fails, no later
+        completion happens for the round, so idle workers pick it up from this list.
+
+        Args:
+        run_id (Optional[str]): Only list rounds of this run
+        model_names (Sequence[str]): Only list rounds of these models (all models if empty)
+
+        Returns:
+        List[WorkRound]: The finished, unsaved rounds
+        """
+        filters, params = self._filters(run_id, model_names)
+        with self._transaction() as conn:
+            self._requeue_expired(conn, time.time())
+            rows = conn.execute(
+                f"SELECT run_id, model_name, round, MIN(run_date) FROM work_items WHERE 1 = 1{filters} "
+                f"AND (run_id, model_name, round) IN (SELECT run_id, model_name, round FROM work_rounds WHERE saved = 0) "
+                f"GROUP BY run_id, model_name, round HAVING SUM(status IN ('pending', 'leased')) = 0 ORDER BY run_id, model_name, round",
+                params
+            ).fetchall()
+        return [WorkRound(*row) for row in rows]
+
+    def unclaim_round(self, run_id: str, model_name: str, round_number: int) -> None:
+        """Allow another worker to save a round after a failed save."""
+        with self._transaction() as conn:
+            conn.execute("UPDATE work_rounds SET saved = 0 WHERE run_id = ? AND model_name = ? AND round = ?", (run_id, model_name, round_number))
+
+    def counts(self, run_id: Optional[str] = None, model_names: Sequence[str] = ()) -> Dict[str, int]:
+        """Return the number of items in each status."""
+        filters, params = self._filters(run_id, model_names)
+        conn = sqlite3.connect(self.db_path, timeout=60)
+        try:
+            rows = conn.execute(f"SELECT status, COUNT(*) FROM work_items WHERE 1 = 1{filters} GROUP BY status", params).fetchall()
+        finally:
+            conn.close()
+        return {status: count for status, count in rows}
+
+class LeaseHeartbeat:
+    """Background thread that keeps a work item's lease alive while it is processed."""
+
+    def __init__(self, work_queue: WorkQueue, item_id: int, worker_id: str):
+        self.work_queue = work_queue
+        self.item_id = item_id
+        self.worker_id = worker_id
+        self.lost = False
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"heartbeat-{item_id}", daemon=True)
+
+    def _run(self) -> None:
+        interval = max(1.0, self.work_queue.lease_seconds / 3)
+        while not self._stop_event.wait(interval):
+            try:
+                if not self.work_queue.heartbeat(self.item_id, self.worker_id):
+                    self.lost = True
+                    return
+            except sqlite3.Error as e:
+                logger.warning(f"Heartbeat for work item {self.item_id} failed: {e}")
+
+    def __enter__(self) -> 'LeaseHeartbeat':
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self._stop_event.set()
+        self._thread.join()
@@ -0,0 +1,85 @@
+import json
+import os
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta
+import pandas as pd
+from src.adaptive import ensure_ability_estimates
+
+def make_results(round_number, codes, correct=True, categories=('SEO',), **columns):
+    """
+    Result rows as the benchmark stores them, one per question code.
+
+    `correct` is one value for every row or a value per row, and `categories` are cycled
+    over the rows. Keyword arguments add or replace columns. Timestamps are one second
+    apart, so identical calls give identical rows.
+    """
+    count = len(codes)
+    correct = list(correct) if isinstance(correct, (list, tuple)) else [correct] * count
+    results = pd.DataFrame({
+        'Round': [round_number] * count,
+        'Discipline': ['Marketing'] * count,
+        'Category': [categories[i % len(categories)] for i in range(count)],
+        'Question_Code': list(codes),
+        'Correct_Option': ['A'] * count,
+        'Model': ['GPT-4'] * count,
+        'Model_Answer': ['A' if is_correct else 'B' for is_correct in correct],
+        'Is_Correct': correct,
+        'Prompt_Tokens': [10] * count,
+        'Completion_Tokens': [2] * count,
+        'Timestamp': [datetime(2024, 1, 1, 12, 0) + timedelta(seconds=i) for i in range(count)]
+    })
+    for column, values in columns.items():
+        results[column] = values
+    return results
+
+def make_questions(codes=('Q1', 'Q2', 'Q3'), **columns):
+    """Question rows as stored in the questions table; keyword arguments add or replace columns."""
+    count = len(codes)
+    questions = pd.DataFrame({
+        'Question_Code': list(codes),
+        'Discipline': ['Marketing'] * count,
+        'Category': ['SEO'] * count,
+        'Sub_Category': [''] * count,
+        'Question': [f'Question {code}?' for code in codes],
+        'Option_A': ['a'] * count,
+        'Option_B': ['b'] * count,
+        'Option_C': ['c'] * count,
+        'Option_D': ['d'] * count,
+        'Correct_Option': ['A'] * count,
+    })
+    for column, values in columns.items():
+        questions[column] = values
+    return questions
+
+def record_adaptive_round(db_path, model, date, round_number, percentages):
+    """Record an adaptive estimate for a round, as save_ability_estimate does at the end of an adaptive round."""
+    conn = sqlite3.connect(db_path)
+    try:
+        with conn:
+            ensure_ability_estimates(conn)
+            conn.execute("INSERT INTO adaptive_estimates (Model, Round, Date, Percentage_Correct, Percentages) VALUES (?, ?, ?, ?, ?)",
+                         (model, round_number, date, percentages['TOTAL'], json.dumps(percentages)))
+    finally:
+        conn.close()
+
+class TempDatabaseMixin:
+    """Gives each test a temporary folder, a database path `db_path` in it and a query helper."""
+
+    db_name = 'results.db'
+
+    def setUp(self):
+        super().setUp()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.db_path = self.path(self.db_name)
+
+    def path(self, name):
+        return os.path.join(self.temp_dir.name, name)
+
+    def query(self, sql, db_path=None):
+        conn = sqlite3.connect(db_path or self.db_path)
+        try:
+            return conn.execute(sql).fetchall()
+        finally:
+            conn.close()
@@ -0,0 +1,75 @@
+import unittest
+import os
+import sqlite3
+import tempfile
+import numpy as np
+import pandas as pd
+from src.analysis import CorrectnessMatrix
+from src.adaptive import fit_item_parameters, AdaptiveTest, calibrated_pool, save_ability_estimate
+
+def simulate(abilities, discrimination, difficulty, rng):
+    probability = 1 / (1 + np.exp(-discrimination * (np.asarray(abilities)[:, None] - difficulty)))
+    return (rng.random(probability.shape) < probability).astype(float)
+
+class TestAdaptive(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.difficulty = rng.normal(0, 1, 200)
+        self.discrimination = rng.lognormal(0, 0.3, 200)
+        scores = simulate(rng.normal(0, 1, 30), self.discrimination, self.difficulty, rng)
+        # A tenth of the answers are missing, and Q199 was answered by only two runs
+        scores[rng.random(scores.shape) < 0.1] = np.nan
+        scores[2:, 199] = np.nan
+        codes = np.array([f'Q{i:03d}' for i in range(200)], dtype=object)
+        categories = np.array(['SEO', 'PPC'] * 100, dtype=object)
+        self.matrix = CorrectnessMatrix(pd.DataFrame({'Label': range(30)}), codes, categories, scores)
+        self.questions = pd.DataFrame({'Question_Code': codes, 'Category': categories, 'Discipline': 'Marketing'})
+
+    def test_fit_recovers_difficulty(self):
+        items = fit_item_parameters(self.matrix, min_runs=3)
+        self.assertEqual(len(items), 199)
+        self.assertNotIn('Q199', set(items['Question_Code']))
+        self.assertGreater(np.corrcoef(items['Difficulty'], self.difficulty[:199])[0, 1], 0.85)
+        self.assertTrue(np.isfinite(items[['Discrimination', 'Difficulty']].to_numpy()).all())
+
+    def test_adaptive_test_stops_early_and_orders_models(self):
+        pool = calibrated_pool(self.questions, fit_item_parameters(self.matrix))
+        rng = np.random.default_rng(1)
+        estimates = []
+        for ability in (-1.0, 1.0):
+            test = AdaptiveTest(pool, standard_error=0.35)
+            for code, question in test.questions(self.questions):
+                position = int(code[1:])
+                test.record(code, simulate([ability], self.discrimination[position], self.difficulty[position], rng)[0, 0])
+            self.assertLess(test.standard_error, 0.35)
+            self.assertLess(test.asked, len(pool) // 4)
+            estimates.append(test.expected_percentages())
+        self.assertLess(estimates[0]['TOTAL'], estimates[1]['TOTAL'])
+        self.assertEqual(set(estimates[0]['Category']), {'SEO', 'PPC'})
+        self.assertEqual(set(estimates[0]['Discipline']), {'Marketing'})
+
+    def test_limits_and_invalid_answers(self):
+        pool = calibrated_pool(self.questions, fit_item_parameters(self.matrix))
+        test = AdaptiveTest(pool, standard_error=0.01, max_questions=5)
+        codes = []
+        while (code := test.next_question()) is not None:
+            codes.append(code)
+            test.record(code, None)
+        # Invalid answers still count against the limit but leave the estimate at the prior
+        self.assertEqual(len(set(codes)), 5)
+        self.assertEqual(test.answered, 0)
+        self.assertAlmostEqual(test.ability, 0.0, places=6)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            db_path = os.path.join(temp_dir, 'results.db')
+            save_ability_estimate(test.estimate(), 'gpt-4', '2024-01-01', 1, db_path)
+            conn = sqlite3.connect(db_path)
+            try:
+                row = conn.execute("SELECT Model, Round, Questions, Pool FROM adaptive_estimates").fetchone()
+            finally:
+                conn.close()
+        self.assertEqual(row, ('gpt-4', 1, 0, len(pool)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+import numpy as np
+import pandas as pd
+from unittest.mock import patch
+from src.analysis import load_correctness_matrix, bootstrap_intervals, paired_tests, analyze_runs, holm_adjust
+from src.data_processing import save_results_to_sqlite
+from tests.helpers import TempDatabaseMixin, make_results
+
+def make_run(round_number, correct):
+    return make_results(round_number, [f'Q{i:03d}' for i in range(len(correct))], correct, categories=('SEO', 'PR'))
+
+class TestAnalysis(TempDatabaseMixin, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        # gpt-4o answers 36 of 40 correctly, gpt-4 only 20, with the same answers in both rounds
+        for round_number in (1, 2):
+            save_results_to_sqlite(make_run(round_number, [i % 10 != 0 for i in range(40)]), 'gpt-4o-2024-05-13', '2024-01-01', self.db_path)
+            save_results_to_sqlite(make_run(round_number, [i % 2 == 0 for i in range(40)]), 'gpt-4-0613', '2024-01-01', self.db_path)
+        # A later, smaller run of gpt-4 on the first 10 questions
+        save_results_to_sqlite(make_run(1, [True] * 5 + [False] * 5), 'gpt-4-0613', '2024-02-01', self.db_path)
+
+    def test_load_correctness_matrix(self):
+        matrix = load_correctness_matrix(self.db_path)
+        self.assertEqual(list(matrix.runs['Label']), ['GPT-4 (2024-01-01)', 'GPT-4o', 'GPT-4 (2024-02-01)'])
+        self.assertEqual(matrix.scores.shape, (3, 40))
+        self.assertEqual(int(np.isnan(matrix.scores[2]).sum()), 30)
+        self.assertEqual(list(np.unique(matrix.categories)), ['PR', 'SEO'])
+
+        latest = load_correctness_matrix(self.db_path, models=['gpt-4-0613'], latest=True)
+        self.assertEqual(list(latest.runs['Date']), ['2024-02-01'])
+
+    def test_intervals_and_paired_tests(self):
+        matrix = load_correctness_matrix(self.db_path)
+        intervals = bootstrap_intervals(matrix, resamples=1000, seed=1)
+        total = intervals[intervals['Category'] == 'TOTAL'].set_index('Run')
+        self.assertAlmostEqual(total.loc['GPT-4o', 'Accuracy'], 90.0)
+        self.assertEqual(total.loc['GPT-4 (2024-02-01)', 'Questions'], 10)
+        self.assertTrue((total['Lower'] <= total['Accuracy']).all() and (total['Accuracy'] <= total['Upper']).all())
+        self.assertEqual(len(intervals), 3 * 3)
+        pd.testing.assert_frame_equal(intervals, bootstrap_intervals(matrix, resamples=1000, seed=1))
+
+        tests = paired_tests(matrix, resamples=1000, seed=1).set_index(['Run_A', 'Run_B'])
+        clear = tests.loc[('GPT-4 (2024-01-01)', 'GPT-4o')]
+        self.assertAlmostEqual(clear['Difference'], -40.0)
+        self.assertLess(clear['P_Adjusted'], 0.01)
+        self.assertLess(clear['Upper'], 0)
+        # Compared only on the 10 questions both runs answered
+        self.assertEqual(tests.loc[('GPT-4 (2024-01-01)', 'GPT-4 (2024-02-01)'), 'Questions'], 10)
+
+    def test_holm_adjust(self):
+        np.testing.assert_allclose(holm_adjust(np.array([0.01, 0.04, 0.03])), [0.03, 0.06, 0.06])
+
+    def test_results_are_cached(self):
+        matrix = load_correctness_matrix(self.db_path)
+        cache_file = self.path('cache.json')
+        intervals, tests = analyze_runs(matrix, resamples=200, cache_file=cache_file)
+        with patch('src.analysis.bootstrap_intervals') as mock_intervals, patch('src.analysis.paired_tests') as mock_tests:
+            cached_intervals, cached_tests = analyze_runs(matrix, resamples=200, cache_file=cache_file)
+            mock_intervals.assert_not_called()
+            mock_tests.assert_not_called()
+        pd.testing.assert_frame_equal(intervals, cached_intervals, check_dtype=False)
+        pd.testing.assert_frame_equal(tests, cached_tests, check_dtype=False)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,16 +1,20 @@
+import asyncio
 import unittest
-from unittest.mock import patch, MagicMock
-from src.api_calls import query_language_model, initialize_clients
+from unittest.mock import patch, MagicMock, AsyncMock
+from src import api_calls
+from src.api_calls import query_language_model, query_language_model_async, initialize_clients
+from src.data_processing import PromptParts
 
 class TestApiCalls(unittest.TestCase):
 
     @patch('src.api_calls.os.getenv')
     def test_initialize_clients(self, mock_getenv):
-        mock_getenv.side_effect = lambda x: 'dummy_key' if x in ['OPENAI_API_KEY', 'CLAUDE_API_KEY', 'TOGETHER_API_KEY'] else None
+        # SDKs are imported lazily inside the patch, and they call getenv with defaults
+        mock_getenv.side_effect = lambda x, default=None: 'dummy_key' if x in ['OPENAI_API_KEY', 'CLAUDE_API_KEY', 'TOGETHER_API_KEY'] else default
         
-        with patch('src.api_calls.OpenAI') as mock_openai, \
+        with patch('src.api_calls.openai.OpenAI') as mock_openai, \
              patch('src.api_calls.anthropic.Anthropic') as mock_anthropic, \
-             patch('src.api_calls.Together') as mock_together, \
+             patch('src.api_calls.together.Together') as mock_together, \
              patch('src.api_calls.vertexai.init') as mock_vertexai_init:
             
             initialize_clients()
@@ -23,14 +27,14 @@ class TestApiCalls(unittest.TestCase):
     @patch('src.api_calls.GPT_client')
     @patch('src.api_calls.claude_client')
     @patch('src.api_calls.together_client')
-    @patch('src.api_calls.GenerativeModel')
+    @patch('src.api_calls.generative_models.GenerativeModel')
     def test_query_language_model_all_providers(self, mock_generative_model, mock_together, mock_claude, mock_gpt):
         # Test OpenAI
         mock_gpt.chat.completions.create.return_value = MagicMock(
             choices=[MagicMock(message=MagicMock(content="OpenAI response"))],
             usage=MagicMock(prompt_tokens=10, completion_tokens=5)
         )
-        response, prompt_tokens, completion_tokens = query_language_model('OpenAI', 'gpt-4', 'Test prompt')
+        response, prompt_tokens, completion_tokens, cached_tokens, cache_write_tokens = query_language_model('OpenAI', 'gpt-4', 'Test prompt')
         self.assertEqual(response, "OpenAI response")
         self.assertEqual(prompt_tokens, 10)
         self.assertEqual(completion_tokens, 5)
@@ -40,25 +44,29 @@ class TestApiCalls(unittest.TestCase):
             content=[MagicMock(text="Anthropic response")],
             usage=MagicMock(input_tokens=10, output_tokens=5)
         )
-        response, prompt_tokens, completion_tokens = query_language_model('Anthropic', 'claude-3', 'Test prompt')
+        response, prompt_tokens, completion_tokens, cached_tokens, cache_write_tokens = query_language_model('Anthropic', 'claude-3', 'Test prompt')
         self.assertEqual(response, "Anthropic response")
         self.assertEqual(prompt_tokens, 10)
         self.assertEqual(completion_tokens, 5)
 
         # Test Google
-        mock_generative_model.return_value.generate_content.return_value = MagicMock(text="Google response")
-        mock_generative_model.return_value.count_tokens.return_value = MagicMock(total_tokens=15)
-        response, prompt_tokens, completion_tokens = query_language_model('Google', 'gemini-pro', 'Test prompt')
+        api_calls._gemini_models.clear()
+        mock_generative_model.return_value.generate_content.return_value = MagicMock(
+            text="Google response",
+            usage_metadata=MagicMock(prompt_token_count=15, candidates_token_count=15, cached_content_token_count=0)
+        )
+        response, prompt_tokens, completion_tokens, cached_tokens, cache_write_tokens = query_language_model('Google', 'gemini-pro', 'Test prompt')
         self.assertEqual(response, "Google response")
         self.assertEqual(prompt_tokens, 15)
         self.assertEqual(completion_tokens, 15)
+        mock_generative_model.return_value.count_tokens.assert_not_called()
 
         # Test Meta/Mistral
         mock_together.chat.completions.create.return_value = MagicMock(
             choices=[MagicMock(message=MagicMock(content="Together response"))],
             usage=MagicMock(prompt_tokens=10, completion_tokens=5)
         )
-        response, prompt_tokens, completion_tokens = query_language_model('Meta', 'llama-2', 'Test prompt')
+        response, prompt_tokens, completion_tokens, cached_tokens, cache_write_tokens = query_language_model('Meta', 'llama-2', 'Test prompt')
         self.assertEqual(response, "Together response")
         self.assertEqual(prompt_tokens, 10)
         self.assertEqual(completion_tokens, 5)
@@ -66,14 +74,14 @@ class TestApiCalls(unittest.TestCase):
     @patch('src.api_calls.GPT_client')
     @patch('src.api_calls.claude_client')
     @patch('src.api_calls.together_client')
-    @patch('src.api_calls.GenerativeModel')
+    @patch('src.api_calls.generative_models.GenerativeModel')
     def test_query_language_model_retry(self, mock_generative_model, mock_together, mock_claude, mock_gpt):
         mock_gpt.chat.completions.create.side_effect = [Exception("API Error"), MagicMock(
             choices=[MagicMock(message=MagicMock(content="OpenAI response"))],
             usage=MagicMock(prompt_tokens=10, completion_tokens=5)
         )]
         
-        response, prompt_tokens, completion_tokens = query_language_model('OpenAI', 'gpt-4', 'Test prompt')
+        response, prompt_tokens, completion_tokens, cached_tokens, cache_write_tokens = query_language_model('OpenAI', 'gpt-4', 'Test prompt')
         self.assertEqual(response, "OpenAI response")
         self.assertEqual(prompt_tokens, 10)
         self.assertEqual(completion_tokens, 5)
@@ -82,11 +90,11 @@ class TestApiCalls(unittest.TestCase):
     @patch('src.api_calls.GPT_client')
     @patch('src.api_calls.claude_client')
     @patch('src.api_calls.together_client')
-    @patch('src.api_calls.GenerativeModel')
+    @patch('src.api_calls.generative_models.GenerativeModel')
     def test_query_language_model_all_retries_failed(self, mock_generative_model, mock_together, mock_claude, mock_gpt):
         mock_gpt.chat.completions.create.side_effect = Exception("API Error")
         
-        response, prompt_tokens, completion_tokens = query_language_model('OpenAI', 'gpt-4', 'Test prompt')
+        response, prompt_tokens, completion_tokens, cached_tokens, cache_write_tokens = query_language_model('OpenAI', 'gpt-4', 'Test prompt')
         self.assertIsNone(response)
         self.assertEqual(prompt_tokens, 0)
         self.assertEqual(completion_tokens, 0)
@@ -95,12 +103,86 @@ class TestApiCalls(unittest.TestCase):
     @patch('src.api_calls.GPT_client')
     @patch('src.api_calls.claude_client')
     @patch('src.api_calls.together_client')
-    @patch('src.api_calls.GenerativeModel')
+    @patch('src.api_calls.generative_models.GenerativeModel')
     def test_query_language_model_unknown_provider(self, mock_generative_model, mock_together, mock_claude, mock_gpt):
-        response, prompt_tokens, completion_tokens = query_language_model('UnknownProvider', 'unknown-model', 'Test prompt')
+        response, prompt_tokens, completion_tokens, cached_tokens, cache_write_tokens = query_language_model('UnknownProvider', 'unknown-model', 'Test prompt')
         self.assertIsNone(response)
         self.assertEqual(prompt_tokens, 0)
         self.assertEqual(completion_tokens, 0)
 
+    @patch('src.api_calls.initialize_clients')
+    @patch('src.api_calls.GPT_client')
+    @patch('src.api_calls.claude_client')
+    def test_shared_prefix_is_cacheable(self, mock_claude, mock_gpt, mock_initialize):
+        prompt = PromptParts('You are a marketing expert.', 'Example question A\n\n', 'Test prompt')
+
+        # Anthropic: the last static block carries the cache breakpoint and cached tokens count towards the prompt
+        mock_claude.messages.create.return_value = MagicMock(
+            content=[MagicMock(text="A")],
+            usage=MagicMock(input_tokens=10, output_tokens=1, cache_read_input_tokens=1200, cache_creation_input_tokens=0)
+        )
+        self.assertEqual(query_language_model('Anthropic', 'claude-3', prompt), ("A", 1210, 1, 1200, 0))
+        request = mock_claude.messages.create.call_args.kwargs
+        self.assertEqual(request['system'], [{"type": "text", "text": 'You are a marketing expert.'}])
+        self.assertEqual(request['messages'][0]['content'], [
+            {"type": "text", "text": 'Example question A\n\n', "cache_control": {"type": "ephemeral"}},
+            {"type": "text", "text": 'Test prompt'}
+        ])
+        # The first request writes the prefix to the cache, which is billed separately
+        mock_claude.messages.create.return_value = MagicMock(
+            content=[MagicMock(text="A")],
+            usage=MagicMock(input_tokens=10, output_tokens=1, cache_read_input_tokens=0, cache_creation_input_tokens=1200)
+        )
+        self.assertEqual(query_language_model('Anthropic', 'claude-3', prompt), ("A", 1210, 1, 0, 1200))
+
+        # OpenAI: the prefix leads the messages unchanged and cached tokens come from the usage details
+        mock_gpt.chat.completions.create.return_value = MagicMock(
+            choices=[MagicMock(message=MagicMock(content="B"))],
+            usage=MagicMock(prompt_tokens=1210, completion_tokens=1, prompt_tokens_details=MagicMock(cached_tokens=1024))
+        )
+        self.assertEqual(query_language_model('OpenAI', 'gpt-4o', prompt), ("B", 1210, 1, 1024, 0))
+        messages = mock_gpt.chat.completions.create.call_args.kwargs['messages']
+        self.assertEqual(messages, [{"role": "system", "content": 'You are a marketing expert.'},
+                                    {"role": "user", "content": 'Example question A\n\nTest prompt'}])
+
+    @patch('src.api_calls.initialize_clients')
+    @patch('src.api_calls.generative_models')
+    def test_gemini_reuses_model_and_response_usage(self, mock_generative_models, mock_initialize):
+        api_calls._gemini_models.clear()
+        self.addCleanup(api_calls._gemini_models.clear)
+        model_instance = mock_generative_models.GenerativeModel.return_value
+        response = MagicMock(text="C", usage_metadata=MagicMock(prompt_token_count=120, candidates_token_count=1,
+                                                                cached_content_token_count=100))
+        model_instance.generate_content.return_value = response
+        model_instance.generate_content_async = AsyncMock(return_value=response)
+        prompt = PromptParts('You are a marketing expert.', 'Example question A\n\n', 'Test prompt')
+
+        self.assertEqual(query_language_model('Google', 'gemini-pro', prompt), ("C", 120, 1, 100, 0))
+        self.assertEqual(query_language_model('Google', 'gemini-pro', prompt), ("C", 120, 1, 100, 0))
+        self.assertEqual(asyncio.run(query_language_model_async('Google', 'gemini-pro', prompt)), ("C", 120, 1, 100, 0))
+
+        # One model instance serves every request, and token counts need no extra round-trips
+        mock_generative_models.GenerativeModel.assert_called_once()
+        self.assertEqual(mock_generative_models.GenerativeModel.call_args.kwargs['system_instruction'], 'You are a marketing expert.')
+        model_instance.generate_content_async.assert_awaited_once_with('Example question A\n\nTest prompt')
+        model_instance.count_tokens.assert_not_called()
+
+    @patch('src.api_calls.asyncio.sleep', new_callable=AsyncMock)
+    @patch('src.api_calls.time.sleep')
+    @patch('src.api_calls.initialize_clients')
+    @patch('src.api_calls.GPT_client')
+    def test_sync_and_async_queries_share_retries(self, mock_gpt, mock_initialize, mock_sleep, mock_async_sleep):
+        response = MagicMock(choices=[MagicMock(message=MagicMock(content="A"))],
+                             usage=MagicMock(prompt_tokens=10, completion_tokens=1, prompt_tokens_details=MagicMock(cached_tokens=0)))
+        mock_gpt.chat.completions.create.side_effect = [Exception("API Error"), response]
+        self.assertEqual(query_language_model('OpenAI', 'gpt-4', 'Test prompt'), ("A", 10, 1, 0, 0))
+        mock_sleep.assert_called_once()
+
+        # Every attempt fails: no wait after the last one
+        mock_gpt.chat.completions.create.side_effect = Exception("API Error")
+        self.assertEqual(asyncio.run(query_language_model_async('OpenAI', 'gpt-4', 'Test prompt', retry_count=3)), (None, 0, 0, 0, 0))
+        self.assertEqual(mock_async_sleep.await_count, 2)
+        self.assertEqual(mock_gpt.chat.completions.create.call_count, 5)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,55 @@
+import unittest
+import threading
+from src.budget import CostAccumulator, parse_model_budgets
+
+class TestBudget(unittest.TestCase):
+
+    def test_accumulates_thread_safely(self):
+        tracker = CostAccumulator()
+        threads = [threading.Thread(target=lambda: [tracker.add('GPT-4', 0.01) for _ in range(1000)]) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertAlmostEqual(tracker.spent(), 40.0)
+        self.assertAlmostEqual(tracker.spent('GPT-4'), 40.0)
+
+    def test_no_budget_always_continues(self):
+        tracker = CostAccumulator()
+        tracker.add('GPT-4', 100.0)
+        self.assertEqual(tracker.check('GPT-4').action, 'continue')
+
+    def test_slows_down_near_budget(self):
+        tracker = CostAccumulator(max_cost=1.0, slowdown_threshold=0.5, max_delay=4)
+        tracker.add('GPT-4', 0.25)
+        tracker.add('GPT-4', 0.25)
+        tracker.add('GPT-4', 0.25)
+        status = tracker.check('GPT-4')
+        self.assertEqual(status.action, 'slow')
+        self.assertAlmostEqual(status.delay, 2.0)
+
+    def test_stops_before_exceeding_total_budget(self):
+        tracker = CostAccumulator(max_cost=1.0)
+        tracker.add('GPT-4', 0.4)
+        tracker.add('GPT-4', 0.4)
+        status = tracker.check('GPT-4')
+        self.assertEqual(status.action, 'stop')
+        self.assertEqual(status.scope, 'total')
+
+    def test_stops_on_model_budget_only_for_that_model(self):
+        tracker = CostAccumulator(model_budgets={'GPT-4': 0.5})
+        tracker.add('GPT-4', 0.3)
+        tracker.add('Claude-3 Opus', 0.3)
+        self.assertEqual(tracker.check('GPT-4').action, 'stop')
+        self.assertEqual(tracker.check('GPT-4').scope, 'model')
+        self.assertEqual(tracker.check('Claude-3 Opus').action, 'continue')
+
+    def test_parse_model_budgets(self):
+        self.assertEqual(parse_model_budgets(('GPT-4o=5', 'Claude-3 Opus=2.5')), {'GPT-4o': 5.0, 'Claude-3 Opus': 2.5})
+        with self.assertRaises(ValueError):
+            parse_model_budgets(('GPT-4o',))
+        with self.assertRaises(ValueError):
+            parse_model_budgets(('GPT-4o=lots',))
+
+if __name__ == '__main__':
+    unittest.main()
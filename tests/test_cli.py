@@ -1,8 +1,12 @@
 import unittest
+import sqlite3
 from unittest.mock import patch, MagicMock
 from click.testing import CliRunner
 import pandas as pd
-from src.cli import run_benchmark
+import os
+import tempfile
+from src.cli import run_benchmark, run_worker
+from src.work_queue import WorkQueue
 
 class TestCLI(unittest.TestCase):
     def setUp(self):
@@ -25,7 +29,7 @@ class TestCLI(unittest.TestCase):
             'Correct_Option': ['A'],
             'Question_Code': ['TEST001']
         })
-        mock_query_model.return_value = ('A', 10, 5)
+        mock_query_model.return_value = ('A', 10, 5, 0, 0)
         
         with patch('src.cli.select_models', return_value=[{'name': 'Test Model', 'provider': 'Test Provider', 'variant': 'test-variant', 'prompt': 0.01, 'completion': 0.01}]), \
              patch('src.cli.select_categories', return_value=['Test Category']), \
@@ -55,7 +59,7 @@ class TestCLI(unittest.TestCase):
             'Correct_Option': ['A'],
             'Question_Code': ['SEO001']
         })
-        mock_query_model.return_value = ('A', 10, 5)
+        mock_query_model.return_value = ('A', 10, 5, 0, 0)
         
         with patch('src.cli.MODELS', [{'name': 'GPT-4', 'provider': 'OpenAI', 'variant': 'gpt-4', 'prompt': 0.01, 'completion': 0.01}]):
             result = self.runner.invoke(run_benchmark, [
@@ -87,7 +91,7 @@ class TestCLI(unittest.TestCase):
             'Correct_Option': ['A'] * 100,
             'Question_Code': [f'SEO{i:03d}' for i in range(1, 101)]
         })
-        mock_query_model.return_value = ('A', 10, 5)
+        mock_query_model.return_value = ('A', 10, 5, 0, 0)
         
         with patch('src.cli.MODELS', [{'name': 'GPT-4', 'provider': 'OpenAI', 'variant': 'gpt-4', 'prompt': 0.01, 'completion': 0.01}]):
             result = self.runner.invoke(run_benchmark, [
@@ -154,7 +158,7 @@ class TestCLI(unittest.TestCase):
             patch('src.cli.select_categories', return_value=['Test']), \
             patch('src.cli.get_user_inputs', return_value=(1, 1)), \
             patch('src.cli.confirm_run', return_value=False), \
-            patch('src.cli.estimate_cost', return_value=(0, [])):
+            patch('src.cli.estimate_run_cost', return_value=(0, [])):
             result = self.runner.invoke(run_benchmark, ['--interactive'])
             self.assertEqual(result.exit_code, 0, f"Expected exit code 0, but got {result.exit_code}. Output: {result.output}")
             self.assertIn("Testing run aborted by the user", result.output)
@@ -177,8 +181,8 @@ class TestCLI(unittest.TestCase):
             'Question_Code': ['SEO001']
         })
         mock_query_model.side_effect = [
-            ('Invalid', 10, 5),  # First call returns invalid answer
-            ('A', 10, 5)  # Second call returns valid answer
+            ('Invalid', 10, 5, 0, 0),  # First call returns invalid answer
+            ('A', 10, 5, 0, 0)  # Second call returns valid answer
         ]
         
         with patch('src.cli.MODELS', [{'name': 'GPT-4', 'provider': 'OpenAI', 'variant': 'gpt-4', 'prompt': 0.01, 'completion': 0.01}]):
@@ -211,7 +215,7 @@ class TestCLI(unittest.TestCase):
             'Correct_Option': ['A'],
             'Question_Code': ['SEO001']
         })
-        mock_query_model.return_value = ('Invalid', 10, 5)  # Always return invalid answer
+        mock_query_model.return_value = ('Invalid', 10, 5, 0, 0)  # Always return invalid answer
         
         with patch('src.cli.MODELS', [{'name': 'GPT-4', 'provider': 'OpenAI', 'variant': 'gpt-4', 'prompt': 0.01, 'completion': 0.01}]), \
              patch('src.cli.MAX_RETRIES', 3):  # Set MAX_RETRIES to 3 for this test
@@ -258,5 +262,322 @@ class TestCLI(unittest.TestCase):
             self.assertNotEqual(result.exit_code, 0, f"Unhandled exception test failed with output: {result.output}")
             self.assertIn("An error occurred: Unhandled error", result.output)
 
+    @patch('src.cli.load_questions')
+    @patch('src.cli.query_language_model')
+    @patch('src.cli.save_results_to_sqlite')
+    @patch('src.cli.record_budget_stop')
+    @patch('src.cli.check_table_exists_and_get_highest_round', return_value=0)
+    @patch('src.cli.os.getenv')
+    def test_max_cost_stops_run(self, mock_getenv, mock_highest_round, mock_record_stop, mock_save_results, mock_query_model, mock_load_questions):
+        mock_getenv.side_effect = lambda x: 'dummy_key' if x in ['OPENAI_API_KEY', 'CLAUDE_API_KEY', 'TOGETHER_API_KEY'] else None
+        mock_load_questions.return_value = pd.DataFrame({
+            'Discipline': ['SEO'] * 10,
+            'Category': ['SEO'] * 10,
+            'Question': ['Q'] * 10,
+            'Option_A': ['A'] * 10,
+            'Option_B': ['B'] * 10,
+            'Option_C': ['C'] * 10,
+            'Option_D': ['D'] * 10,
+            'Correct_Option': ['A'] * 10,
+            'Question_Code': [f'SEO{i:03d}' for i in range(1, 11)]
+        })
+        mock_query_model.return_value = ('A', 10, 5, 0, 0)  # Costs $0.15 per call
+
+        with patch('src.cli.MODELS', [{'name': 'GPT-4', 'provider': 'OpenAI', 'variant': 'gpt-4', 'prompt': 0.01, 'completion': 0.01}]), \
+             patch('src.cli.estimate_run_cost', return_value=(0, [])):
+            result = self.runner.invoke(run_benchmark, [
+                '--non-interactive',
+                '--num-questions', 'all',
+                '--num-rounds', '2',
+                '--models', 'GPT-4',
+                '--categories', 'SEO',
+                '--max-cost', '0.5'
+            ])
+
+        self.assertEqual(result.exit_code, 0, f"Max cost test failed with output: {result.output}")
+        self.assertEqual(mock_query_model.call_count, 3)
+        mock_record_stop.assert_called_once()
+        self.assertEqual(mock_record_stop.call_args.args[3], 3)  # Questions completed before stopping
+        mock_save_results.assert_called_once()
+        self.assertEqual(len(mock_save_results.call_args.args[0]), 3)
+
+    @patch('src.cli.load_questions')
+    @patch('src.cli.query_language_model')
+    @patch('src.cli.save_results_to_sqlite')
+    @patch('src.cli.check_table_exists_and_get_highest_round', return_value=0)
+    @patch('src.cli.os.getenv')
+    def test_enqueue_then_worker(self, mock_getenv, mock_highest_round, mock_save_results, mock_query_model, mock_load_questions):
+        mock_getenv.side_effect = lambda x: 'dummy_key' if x in ['OPENAI_API_KEY', 'CLAUDE_API_KEY', 'TOGETHER_API_KEY'] else None
+        mock_load_questions.return_value = pd.DataFrame({
+            'Discipline': ['SEO'] * 3,
+            'Category': ['SEO'] * 3,
+            'Question': ['Q'] * 3,
+            'Option_A': ['A'] * 3,
+            'Option_B': ['B'] * 3,
+            'Option_C': ['C'] * 3,
+            'Option_D': ['D'] * 3,
+            'Correct_Option': ['A'] * 3,
+            'Question_Code': ['SEO001', 'SEO002', 'SEO003']
+        })
+        mock_query_model.return_value = ('A', 10, 5, 0, 0)
+
+        with self.runner.isolated_filesystem(), \
+             patch('src.cli.MODELS', [{'name': 'GPT-4', 'provider': 'OpenAI', 'variant': 'gpt-4', 'prompt': 0.01, 'completion': 0.01}]), \
+             patch('src.cli.estimate_run_cost', return_value=(0, [])):
+            result = self.runner.invoke(run_benchmark, [
+                '--non-interactive', '--num-rounds', '2', '--models', 'GPT-4', '--categories', 'SEO',
+                '--enqueue', '--queue-db', 'queue.db', '--run-id', 'test-run', '--few-shot', '1'
+            ])
+            self.assertEqual(result.exit_code, 0, f"Enqueue failed with output: {result.output}")
+            mock_query_model.assert_not_called()
+
+            result = self.runner.invoke(run_benchmark, ['--worker', '--queue-db', 'queue.db', '--run-id', 'test-run'])
+
+        self.assertEqual(result.exit_code, 0, f"Worker failed with output: {result.output}")
+        self.assertEqual(mock_query_model.call_count, 6)
+        self.assertEqual(mock_save_results.call_count, 2)
+        saved_rounds = sorted(call.args[0]['Round'].iloc[0] for call in mock_save_results.call_args_list)
+        self.assertEqual(saved_rounds, [1, 2])
+        # Workers ask with the few-shot count the run was queued with
+        self.assertEqual({int(value) for call in mock_save_results.call_args_list for value in call.args[0]['Few_Shot']}, {1})
+
+    @patch('src.cli.load_questions')
+    @patch('src.cli.save_results_to_sqlite')
+    def test_worker_saves_round_whose_last_item_expired(self, mock_save_results, mock_load_questions):
+        mock_load_questions.return_value = pd.DataFrame({'Question_Code': ['SEO001', 'SEO002']})
+        with tempfile.TemporaryDirectory() as temp_dir, \
+             patch('src.cli.MODELS', [{'name': 'GPT-4', 'provider': 'OpenAI', 'variant': 'gpt-4', 'prompt': 0.01, 'completion': 0.01}]):
+            work_queue = WorkQueue(os.path.join(temp_dir, 'queue.db'), lease_seconds=60, max_attempts=1)
+            work_queue.enqueue('test-run', '2024-01-01', [('GPT-4', 1, 'SEO001'), ('GPT-4', 1, 'SEO002')])
+            item = work_queue.claim('worker-a')
+            work_queue.complete(item.id, 'worker-a', {'Round': 1, 'Question_Code': 'SEO001', 'Timestamp': '2024-01-01 00:00:00'})
+            # The worker holding the round's last item dies, and that was its only allowed attempt
+            work_queue.lease_seconds = -1
+            work_queue.claim('worker-b')
+            work_queue.lease_seconds = 60
+
+            self.assertEqual(run_worker(work_queue, 'worker-c', 'test-run', poll_interval=0, db_path=os.path.join(temp_dir, 'results.db')), 0)
+
+        mock_save_results.assert_called_once()
+        self.assertEqual(list(mock_save_results.call_args.args[0]['Question_Code']), ['SEO001'])
+
+    @patch('src.cli.load_questions')
+    @patch('src.cli.query_language_model')
+    @patch('src.cli.save_results_to_sqlite')
+    @patch('src.cli.record_budget_stop')
+    @patch('src.cli.check_table_exists_and_get_highest_round', return_value=0)
+    @patch('src.cli.os.getenv')
+    def test_max_cost_stops_invalid_answer_retries(self, mock_getenv, mock_highest_round, mock_record_stop, mock_save_results, mock_query_model, mock_load_questions):
+        mock_getenv.side_effect = lambda x: 'dummy_key' if x in ['OPENAI_API_KEY', 'CLAUDE_API_KEY', 'TOGETHER_API_KEY'] else None
+        mock_load_questions.return_value = pd.DataFrame({
+            'Discipline': ['SEO'],
+            'Category': ['SEO'],
+            'Question': ['Q'],
+            'Option_A': ['A'],
+            'Option_B': ['B'],
+            'Option_C': ['C'],
+            'Option_D': ['D'],
+            'Correct_Option': ['A'],
+            'Question_Code': ['SEO001']
+        })
+        mock_query_model.return_value = ('Invalid', 10, 5, 0, 0)  # Costs $0.15 per call
+
+        with patch('src.cli.MODELS', [{'name': 'GPT-4', 'provider': 'OpenAI', 'variant': 'gpt-4', 'prompt': 0.01, 'completion': 0.01}]), \
+             patch('src.cli.estimate_run_cost', return_value=(0, [])):
+            result = self.runner.invoke(run_benchmark, [
+                '--non-interactive',
+                '--num-questions', '1',
+                '--num-rounds', '1',
+                '--models', 'GPT-4',
+                '--categories', 'SEO',
+                '--max-cost', '0.5'
+            ])
+
+        self.assertEqual(result.exit_code, 0, f"Retry budget test failed with output: {result.output}")
+        # A fourth call would take spend to $0.60, so the retries stop after three calls
+        self.assertEqual(mock_query_model.call_count, 3)
+
+    @patch('src.cli.load_questions')
+    @patch('src.cli.query_language_model')
+    @patch('src.cli.os.getenv')
+    def test_shard_rerun_is_idempotent(self, mock_getenv, mock_query_model, mock_load_questions):
+        mock_getenv.side_effect = lambda x: 'dummy_key' if x in ['OPENAI_API_KEY', 'CLAUDE_API_KEY', 'TOGETHER_API_KEY'] else None
+        mock_load_questions.return_value = pd.DataFrame({
+            'Discipline': ['SEO'] * 20,
+            'Category': ['SEO'] * 20,
+            'Question': ['Q'] * 20,
+            'Option_A': ['A'] * 20,
+            'Option_B': ['B'] * 20,
+            'Option_C': ['C'] * 20,
+            'Option_D': ['D'] * 20,
+            'Correct_Option': ['A'] * 20,
+            'Question_Code': [f'SEO{i:03d}' for i in range(1, 21)]
+        })
+        mock_query_model.return_value = ('A', 10, 5, 0, 0)
+        args = ['--non-interactive', '--num-questions', '10', '--num-rounds', '2', '--models', 'GPT-4', '--categories', 'SEO',
+                '--seed', '5', '--results-db', 'shard.db', '--run-date', '2024-01-01']
+
+        with self.runner.isolated_filesystem(), \
+             patch('src.cli.MODELS', [{'name': 'GPT-4', 'provider': 'OpenAI', 'variant': 'gpt-4', 'prompt': 0.01, 'completion': 0.01}]), \
+             patch('src.cli.estimate_run_cost', return_value=(0, [])):
+            calls_per_shard = []
+            for shard in ('1/2', '2/2'):
+                result = self.runner.invoke(run_benchmark, args + ['--shard', shard])
+                self.assertEqual(result.exit_code, 0, f"Shard {shard} failed with output: {result.output}")
+                calls_per_shard.append(mock_query_model.call_count - sum(calls_per_shard))
+
+            # Both shards together cover 2 rounds x 10 sampled questions exactly once
+            self.assertEqual(sum(calls_per_shard), 20)
+
+            result = self.runner.invoke(run_benchmark, args + ['--shard', '1/2'])
+            self.assertEqual(result.exit_code, 0, f"Shard rerun failed with output: {result.output}")
+            self.assertEqual(mock_query_model.call_count, 20)
+
+    @patch('src.cli.load_questions')
+    @patch('src.cli.query_language_model')
+    @patch('src.cli.os.getenv')
+    def test_incremental_runs_only_missing_cells(self, mock_getenv, mock_query_model, mock_load_questions):
+        mock_getenv.side_effect = lambda x: 'dummy_key' if x in ['OPENAI_API_KEY', 'CLAUDE_API_KEY', 'TOGETHER_API_KEY'] else None
+        def questions(count):
+            return pd.DataFrame({
+                'Discipline': ['SEO'] * count,
+                'Category': ['SEO'] * count,
+                'Question': ['Q'] * count,
+                'Option_A': ['A'] * count,
+                'Option_B': ['B'] * count,
+                'Option_C': ['C'] * count,
+                'Option_D': ['D'] * count,
+                'Correct_Option': ['A'] * count,
+                'Question_Code': [f'SEO{i:03d}' for i in range(1, count + 1)]
+            })
+        mock_query_model.return_value = ('A', 10, 5, 0, 0)
+        models = [{'name': 'GPT-4', 'provider': 'OpenAI', 'variant': 'gpt-4', 'prompt': 0.01, 'completion': 0.01},
+                  {'name': 'GPT-4o', 'provider': 'OpenAI', 'variant': 'gpt-4o', 'prompt': 0.01, 'completion': 0.01}]
+        args = ['--non-interactive', '--num-rounds', '2', '--categories', 'SEO', '--incremental',
+                '--results-db', 'results.db', '--run-date', '2024-01-01']
+
+        with self.runner.isolated_filesystem(), \
+             patch('src.cli.MODELS', models), \
+             patch('src.cli.estimate_run_cost', return_value=(0, [])) as mock_estimate:
+            mock_load_questions.return_value = questions(5)
+            result = self.runner.invoke(run_benchmark, args + ['--models', 'GPT-4'])
+            self.assertEqual(result.exit_code, 0, f"First run failed with output: {result.output}")
+            self.assertEqual(mock_query_model.call_count, 10)
+
+            # Two new questions and a new model: only the missing cells are asked
+            mock_load_questions.return_value = questions(7)
+            result = self.runner.invoke(run_benchmark, args + ['--models', 'GPT-4', '--models', 'GPT-4o'])
+            self.assertEqual(result.exit_code, 0, f"Incremental run failed with output: {result.output}")
+            self.assertEqual(mock_query_model.call_count, 10 + 2 * 2 + 7 * 2)
+            self.assertEqual(mock_estimate.call_args.kwargs['model_questions'], {'gpt-4': 4, 'gpt-4o': 14})
+
+            result = self.runner.invoke(run_benchmark, args + ['--models', 'GPT-4', '--models', 'GPT-4o'])
+            self.assertEqual(result.exit_code, 0, f"Rerun failed with output: {result.output}")
+            self.assertIn("Nothing to run", result.output)
+            self.assertEqual(mock_query_model.call_count, 28)
+
+            # Few-shot answers would share the zero-shot rounds and summaries
+            result = self.runner.invoke(run_benchmark, args + ['--models', 'GPT-4', '--few-shot', '1'])
+            self.assertNotEqual(result.exit_code, 0)
+            self.assertIn("already has answers with [0] few-shot examples", result.output)
+            self.assertEqual(mock_query_model.call_count, 28)
+
+            # Each round has one summary row covering every stored answer
+            conn = sqlite3.connect('results.db')
+            try:
+                rows = conn.execute("SELECT Model, Round, Percentage_Correct FROM model_summary ORDER BY Model, Round").fetchall()
+                questions_stored = conn.execute("SELECT Questions FROM token_usage WHERE Model = 'gpt-4' ORDER BY Round").fetchall()
+            finally:
+                conn.close()
+        self.assertEqual(rows, [('gpt-4', 1, 100.0), ('gpt-4', 2, 100.0), ('gpt-4o', 1, 100.0), ('gpt-4o', 2, 100.0)])
+        self.assertEqual(questions_stored, [(7,), (7,)])
+
+    @patch('src.cli.load_questions')
+    @patch('src.cli.query_language_model')
+    @patch('src.cli.os.getenv')
+    def test_adaptive_run_stops_early(self, mock_getenv, mock_query_model, mock_load_questions):
+        from src.data_processing import save_results_to_sqlite
+        mock_getenv.side_effect = lambda x: 'dummy_key' if x in ['OPENAI_API_KEY', 'CLAUDE_API_KEY', 'TOGETHER_API_KEY'] else None
+        count = 40
+        mock_load_questions.return_value = pd.DataFrame({
+            'Discipline': ['SEO'] * count,
+            'Category': ['SEO'] * count,
+            'Question': ['Q'] * count,
+            'Option_A': ['A'] * count,
+            'Option_B': ['B'] * count,
+            'Option_C': ['C'] * count,
+            'Option_D': ['D'] * count,
+            'Correct_Option': ['A'] * count,
+            'Question_Code': [f'SEO{i:03d}' for i in range(count)]
+        })
+        mock_query_model.return_value = ('A', 10, 5, 0, 0)
+        models = [{'name': 'GPT-4', 'provider': 'OpenAI', 'variant': 'gpt-4', 'prompt': 0.01, 'completion': 0.01}]
+
+        with self.runner.isolated_filesystem(), \
+             patch('src.cli.MODELS', models), \
+             patch('src.cli.estimate_run_cost', return_value=(0, [])):
+            # Stored runs of increasing ability calibrate the questions: run k answers questions below 8 * k
+            for k in range(1, 6):
+                history = mock_load_questions.return_value[['Discipline', 'Category', 'Question_Code']].assign(
+                    Round=1, Is_Correct=[i < 8 * k for i in range(count)])
+                save_results_to_sqlite(history, f'model-{k}', '2024-01-01', 'results.db')
+
+            result = self.runner.invoke(run_benchmark, ['--non-interactive', '--models', 'GPT-4', '--categories', 'SEO', '--adaptive',
+                                                        '--adaptive-se', '0.8', '--results-db', 'results.db', '--run-date', '2024-02-01'])
+            self.assertEqual(result.exit_code, 0, f"Adaptive run failed with output: {result.output}")
+            self.assertLess(mock_query_model.call_count, count)
+
+            conn = sqlite3.connect('results.db')
+            try:
+                estimate = conn.execute("SELECT Model, Questions, Pool, Percentage_Correct FROM adaptive_estimates").fetchone()
+                summary = conn.execute("SELECT Percentage_Correct FROM model_summary WHERE Model = 'gpt-4'").fetchone()
+            finally:
+                conn.close()
+        self.assertEqual(estimate[:3], ('gpt-4', mock_query_model.call_count, count))
+        # The summary holds the expected share of the whole pool, not of the questions asked
+        self.assertEqual(summary[0], estimate[3])
+        self.assertLess(summary[0], 100.0)
+
+    @patch('src.cli.load_questions')
+    @patch('src.cli.os.getenv')
+    def test_local_model_runs_offline_in_batches(self, mock_getenv, mock_load_questions):
+        from src.local_inference import LocalModel
+        class FakeModel(LocalModel):
+            batches = []
+            def score(self, prompts):
+                self.batches.append(len(prompts))
+                return [('A', 20, 1, 0) for _ in prompts]
+
+        mock_getenv.return_value = None  # No API keys at all
+        count = 6
+        mock_load_questions.return_value = pd.DataFrame({
+            'Discipline': ['SEO'] * count,
+            'Category': ['SEO'] * count,
+            'Question': [f'Q{i}' for i in range(count)],
+            'Option_A': ['A'] * count,
+            'Option_B': ['B'] * count,
+            'Option_C': ['C'] * count,
+            'Option_D': ['D'] * count,
+            'Correct_Option': ['A'] * count,
+            'Question_Code': [f'SEO{i:03d}' for i in range(count)]
+        })
+        models = [{'name': 'Tiny', 'provider': 'Local', 'variant': 'tiny-model', 'prompt': 0, 'completion': 0}]
+
+        with self.runner.isolated_filesystem(), \
+             patch('src.cli.MODELS', models), \
+             patch('src.cli.estimate_run_cost', return_value=(0, [])), \
+             patch.dict('src.local_inference._models', {'tiny-model': FakeModel('tiny-model')}):
+            result = self.runner.invoke(run_benchmark, ['--non-interactive', '--models', 'Tiny', '--categories', 'SEO', '--num-rounds', '2',
+                                                        '--results-db', 'results.db', '--run-date', '2024-01-01'])
+            self.assertEqual(result.exit_code, 0, f"Local run failed with output: {result.output}")
+            conn = sqlite3.connect('results.db')
+            try:
+                rows = conn.execute("SELECT Round, Percentage_Correct FROM model_summary ORDER BY Round").fetchall()
+            finally:
+                conn.close()
+        # Each round is scored in one call rather than question by question
+        self.assertEqual(FakeModel.batches, [count, count])
+        self.assertEqual(rows, [(1, 100.0), (2, 100.0)])
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
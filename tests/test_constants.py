@@ -1,19 +1,50 @@
 import unittest
 from unittest.mock import patch, mock_open
 import yaml
-from src.constants import evaluate_cost, CONFIG, MODELS, PROMPT_TEMPLATE, MAX_RETRIES, VALID_ANSWERS
+import os
+import tempfile
+from src.model_registry import parse_price
+from src.constants import load_config_snapshot, CONFIG, MODELS, PROMPT_TEMPLATE, MAX_RETRIES, VALID_ANSWERS
 
 class TestConstants(unittest.TestCase):
 
-    def test_evaluate_cost_valid(self):
-        self.assertEqual(evaluate_cost("10 / 1000000"), 0.00001)
-        self.assertEqual(evaluate_cost("5 + 5"), 10)
+    def test_parse_price_valid(self):
+        self.assertEqual(parse_price("10 / 1000000"), 0.00001)
+        self.assertEqual(parse_price("5 + 5"), 10)
 
-    def test_evaluate_cost_invalid(self):
-        with patch('builtins.print') as mock_print:
-            result = evaluate_cost("invalid_expression")
-            self.assertEqual(result, 0.0)
-            mock_print.assert_called_once()
+    def test_parse_price_invalid(self):
+        with self.assertRaises(ValueError):
+            parse_price("invalid_expression")
+
+    def test_parse_price_rejects_code(self):
+        with self.assertRaises(ValueError):
+            parse_price("__import__('os').getcwd()")
+
+    def test_models_do_not_mutate_config(self):
+        self.assertIsInstance(CONFIG['models'][0]['prompt'], str)
+        self.assertIsInstance(MODELS[0]['prompt'], float)
+
+    def test_config_snapshot_cache(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            config_path = os.path.join(temp_dir, 'config.yaml')
+            cache_path = os.path.join(temp_dir, 'cache.json')
+            with open(config_path, 'w') as config_file:
+                config_file.write("models:\n  - {name: M, variant: m, provider: P, prompt: '1 / 4', completion: '2'}\n")
+
+            snapshot = load_config_snapshot(config_path, cache_path)
+            self.assertEqual(snapshot['models'][0]['prompt'], 0.25)
+            self.assertTrue(os.path.exists(cache_path))
+
+            # A valid snapshot skips YAML parsing
+            with patch('yaml.safe_load') as mock_yaml_load:
+                self.assertEqual(load_config_snapshot(config_path, cache_path)['models'], snapshot['models'])
+                mock_yaml_load.assert_not_called()
+
+            # Editing config.yaml invalidates the snapshot
+            with open(config_path, 'w') as config_file:
+                config_file.write("models:\n  - {name: M, variant: m, provider: P, prompt: '3', completion: '2'}\n")
+            os.utime(config_path, ns=(0, os.stat(cache_path).st_mtime_ns + 1))
+            self.assertEqual(load_config_snapshot(config_path, cache_path)['models'][0]['prompt'], 3)
 
     @patch('yaml.safe_load')
     def test_config_loading(self, mock_yaml_load):
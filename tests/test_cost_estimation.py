@@ -0,0 +1,72 @@
+import unittest
+import pandas as pd
+from unittest.mock import patch
+from src.cost_estimation import estimate_run_cost, load_completion_token_history, prompt_token_stats
+from src.data_processing import save_results_to_sqlite
+from tests.helpers import TempDatabaseMixin, make_results
+
+def _count_words(text):
+    return len(text.split())
+
+class TestCostEstimation(TempDatabaseMixin, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.questions_df = pd.DataFrame({
+            'Question': ['What is SEO?', 'Which channel builds brands over the long term?'],
+            'Option_A': ['A'] * 2,
+            'Option_B': ['B'] * 2,
+            'Option_C': ['C'] * 2,
+            'Option_D': ['D'] * 2,
+        })
+        self.model = {'name': 'GPT-4o', 'variant': 'gpt-4o', 'provider': 'OpenAI', 'prompt': 0.001, 'completion': 0.002}
+        tokenizer_patch = patch('src.cost_estimation.get_tokenizer', return_value=('words', _count_words))
+        tokenizer_patch.start()
+        self.addCleanup(tokenizer_patch.stop)
+
+    def _save_round(self, completion_tokens):
+        codes = [f'Q{i}' for i in range(len(completion_tokens))]
+        results_df = make_results(1, codes, Prompt_Tokens=70, Completion_Tokens=completion_tokens)
+        save_results_to_sqlite(results_df, 'gpt-4o', '2024-07-01', db_path=self.db_path)
+
+    def test_prompt_token_stats_counts_rendered_prompts(self):
+        tokenizer_name, stats = prompt_token_stats(['one two', 'one two three four'], self.model)
+        self.assertEqual(tokenizer_name, 'words')
+        self.assertEqual(stats.count, 2)
+        self.assertGreater(stats.mean, 3)
+
+    def test_load_completion_token_history(self):
+        self.assertIsNone(load_completion_token_history('gpt-4o', self.db_path))
+        self._save_round([1, 3])
+        history = load_completion_token_history('gpt-4o', self.db_path)
+        self.assertEqual(history.count, 2)
+        self.assertAlmostEqual(history.mean, 2.0)
+        self.assertAlmostEqual(history.std, 1.0)
+
+    def test_estimate_uses_history_and_bounds(self):
+        self._save_round([10, 10, 10, 10])
+        total_cost, estimates = estimate_run_cost(self.questions_df, 2, 1, [self.model], db_path=self.db_path)
+        estimate = estimates[0]
+        self.assertAlmostEqual(total_cost, estimate.cost)
+        self.assertLessEqual(estimate.low, estimate.cost)
+        self.assertGreaterEqual(estimate.high, estimate.cost)
+        # Completion cost comes from the 10-token history rather than the default
+        self.assertGreater(estimate.cost, 2 * 10 * self.model['completion'])
+
+    def test_estimate_falls_back_to_expected_completion_tokens(self):
+        reasoning_model = dict(self.model, variant='o1-preview', expected_completion_tokens=800)
+        _, reasoning_estimates = estimate_run_cost(self.questions_df, 2, 1, [reasoning_model], db_path=self.db_path)
+        _, default_estimates = estimate_run_cost(self.questions_df, 2, 1, [self.model], db_path=self.db_path)
+        self.assertGreater(reasoning_estimates[0].cost, default_estimates[0].cost)
+        self.assertGreater(reasoning_estimates[0].high, reasoning_estimates[0].cost)
+
+    def test_prefix_is_priced_as_cached_only_when_long_enough(self):
+        model = dict(self.model, cached_prompt=0.0001, cache_write_prompt=0.00125)
+        _, plain = estimate_run_cost(self.questions_df, 2, 1, [model], db_path=self.db_path)
+        for words, extra in ((10, 10 * 2 * 0.001), (2000, 2000 * (0.00125 + 0.0001))):
+            with patch('src.cost_estimation.shared_prompt_prefix', return_value='word ' * words):
+                _, estimates = estimate_run_cost(self.questions_df, 2, 1, [model], db_path=self.db_path, few_shot=1)
+            self.assertAlmostEqual(estimates[0].cost - plain[0].cost, extra)
+
+if __name__ == '__main__':
+    unittest.main()
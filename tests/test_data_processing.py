@@ -2,17 +2,22 @@ import unittest
 import pandas as pd
 import os
 import sqlite3
+import tempfile
+from datetime import datetime
 from unittest.mock import patch, MagicMock
 from src.data_processing import (
-    estimate_cost,
     calculate_token_cost,
+    build_prompt_parts,
     load_questions,
     answer_check,
     check_table_exists_and_get_highest_round,
     sanitize_column_name,
     save_results_to_sqlite,
     get_sqlite_type,
-    ensure_summary_table
+    ensure_summary_table,
+    load_completed_questions,
+    load_table_catalog,
+    stored_few_shot_counts
 )
 
 class TestDataProcessing(unittest.TestCase):
@@ -102,11 +107,6 @@ class TestDataProcessing(unittest.TestCase):
         self.assertEqual(len(alter_table_calls), 1)
         mock_cursor.execute.assert_any_call("ALTER TABLE test_summary ADD COLUMN New_Column REAL")
 
-    def test_estimate_cost_empty_models(self):
-        total_cost, model_costs = estimate_cost(10, 2, [])
-        self.assertEqual(total_cost, 0)
-        self.assertEqual(model_costs, [])
-
     def test_calculate_token_cost_zero_tokens(self):
         model_info = {"prompt": 0.001, "completion": 0.002}
         cost = calculate_token_cost(0, 0, model_info)
@@ -128,23 +128,35 @@ class TestDataProcessing(unittest.TestCase):
         alter_table_calls = [call for call in mock_cursor.execute.call_args_list if 'ALTER TABLE' in str(call)]
         self.assertEqual(len(alter_table_calls), 0)
 
-    def test_estimate_cost_with_models(self):
-        models = [
-            {"name": "Model1", "prompt": 0.001, "completion": 0.002},
-            {"name": "Model2", "prompt": 0.002, "completion": 0.003}
-        ]
-        total_cost, model_costs = estimate_cost(10, 2, models)
-        self.assertGreater(total_cost, 0)
-        self.assertEqual(len(model_costs), 2)
-        for model_name, cost in model_costs:
-            self.assertIn(model_name, ["Model1", "Model2"])
-            self.assertGreater(cost, 0)
-
     def test_calculate_token_cost_non_zero(self):
         model_info = {"prompt": 0.001, "completion": 0.002}
         cost = calculate_token_cost(100, 50, model_info)
         self.assertEqual(cost, 0.2)
 
+    def test_calculate_token_cost_cached_prompt(self):
+        model_info = {"prompt": 0.001, "completion": 0.002, "cached_prompt": 0.0001}
+        self.assertAlmostEqual(calculate_token_cost(100, 50, model_info, cached_tokens=80), 0.02 + 0.008 + 0.1)
+        # Models without a cached price pay the prompt price
+        self.assertAlmostEqual(calculate_token_cost(100, 50, {"prompt": 0.001, "completion": 0.002}, cached_tokens=80), 0.2)
+        # Cache writes are billed at their own price, or at the prompt price if none is set
+        model_info["cache_write_prompt"] = 0.00125
+        self.assertAlmostEqual(calculate_token_cost(100, 50, model_info, cache_write_tokens=80), 0.02 + 0.1 + 0.1)
+        self.assertAlmostEqual(calculate_token_cost(100, 50, {"prompt": 0.001, "completion": 0.002}, cache_write_tokens=80), 0.2)
+
+    def test_build_prompt_parts_few_shot(self):
+        question = pd.Series({'Question': 'Q?', 'Option_A': 'a', 'Option_B': 'b', 'Option_C': 'c', 'Option_D': 'd'})
+        zero_shot = build_prompt_parts(question)
+        self.assertEqual(zero_shot.prefix, '')
+        two_shot = build_prompt_parts(question, few_shot=2)
+        self.assertEqual(two_shot.question, zero_shot.question)
+        self.assertEqual(two_shot.prefix.count('Answer:'), 2)
+        self.assertTrue(two_shot.text.endswith(zero_shot.question))
+        # The prefix is identical for every question, so providers can cache it
+        other = build_prompt_parts(question.replace('Q?', 'Other?'), few_shot=2)
+        self.assertEqual(other.prefix, two_shot.prefix)
+        with self.assertRaises(ValueError):
+            build_prompt_parts(question, few_shot=100)
+
     @patch('sqlite3.connect')
     @patch('pandas.read_sql_query')
     @patch('os.path.exists')
@@ -247,5 +259,77 @@ class TestDataProcessing(unittest.TestCase):
         alter_table_calls = [call for call in mock_cursor.execute.call_args_list if 'ALTER TABLE' in str(call)]
         self.assertEqual(len(alter_table_calls), 2)
 
+    @patch('sqlite3.connect')
+    def test_load_completed_questions(self, mock_connect):
+        mock_cursor = MagicMock()
+        mock_cursor.fetchone.return_value = ('2023_01_01_test_model',)
+        mock_cursor.fetchall.return_value = [(1, 'Q1'), (1, 'Q2'), (2, 'Q1')]
+        mock_connect.return_value.cursor.return_value = mock_cursor
+
+        result = load_completed_questions('org/test-model', '2023-01-01')
+        self.assertEqual(result, {(1, 'Q1'), (1, 'Q2'), (2, 'Q1')})
+        self.assertIn('"2023_01_01_test_model"', mock_cursor.execute.call_args.args[0])
+
+    @patch('sqlite3.connect')
+    def test_load_completed_questions_table_not_exists(self, mock_connect):
+        mock_cursor = MagicMock()
+        mock_cursor.fetchone.return_value = None
+        mock_connect.return_value.cursor.return_value = mock_cursor
+
+        self.assertEqual(load_completed_questions('test_model', '2023-01-01'), set())
+
+    def make_results(self, round_number, hour):
+        return pd.DataFrame({
+            'Round': [round_number] * 2,
+            'Category': ['SEO'] * 2,
+            'Question_Code': ['Q1', 'Q2'],
+            'Is_Correct': [True, False],
+            'Timestamp': [datetime(2024, 1, 1, hour, 0), datetime(2024, 1, 1, hour, 30)]
+        })
+
+    def test_table_catalog_tracks_appends(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            db_path = os.path.join(temp_dir, 'results.db')
+            save_results_to_sqlite(self.make_results(1, 9), 'org/test-model', '2024-01-01', db_path)
+            save_results_to_sqlite(self.make_results(2, 10), 'org/test-model', '2024-01-01', db_path)
+            save_results_to_sqlite(self.make_results(1, 11), 'other-model', '2024-01-02', db_path)
+
+            catalog = load_table_catalog(db_path)
+            self.assertEqual(list(catalog['Table_Name']), ['2024_01_01_test_model', '2024_01_02_other_model'])
+            entry = catalog.iloc[0]
+            self.assertEqual((entry['Model'], entry['Date'], entry['First_Round'], entry['Last_Round'], entry['Row_Count']),
+                             ('org/test-model', '2024-01-01', 1, 2, 4))
+            self.assertTrue(entry['First_Timestamp'].startswith('2024-01-01 09:00:00'))
+            self.assertTrue(entry['Last_Timestamp'].startswith('2024-01-01 10:30:00'))
+            self.assertEqual(list(load_table_catalog(db_path, date='2024-01-02')['Model']), ['other-model'])
+
+    def test_table_catalog_backfills_existing_tables(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            db_path = os.path.join(temp_dir, 'results.db')
+            conn = sqlite3.connect(db_path)
+            self.make_results(3, 9).to_sql('2024_01_01_test_model', conn, index=False)
+            conn.close()
+
+            catalog = load_table_catalog(db_path)
+            self.assertEqual(catalog[['Model', 'First_Round', 'Row_Count']].values.tolist(), [['test_model', 3, 2]])
+
+            # Later rounds are folded into the backfilled entry
+            save_results_to_sqlite(self.make_results(4, 10), 'test_model', '2024-01-01', db_path)
+            self.assertEqual(load_table_catalog(db_path)[['Last_Round', 'Row_Count']].values.tolist(), [[4, 4]])
+
+    def test_few_shot_answers_are_kept_apart(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            db_path = os.path.join(temp_dir, 'results.db')
+            self.assertEqual(stored_few_shot_counts('test_model', '2024-01-01', db_path), set())
+            # Answers stored before Few_Shot existed are zero-shot
+            save_results_to_sqlite(self.make_results(1, 9), 'test_model', '2024-01-01', db_path)
+            few_shot_results = self.make_results(2, 10)
+            few_shot_results['Few_Shot'] = 3
+            save_results_to_sqlite(few_shot_results, 'test_model', '2024-01-01', db_path)
+
+            self.assertEqual(stored_few_shot_counts('test_model', '2024-01-01', db_path), {0, 3})
+            self.assertEqual(load_completed_questions('test_model', '2024-01-01', db_path, few_shot=3), {(2, 'Q1'), (2, 'Q2')})
+            self.assertEqual(load_completed_questions('test_model', '2024-01-01', db_path, few_shot=0), {(1, 'Q1'), (1, 'Q2')})
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,82 @@
+import unittest
+from datetime import datetime
+from src.data_processing import save_results_to_sqlite
+from src.database_merge import merge_databases
+from tests.helpers import TempDatabaseMixin, make_results, record_adaptive_round
+
+class TestDatabaseMerge(TempDatabaseMixin, unittest.TestCase):
+
+    db_name = 'target.db'
+
+    def setUp(self):
+        super().setUp()
+        self.target = self.db_path
+        self.source = self.path('source.db')
+
+    def test_merge_into_empty_target(self):
+        save_results_to_sqlite(make_results(1, ['Q1', 'Q2']), 'gpt-4', '2024-01-01', self.source)
+        report = merge_databases(self.target, [self.source])
+        self.assertEqual((report.tables_merged, report.rows_inserted, report.duplicates_skipped), (1, 2, 0))
+        self.assertEqual(self.query("SELECT Model, Round, Date, Percentage_Correct FROM model_summary"), [('gpt-4', 1, '2024-01-01', 100.0)])
+        self.assertEqual(self.query("SELECT TOTAL, SEO FROM category_summary"), [(100.0, 100.0)])
+        self.assertEqual(self.query("SELECT Questions, Prompt_Tokens, Completion_Tokens FROM token_usage"), [(2, 20, 4)])
+
+    def test_identical_results_are_deduplicated(self):
+        save_results_to_sqlite(make_results(1, ['Q1', 'Q2']), 'gpt-4', '2024-01-01', self.source)
+        merge_databases(self.target, [self.source])
+        report = merge_databases(self.target, [self.source])
+        self.assertEqual((report.rows_inserted, report.duplicates_skipped), (0, 2))
+        self.assertEqual(self.query('SELECT COUNT(*) FROM "2024_01_01_gpt_4"'), [(2,)])
+        self.assertEqual(self.query("SELECT COUNT(*) FROM model_summary"), [(1,)])
+        self.assertEqual(self.query("SELECT Model, Row_Count FROM table_catalog"), [('gpt-4', 2)])
+
+    def test_colliding_round_is_renumbered(self):
+        save_results_to_sqlite(make_results(1, ['Q1', 'Q2']), 'gpt-4', '2024-01-01', self.target)
+        save_results_to_sqlite(make_results(1, ['Q1', 'Q2'], correct=False), 'gpt-4', '2024-01-01', self.source)
+        report = merge_databases(self.target, [self.source])
+        self.assertEqual(report.renumbered_rounds, [('2024_01_01_gpt_4', 1, 2)])
+        self.assertEqual(self.query("SELECT Round, Percentage_Correct FROM model_summary ORDER BY Round"), [(1, 100.0), (2, 0.0)])
+
+    def test_merging_a_renumbered_round_again_adds_nothing(self):
+        save_results_to_sqlite(make_results(1, ['Q1', 'Q2']), 'gpt-4', '2024-01-01', self.target)
+        save_results_to_sqlite(make_results(1, ['Q1', 'Q2'], correct=False), 'gpt-4', '2024-01-01', self.source)
+        merge_databases(self.target, [self.source])
+        report = merge_databases(self.target, [self.source])
+        self.assertEqual((report.rows_inserted, report.duplicates_skipped, report.renumbered_rounds), (0, 2, []))
+        self.assertEqual(self.query('SELECT Round, COUNT(*) FROM "2024_01_01_gpt_4" GROUP BY Round'), [(1, 2), (2, 2)])
+        self.assertEqual(self.query("SELECT Round, Percentage_Correct FROM model_summary ORDER BY Round"), [(1, 100.0), (2, 0.0)])
+
+    def test_renumbered_round_skips_source_rounds(self):
+        save_results_to_sqlite(make_results(1, ['Q1', 'Q2']), 'gpt-4', '2024-01-01', self.target)
+        save_results_to_sqlite(make_results(1, ['Q1', 'Q2'], correct=False), 'gpt-4', '2024-01-01', self.source)
+        save_results_to_sqlite(make_results(2, ['Q1', 'Q2'], correct=[True, False], Timestamp=[datetime(2024, 1, 1, 13, 0)] * 2), 'gpt-4', '2024-01-01', self.source)
+        report = merge_databases(self.target, [self.source])
+        self.assertEqual(report.renumbered_rounds, [('2024_01_01_gpt_4', 1, 3)])
+        self.assertEqual(self.query("SELECT Round, Percentage_Correct FROM model_summary ORDER BY Round"), [(1, 100.0), (2, 50.0), (3, 0.0)])
+
+    def test_renumbered_adaptive_round_keeps_its_percentages(self):
+        save_results_to_sqlite(make_results(1, ['Q1', 'Q2']), 'gpt-4', '2024-01-01', self.target)
+        percentages = {'TOTAL': 62.5, 'Category': {'SEO': 62.5}, 'Discipline': {'Marketing': 62.5}}
+        save_results_to_sqlite(make_results(1, ['Q1', 'Q2'], correct=False), 'gpt-4', '2024-01-01', self.source, percentages=percentages)
+        record_adaptive_round(self.source, 'gpt-4', '2024-01-01', 1, percentages)
+        merge_databases(self.target, [self.source])
+        self.assertEqual(self.query("SELECT Round, Percentage_Correct FROM model_summary ORDER BY Round"), [(1, 100.0), (2, 62.5)])
+        self.assertEqual(self.query("SELECT Round, TOTAL, SEO FROM category_summary ORDER BY Round"), [(1, 100.0, 100.0), (2, 62.5, 62.5)])
+        self.assertEqual(self.query("SELECT Round, Marketing FROM discipline_summary ORDER BY Round"), [(1, 100.0), (2, 62.5)])
+        self.assertEqual(self.query("SELECT Round, Percentage_Correct FROM adaptive_estimates"), [(2, 62.5)])
+
+    def test_disjoint_shards_share_a_round(self):
+        save_results_to_sqlite(make_results(1, ['Q1', 'Q2']), 'gpt-4', '2024-01-01', self.target)
+        save_results_to_sqlite(make_results(1, ['Q3', 'Q4'], correct=False), 'gpt-4', '2024-01-01', self.source)
+        report = merge_databases(self.target, [self.source])
+        self.assertEqual(report.renumbered_rounds, [])
+        self.assertEqual(self.query("SELECT Round, Percentage_Correct FROM model_summary"), [(1, 50.0)])
+        self.assertEqual(self.query("SELECT Round, Questions FROM token_usage"), [(1, 4)])
+
+    def test_rejects_merging_into_itself(self):
+        save_results_to_sqlite(make_results(1, ['Q1']), 'gpt-4', '2024-01-01', self.target)
+        with self.assertRaises(ValueError):
+            merge_databases(self.target, [self.target])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+import os
+import sys
+from unittest.mock import patch
+from src.data_processing import save_results_to_sqlite
+from src.export import export_results
+from src.question_versions import refresh_round_summaries
+from tests.helpers import TempDatabaseMixin, make_results
+
+try:
+    import pyarrow
+    import pyarrow.dataset
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+class TestExport(TempDatabaseMixin, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.output = self.path('export')
+        save_results_to_sqlite(make_results(1, ['Q1', 'Q2', 'Q3'], correct=[True, False, True], Question_Version='v1'), 'gpt-4', '2024-01-01', self.db_path)
+
+    def read_results(self, export_format='parquet'):
+        dataset = pyarrow.dataset.dataset(os.path.join(self.output, 'results'), format='parquet' if export_format == 'parquet' else 'ipc', partitioning='hive')
+        return dataset.to_table().to_pandas()
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_export_is_incremental(self):
+        report = export_results(self.db_path, self.output, batch_size=2)
+        self.assertEqual((report.tables_exported, report.rows_exported), (1, 3))
+        self.assertIn('model_summary', report.summaries_rewritten)
+        # Two parts of at most two rows plus one file per summary table
+        self.assertEqual(report.files_written, 2 + len(report.summaries_rewritten))
+
+        # Nothing new: nothing is written
+        report = export_results(self.db_path, self.output, batch_size=2)
+        self.assertEqual((report.rows_exported, report.files_written, report.summaries_rewritten), (0, 0, []))
+
+        save_results_to_sqlite(make_results(2, ['Q1', 'Q2'], correct=[True, False]), 'gpt-4', '2024-01-01', self.db_path)
+        report = export_results(self.db_path, self.output, batch_size=2)
+        self.assertEqual(report.rows_exported, 2)
+
+        results = self.read_results()
+        self.assertEqual(sorted(zip(results['Round'], results['Question_Code'])), [(1, 'Q1'), (1, 'Q2'), (1, 'Q3'), (2, 'Q1'), (2, 'Q2')])
+        self.assertEqual(results['Is_Correct'].sum(), 3)
+        self.assertEqual(set(results['date'].astype(str)), {'2024-01-01'})
+        self.assertEqual(set(results['model'].astype(str)), {'gpt_4'})
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_rebuilt_round_summary_is_exported_again(self):
+        export_results(self.db_path, self.output)
+        # A new version of Q1 leaves only the wrong answer to Q2 in the rebuilt round
+        refresh_round_summaries([('2024_01_01_gpt_4', 'gpt-4', '2024-01-01', 1)], {'Q1': 'v2', 'Q3': 'v2'}, self.db_path)
+        report = export_results(self.db_path, self.output)
+        self.assertIn('model_summary', report.summaries_rewritten)
+        summary = pyarrow.parquet.read_table(os.path.join(self.output, 'summaries', 'model_summary.parquet')).to_pandas()
+        self.assertEqual(summary['Percentage_Correct'].tolist(), [0.0])
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_arrow_export_dictionary_encodes_strings(self):
+        export_results(self.db_path, self.output, export_format='arrow')
+        folder = os.path.join(self.output, 'results', 'date=2024-01-01', 'model=gpt_4')
+        (name,) = os.listdir(folder)
+        with pyarrow.memory_map(os.path.join(folder, name)) as source:
+            table = pyarrow.ipc.open_file(source).read_all()
+        self.assertTrue(pyarrow.types.is_dictionary(table.schema.field('Question_Code').type))
+        self.assertEqual(table.schema.field('Round').type, pyarrow.int64())
+
+        with self.assertRaises(ValueError):
+            export_results(self.db_path, self.output, export_format='parquet')
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_full_export_replaces_parts(self):
+        export_results(self.db_path, self.output, batch_size=1)
+        report = export_results(self.db_path, self.output, batch_size=10, full=True)
+        self.assertEqual((report.rows_exported, report.files_written - len(report.summaries_rewritten)), (3, 1))
+        self.assertEqual(len(self.read_results()), 3)
+
+    def test_missing_pyarrow(self):
+        with patch.dict(sys.modules, {'pyarrow': None}):
+            with self.assertRaisesRegex(ImportError, 'pip install pyarrow'):
+                export_results(self.db_path, self.output)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,31 @@
+import unittest
+from src.json_cache import JsonCache
+from tests.helpers import TempDatabaseMixin
+
+class TestJsonCache(TempDatabaseMixin, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.cache_file = self.path('cache.json')
+
+    def test_missing_or_corrupt_file_starts_empty(self):
+        self.assertIsNone(JsonCache(self.cache_file).get('a'))
+        with open(self.cache_file, 'w') as file:
+            file.write('{not json')
+        self.assertIsNone(JsonCache(self.cache_file).get('a'))
+
+    def test_keeps_the_most_recently_used_entries(self):
+        cache = JsonCache(self.cache_file, size=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        # Reading 'a' makes 'b' the least recently used entry
+        self.assertEqual(cache.get('a'), 1)
+        cache.put('c', 3)
+        cache.save()
+
+        cache = JsonCache(self.cache_file, size=2)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual((cache.get('a'), cache.get('c')), (1, 3))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+import sys
+import unittest
+from unittest.mock import patch
+from src.lazy import lazy_import
+
+class TestLazy(unittest.TestCase):
+
+    def test_imports_on_first_attribute_access(self):
+        module_name = 'xml.dom.minicompat'
+        sys.modules.pop(module_name, None)
+        proxy = lazy_import(module_name)
+        self.assertNotIn(module_name, sys.modules)
+        self.assertIn('NodeList', dir(proxy))
+        self.assertIn(module_name, sys.modules)
+        self.assertIs(proxy.NodeList, sys.modules[module_name].NodeList)
+
+    def test_patch_through_proxy(self):
+        proxy = lazy_import('json')
+        original = proxy.dumps
+        with patch('json.dumps', return_value='patched'):
+            self.assertEqual(proxy.dumps({}), 'patched')
+        with patch.object(proxy, 'dumps', return_value='patched'):
+            self.assertEqual(sys.modules['json'].dumps({}), 'patched')
+        self.assertIs(proxy.dumps, original)
+
+    def test_missing_module_raises_on_use(self):
+        proxy = lazy_import('module_that_does_not_exist')
+        with self.assertRaises(ImportError):
+            proxy.anything
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+import sys
+from unittest.mock import patch
+import numpy as np
+from src.data_processing import PromptParts
+from src.api_calls import query_language_model
+from src import local_inference
+from src.local_inference import LocalModel, choose_letter, load_local_model, prefetch_answers, query_local_model
+
+class FakeModel(LocalModel):
+    """Answers 'B' to every prompt and records the batches it was given."""
+
+    def __init__(self, variant):
+        super().__init__(variant)
+        self.batches = []
+
+    def score(self, prompts):
+        self.batches.append(list(prompts))
+        return [('B', 20, 1, 10) for _ in prompts]
+
+class TestLocalInference(unittest.TestCase):
+
+    def setUp(self):
+        self.model = FakeModel('fake-model')
+        patcher = patch.dict(local_inference._models, {'fake-model': self.model})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(local_inference._prefetched.clear)
+
+    def test_choose_letter(self):
+        logits = np.zeros(10)
+        logits[7] = 3.0  # " C"
+        logits[1] = 2.0  # "A"
+        self.assertEqual(choose_letter(logits, [[1, 5], [2, 6], [3, 7], [4, 8]]), 'C')
+
+    def test_prefetched_answers_are_reused(self):
+        prompts = [PromptParts('', 'Examples\n\n', f'Question {i}') for i in range(5)]
+        self.assertEqual(prefetch_answers('fake-model', prompts + prompts[:1]), 5)
+        self.assertEqual(len(self.model.batches), 1)
+        self.assertEqual(query_local_model('fake-model', prompts[0]), ('B', 20, 1, 10))
+        # Prefetching again only scores prompts that are not waiting to be asked
+        self.assertEqual(prefetch_answers('fake-model', prompts), 1)
+        for prompt in prompts:
+            query_local_model('fake-model', prompt)
+        self.assertEqual(len(self.model.batches), 2)
+        # A prompt that was not prefetched is scored on its own
+        query_local_model('fake-model', prompts[0])
+        self.assertEqual(self.model.batches[-1], [prompts[0]])
+
+    def test_local_provider_needs_no_api_clients(self):
+        with patch('src.api_calls.initialize_clients', side_effect=Exception("API keys missing")) as mock_initialize:
+            self.assertEqual(query_language_model('Local', 'fake-model', 'Question'), ('B', 20, 1, 10, 0))
+            mock_initialize.assert_not_called()
+
+    def test_model_without_score_cannot_be_created(self):
+        class Incomplete(LocalModel):
+            pass
+
+        with self.assertRaises(TypeError):
+            Incomplete('incomplete-model')
+
+    def test_missing_backend_explains_install(self):
+        with patch.dict(sys.modules, {'torch': None, 'transformers': None, 'llama_cpp': None}):
+            with self.assertRaisesRegex(ImportError, 'pip install torch transformers'):
+                load_local_model('some-org/some-model')
+            with self.assertRaisesRegex(ImportError, 'pip install llama-cpp-python'):
+                load_local_model('/models/model.Q4_K_M.gguf')
+
+if __name__ == '__main__':
+    unittest.main()
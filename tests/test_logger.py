@@ -0,0 +1,67 @@
+import unittest
+import json
+import logging
+import os
+import tempfile
+from src.logger import setup_logger, get_logger, flush_logs, shutdown_logger, _NonBlockingQueueHandler
+
+class TestLogger(unittest.TestCase):
+
+    def setUp(self):
+        shutdown_logger()
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        shutdown_logger()
+        logging.getLogger('tests.module').setLevel(logging.NOTSET)
+        self.temp_dir.cleanup()
+
+    def _log_lines(self):
+        lines = []
+        for root, _, files in os.walk(os.path.join(self.temp_dir.name, 'Logs')):
+            for name in files:
+                with open(os.path.join(root, name)) as log_file:
+                    lines.extend(json.loads(line) for line in log_file if line.strip())
+        return lines
+
+    def test_setup_logger_is_idempotent(self):
+        setup_logger(self.temp_dir.name, console_level='CRITICAL', module_levels={})
+        setup_logger(self.temp_dir.name, console_level='CRITICAL', module_levels={})
+        queue_handlers = [h for h in logging.getLogger().handlers if isinstance(h, _NonBlockingQueueHandler)]
+        self.assertEqual(len(queue_handlers), 1)
+
+        get_logger('tests.module').info("Logged once")
+        flush_logs()
+        messages = [line['message'] for line in self._log_lines()]
+        self.assertEqual(messages.count("Logged once"), 1)
+
+    def test_json_lines_output_with_extra_fields(self):
+        setup_logger(self.temp_dir.name, console_level='CRITICAL', module_levels={})
+        get_logger('tests.module').info("Answer received", extra={'model': 'GPT-4', 'is_correct': True})
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            get_logger('tests.module').exception("Failure")
+        flush_logs()
+
+        lines = self._log_lines()
+        answer_line = next(line for line in lines if line['message'] == "Answer received")
+        self.assertEqual(answer_line['level'], 'INFO')
+        self.assertEqual(answer_line['logger'], 'tests.module')
+        self.assertEqual(answer_line['model'], 'GPT-4')
+        self.assertTrue(answer_line['is_correct'])
+        failure_line = next(line for line in lines if line['message'] == "Failure")
+        self.assertIn("ValueError: boom", failure_line['exception'])
+
+    def test_module_levels(self):
+        setup_logger(self.temp_dir.name, console_level='CRITICAL', module_levels={'tests.module': 'WARNING'})
+        get_logger('tests.module').info("Suppressed")
+        get_logger('tests.module').warning("Kept")
+        flush_logs()
+
+        messages = [line['message'] for line in self._log_lines()]
+        self.assertNotIn("Suppressed", messages)
+        self.assertIn("Kept", messages)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+import os
+import tempfile
+import urllib.request
+from src.metrics import (
+    _Metric, Counter, Gauge, Histogram, MetricsRegistry, MetricsExporter, write_textfile, is_rate_limit_error
+)
+
+class RateLimitError(Exception):
+    status_code = 429
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = MetricsRegistry()
+        self.counter = self.registry.register(Counter('test_questions', "Questions answered.", ['model']))
+        self.gauge = self.registry.register(Gauge('test_in_flight', "Requests in flight.", ['model']))
+        self.histogram = self.registry.register(Histogram('test_latency_seconds', "Latency.", ['model'], buckets=[1, 5]))
+
+    def test_counter_and_gauge(self):
+        self.counter.inc(model='GPT-4')
+        self.counter.inc(2, model='GPT-4')
+        self.gauge.inc(model='GPT-4')
+        self.gauge.dec(model='GPT-4')
+        self.assertEqual(self.counter.value(model='GPT-4'), 3)
+        self.assertEqual(self.gauge.value(model='GPT-4'), 0)
+        with self.assertRaises(ValueError):
+            self.counter.inc(-1, model='GPT-4')
+
+    def test_metric_without_samples_cannot_be_created(self):
+        class Incomplete(_Metric):
+            metric_type = 'gauge'
+
+        with self.assertRaises(TypeError):
+            Incomplete('test_incomplete', "Missing samples.")
+
+    def test_render_openmetrics(self):
+        self.counter.inc(model='GPT-4')
+        self.histogram.observe(0.5, model='GPT-4')
+        self.histogram.observe(3, model='GPT-4')
+        output = self.registry.render()
+
+        self.assertIn('# TYPE test_questions counter', output)
+        self.assertIn('test_questions_total{model="GPT-4"} 1', output)
+        self.assertIn('test_latency_seconds_bucket{model="GPT-4",le="1"} 1', output)
+        self.assertIn('test_latency_seconds_bucket{model="GPT-4",le="5"} 2', output)
+        self.assertIn('test_latency_seconds_bucket{model="GPT-4",le="+Inf"} 2', output)
+        self.assertIn('test_latency_seconds_count{model="GPT-4"} 2', output)
+        self.assertIn('test_latency_seconds_sum{model="GPT-4"} 3.5', output)
+        self.assertTrue(output.endswith('# EOF\n'))
+
+    def test_write_textfile(self):
+        self.counter.inc(model='GPT-4')
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'benchmark.prom')
+            write_textfile(path, self.registry)
+            with open(path) as metrics_file:
+                self.assertIn('test_questions_total{model="GPT-4"} 1', metrics_file.read())
+
+    def test_http_exporter(self):
+        self.counter.inc(model='GPT-4')
+        exporter = MetricsExporter(port=0, registry=self.registry).start()
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{exporter.port}/metrics") as response:
+                body = response.read().decode('utf-8')
+                self.assertIn('application/openmetrics-text', response.headers['Content-Type'])
+        finally:
+            exporter.stop()
+        self.assertIn('test_questions_total{model="GPT-4"} 1', body)
+
+    def test_is_rate_limit_error(self):
+        self.assertTrue(is_rate_limit_error(RateLimitError("Too many requests")))
+        self.assertFalse(is_rate_limit_error(ValueError("Bad request")))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+import os
+import sqlite3
+import tempfile
+import pandas as pd
+from src.model_names import determine_provider, clean_model_name, resolve_display_name
+from src.data_processing import save_results_to_sqlite, ensure_display_columns
+
+class TestModelNames(unittest.TestCase):
+
+    def test_registry_models_use_configured_names(self):
+        self.assertEqual(resolve_display_name('gpt-4o-mini-2024-07-18'), ('GPT-4o Mini', 'OpenAI'))
+        self.assertEqual(resolve_display_name('GPT-4o Mini'), ('GPT-4o Mini', 'OpenAI'))
+        # The API route is not shown as the provider
+        self.assertEqual(resolve_display_name('mistral-large-latest'), ('Mistral Large', 'Mistral'))
+
+    def test_unknown_models_fall_back_to_heuristics(self):
+        self.assertEqual(determine_provider('gpt-4-0613'), 'OpenAI')
+        self.assertEqual(clean_model_name('gpt-4-0613', 'OpenAI'), 'GPT-4')
+        self.assertEqual(resolve_display_name('claude-2-1-instant-20231121'), ('Claude-2.1 Instant', 'Anthropic'))
+        self.assertEqual(resolve_display_name('claude'), ('claude', 'Anthropic'))
+        self.assertEqual(resolve_display_name('some_model'), ('some_model', 'Unknown'))
+
+    def test_names_are_memoized(self):
+        resolve_display_name.cache_clear()
+        resolve_display_name('gpt-4-0613')
+        resolve_display_name('gpt-4-0613')
+        self.assertEqual(resolve_display_name.cache_info().hits, 1)
+
+    def test_display_names_stored_with_summaries(self):
+        results = pd.DataFrame({
+            'Round': [1, 1],
+            'Discipline': ['Marketing'] * 2,
+            'Category': ['SEO'] * 2,
+            'Question_Code': ['Q1', 'Q2'],
+            'Is_Correct': [True, False]
+        })
+        with tempfile.TemporaryDirectory() as temp_dir:
+            db_path = os.path.join(temp_dir, 'results.db')
+            conn = sqlite3.connect(db_path)
+            # A summary written before display names were stored
+            conn.execute("CREATE TABLE category_summary (Model TEXT, Round INTEGER, Date TEXT, TOTAL REAL, SEO REAL)")
+            conn.execute("INSERT INTO category_summary VALUES ('gpt-4-0613', 1, '2023-01-01', 50.0, 50.0)")
+            conn.commit()
+            conn.close()
+
+            save_results_to_sqlite(results, 'gpt-4o-2024-05-13', '2024-01-01', db_path)
+
+            conn = sqlite3.connect(db_path)
+            try:
+                for table in ('model_summary', 'discipline_summary'):
+                    self.assertEqual(conn.execute(f"SELECT Display_Name, Provider FROM {table}").fetchall(), [('GPT-4o', 'OpenAI')])
+                self.assertEqual(conn.execute("SELECT Model, Display_Name, Provider FROM category_summary ORDER BY Date").fetchall(),
+                                 [('gpt-4-0613', 'GPT-4', 'OpenAI'), ('gpt-4o-2024-05-13', 'GPT-4o', 'OpenAI')])
+                column_types = {info[1]: info[2] for info in conn.execute("PRAGMA table_info(category_summary)")}
+                self.assertEqual((column_types['Display_Name'], column_types['Provider']), ('TEXT', 'TEXT'))
+
+                ensure_display_columns(conn, 'missing_summary')
+                self.assertIsNone(conn.execute("SELECT name FROM sqlite_master WHERE name = 'missing_summary'").fetchone())
+            finally:
+                conn.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+from src.model_registry import ModelRegistry, parse_price, validate_model
+
+class TestModelRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.entries = [
+            {'name': 'GPT-4', 'variant': 'gpt-4-0613', 'provider': 'OpenAI', 'prompt': '30 / 1000000', 'completion': '60 / 1000000'},
+            {'name': 'Claude-3 Opus', 'variant': 'claude-3-opus-20240229', 'provider': 'Anthropic', 'prompt': '15 / 1000000', 'completion': '75 / 1000000'},
+            {'name': 'GPT-4o', 'variant': 'gpt-4o-2024-05-13', 'provider': 'OpenAI', 'prompt': 2.5e-06, 'completion': '10 / 1000000',
+             'expected_completion_tokens': 5},
+        ]
+
+    def test_parse_price(self):
+        self.assertEqual(parse_price("10 / 1000000"), 0.00001)
+        self.assertEqual(parse_price("(1 + 2) * -3"), -9)
+        self.assertEqual(parse_price(0.5), 0.5)
+
+    def test_parse_price_rejects_code(self):
+        for expression in ("__import__('os').system('echo hi')", "2 ** 1000000000", "1 / 0", "abc", "", "True + 1"):
+            with self.assertRaises(ValueError):
+                parse_price(expression)
+
+    def test_registry_indexes(self):
+        registry = ModelRegistry(self.entries)
+        self.assertEqual(len(registry), 3)
+        self.assertEqual(registry.by_variant['gpt-4-0613']['name'], 'GPT-4')
+        self.assertEqual([model['name'] for model in registry.by_provider['OpenAI']], ['GPT-4', 'GPT-4o'])
+        self.assertEqual(registry.get('GPT-4')['prompt'], 0.00003)
+        self.assertIn('Claude-3 Opus', registry)
+
+    def test_select_keeps_config_order(self):
+        registry = ModelRegistry(self.entries)
+        selected = registry.select(['GPT-4o', 'Unknown', 'GPT-4'])
+        self.assertEqual([model['name'] for model in selected], ['GPT-4', 'GPT-4o'])
+
+    def test_entries_are_not_mutated(self):
+        ModelRegistry(self.entries)
+        self.assertEqual(self.entries[0]['prompt'], '30 / 1000000')
+
+    def test_rejects_invalid_definitions(self):
+        invalid_entries = [
+            {'name': 'X', 'provider': 'OpenAI', 'prompt': '1', 'completion': '1'},
+            {'name': 'X', 'variant': 'x', 'provider': 'OpenAI', 'prompt': 'one', 'completion': '1'},
+            {'name': 'X', 'variant': 'x', 'provider': 'OpenAI', 'prompt': '-1', 'completion': '1'},
+            {'name': 'X', 'variant': 'x', 'provider': 'OpenAI', 'prompt': '1', 'completion': '1', 'expected_completion_tokens': 0},
+        ]
+        for entry in invalid_entries:
+            with self.assertRaises(ValueError):
+                validate_model(entry)
+
+    def test_rejects_duplicates(self):
+        with self.assertRaises(ValueError):
+            ModelRegistry(self.entries + [dict(self.entries[0], variant='other')])
+        with self.assertRaises(ValueError):
+            ModelRegistry(self.entries + [dict(self.entries[0], name='Other')])
+
+if __name__ == '__main__':
+    unittest.main()
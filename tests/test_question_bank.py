@@ -0,0 +1,84 @@
+import unittest
+import sqlite3
+from unittest.mock import MagicMock, patch
+from src.question_bank import ingest_questions, read_question_chunks
+from tests.helpers import TempDatabaseMixin, make_questions
+
+# Spreadsheet headers as question writers type them; ingest_questions normalizes them
+FILE_HEADERS = {'Question_Code': 'Question Code', 'Sub_Category': 'Sub-Category', 'Correct_Option': 'Correct Option'}
+
+def make_bank(**columns):
+    defaults = {'Category': ['SEO', 'SEO', 'PR'], 'Sub_Category': ['On-page', '', 'Media'],
+                'Question': ['First?', 'Second?', 'Third?'], 'Correct_Option': ['A', 'B', 'C']}
+    return make_questions(**{**defaults, **columns}).rename(columns=FILE_HEADERS)
+
+class TestQuestionBank(TempDatabaseMixin, unittest.TestCase):
+
+    db_name = 'questions.db'
+
+    def setUp(self):
+        super().setUp()
+        self.csv_path = self.path('questions.csv')
+
+    def ingest(self, questions, **kwargs):
+        questions.to_csv(self.csv_path, index=False)
+        return ingest_questions(self.csv_path, self.db_path, **kwargs)
+
+    def test_only_changed_questions_are_rewritten(self):
+        report = self.ingest(make_bank(), chunk_size=2)
+        self.assertEqual(report[:3], (3, 0, 0))
+        self.assertEqual(self.query("SELECT Question_Code, Sub_Category FROM questions ORDER BY Question_Code"),
+                         [('Q1', 'On-page'), ('Q2', None), ('Q3', 'Media')])
+        ids = self.query("SELECT id FROM questions ORDER BY Question_Code")
+
+        report = self.ingest(make_bank(Question=['First?', 'Second, edited?', 'Third?']), chunk_size=2)
+        self.assertEqual(report[:3], (0, 1, 2))
+        self.assertEqual(self.query("SELECT Question FROM questions WHERE Question_Code = 'Q2'"), [('Second, edited?',)])
+        self.assertEqual(self.query("SELECT id FROM questions ORDER BY Question_Code"), ids)
+
+    def test_indexes_and_pruning(self):
+        self.ingest(make_bank())
+        indexes = {row[0] for row in self.query("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'questions'")}
+        self.assertTrue({'idx_questions_code', 'idx_questions_category', 'idx_questions_discipline'}.issubset(indexes))
+
+        report = self.ingest(make_bank().iloc[:2])
+        self.assertEqual((report.missing, report.removed), (1, 0))
+        report = self.ingest(make_bank().iloc[:2], prune=True)
+        self.assertEqual((report.missing, report.removed), (0, 1))
+        self.assertEqual(self.query("SELECT COUNT(*) FROM questions"), [(2,)])
+
+    def test_existing_table_is_upgraded(self):
+        # Tables written by the old script: every value as text, no hash or unique index
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE questions (id INTEGER PRIMARY KEY AUTOINCREMENT, Question_Code TEXT, Category TEXT, Question TEXT)")
+        conn.execute("INSERT INTO questions (Question_Code, Category, Question) VALUES ('Q1', 'SEO', 'nan')")
+        conn.commit()
+        conn.close()
+
+        report = self.ingest(make_bank())
+        self.assertEqual(report[:3], (2, 1, 0))
+        self.assertEqual(self.query("SELECT COUNT(*), COUNT(Content_Hash) FROM questions"), [(3, 3)])
+
+    def test_duplicate_codes_roll_back(self):
+        self.ingest(make_bank())
+        with self.assertRaises(ValueError):
+            self.ingest(make_bank(Question_Code=['Q1', 'Q1', 'Q4'], Question=['New?'] * 3))
+        self.assertEqual(self.query("SELECT Question FROM questions WHERE Question_Code = 'Q1'"), [('First?',)])
+
+    def test_excel_blank_header_keeps_columns_aligned(self):
+        xlsx_path = self.path('questions.xlsx')
+        open(xlsx_path, 'w').close()
+        openpyxl = MagicMock()
+        openpyxl.load_workbook.return_value.active.iter_rows.return_value = iter([
+            ('Question Code', None, 'Question', 'Correct Option'),
+            ('Q1', 'note', 'First?', 'A'),
+            (None, None, None, None),
+            ('Q2', None, 'Second?', 'B'),
+        ])
+        with patch.dict('sys.modules', {'openpyxl': openpyxl}):
+            chunks = list(read_question_chunks(xlsx_path))
+        self.assertEqual(chunks, [[{'Question_Code': 'Q1', 'Question': 'First?', 'Correct_Option': 'A'},
+                                   {'Question_Code': 'Q2', 'Question': 'Second?', 'Correct_Option': 'B'}]])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from src.analysis import CorrectnessMatrix
+from src.question_sets import (
+    question_statistics, kendall_tau, select_core_subset, save_question_set, load_question_set, list_question_sets
+)
+
+def make_matrix(scores, categories):
+    runs = pd.DataFrame({'Label': [f'Run {i}' for i in range(len(scores))]})
+    codes = np.array([f'Q{i:03d}' for i in range(len(categories))])
+    return CorrectnessMatrix(runs, codes, np.array(categories), np.array(scores, dtype=float))
+
+class TestQuestionSets(unittest.TestCase):
+
+    def setUp(self):
+        # Run i answers the questions whose ability threshold is below its own; Q3 and Q7 are
+        # answered by every run and Q5 by none
+        thresholds = [0.1, 0.3, 0.5, 0.0, 0.7, 2.0, 0.9, 0.0]
+        abilities = [0.2, 0.4, 0.6, 0.8, 1.0]
+        scores = [[float(ability > threshold) for threshold in thresholds] for ability in abilities]
+        self.matrix = make_matrix(scores, ['SEO', 'SEO', 'SEO', 'SEO', 'PR', 'PR', 'PR', 'PR'])
+
+    def test_question_statistics(self):
+        statistics = question_statistics(self.matrix).set_index('Question_Code')
+        self.assertAlmostEqual(statistics.loc['Q000', 'Difficulty'], 0.0)
+        self.assertAlmostEqual(statistics.loc['Q005', 'Difficulty'], 1.0)
+        # Questions every run answers the same way do not discriminate
+        self.assertEqual(statistics.loc['Q003', 'Discrimination'], 0.0)
+        self.assertEqual(statistics.loc['Q005', 'Discrimination'], 0.0)
+        self.assertGreater(statistics.loc['Q002', 'Discrimination'], 0.5)
+        self.assertEqual(list(statistics['Runs']), [5] * 8)
+
+    def test_kendall_tau(self):
+        self.assertAlmostEqual(kendall_tau(np.array([1.0, 2.0, 3.0]), np.array([10.0, 20.0, 30.0])), 1.0)
+        self.assertAlmostEqual(kendall_tau(np.array([1.0, 2.0, 3.0]), np.array([3.0, 2.0, 1.0])), -1.0)
+        self.assertAlmostEqual(kendall_tau(np.array([1.0, 2.0, np.nan]), np.array([1.0, 2.0, 0.0])), 1.0)
+
+    def test_core_subset_is_balanced_and_preserves_ranking(self):
+        subset = select_core_subset(self.matrix, fraction=0.25, min_tau=0.99)
+        self.assertGreaterEqual(subset.kendall_tau, 0.99)
+        self.assertEqual(subset.statistics['Category'].value_counts().to_dict(), {'SEO': 2, 'PR': 2})
+        self.assertNotIn('Q003', subset.question_codes)
+        self.assertNotIn('Q005', subset.question_codes)
+
+        with self.assertRaises(ValueError):
+            select_core_subset(make_matrix([[1.0, 0.0]], ['SEO', 'SEO']))
+
+    def test_save_and_load_question_set(self):
+        subset = select_core_subset(self.matrix, fraction=0.5)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            db_path = os.path.join(temp_dir, 'questions.db')
+            save_question_set('core', subset.statistics, db_path)
+            self.assertEqual(load_question_set('core', db_path), sorted(subset.question_codes))
+
+            # Saving again under the same name replaces the set
+            save_question_set('core', subset.statistics.head(1), db_path)
+            self.assertEqual(load_question_set('core', db_path), [subset.question_codes[0]])
+            self.assertEqual(list_question_sets(db_path)[['Name', 'Questions']].values.tolist(), [['core', 1]])
+
+            with self.assertRaises(ValueError):
+                load_question_set('missing', db_path)
+
+if __name__ == '__main__':
+    unittest.main()
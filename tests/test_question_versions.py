@@ -0,0 +1,43 @@
+import unittest
+from src.data_processing import save_results_to_sqlite, load_completed_questions, question_version, question_versions
+from src.question_versions import find_stale_results, recompute_current_summaries
+from tests.helpers import TempDatabaseMixin, make_questions, make_results, record_adaptive_round
+
+def make_pair(first_question='First?'):
+    return make_questions(('Q1', 'Q2'), Question=[first_question, 'Second?'], Correct_Option=['A', 'B'])
+
+class TestQuestionVersions(TempDatabaseMixin, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        old_versions = question_versions(make_pair())
+        results = make_results(1, ['Q1', 'Q2'], [True, False], Question_Version=[old_versions['Q1'], old_versions['Q2']])
+        save_results_to_sqlite(results, 'gpt-4', '2024-01-01', self.db_path)
+        self.versions = question_versions(make_pair('First, reworded?'))
+
+    def test_question_version(self):
+        question = make_pair().iloc[0]
+        self.assertEqual(question_version(question), question_version(question.to_dict()))
+        self.assertNotEqual(question_version(question), question_version(make_pair('Other?').iloc[0]))
+        # Fields the model never sees don't change the version
+        self.assertEqual(question_version(question), question_version({**question.to_dict(), 'Category': 'PR'}))
+
+    def test_edited_questions_are_not_completed(self):
+        self.assertEqual(load_completed_questions('gpt-4', '2024-01-01', self.db_path), {(1, 'Q1'), (1, 'Q2')})
+        self.assertEqual(load_completed_questions('gpt-4', '2024-01-01', self.db_path, self.versions), {(1, 'Q2')})
+
+    def test_find_stale_results_and_recompute(self):
+        stale = find_stale_results(self.versions, self.db_path)
+        self.assertEqual(stale[['Model', 'Round', 'Question_Code']].values.tolist(), [['gpt-4', 1, 'Q1']])
+
+        self.assertEqual(recompute_current_summaries(self.versions, self.db_path), 1)
+        self.assertEqual(self.query("SELECT Round, Percentage_Correct FROM model_summary"), [(1, 0.0)])
+
+    def test_recompute_keeps_adaptive_percentages(self):
+        record_adaptive_round(self.db_path, 'gpt-4', '2024-01-01', 1, {'TOTAL': 62.5, 'Category': {'SEO': 62.5}})
+        recompute_current_summaries(self.versions, self.db_path)
+        self.assertEqual(self.query("SELECT Round, Percentage_Correct FROM model_summary"), [(1, 62.5)])
+        self.assertEqual(self.query("SELECT TOTAL, SEO FROM category_summary"), [(62.5, 62.5)])
+
+if __name__ == '__main__':
+    unittest.main()
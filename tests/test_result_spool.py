@@ -0,0 +1,128 @@
+import unittest
+import os
+import sqlite3
+import time
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+from src.cli import save_round, replay_interrupted_rounds
+from src.data_processing import question_versions, save_results_to_sqlite
+from src.result_spool import ResultSpool, SpooledRound, read_spool_file, replay_spool
+from tests.helpers import TempDatabaseMixin, make_questions, make_results, record_adaptive_round
+
+def make_answers(round_number, codes, correct=True):
+    return make_results(round_number, codes, correct).to_dict('records')
+
+class TestResultSpool(TempDatabaseMixin, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.folder = self.path('Spool')
+
+    def test_rounds_are_saved_in_the_background(self):
+        spool = ResultSpool(save_round, self.db_path, folder=self.folder, flush_interval=0.05).start()
+        for result in make_answers(1, ['Q1', 'Q2', 'Q3'], [True, True, False]):
+            spool.add('gpt-4', '2024-01-01', result)
+        spool.finish_round('gpt-4', '2024-01-01', 1)
+        self.assertTrue(os.path.exists(spool.path))
+        spool.close()
+
+        self.assertEqual(self.query('SELECT COUNT(*) FROM "2024_01_01_gpt_4"'), [(3,)])
+        self.assertEqual(self.query('SELECT Round, Percentage_Correct FROM model_summary'), [(1, 66.67)])
+        # Everything reached the database, so nothing is left to replay
+        self.assertFalse(os.path.exists(spool.path))
+
+    def test_failed_save_keeps_the_spool_file(self):
+        spool = ResultSpool(MagicMock(side_effect=sqlite3.OperationalError('database is locked')), self.db_path,
+                            folder=self.folder, flush_interval=0.05).start()
+        spool.add('gpt-4', '2024-01-01', make_answers(1, ['Q1'])[0])
+        spool.finish_round('gpt-4', '2024-01-01', 1)
+        spool.close()
+
+        self.assertTrue(spool.failed)
+        self.assertEqual([len(spooled.results) for spooled in read_spool_file(spool.path)], [1])
+
+    def test_replay_after_crash(self):
+        # The flusher never runs, as if the process died before it could save anything
+        spool = ResultSpool(save_round, self.db_path, folder=self.folder)
+        for result in make_answers(1, ['Q1', 'Q2', 'Q3']):
+            spool.add('gpt-4', '2024-01-01', result)
+        spool.finish_round('gpt-4', '2024-01-01', 1)
+        second_round = make_answers(2, ['Q1', 'Q2'], [True, False])
+        for result in second_round:
+            spool.add('gpt-4', '2024-01-01', result)
+        spool._file.close()
+        # The first answer of the unfinished round reached the database before the crash
+        save_round(SpooledRound(self.db_path, 'gpt-4', '2024-01-01', 2, second_round[:1], None, False))
+
+        # A recently written file may belong to a run that is still going
+        self.assertEqual(replay_spool(save_round, self.folder, stale_seconds=60), 0)
+
+        stale = time.time() - 120
+        os.utime(spool.path, (stale, stale))
+        self.assertEqual(replay_spool(save_round, self.folder, stale_seconds=60), 4)
+        self.assertEqual(self.query('SELECT Round, COUNT(*) FROM "2024_01_01_gpt_4" GROUP BY Round'), [(1, 3), (2, 2)])
+        self.assertEqual(self.query('SELECT Round, Percentage_Correct FROM model_summary ORDER BY Round'), [(1, 100.0), (2, 50.0)])
+        self.assertEqual(os.listdir(self.folder), [])
+        self.assertEqual(replay_spool(save_round, self.folder, stale_seconds=60), 0)
+
+    def test_replayed_adaptive_round_keeps_its_percentages(self):
+        spool = ResultSpool(save_round, self.db_path, folder=self.folder)
+        answers = make_answers(1, ['Q1', 'Q2'], [True, False])
+        for result in answers:
+            spool.add('gpt-4', '2024-01-01', result)
+        percentages = {'TOTAL': 62.5, 'Category': {'SEO': 62.5}}
+        spool.finish_round('gpt-4', '2024-01-01', 1, percentages)
+        spool._file.close()
+        record_adaptive_round(self.db_path, 'gpt-4', '2024-01-01', 1, percentages)
+        # Half of the round reached the database before the crash, so replay rebuilds its summaries
+        save_round(SpooledRound(self.db_path, 'gpt-4', '2024-01-01', 1, answers[:1], None, False))
+
+        stale = time.time() - 120
+        os.utime(spool.path, (stale, stale))
+        self.assertEqual(replay_spool(save_round, self.folder, stale_seconds=60), 1)
+        self.assertEqual(self.query("SELECT Round, Percentage_Correct FROM model_summary"), [(1, 62.5)])
+        self.assertEqual(self.query("SELECT TOTAL, SEO FROM category_summary"), [(62.5, 62.5)])
+
+    def test_adaptive_estimate_is_saved_with_its_round(self):
+        spool = ResultSpool(save_round, self.db_path, folder=self.folder)
+        for result in make_answers(1, ['Q1', 'Q2'], [True, False]):
+            spool.add('gpt-4', '2024-01-01', result)
+        percentages = {'TOTAL': 62.5, 'Category': {'SEO': 62.5}}
+        estimate = {'Ability': 0.4, 'Standard_Error': 0.3, 'Questions': 2, 'Pool': 10, 'Percentages': percentages}
+        spool.finish_round('gpt-4', '2024-01-01', 1, percentages, estimate=estimate)
+        spool._file.close()
+        # Nothing reaches the database before the round is saved
+        self.assertFalse(os.path.exists(self.db_path))
+
+        stale = time.time() - 120
+        os.utime(spool.path, (stale, stale))
+        self.assertEqual(replay_spool(save_round, self.folder, stale_seconds=60), 2)
+        self.assertEqual(self.query("SELECT Round, Ability, Percentage_Correct FROM adaptive_estimates"), [(1, 0.4, 62.5)])
+        self.assertEqual(self.query("SELECT Round, Percentage_Correct FROM model_summary"), [(1, 62.5)])
+
+        # Saving the round again replaces its estimate
+        save_round(SpooledRound(self.db_path, 'gpt-4', '2024-01-01', 1, [], percentages, True, dict(estimate, Ability=0.5)))
+        self.assertEqual(self.query("SELECT Round, Ability FROM adaptive_estimates"), [(1, 0.5)])
+
+    def test_replay_leaves_out_answers_to_edited_questions(self):
+        questions = make_questions(['Q1', 'Q2'])
+        versions = question_versions(questions)
+        # Q1 was answered before it was edited
+        save_results_to_sqlite(make_results(1, ['Q1'], Question_Version='old'), 'gpt-4', '2024-01-01', self.db_path)
+        spool = ResultSpool(save_round, self.db_path, folder=self.folder)
+        answers = make_results(1, ['Q1', 'Q2'], [False, True], Question_Version=[versions['Q1'], versions['Q2']],
+                               Timestamp=[datetime(2024, 1, 2, 12, 0)] * 2)
+        for result in answers.to_dict('records'):
+            spool.add('gpt-4', '2024-01-01', result)
+        spool.finish_round('gpt-4', '2024-01-01', 1, refresh=True)
+        spool._file.close()
+
+        stale = time.time() - 120
+        os.utime(spool.path, (stale, stale))
+        with patch('src.cli.load_questions', return_value=questions):
+            self.assertEqual(replay_interrupted_rounds(self.folder, stale_seconds=60), 2)
+        self.assertEqual(self.query('SELECT COUNT(*) FROM "2024_01_01_gpt_4"'), [(3,)])
+        self.assertEqual(self.query("SELECT Round, Percentage_Correct FROM model_summary"), [(1, 50.0)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+import pandas as pd
+from src.sharding import parse_shard, in_shard, sample_round_questions, filter_shard, _stable_hash
+
+class TestSharding(unittest.TestCase):
+
+    def setUp(self):
+        self.questions_df = pd.DataFrame({
+            'Question_Code': [f'Q{i:03d}' for i in range(100)],
+            'Category': ['SEO'] * 100
+        })
+
+    def test_parse_shard(self):
+        self.assertEqual(parse_shard('2/4'), (2, 4))
+        for value in ('0/4', '5/4', '2', 'a/b', '1/0'):
+            with self.assertRaises(ValueError):
+                parse_shard(value)
+
+    def test_shards_partition_cells(self):
+        for code in self.questions_df['Question_Code']:
+            owners = [index for index in range(1, 4) if in_shard(7, 'gpt-4', 1, code, index, 3)]
+            self.assertEqual(len(owners), 1)
+
+    def test_shards_are_balanced(self):
+        sizes = [len(filter_shard(self.questions_df, 0, 'gpt-4', 1, index, 4)) for index in range(1, 5)]
+        self.assertEqual(sum(sizes), 100)
+        self.assertTrue(all(10 <= size <= 40 for size in sizes))
+
+    def test_sample_is_reproducible_and_order_independent(self):
+        shuffled_df = self.questions_df.sample(frac=1, random_state=1)
+        first = sample_round_questions(self.questions_df, 10, 3, 2)
+        second = sample_round_questions(shuffled_df, 10, 3, 2)
+        self.assertEqual(list(first['Question_Code']), list(second['Question_Code']))
+        other_round = sample_round_questions(self.questions_df, 10, 3, 3)
+        self.assertNotEqual(list(first['Question_Code']), list(other_round['Question_Code']))
+
+    def test_sample_caps_at_available_questions(self):
+        self.assertEqual(len(sample_round_questions(self.questions_df, 500, 0, 1)), 100)
+
+    def test_growing_the_pool_keeps_earlier_picks(self):
+        first = set(sample_round_questions(self.questions_df.iloc[:60], 10, 3, 2)['Question_Code'])
+        grown = set(sample_round_questions(self.questions_df, 10, 3, 2)['Question_Code'])
+        added = {code for code in grown if code >= 'Q060'}
+        # Only new questions can displace earlier picks, so every other pick is unchanged
+        self.assertEqual(grown - added, set(sorted(first, key=lambda code: _stable_hash(3, 2, code))[:10 - len(added)]))
+
+if __name__ == '__main__':
+    unittest.main()
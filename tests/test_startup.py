@@ -0,0 +1,46 @@
+import os
+import subprocess
+import sys
+import unittest
+from typing import Dict
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must not be imported just to start the CLI or show --help
+HEAVY_MODULES = ['pandas', 'numpy', 'openai', 'anthropic', 'together', 'mistralai', 'vertexai', 'google.cloud.aiplatform', 'tiktoken', 'dotenv']
+
+# Generous ceiling for the cumulative import time of src.cli, in microseconds
+IMPORT_BUDGET_US = 1_000_000
+
+def import_times(statement: str) -> Dict[str, int]:
+    """Run `statement` under -X importtime and return cumulative import time per module."""
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+    )
+    times: Dict[str, int] = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+class TestStartup(unittest.TestCase):
+
+    def test_cli_import_skips_heavy_modules(self):
+        times = import_times('import src.cli')
+        loaded = sorted(name for name in times if name.split('.')[0] in HEAVY_MODULES or name in HEAVY_MODULES)
+        self.assertEqual(loaded, [], f"Heavy modules imported at start-up: {loaded}")
+
+    def test_cli_import_time_budget(self):
+        times = import_times('import src.cli')
+        self.assertLess(times['src.cli'], IMPORT_BUDGET_US, f"src.cli took {times['src.cli'] / 1e6:.2f}s to import")
+
+    def test_help_runs(self):
+        completed = subprocess.run([sys.executable, 'main.py', '--help'], cwd=PROJECT_ROOT, capture_output=True, text=True, timeout=60)
+        self.assertEqual(completed.returncode, 0, completed.stderr)
+        self.assertIn('--num-questions', completed.stdout)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,6 @@
 import unittest
 from unittest.mock import patch, MagicMock
-from src.user_interface import get_user_inputs, confirm_run, clear_console, curses_menu, select_models, select_categories
+from src.user_interface import get_user_inputs, confirm_run, clear_console, curses_menu, select_models, select_categories, SelectionMenu
 
 # Mock curses module in case it's not available
 try:
@@ -40,6 +40,16 @@ class TestUserInterface(unittest.TestCase):
         result = confirm_run(10.0, [('Model1', 5.0), ('Model2', 5.0)], 2, 100, 200)
         self.assertFalse(result)
 
+    @patch('builtins.print')
+    @patch('builtins.input')
+    def test_confirm_run_with_bounds(self, mock_input, mock_print):
+        mock_input.return_value = 'y'
+        result = confirm_run(3.0, [('Model1', 1.0, 0.5, 1.5), ('Model2', 2.0, 1.0, 3.0)], 1, 100, 200)
+        self.assertTrue(result)
+        printed = [str(call.args[0]) for call in mock_print.call_args_list if call.args]
+        self.assertIn("  Model1: $1.000 (likely range $0.500 - $1.500)", printed)
+        self.assertIn("Total likely range: $1.500 - $4.500", printed)
+
     @patch('os.system')
     def test_clear_console(self, mock_system):
         clear_console()
@@ -68,6 +78,7 @@ class TestUserInterface(unittest.TestCase):
     @patch('src.user_interface.curses', mock_curses)
     def test_curses_menu(self):
         mock_stdscr = MagicMock()
+        mock_stdscr.getmaxyx.return_value = (24, 80)
         mock_stdscr.getch.side_effect = [
             mock_curses.KEY_DOWN,
             ord(' '),
@@ -81,5 +92,58 @@ class TestUserInterface(unittest.TestCase):
         mock_stdscr.refresh.assert_called()
         mock_stdscr.addstr.assert_called()
 
+    def make_menu(self, items, height=10, width=40, **kwargs):
+        stdscr = MagicMock()
+        stdscr.getmaxyx.return_value = (height, width)
+        return SelectionMenu(stdscr, items, "Prompt", **kwargs), stdscr
+
+    def test_selection_menu_scrolls_within_screen(self):
+        items = [f"Run {i}" for i in range(1000)]
+        menu, stdscr = self.make_menu(items)
+        menu.draw(full=True)
+        for _ in range(20):
+            menu.handle_key(curses.KEY_DOWN)
+        stdscr.addstr.reset_mock()
+        menu.draw()
+
+        rows = [call.args[0] for call in stdscr.addstr.call_args_list]
+        self.assertTrue(all(row < 10 for row in rows))
+        # Six entries fit below the header; the cursor is on the last visible row
+        self.assertEqual(menu.top, 15)
+        self.assertIn((8, 0, '[ ] Run 20', curses.A_REVERSE), [call.args for call in stdscr.addstr.call_args_list])
+
+        # Moving the cursor within the page only rewrites the two rows whose highlight changed
+        menu.handle_key(curses.KEY_UP)
+        stdscr.addstr.reset_mock()
+        menu.draw()
+        self.assertEqual(sorted(call.args[0] for call in stdscr.addstr.call_args_list), [7, 8])
+
+    def test_selection_menu_filters(self):
+        items = ['GPT-4o', 'GPT-4o Mini', 'Claude-3 Opus', 'Gemini-1.5 Pro']
+        menu, _ = self.make_menu(items, require_selection=True)
+        for char in 'gpt':
+            menu.handle_key(ord(char))
+        self.assertEqual(menu.shown, [0, 1])
+        menu.handle_key(ord('-'))
+        menu.handle_key(ord('4'))
+        menu.handle_key(ord('o'))
+        menu.handle_key(ord('m'))
+        self.assertEqual(menu.shown, [])
+        menu.handle_key(127)
+        menu.handle_key(1)
+        self.assertEqual(menu.selected, {0, 1})
+        menu.handle_key(27)
+        self.assertEqual(menu.shown, [0, 1, 2, 3])
+
+        menu.handle_key(1)
+        menu.handle_key(1)
+        self.assertEqual(menu.selected, set())
+        self.assertFalse(menu.handle_key(10))
+        self.assertTrue(menu.message)
+        menu.handle_key(curses.KEY_END)
+        menu.handle_key(ord(' '))
+        self.assertTrue(menu.handle_key(10))
+        self.assertEqual(menu.selected, {3})
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
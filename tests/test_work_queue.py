@@ -0,0 +1,104 @@
+import unittest
+import time
+from src.work_queue import WorkQueue, LeaseHeartbeat
+from tests.helpers import TempDatabaseMixin
+
+class TestWorkQueue(TempDatabaseMixin, unittest.TestCase):
+
+    db_name = 'queue.db'
+
+    def setUp(self):
+        super().setUp()
+        self.queue = WorkQueue(self.db_path, lease_seconds=60, max_attempts=2)
+        self.queue.enqueue('run-1', '2024-01-01', [('GPT-4', 1, 'Q1'), ('GPT-4', 1, 'Q2'), ('Claude-3 Opus', 1, 'Q1')])
+
+    def test_enqueue_ignores_duplicates(self):
+        added = self.queue.enqueue('run-1', '2024-01-01', [('GPT-4', 1, 'Q1'), ('GPT-4', 2, 'Q1')])
+        self.assertEqual(added, 1)
+        self.assertEqual(self.queue.counts('run-1'), {'pending': 4})
+
+    def test_items_carry_their_few_shot_count(self):
+        self.queue.enqueue('run-2', '2024-01-01', [('GPT-4', 1, 'Q1')], few_shot=3)
+        self.assertEqual(self.queue.claim('worker-a', run_id='run-2').few_shot, 3)
+        self.assertEqual(self.queue.claim('worker-a', run_id='run-1').few_shot, 0)
+        # A run keeps one prompt variant
+        with self.assertRaises(ValueError):
+            self.queue.enqueue('run-2', '2024-01-01', [('GPT-4', 2, 'Q1')])
+
+    def test_claims_are_exclusive(self):
+        first = self.queue.claim('worker-a')
+        second = self.queue.claim('worker-b')
+        self.assertNotEqual(first.id, second.id)
+        self.assertEqual(first.attempts, 1)
+        self.assertEqual(self.queue.counts(), {'pending': 1, 'leased': 2})
+
+    def test_claim_filters_by_model(self):
+        item = self.queue.claim('worker-a', model_names=('Claude-3 Opus',))
+        self.assertEqual(item.model_name, 'Claude-3 Opus')
+        self.assertIsNone(self.queue.claim('worker-a', model_names=('Claude-3 Opus',)))
+
+    def test_expired_lease_is_requeued(self):
+        self.queue.lease_seconds = -1
+        item = self.queue.claim('worker-a', model_names=('Claude-3 Opus',))
+        self.queue.lease_seconds = 60
+        reclaimed = self.queue.claim('worker-b', model_names=('Claude-3 Opus',))
+        self.assertEqual(reclaimed.id, item.id)
+        self.assertEqual(reclaimed.attempts, 2)
+        # The first worker lost its lease, so its late result is discarded
+        self.assertFalse(self.queue.complete(item.id, 'worker-a', {'Model_Answer': 'A'}))
+        self.assertTrue(self.queue.complete(item.id, 'worker-b', {'Model_Answer': 'B'}))
+
+    def test_expired_lease_fails_after_max_attempts(self):
+        self.queue.lease_seconds = -1
+        self.queue.claim('worker-a', model_names=('Claude-3 Opus',))
+        self.queue.claim('worker-b', model_names=('Claude-3 Opus',))
+        self.assertIsNone(self.queue.claim('worker-c', model_names=('Claude-3 Opus',)))
+        self.assertEqual(self.queue.counts(model_names=('Claude-3 Opus',)), {'failed': 1})
+
+    def test_heartbeat_extends_lease(self):
+        item = self.queue.claim('worker-a')
+        self.assertTrue(self.queue.heartbeat(item.id, 'worker-a'))
+        self.assertFalse(self.queue.heartbeat(item.id, 'worker-b'))
+
+    def test_lease_heartbeat_thread(self):
+        self.queue.lease_seconds = 3
+        item = self.queue.claim('worker-a')
+        with LeaseHeartbeat(self.queue, item.id, 'worker-a') as heartbeat:
+            time.sleep(1.2)
+        self.assertFalse(heartbeat.lost)
+        self.assertTrue(self.queue.complete(item.id, 'worker-a', None))
+
+    def test_release_returns_item_without_counting_attempt(self):
+        item = self.queue.claim('worker-a')
+        self.queue.release(item.id, 'worker-a')
+        self.assertEqual(self.queue.claim('worker-b').attempts, 1)
+
+    def test_finished_round_is_claimed_once(self):
+        for _ in range(2):
+            item = self.queue.claim('worker-a', model_names=('GPT-4',))
+            self.assertIsNone(self.queue.claim_finished_round('run-1', 'GPT-4', 1))
+            self.queue.complete(item.id, 'worker-a', {'Question_Code': item.question_code, 'Timestamp': '2024-01-01 00:00:00'})
+        results = self.queue.claim_finished_round('run-1', 'GPT-4', 1)
+        self.assertEqual([result['Question_Code'] for result in results], ['Q1', 'Q2'])
+        self.assertIsNone(self.queue.claim_finished_round('run-1', 'GPT-4', 1))
+        self.queue.unclaim_round('run-1', 'GPT-4', 1)
+        self.assertIsNotNone(self.queue.claim_finished_round('run-1', 'GPT-4', 1))
+
+    def test_round_whose_last_item_expires_is_listed_for_saving(self):
+        item = self.queue.claim('worker-a', model_names=('GPT-4',))
+        self.queue.complete(item.id, 'worker-a', {'Question_Code': item.question_code, 'Timestamp': '2024-01-01 00:00:00'})
+        # The round's last item is abandoned by both workers allowed to try it
+        self.queue.lease_seconds = -1
+        self.queue.claim('worker-a', model_names=('GPT-4',))
+        self.assertEqual(self.queue.finished_unsaved_rounds(), [])
+        self.queue.claim('worker-b', model_names=('GPT-4',))
+        self.assertIsNone(self.queue.claim('worker-c', model_names=('GPT-4',)))
+
+        rounds = self.queue.finished_unsaved_rounds(model_names=('GPT-4',))
+        self.assertEqual(rounds, [('run-1', 'GPT-4', 1, '2024-01-01')])
+        results = self.queue.claim_finished_round('run-1', 'GPT-4', 1)
+        self.assertEqual([result['Question_Code'] for result in results], ['Q1'])
+        self.assertEqual(self.queue.finished_unsaved_rounds(model_names=('GPT-4',)), [])
+
+if __name__ == '__main__':
+    unittest.main()
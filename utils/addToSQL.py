@@ -1,43 +1,39 @@
-import sqlite3
-import pandas as pd
-
-# Load data from Excel file
-file_path = '../../Test_Questions.xlsx'
-df = pd.read_excel(file_path)
-
-# Sanitize column names
-df.columns = [col.replace(' ', '_').replace('-', '_') for col in df.columns]
-
-# Convert all data to string format to ensure compatibility with SQLite
-df = df.astype(str)
-
-# Connect to SQLite database
-conn = sqlite3.connect('../../results_database.sqlite')
-cursor = conn.cursor()
-
-# Define table name
-table_name = 'questions'
-
-# Drop table if it exists
-cursor.execute(f'DROP TABLE IF EXISTS {table_name}')
-
-# Create table
-cursor.execute(f'''
-    CREATE TABLE IF NOT EXISTS {table_name} (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        {', '.join([f'{col} TEXT' for col in df.columns])}
-    )
-''')
-
-# Insert data into table
-for index, row in df.iterrows():
-    cursor.execute(f'''
-    INSERT INTO {table_name} ({', '.join(df.columns)})
-    VALUES ({', '.join(['?' for _ in df.columns])})
-    ''', tuple(row))
-
-# Commit and close connection
-conn.commit()
-conn.close()
-
-print("Excel sheet added to Questions table")
+import os
+import sys
+
+def add_project_root_to_path():
+    # Get the directory containing the current script (utils)
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    
+    # Get the parent directory of utils (which should be the project root)
+    project_root = os.path.dirname(current_dir)
+    
+    # Add the project root to sys.path if it's not already there
+    if project_root not in sys.path:
+        sys.path.insert(0, project_root)
+
+add_project_root_to_path()
+
+import click
+from src.constants import DATABASE_PATH
+from src.question_bank import CHUNK_SIZE, ingest_questions
+
+@click.command()
+@click.argument('source', type=click.Path(exists=True, dir_okay=False))
+@click.option('--db', 'db_path', default=DATABASE_PATH, type=click.Path(dir_okay=False), help='Database holding the questions table')
+@click.option('--chunk-size', default=CHUNK_SIZE, type=click.IntRange(min=1), help='Rows read and written per batch')
+@click.option('--prune', is_flag=True, help='Delete questions that are no longer in SOURCE')
+def main(source, db_path, chunk_size, prune):
+    """Load the question bank in SOURCE (CSV or Excel) into the questions table."""
+    report = ingest_questions(source, db_path, chunk_size, prune)
+    print(f"Questions from {source} loaded into {db_path}")
+    print(f"  New: {report.inserted}")
+    print(f"  Updated: {report.updated}")
+    print(f"  Unchanged: {report.unchanged}")
+    if prune:
+        print(f"  Removed: {report.removed}")
+    elif report.missing:
+        print(f"  Not in the file (kept, use --prune to delete): {report.missing}")
+
+if __name__ == '__main__':
+    main()
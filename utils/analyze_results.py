@@ -0,0 +1,63 @@
+import os
+import sys
+
+def add_project_root_to_path():
+    # Get the directory containing the current script (utils)
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+
+    # Get the parent directory of utils (which should be the project root)
+    project_root = os.path.dirname(current_dir)
+
+    # Add the project root to sys.path if it's not already there
+    if project_root not in sys.path:
+        sys.path.insert(0, project_root)
+
+add_project_root_to_path()
+
+from datetime import datetime
+
+import click
+from src.constants import DATABASE_PATH, RESULTS_FOLDER, BOOTSTRAP_RESAMPLES, BOOTSTRAP_CONFIDENCE, BOOTSTRAP_SEED, ANALYSIS_CACHE_FILE
+from src.analysis import load_correctness_matrix, analyze_runs
+
+@click.command()
+@click.option('--db', 'db_path', default=DATABASE_PATH, type=click.Path(exists=True, dir_okay=False), help='Results database to analyze')
+@click.option('--model', '-m', 'models', multiple=True, help='Model variant to include (can be specified multiple times; all if omitted)')
+@click.option('--date', default=None, help='Only include runs from this date (YYYY-MM-DD)')
+@click.option('--latest', is_flag=True, help='Only include the most recent run of each model')
+@click.option('--resamples', default=BOOTSTRAP_RESAMPLES, type=click.IntRange(min=1), help='Number of bootstrap resamples')
+@click.option('--confidence', default=BOOTSTRAP_CONFIDENCE, type=click.FloatRange(0, 1, min_open=True, max_open=True), help='Confidence level of the intervals')
+@click.option('--seed', default=BOOTSTRAP_SEED, type=int, help='Seed of the resamples')
+@click.option('--alpha', default=0.05, type=float, help='Significance level for listing differences between runs')
+@click.option('--no-cache', is_flag=True, help='Recompute even if the same analysis is cached')
+@click.option('--output', default=RESULTS_FOLDER, type=click.Path(file_okay=False), help='Folder for the CSV files')
+def main(db_path, models, date, latest, resamples, confidence, seed, alpha, no_cache, output):
+    """Bootstrap confidence intervals per model and category, and paired tests between models."""
+    matrix = load_correctness_matrix(db_path, models, date, latest)
+    if matrix.runs.empty:
+        print("No runs match the selection.")
+        return
+
+    intervals, tests = analyze_runs(matrix, resamples, confidence, seed, None if no_cache else ANALYSIS_CACHE_FILE)
+
+    level = f"{confidence:.0%}"
+    print(f"Accuracy of {len(matrix.runs)} runs over {len(matrix.question_codes)} questions ({level} intervals, {resamples} resamples):")
+    totals = intervals[intervals['Category'] == 'TOTAL'].sort_values('Accuracy', ascending=False)
+    for run in totals.itertuples(index=False):
+        print(f"  {run.Run}: {run.Accuracy:.1f}% [{run.Lower:.1f}, {run.Upper:.1f}] on {run.Questions} questions")
+
+    significant = tests[tests['P_Adjusted'] < alpha]
+    print(f"\n{len(significant)} of {len(tests)} pairs differ at p < {alpha} (Holm-adjusted):")
+    for pair in significant.sort_values('P_Adjusted').itertuples(index=False):
+        print(f"  {pair.Run_A} vs {pair.Run_B}: {pair.Difference:+.1f} points [{pair.Lower:+.1f}, {pair.Upper:+.1f}], p = {pair.P_Adjusted:.4f}")
+
+    today_date = datetime.today().strftime('%d-%m-%Y')
+    os.makedirs(output, exist_ok=True)
+    intervals_path = os.path.join(output, f"Bootstrap Intervals - {today_date}.csv")
+    tests_path = os.path.join(output, f"Paired Tests - {today_date}.csv")
+    intervals.to_csv(intervals_path, index=False)
+    tests.to_csv(tests_path, index=False)
+    print(f"\nSaved {intervals_path} and {tests_path}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+import os
+import sys
+
+def add_project_root_to_path():
+    # Get the directory containing the current script (utils)
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    
+    # Get the parent directory of utils (which should be the project root)
+    project_root = os.path.dirname(current_dir)
+    
+    # Add the project root to sys.path if it's not already there
+    if project_root not in sys.path:
+        sys.path.insert(0, project_root)
+
+add_project_root_to_path()
+
+import click
+from src.constants import DATABASE_PATH, EXPORT_FOLDER, EXPORT_BATCH_SIZE
+from src.export import FORMATS, export_results
+
+@click.command()
+@click.option('--db', 'db_path', default=DATABASE_PATH, type=click.Path(exists=True, dir_okay=False), help='Results database to export')
+@click.option('--output', default=EXPORT_FOLDER, type=click.Path(file_okay=False), help='Export folder')
+@click.option('--format', 'export_format', default='parquet', type=click.Choice(list(FORMATS)), help='Parquet files or Arrow IPC files (memory-mappable)')
+@click.option('--batch-size', default=EXPORT_BATCH_SIZE, type=click.IntRange(min=1), help='Maximum rows per part file')
+@click.option('--full', is_flag=True, help='Ignore the previous export state and export everything again')
+def main(db_path, output, export_format, batch_size, full):
+    """Export results and summaries for analysis, writing only rounds added since the last export."""
+    report = export_results(db_path, output, export_format, batch_size, full)
+    print(f"Exported {report.rows_exported} result rows from {report.tables_exported} tables to {output}")
+    print(f"  Files written: {report.files_written}")
+    print(f"  Summaries rewritten: {', '.join(report.summaries_rewritten) or 'none'}")
+
+if __name__ == '__main__':
+    main()
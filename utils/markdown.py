@@ -15,12 +15,16 @@ def add_project_root_to_path():
 # Call this function at the top of your markdown.py file
 add_project_root_to_path()
 
+import hashlib
 import sqlite3
 import pandas as pd
 from datetime import datetime
 import curses
-from utils.utils import determine_provider, clean_model_name, clear_console
-from src.constants import DATABASE_PATH
+from utils.utils import clear_console
+from src.constants import DATABASE_PATH, RESULTS_FOLDER
+from src.data_processing import DISPLAY_COLUMNS, ensure_display_columns
+from src.user_interface import SelectionMenu
+from src.json_cache import JsonCache
 
 # Clear console
 clear_console()
@@ -35,138 +39,121 @@ def verify_database_path(path):
 def get_models():
     verify_database_path(DATABASE_PATH)
     conn = sqlite3.connect(DATABASE_PATH)
-    query = "SELECT Model, Date, TOTAL as Score FROM category_summary ORDER BY Date DESC, TOTAL DESC"
+    # Display names are stored with each summary row; older rows are filled in once here
+    ensure_display_columns(conn, 'category_summary')
+    conn.commit()
+    query = "SELECT Model, Date, TOTAL as Score, Provider, Display_Name as CleanModel FROM category_summary ORDER BY Date DESC, TOTAL DESC"
     models_df = pd.read_sql_query(query, conn)
     conn.close()
 
-    # Apply determine_provider and clean_model_name functions
-    models_df['Provider'] = models_df['Model'].apply(determine_provider)
-    models_df['CleanModel'] = models_df.apply(lambda row: clean_model_name(row['Model'], row['Provider']), axis=1)
-
     return models_df
 
 # Function to select models using curses menu
 def curses_model_menu(models_df):
-    stdscr = curses.initscr()
-    curses.cbreak()
-    curses.noecho()
-    stdscr.keypad(True)
-    
     models = models_df.to_dict('records')
-    selected_models = set()
-    idx = 0
-    
+    items = [f"{model['Date']} - {model['CleanModel']} - Score: {model['Score']:.1f}%" for model in models]
     try:
-        while True:
-            stdscr.clear()
-            stdscr.addstr(0, 0, "Use arrow keys to navigate, Space to select/deselect, and Enter to confirm all selections.")
-            stdscr.addstr(1, 0, "Press Ctrl+C to exit at any time.\n")
-            for i, model in enumerate(models):
-                display_text = f"{model['Date']} - {model['CleanModel']} - Score: {model['Score']:.1f}%"
-                if i == idx:
-                    stdscr.addstr(i + 3, 0, f"{'[X]' if model['Model'] in selected_models else '[ ]'} {display_text}", curses.A_REVERSE)
-                else:
-                    stdscr.addstr(i + 3, 0, f"{'[X]' if model['Model'] in selected_models else '[ ]'} {display_text}")
-            stdscr.refresh()
-            
-            key = stdscr.getch()
-            
-            if key == curses.KEY_UP and idx > 0:
-                idx -= 1
-            elif key == curses.KEY_DOWN and idx < len(models) - 1:
-                idx += 1
-            elif key == ord(' '):
-                model = models[idx]['Model']
-                if model in selected_models:
-                    selected_models.remove(model)
-                else:
-                    selected_models.add(model)
-            elif key in [curses.KEY_ENTER, 10, 13]:  # Enter key
-                if len(selected_models) > 0:
-                    return list(selected_models)
-                else:
-                    stdscr.addstr(len(models) + 3, 0, "Please select at least one model before confirming.", curses.A_BOLD)
-                    stdscr.refresh()
-                    stdscr.getch()  # Wait for any key press
+        selected = curses.wrapper(lambda stdscr: SelectionMenu(stdscr, items, "Select the models to include in the leaderboard (Ctrl+C to exit):",
+                                                               require_selection=True).run())
     except KeyboardInterrupt:
         return None
-    finally:
-        curses.endwin()
-
-# Main function to generate markdown file
-def generate_markdown(selected_models):
-    # Connect to SQLite database
+    return list(dict.fromkeys(models[idx]['Model'] for idx in selected))
+
+# Column names in category_summary and their display names
+COLUMN_RENAMES = {
+    'TOTAL': 'TOTAL↓',
+    'Ad_Ops': 'Ad Ops',
+    'Comms_Planning': 'Comms Planning',
+    'Marketing_Effectiveness': 'Marketing Effectiveness',
+    'Paid_Search': 'Paid Search',
+    'Paid_Social': 'Paid Social',
+    'Privacy___Ethics': 'Privacy & Ethics',
+    'Web_Analytics': 'Web Analytics',
+    'Content_Marketing': 'Content Marketing',
+    'Influencer_Marketing': 'Influencer Marketing',
+    'Market_Research___Insights': 'Market Research & Insights',
+}
+
+# Define the structure of the markdown table
+HEADERS = ["Provider", "Model", "TOTAL↓", "AV", "Ad Ops", "Affiliates", "Audio", "Cinema",
+           "Comms Planning", "Marketing Effectiveness", "Outdoor", "Paid Search", "Paid Social",
+           "Privacy & Ethics", "Programmatic", "Publishing", "SEO", "Web Analytics", "eCommerce", "Content Marketing", "Influencer Marketing", "Market Research & Insights"]
+
+# Rendered tables keyed by a hash of the category_summary rows they were built from
+CACHE_FILE = os.path.join(RESULTS_FOLDER, '.leaderboard_cache.json')
+RENDERER_VERSION = 2
+
+# Read the category_summary rows for the selected models
+def load_category_summary(selected_models):
     verify_database_path(DATABASE_PATH)
     conn = sqlite3.connect(DATABASE_PATH)
-
-    # Read data from category_summary table with selected models
     placeholders = ', '.join(['?' for _ in selected_models])
     query = f"SELECT * FROM category_summary WHERE Model IN ({placeholders})"
     df = pd.read_sql_query(query, conn, params=selected_models)
-
-    # Close the connection
     conn.close()
+    return df
 
-    # Apply determine_provider and clean_model_name functions
-    df['Provider'] = df['Model'].apply(determine_provider)
-    df['CleanModel'] = df.apply(lambda row: clean_model_name(row['Model'], row['Provider']), axis=1)
-
-    # Rename columns as needed
-    column_renames = {
-        'TOTAL': 'TOTAL↓',
-        'Ad_Ops': 'Ad Ops',
-        'Comms_Planning': 'Comms Planning',
-        'Marketing_Effectiveness': 'Marketing Effectiveness',
-        'Paid_Search': 'Paid Search',
-        'Paid_Social': 'Paid Social',
-        'Privacy___Ethics': 'Privacy & Ethics',
-        'Web_Analytics': 'Web Analytics',
-        'Content_Marketing': 'Content Marketing',
-        'Influencer_Marketing': 'Influencer Marketing',
-        'Market_Research___Insights': 'Market Research & Insights',
-    }
-
-    df.rename(columns=column_renames, inplace=True)
+# Hash the rows (in a stable order) so identical inputs map to the same rendered table
+def summary_cache_key(df):
+    ordered = df.reindex(sorted(df.columns), axis=1)
+    ordered = ordered.sort_values(by=list(ordered.columns), kind='stable').reset_index(drop=True)
+    digest = hashlib.sha256(f"{RENDERER_VERSION}|{'|'.join(ordered.columns)}|{'|'.join(HEADERS)}".encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(ordered, index=False).values.tobytes())
+    return digest.hexdigest()
 
-    # Add Provider column based on Model
-    df['Provider'] = df['Model'].apply(determine_provider)
+# Build the markdown table in one vectorized pass over the columns
+def render_markdown(df):
+    df = df.rename(columns=COLUMN_RENAMES)
 
-    # Clean up Model names for each provider
-    df['Model'] = df.apply(lambda row: clean_model_name(row['Model'], row['Provider']), axis=1)
+    # Provider and display names come from the summary rows (see get_models)
+    numeric_columns = df.columns.difference(['Model', *DISPLAY_COLUMNS])
 
-    # Convert relevant columns to numeric and round to one decimal place
-    numeric_columns = df.columns.difference(['Provider', 'Model'])
-    df[numeric_columns] = df[numeric_columns].apply(pd.to_numeric, errors='coerce').round(1)
-
-    # Sort the DataFrame by 'TOTAL↓' in descending order
-    df.sort_values(by='TOTAL↓', ascending=False, inplace=True)
-
-    # Find the maximum value in each numeric column
-    max_values = df[numeric_columns].max()
+    numeric = df[numeric_columns].apply(pd.to_numeric, errors='coerce').round(1)
+    order = numeric['TOTAL↓'].sort_values(ascending=False, kind='stable').index
+    numeric = numeric.loc[order]
 
     # Add percentage sign to numeric columns and bold the maximum values
-    for col in numeric_columns:
-        df[col] = df[col].apply(lambda x: f"**{x}%**" if x == max_values[col] else f"{x}%")
-
-    # Define the structure of the markdown table
-    headers = ["Provider", "Model", "TOTAL↓", "AV", "Ad Ops", "Affiliates", "Audio", "Cinema", 
-               "Comms Planning", "Marketing Effectiveness", "Outdoor", "Paid Search", "Paid Social", 
-               "Privacy & Ethics", "Programmatic", "Publishing", "SEO", "Web Analytics", "eCommerce", "Content Marketing", "Influencer Marketing", "Market Research & Insights"]
+    formatted = numeric.astype(str).fillna('nan') + '%'
+    formatted = formatted.mask(numeric.eq(numeric.max()), '**' + formatted + '**')
+    formatted['Provider'] = df.loc[order, 'Provider']
+    formatted['Model'] = df.loc[order, 'Display_Name']
+    formatted = formatted.reindex(columns=HEADERS).astype(str).fillna('')
+
+    # Join the columns into table rows
+    rows = '| ' + formatted[HEADERS[0]]
+    for header in HEADERS[1:]:
+        rows = rows + ' | ' + formatted[header]
+    markdown_table = "| " + " | ".join(HEADERS) + " |\n"
+    markdown_table += "| " + " | ".join(["-"*len(header) for header in HEADERS]) + " |\n"
+    markdown_table += ''.join(row + ' |\n' for row in rows)
+    return markdown_table
 
-    # Create the markdown table
-    markdown_table = "| " + " | ".join(headers) + " |\n"
-    markdown_table += "| " + " | ".join(["-"*len(header) for header in headers]) + " |\n"
+# Main function to generate markdown file
+def generate_markdown(selected_models):
+    df = load_category_summary(selected_models)
+    key = summary_cache_key(df)
 
-    for index, row in df.iterrows():
-        markdown_table += "| " + " | ".join(str(row.get(header, "")) for header in headers) + " |\n"
+    cache = JsonCache(CACHE_FILE)
+    markdown_table = cache.get(key)
+    if markdown_table is None:
+        markdown_table = render_markdown(df)
+    cache.put(key, markdown_table)
 
-    # Get today's date
+    # Write the markdown table to a file with today's date in the filename
     today_date = datetime.today().strftime('%d-%m-%Y')
+    os.makedirs(RESULTS_FOLDER, exist_ok=True)
+    file_name = os.path.join(RESULTS_FOLDER, f"Marketing Benchmark Results - {today_date}.md")
+
+    if os.path.exists(file_name):
+        with open(file_name, "r") as file:
+            if file.read() == markdown_table:
+                cache.save()
+                print("Markdown file is up to date")
+                return
 
-    # Write the markdown table to a file with today's date in the filename
-    file_name = f"../Results/Marketing Benchmark Results - {today_date}.md"
     with open(file_name, "w") as file:
         file.write(markdown_table)
+    cache.save()
 
     print("Markdown file created successfully")
 
@@ -176,9 +163,6 @@ def main():
         models_df = get_models()
         selected_models = curses_model_menu(models_df)
         
-        # Cleanup curses
-        curses.endwin()
-        
         if selected_models:
             generate_markdown(selected_models)
         else:
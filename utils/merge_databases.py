@@ -0,0 +1,35 @@
+import os
+import sys
+
+def add_project_root_to_path():
+    # Get the directory containing the current script (utils)
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    
+    # Get the parent directory of utils (which should be the project root)
+    project_root = os.path.dirname(current_dir)
+    
+    # Add the project root to sys.path if it's not already there
+    if project_root not in sys.path:
+        sys.path.insert(0, project_root)
+
+add_project_root_to_path()
+
+import click
+from src.constants import DATABASE_PATH
+from src.database_merge import merge_databases
+
+@click.command()
+@click.argument('sources', nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option('--target', default=DATABASE_PATH, type=click.Path(dir_okay=False), help='Database to merge into (defaults to the main results database)')
+def main(sources, target):
+    """Merge result databases from other machines into TARGET."""
+    report = merge_databases(target, list(sources))
+    print(f"Merged {report.tables_merged} tables from {len(sources)} databases into {target}")
+    print(f"  Rows added: {report.rows_inserted}")
+    print(f"  Duplicates skipped: {report.duplicates_skipped}")
+    print(f"  Summaries recomputed: {report.summaries_recomputed}")
+    for table, old_round, new_round in report.renumbered_rounds:
+        print(f"  {table}: round {old_round} renumbered to {new_round}")
+
+if __name__ == '__main__':
+    main()
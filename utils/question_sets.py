@@ -0,0 +1,68 @@
+import os
+import sys
+
+def add_project_root_to_path():
+    # Get the directory containing the current script (utils)
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+
+    # Get the parent directory of utils (which should be the project root)
+    project_root = os.path.dirname(current_dir)
+
+    # Add the project root to sys.path if it's not already there
+    if project_root not in sys.path:
+        sys.path.insert(0, project_root)
+
+add_project_root_to_path()
+
+import click
+from src.constants import DATABASE_PATH
+from src.analysis import load_correctness_matrix
+from src.question_sets import select_core_subset, save_question_set, list_question_sets
+
+@click.group()
+def cli():
+    """Propose and manage named question sets for run_benchmark --question-set."""
+
+@cli.command()
+@click.option('--db', 'db_path', default=DATABASE_PATH, type=click.Path(exists=True, dir_okay=False), help='Results database to compute statistics from')
+@click.option('--questions-db', default=DATABASE_PATH, type=click.Path(dir_okay=False), help='Database the question set is saved to')
+@click.option('--model', '-m', 'models', multiple=True, help='Model variant to include (can be specified multiple times; all if omitted)')
+@click.option('--date', default=None, help='Only include runs from this date (YYYY-MM-DD)')
+@click.option('--latest', is_flag=True, help='Only include the most recent run of each model')
+@click.option('--fraction', default=0.3, type=click.FloatRange(0, 1, min_open=True), help='Share of each category to start from')
+@click.option('--min-tau', default=0.9, type=click.FloatRange(-1, 1), help="Kendall's tau the subset ranking must reach")
+@click.option('--min-runs', default=2, type=click.IntRange(min=1), help='Prefer questions answered by at least this many runs')
+@click.option('--save', 'name', default=None, help='Save the subset under this name')
+def propose(db_path, questions_db, models, date, latest, fraction, min_tau, min_runs, name):
+    """Propose a category-balanced core subset that preserves the ranking of stored runs."""
+    matrix = load_correctness_matrix(db_path, models, date, latest)
+    if len(matrix.runs) < 2:
+        print("At least two runs are needed to compare rankings.")
+        return
+
+    subset = select_core_subset(matrix, fraction, min_tau, min_runs)
+    print(f"Core subset: {len(subset.question_codes)} of {len(matrix.question_codes)} questions "
+          f"({subset.fraction:.0%} per category) over {len(matrix.runs)} runs, Kendall tau {subset.kendall_tau:.3f}")
+    if subset.kendall_tau < min_tau:
+        print(f"Warning: even all questions do not reach tau {min_tau}")
+    for category, group in subset.statistics.groupby('Category'):
+        print(f"  {category}: {len(group)} questions, mean difficulty {group['Difficulty'].mean():.2f}, "
+              f"mean discrimination {group['Discrimination'].mean():.2f}")
+
+    if name:
+        save_question_set(name, subset.statistics, questions_db)
+        print(f"Saved as '{name}'; use it with: python main.py --non-interactive --question-set {name}")
+
+@cli.command(name='list')
+@click.option('--questions-db', default=DATABASE_PATH, type=click.Path(exists=True, dir_okay=False), help='Database holding the question sets')
+def list_sets(questions_db):
+    """List the saved question sets."""
+    sets = list_question_sets(questions_db)
+    if sets.empty:
+        print("No question sets saved.")
+        return
+    for row in sets.itertuples(index=False):
+        print(f"  {row.Name}: {row.Questions} questions (created {row.Created})")
+
+if __name__ == '__main__':
+    cli()
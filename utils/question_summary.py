@@ -1,11 +1,33 @@
 import os
+import sys
+
+def add_project_root_to_path():
+    # Get the directory containing the current script (utils)
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    
+    # Get the parent directory of utils (which should be the project root)
+    project_root = os.path.dirname(current_dir)
+    
+    # Add the project root to sys.path if it's not already there
+    if project_root not in sys.path:
+        sys.path.insert(0, project_root)
+
+add_project_root_to_path()
+
 import sqlite3
 from datetime import datetime
 import curses
 import pandas as pd
 import re
-from typing import List, Tuple, Optional
-from utils import determine_provider, clean_model_name, clear_console
+from typing import List
+from utils.utils import resolve_display_name, clear_console
+from src.constants import DATABASE_PATH
+from src.data_processing import ensure_table_catalog, load_table_catalog
+from src.user_interface import SelectionMenu
+
+# SQLite's default limit on the number of terms in a compound SELECT
+MAX_COMPOUND_SELECT = 500
+QUESTION_COLUMNS = ('Category', 'Sub_Category', 'Question')
 
 class DatabaseError(Exception):
     """Custom exception for database-related errors."""
@@ -19,113 +41,91 @@ def get_base_folder() -> str:
     except Exception as e:
         raise OSError(f"Failed to determine base folder: {e}")
 
-def get_table_names_with_timestamp(cursor: sqlite3.Cursor) -> List[str]:
-    """Get table names that have a 'Timestamp' column."""
+def get_table_names(db_path: str) -> List[str]:
+    """Get the results tables recorded in the table catalog, ordered by date and model."""
     try:
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-        tables = [row[0] for row in cursor.fetchall()]
-        
-        return [
-            table for table in tables
-            if any(column[1].lower() == 'timestamp' for column in cursor.execute(f"PRAGMA table_info('{table}');"))
-        ]
+        return list(load_table_catalog(db_path)['Table_Name'])
     except sqlite3.Error as e:
         raise DatabaseError(f"Failed to retrieve table names: {e}")
 
-def get_earliest_timestamp(cursor: sqlite3.Cursor, table_name: str) -> Optional[str]:
-    """Get the earliest timestamp from a table."""
-    try:
-        cursor.execute(f"SELECT MIN(Timestamp) FROM '{table_name}';")
-        return cursor.fetchone()[0]
-    except sqlite3.Error as e:
-        print(f"Warning: Failed to get earliest timestamp for table '{table_name}': {e}")
-        return None
-
-def create_summary_table(cursor: sqlite3.Cursor, conn: sqlite3.Connection) -> None:
-    """Create a summary table."""
-    try:
-        cursor.execute("DROP TABLE IF EXISTS table_summary;")
-        cursor.execute("""
-            CREATE TABLE table_summary (
-                table_name TEXT PRIMARY KEY,
-                creation_date TEXT
-            );
-        """)
-        conn.commit()
-    except sqlite3.Error as e:
-        raise DatabaseError(f"Failed to create summary table: {e}")
-
-def populate_summary_table(cursor: sqlite3.Cursor, conn: sqlite3.Connection, table_names: List[str]) -> None:
-    """Populate the summary table with table names and creation dates."""
-    try:
-        for table_name in table_names:
-            earliest_timestamp = get_earliest_timestamp(cursor, table_name)
-            if earliest_timestamp:
-                formatted_date = datetime.strptime(earliest_timestamp, "%Y-%m-%d %H:%M:%S.%f").strftime("%d-%m-%Y")
-                cursor.execute("INSERT INTO table_summary (table_name, creation_date) VALUES (?, ?);", 
-                               (table_name, formatted_date))
-        conn.commit()
-    except sqlite3.Error as e:
-        raise DatabaseError(f"Failed to populate summary table: {e}")
-    except ValueError as e:
-        raise ValueError(f"Failed to parse timestamp: {e}")
-
 def curses_menu(stdscr, table_names: List[str]) -> List[str]:
-    """Display a curses-based menu for table selection."""
+    """Display a curses-based menu for table selection; confirming with nothing selected exits."""
     try:
-        curses.curs_set(0)
-        selected_tables = set()
-        current_selection = 0
-        table_names.append("Exit")
-
-        while True:
-            stdscr.clear()
-            stdscr.addstr(0, 0, "Select models (press Space to toggle, Enter to confirm):")
-            for idx, table_name in enumerate(table_names):
-                prefix = "[x]" if table_name in selected_tables else "[ ]"
-                style = curses.A_REVERSE if idx == current_selection else curses.A_NORMAL
-                stdscr.addstr(idx + 1, 0, f"{prefix} {table_name}", style)
-            
-            key = stdscr.getch()
-            if key == curses.KEY_UP:
-                current_selection = max(0, current_selection - 1)
-            elif key == curses.KEY_DOWN:
-                current_selection = min(len(table_names) - 1, current_selection + 1)
-            elif key == ord(' '):
-                table_name = table_names[current_selection]
-                if table_name in selected_tables:
-                    selected_tables.remove(table_name)
-                else:
-                    selected_tables.add(table_name)
-            elif key in [10, 13]:  # Enter key
-                if table_names[current_selection] == "Exit":
-                    return []
-                break
-
-        return list(selected_tables)
+        selected = SelectionMenu(stdscr, table_names, "Select results tables (press Space to toggle, Enter to confirm):").run()
+        return [table_names[idx] for idx in selected]
+    except KeyboardInterrupt:
+        return []
     except curses.error as e:
         raise RuntimeError(f"Curses error: {e}")
 
 def clean_table_name(name: str) -> str:
-    """Clean the table name."""
+    """Clean the table name; used for tables missing from the table catalog."""
     name = re.sub(r'^[0-9]+_[0-9]+_[0-9]+_', '', name)
     name = name.replace('_', '-')
-    provider = determine_provider(name)
-    return clean_model_name(name, provider)
+    return resolve_display_name(name)[0]
+
+def correctness_expression(columns: List[str]) -> str:
+    """SQL expression scoring a row 1.0 if correct, else 0.0; older tables store 'Correct' and text booleans."""
+    column = 'Is_Correct' if 'Is_Correct' in columns else 'Correct'
+    return f"CASE WHEN \"{column}\" IN (1, '1', 'True', 'true') THEN 1.0 ELSE 0.0 END"
+
+def column_labels(cursor: sqlite3.Cursor, selected_tables: List[str]) -> List[str]:
+    """Label each table with its model name, adding the date when a model appears more than once."""
+    # The catalog records the model variant of each table, which maps to the configured display name
+    ensure_table_catalog(cursor.connection)
+    models = dict(cursor.execute("SELECT Table_Name, Model FROM table_catalog").fetchall())
+    names = [resolve_display_name(models[table])[0] if models.get(table) else clean_table_name(table) for table in selected_tables]
+    labels = []
+    for table, name in zip(selected_tables, names):
+        if names.count(name) > 1:
+            date = '-'.join(reversed(table.split('_')[:3]))
+            name = f"{name} ({date})"
+        labels.append(name)
+    return labels
+
+def build_question_matrix_query(cursor: sqlite3.Cursor, tables: List[str]) -> str:
+    """
+    Build one query returning, per table and question, the question details and its correctness.
+
+    Each table is reduced to one row per question (the share of its rounds answered
+    correctly) and the tables are combined with UNION ALL.
+    """
+    branches = []
+    for index, table in enumerate(tables):
+        columns = [column[1] for column in cursor.execute(f"PRAGMA table_info('{table}');")]
+        metadata = ', '.join(f'MAX("{name}") AS "{name}"' if name in columns else f'NULL AS "{name}"' for name in QUESTION_COLUMNS)
+        branches.append(
+            f'SELECT {index} AS Table_Index, "Question_Code", {metadata}, AVG({correctness_expression(columns)}) AS Correct '
+            f'FROM "{table}" GROUP BY "Question_Code"'
+        )
+    return ' UNION ALL '.join(branches)
 
 def process_selected_tables(selected_tables: List[str], conn: sqlite3.Connection) -> pd.DataFrame:
-    """Process selected tables and return a DataFrame."""
+    """
+    Build the question-by-model correctness matrix for the selected tables.
+
+    Rows are matched on Question_Code rather than position. Values are the share of
+    rounds in which the model answered the question correctly (1.0 or 0.0 for a single
+    round) and empty where the model never saw the question. Tables are read with one
+    query per MAX_COMPOUND_SELECT tables, SQLite's limit on UNION ALL terms, and the
+    pivot is done in pandas, which stays linear in the number of models where SQL
+    conditional aggregation grows with models x rows.
+    """
     try:
-        df = pd.DataFrame()
-        for table in selected_tables:
-            query = f"SELECT Question_Code, Question, Category, Sub_Category, Correct FROM '{table}'"
-            data = pd.read_sql_query(query, conn)
-            data['Correct'] = data['Correct'].astype(bool)
-            cleaned_table_name = clean_table_name(table)
-            if df.empty:
-                df = data[['Category', 'Sub_Category', 'Question_Code', 'Question']]
-            df[cleaned_table_name] = data['Correct']
-        return df
+        cursor = conn.cursor()
+        answers = pd.concat([
+            pd.read_sql_query(build_question_matrix_query(cursor, selected_tables[start:start + MAX_COMPOUND_SELECT]), conn)
+            .assign(Table_Index=lambda df, start=start: df['Table_Index'] + start)
+            for start in range(0, len(selected_tables), MAX_COMPOUND_SELECT)
+        ], ignore_index=True)
+
+        labels = column_labels(cursor, selected_tables)
+        matrix = answers.pivot(index='Question_Code', columns='Table_Index', values='Correct')
+        matrix = matrix.reindex(columns=range(len(selected_tables)))
+        matrix.columns = labels
+        details = answers.groupby('Question_Code')[list(QUESTION_COLUMNS)].first()
+        df = details.join(matrix).sort_index().reset_index()
+        return df[['Category', 'Sub_Category', 'Question_Code', 'Question'] + labels]
     except (sqlite3.Error, pd.errors.DatabaseError) as e:
         raise DatabaseError(f"Failed to process selected tables: {e}")
 
@@ -133,12 +133,10 @@ def main() -> None:
     try:
         clear_console()
         base_folder = get_base_folder()
-        db_path = os.path.join(base_folder, 'results_database.sqlite')
+        db_path = DATABASE_PATH
         
-        with sqlite3.connect(db_path) as conn:
-            cursor = conn.cursor()
-            table_names = get_table_names_with_timestamp(cursor)
-            selected_tables = curses.wrapper(lambda stdscr: curses_menu(stdscr, table_names))
+        table_names = get_table_names(db_path)
+        selected_tables = curses.wrapper(lambda stdscr: curses_menu(stdscr, table_names))
         
         if selected_tables:
             with sqlite3.connect(db_path) as conn:
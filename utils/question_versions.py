@@ -0,0 +1,46 @@
+import os
+import sys
+
+def add_project_root_to_path():
+    # Get the directory containing the current script (utils)
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    
+    # Get the parent directory of utils (which should be the project root)
+    project_root = os.path.dirname(current_dir)
+    
+    # Add the project root to sys.path if it's not already there
+    if project_root not in sys.path:
+        sys.path.insert(0, project_root)
+
+add_project_root_to_path()
+
+import click
+from src.constants import DATABASE_PATH
+from src.data_processing import load_questions, question_versions
+from src.question_versions import find_stale_results, recompute_current_summaries
+
+@click.command()
+@click.option('--db', 'db_path', default=DATABASE_PATH, type=click.Path(exists=True, dir_okay=False), help='Results database to check')
+@click.option('--questions-db', default=DATABASE_PATH, type=click.Path(exists=True, dir_okay=False), help='Database holding the questions table')
+@click.option('--recompute', is_flag=True, help='Rebuild the summaries of affected rounds from current-version answers only')
+def main(db_path, questions_db, recompute):
+    """List results answered against questions that have since been edited."""
+    versions = question_versions(load_questions(questions_db))
+    stale = find_stale_results(versions, db_path)
+    if stale.empty:
+        print("All results match the current question versions.")
+        return
+
+    print(f"{len(stale)} results were answered against an older version of {stale['Question_Code'].nunique()} questions:")
+    for (model, date), group in stale.groupby(['Model', 'Date']):
+        print(f"  {model} on {date}: {len(group)} results in {group['Round'].nunique()} rounds")
+    print(f"Edited questions: {', '.join(sorted(stale['Question_Code'].unique()))}")
+
+    if recompute:
+        rounds = recompute_current_summaries(versions, db_path)
+        print(f"Recomputed summaries for {rounds} rounds.")
+    else:
+        print("Rerunning a --shard run asks only the edited questions again; --recompute drops them from the summaries instead.")
+
+if __name__ == '__main__':
+    main()